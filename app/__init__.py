@@ -1,18 +1,49 @@
-from flask import Flask, request
+from flask import Flask, Response, request, stream_with_context
 
-from app.receipt_database import ReceiptDatabase
-from app.point_calculator import score_receipt
+from app.receipt_database import create_receipt_db
+from app.request_metrics import RequestMetrics, instrument_app
+from app.receipt_stream import (
+    CSV_MIMETYPE, EXPORT_FORMATS, NDJSON_MIMETYPE, csv_lines, gzip_chunks,
+    ingest_lines, join_chunks, ndjson_lines, read_lines
+)
+from app.snapshot_triggers import configure_snapshot_triggers
+from app.stage_timing import StageTimer, instrument_stages
 
-## Create the Flask application for the receipt processor.
+## Create the Flask application for the receipt processor. Settings are read
+## from environment variables prefixed with "FLASK_" (e.g.
+## FLASK_RECEIPT_POINTS_CACHE) and can be overridden with the given config.
+##
+## Parameters:
+##     config (dict): settings that override the environment, if any
 ##
 ## Returns:
 ##     A Flask object representing the receipt processor application.
 ##
-def create_app() -> Flask:
+def create_app(config: dict = None) -> Flask:
     app = Flask(__name__)
-    receipt_db = ReceiptDatabase()
+    app.config.from_prefixed_env()
+    if config is not None:
+        app.config.update(config)
+
+    receipt_db = create_receipt_db(app.config)
+    configure_snapshot_triggers(receipt_db, app.config)
+    batch_limit = app.config.get('RECEIPT_BATCH_LIMIT', 1000)
+    points_batch_limit = app.config.get('RECEIPT_POINTS_BATCH_LIMIT', 10000)
+    stream_line_limit = app.config.get('RECEIPT_STREAM_LINE_LIMIT', 65536)
+    metrics = RequestMetrics(receipt_db)
+    if app.config.get('RECEIPT_METRICS', True):
+        instrument_app(app, metrics)
+
+    slow_request_ms = app.config.get('RECEIPT_SLOW_REQUEST_MS')
+    if app.config.get('RECEIPT_STAGE_TIMING', False) or slow_request_ms:
+        metrics.stage_timer = StageTimer(
+            slow_request_ms / 1000 if slow_request_ms else None
+        )
+        instrument_stages(app, metrics.stage_timer)
 
-    ## Store the receipt data as a receipt in the database.
+    ## Store the receipt data as a receipt in the database. A request with an
+    ## Idempotency-Key header that was already used for the same receipt gets
+    ## the id from the first request.
     ##
     ## Returns:
     ##     On success, a tuple is returned which contains a dict specifying
@@ -24,14 +55,113 @@ def create_app() -> Flask:
     def store_receipt() -> tuple:
         try:
             receipt_data = request.get_json()
-            receipt_id = receipt_db.add_receipt(receipt_data)
+            receipt_id = receipt_db.add_receipt(
+                receipt_data, request.headers.get('Idempotency-Key')
+            )
             return {'id': receipt_id}, 200
         except (ValueError, KeyError) as err:
+            metrics.count_errors('parse')
             return str(err.args[0]), 400
         except Exception as err:
             return repr(err), 500
 
-    ## Retrieve the amount of points for the receipt with the given id.
+    ## Store each receipt in the array of receipt data in the database.
+    ##
+    ## Returns:
+    ##     On success, a tuple is returned which contains a dict with a list
+    ##     of results in the same order as the receipts and an int for the
+    ##     response code. Each result is a dict specifying either the unique
+    ##     id of the stored receipt or the cause of its rejection. On failure,
+    ##     a tuple is returned which contains a string for the cause of
+    ##     failure and an int for the response code.
+    ##
+    @app.route("/receipts/process/batch", methods=['POST'])
+    def store_receipts() -> tuple:
+        try:
+            receipts_data = request.get_json()
+
+            if not isinstance(receipts_data, list):
+                return 'Batch of receipts must be a JSON array', 400
+            if len(receipts_data) > batch_limit:
+                error_msg = 'Batch of receipts must not contain more than '
+                return error_msg + f'{batch_limit} receipts', 400
+
+            results = receipt_db.add_receipts(receipts_data)
+            metrics.count_errors('parse', sum(
+                isinstance(result, Exception) for result in results
+            ))
+            return {
+                'results': [
+                    {'id': result} if isinstance(result, str)
+                    else {'error': str(result.args[0])}
+                    for result in results
+                ]
+            }, 200
+        except Exception as err:
+            return repr(err), 500
+
+    ## Store the receipt on each line of a newline-delimited JSON body. The
+    ## body is read a line at a time, and the result for each receipt is
+    ## streamed back as soon as it is stored, so memory stays the same however
+    ## many receipts are uploaded.
+    ##
+    ## Returns:
+    ##     On success, a Response is returned which streams a line of JSON for
+    ##     each non-blank line of the body, in the same order, specifying
+    ##     either the unique id of the stored receipt or the cause of its
+    ##     rejection. On failure, a tuple is returned which contains a string
+    ##     for the cause of failure and an int for the response code.
+    ##
+    @app.route("/receipts/process/stream", methods=['POST'])
+    def stream_receipts() -> Response | tuple:
+        if request.mimetype != NDJSON_MIMETYPE:
+            return f'Receipts must be sent as {NDJSON_MIMETYPE}', 415
+
+        lines = read_lines(request.stream, stream_line_limit)
+        results = ingest_lines(receipt_db, lines, stream_line_limit,
+                               lambda: metrics.count_errors('parse'))
+        return Response(stream_with_context(results),
+                        mimetype=NDJSON_MIMETYPE)
+
+    ## Export every stored receipt along with its points as newline-delimited
+    ## JSON, or CSV with the "format" query parameter set to "csv". Only
+    ## receipts with ids after the "since" query parameter are exported if it
+    ## is given. The receipts are read and written a chunk at a time, so
+    ## memory stays the same however many receipts are stored, and the body
+    ## is compressed with gzip if the client accepts it.
+    ##
+    ## Returns:
+    ##     On success, a Response is returned which streams a line for each
+    ##     stored receipt. On failure, a tuple is returned which contains a
+    ##     string for the cause of failure and an int for the response code.
+    ##
+    @app.route("/receipts/export")
+    def export_receipts() -> Response | tuple:
+        format = request.args.get('format', 'ndjson')
+        if format not in EXPORT_FORMATS:
+            error_msg = 'Export format must be one of '
+            return error_msg + ', '.join(EXPORT_FORMATS), 400
+
+        rows = receipt_db.export(request.args.get('since'))
+        if format == 'csv':
+            lines = csv_lines(rows, receipt_db.points_only)
+            mimetype = CSV_MIMETYPE
+        else:
+            lines = ndjson_lines(rows)
+            mimetype = NDJSON_MIMETYPE
+
+        chunks = join_chunks(lines)
+        headers = {'Vary': 'Accept-Encoding'}
+        if request.accept_encodings['gzip']:
+            chunks = gzip_chunks(chunks)
+            headers['Content-Encoding'] = 'gzip'
+
+        return Response(stream_with_context(chunks), mimetype=mimetype,
+                        headers=headers)
+
+    ## Retrieve the amount of points for the receipt with the given id. A
+    ## receipt evicted to stay within the capacity of the storage responds
+    ## with 410 instead of 404.
     ##
     ## Parameters:
     ##     id (str): the id of the receipt
@@ -46,14 +176,43 @@ def create_app() -> Flask:
     @app.route("/receipts/<id>/points")
     def get_points(id) -> tuple:
         try:
-            receipt = receipt_db.get_receipt(id)
+            points = receipt_db.get_points(id)
 
-            if receipt is not None:
-                points = score_receipt(receipt)
+            if points is not None:
                 return {'points': points}, 200
+            elif receipt_db.is_evicted(id):
+                return f'Receipt with the id of {id} was evicted', 410
             else:
                 return f'No receipt found with the id of {id}', 404
         except Exception as err:
+            metrics.count_errors('score')
+            return repr(err), 500
+
+    ## Retrieve the amount of points for each receipt in the array of ids.
+    ##
+    ## Returns:
+    ##     On success, a tuple is returned which contains a dict mapping each
+    ##     id to the amount of points calculated for the receipt with the
+    ##     matching id (or null if no receipt was found) and an int for the
+    ##     response code. On failure, a tuple is returned which contains a
+    ##     string for the cause of failure and an int for the response code.
+    ##
+    @app.route("/receipts/points", methods=['POST'])
+    def get_batch_points() -> tuple:
+        try:
+            ids = request.get_json()
+
+            if not isinstance(ids, list):
+                return 'Receipt ids must be a JSON array', 400
+            if not all(isinstance(id, str) for id in ids):
+                return 'Receipt ids must be strings', 400
+            if len(ids) > points_batch_limit:
+                error_msg = 'Receipt ids must not contain more than '
+                return error_msg + f'{points_batch_limit} ids', 400
+
+            return {'points': receipt_db.get_receipts_points(ids)}, 200
+        except Exception as err:
+            metrics.count_errors('score')
             return repr(err), 500
 
     return app
\ No newline at end of file
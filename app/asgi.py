@@ -0,0 +1,277 @@
+import asyncio
+import functools
+import json
+import re
+
+from flask import Config
+from werkzeug.exceptions import BadRequest, UnsupportedMediaType
+
+from app.receipt_database import ReceiptDatabase, create_receipt_db
+from app.snapshot_triggers import configure_snapshot_triggers
+
+POINTS_PATH = re.compile(r'/receipts/([^/]+)/points')
+
+## An ASGI application for the receipt processor, serving the same routes with
+## the same responses as the Flask application. It runs under an async server
+## (e.g. uvicorn), where one process can hold thousands of idle keep-alive
+## connections instead of tying up a sync worker per connection. Requests are
+## handled in the default executor of the event loop, since the database may
+## block on locks, journal writes, or storage files.
+##
+class ReceiptProcessorASGI:
+    ## Initialize member variables for the application.
+    ##
+    ## Parameters:
+    ##     receipt_db (ReceiptDatabase): the database to store receipts in
+    ##
+    def __init__(self, receipt_db: ReceiptDatabase) -> None:
+        self.receipt_db = receipt_db
+
+    ## Handle a connection from the ASGI server.
+    ##
+    ## Parameters:
+    ##     scope (dict): the details of the connection
+    ##     receive (callable): the coroutine to receive events from the client
+    ##     send (callable): the coroutine to send events to the client
+    ##
+    async def __call__(self, scope: dict, receive: callable,
+                       send: callable) -> None:
+        if scope['type'] == 'lifespan':
+            await self._handle_lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._handle_http(scope, receive, send)
+
+    ## Acknowledge the startup and shutdown of the server.
+    ##
+    ## Parameters:
+    ##     receive (callable): the coroutine to receive events from the server
+    ##     send (callable): the coroutine to send events to the server
+    ##
+    async def _handle_lifespan(self, receive: callable,
+                               send: callable) -> None:
+        while True:
+            event = await receive()
+
+            if event['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif event['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    ## Route an HTTP request to its handler and send the response.
+    ##
+    ## Parameters:
+    ##     scope (dict): the details of the request
+    ##     receive (callable): the coroutine to receive the request body
+    ##     send (callable): the coroutine to send the response
+    ##
+    async def _handle_http(self, scope: dict, receive: callable,
+                           send: callable) -> None:
+        path = scope['path']
+        method = scope['method']
+        points_match = POINTS_PATH.fullmatch(path)
+
+        if path == '/receipts/process':
+            if method == 'POST':
+                body = await self._read_body(receive)
+                data, status = await self._run(
+                    self.store_receipt, body,
+                    self._header(scope, b'idempotency-key'),
+                    self._header(scope, b'content-type')
+                )
+            else:
+                data, status = 'Method Not Allowed', 405
+        elif points_match is not None:
+            if method in ('GET', 'HEAD'):
+                data, status = await self._run(
+                    self.get_points, points_match.group(1)
+                )
+            else:
+                data, status = 'Method Not Allowed', 405
+        else:
+            data, status = 'Not Found', 404
+
+        await self._send_response(send, data, status, method != 'HEAD')
+
+    ## Run a handler in the default executor of the event loop, so that the
+    ## loop keeps serving other connections while it blocks.
+    ##
+    ## Parameters:
+    ##     handler (callable): the handler to run
+    ##     *args: the arguments to call the handler with
+    ##
+    ## Returns:
+    ##     The result of the handler.
+    ##
+    async def _run(self, handler: callable, *args) -> any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, functools.partial(handler, *args)
+        )
+
+    ## Find the value of a header of the request.
+    ##
+    ## Parameters:
+    ##     scope (dict): the details of the request
+    ##     name (bytes): the lowercase name of the header
+    ##
+    ## Returns:
+    ##     A string for the value of the first header with the name or None
+    ##     if the request has no such header.
+    ##
+    def _header(self, scope: dict, name: bytes) -> str:
+        for header_name, value in scope['headers']:
+            if header_name == name:
+                return value.decode('latin-1')
+
+        return None
+
+    ## Read the whole body of the request.
+    ##
+    ## Parameters:
+    ##     receive (callable): the coroutine to receive the request body
+    ##
+    ## Returns:
+    ##     The bytes of the request body.
+    ##
+    async def _read_body(self, receive: callable) -> bytes:
+        chunks = []
+
+        while True:
+            event = await receive()
+            chunks.append(event.get('body', b''))
+
+            if not event.get('more_body', False):
+                return b''.join(chunks)
+
+    ## Send the given data as the response, encoding dicts as JSON and
+    ## strings as HTML like Flask does.
+    ##
+    ## Parameters:
+    ##     send (callable): the coroutine to send the response
+    ##     data (dict | str): the data of the response
+    ##     status (int): the response code
+    ##     include_body (bool): whether to send the body, which is left out
+    ##                          for HEAD requests while keeping its length
+    ##
+    async def _send_response(self, send: callable, data: dict | str,
+                             status: int, include_body: bool = True) -> None:
+        if isinstance(data, dict):
+            body = (json.dumps(data, separators=(',', ':')) + '\n').encode()
+            content_type = b'application/json'
+        else:
+            body = data.encode()
+            content_type = b'text/html; charset=utf-8'
+
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [
+                (b'content-type', content_type),
+                (b'content-length', str(len(body)).encode())
+            ]
+        })
+        await send({
+            'type': 'http.response.body', 'body': body if include_body else b''
+        })
+
+    ## Store the receipt in the request body in the database. A request with
+    ## an idempotency key that was already used for the same receipt gets the
+    ## id from the first request. Bodies that aren't JSON fail like they do
+    ## in the Flask application.
+    ##
+    ## Parameters:
+    ##     body (bytes): the JSON for the receipt
+    ##     idempotency_key (str): the Idempotency-Key header of the request,
+    ##                            if any
+    ##     content_type (str): the Content-Type header of the request, if any
+    ##
+    ## Returns:
+    ##     On success, a tuple is returned which contains a dict specifying
+    ##     the unique id of the receipt and an int for the response code.
+    ##     On failure, a tuple is returned which contains a string for the
+    ##     cause of failure and an int for the response code.
+    ##
+    def store_receipt(self, body: bytes, idempotency_key: str = None,
+                      content_type: str = 'application/json') -> tuple:
+        try:
+            receipt_data = _parse_json(body, content_type)
+            receipt_id = self.receipt_db.add_receipt(receipt_data,
+                                                     idempotency_key)
+            return {'id': receipt_id}, 200
+        except (ValueError, KeyError) as err:
+            return str(err.args[0]), 400
+        except Exception as err:
+            return repr(err), 500
+
+    ## Retrieve the amount of points for the receipt with the given id. A
+    ## receipt evicted to stay within the capacity of the storage responds
+    ## with 410 instead of 404.
+    ##
+    ## Parameters:
+    ##     id (str): the id of the receipt
+    ##
+    ## Returns:
+    ##     On success, a tuple is returned which contains a dict specifying
+    ##     the amount of points calculated for the receipt with the matching
+    ##     id and an int for the response code. On failure, a tuple is
+    ##     returned which contains a string describing the cause of failure
+    ##     and an int for the response code.
+    ##
+    def get_points(self, id: str) -> tuple:
+        try:
+            points = self.receipt_db.get_points(id)
+
+            if points is not None:
+                return {'points': points}, 200
+            elif self.receipt_db.is_evicted(id):
+                return f'Receipt with the id of {id} was evicted', 410
+            else:
+                return f'No receipt found with the id of {id}', 404
+        except Exception as err:
+            return repr(err), 500
+
+## Parse a JSON request body the way Flask's Request.get_json does.
+##
+## Parameters:
+##     body (bytes): the body of the request
+##     content_type (str): the Content-Type header of the request, if any
+##
+## Raises:
+##     UnsupportedMediaType: if the content type is not JSON
+##     BadRequest: if the body is not valid JSON
+##
+## Returns:
+##     The data decoded from the body.
+##
+def _parse_json(body: bytes, content_type: str) -> any:
+    mimetype = (content_type or '').split(';')[0].strip().lower()
+    if not (mimetype == 'application/json' or (
+        mimetype.startswith('application/') and mimetype.endswith('+json')
+    )):
+        raise UnsupportedMediaType()
+
+    try:
+        return json.loads(body)
+    except ValueError:
+        raise BadRequest() from None
+
+## Create the ASGI application for the receipt processor. Settings are read
+## the same way as for create_app, from environment variables prefixed with
+## "FLASK_", and can be overridden with the given config.
+##
+## Parameters:
+##     config (dict): settings that override the environment, if any
+##
+## Returns:
+##     A ReceiptProcessorASGI representing the receipt processor application.
+##
+def create_asgi_app(config: dict = None) -> ReceiptProcessorASGI:
+    app_config = Config('.')
+    app_config.from_prefixed_env()
+    if config is not None:
+        app_config.update(config)
+
+    receipt_db = create_receipt_db(app_config)
+    configure_snapshot_triggers(receipt_db, app_config)
+    return ReceiptProcessorASGI(receipt_db)
@@ -0,0 +1,110 @@
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from app.benchmarks.http_load import LoadRequest, run_load
+from app.benchmarks.payloads import load_examples
+
+HOST = '127.0.0.1'
+SERVERS = {
+    'flask (gunicorn sync)': [
+        sys.executable, '-m', 'gunicorn', '-w', '1', '-b', '{bind}',
+        'app.server:app'
+    ],
+    'asgi (uvicorn)': [
+        sys.executable, '-m', 'uvicorn', '--host', HOST, '--port', '{port}',
+        '--log-level', 'warning', 'app.asgi_server:app'
+    ]
+}
+
+## Find a free port on the local host.
+##
+## Returns:
+##     An int for the port.
+##
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind((HOST, 0))
+        return sock.getsockname()[1]
+
+## Start a server and wait until it accepts connections.
+##
+## Parameters:
+##     command (list[str]): the command to start the server, with "{port}"
+##                          and "{bind}" placeholders
+##     port (int): the port for the server to listen on
+##
+## Raises:
+##     RuntimeError: if the server doesn't accept connections in time
+##
+## Returns:
+##     A Popen for the server process.
+##
+def start_server(command: list[str], port: int) -> subprocess.Popen:
+    args = [
+        arg.format(port=port, bind=f'{HOST}:{port}') for arg in command
+    ]
+    process = subprocess.Popen(args, stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL,
+                               env=dict(os.environ))
+
+    for i in range(100):
+        try:
+            socket.create_connection((HOST, port), timeout=0.1).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+
+    process.kill()
+    raise RuntimeError(f'Server did not start: {" ".join(args)}')
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description='Compare the Flask and ASGI applications under load.'
+    )
+    parser.add_argument('--connections', type=int, default=50,
+                        help='the amount of connections sending requests')
+    parser.add_argument('--idle-connections', type=int, nargs='+',
+                        default=[0, 1000],
+                        help='the amounts of idle keep-alive connections')
+    parser.add_argument('--duration', type=float, default=5.0,
+                        help='the seconds to send requests for')
+    args = parser.parse_args()
+
+    bodies = [json.dumps(data).encode() for data in load_examples()]
+    requests = itertools.cycle(
+        [LoadRequest('POST', '/receipts/process', body) for body in bodies]
+        + [LoadRequest('GET', '/receipts/1/points')] * len(bodies)
+    )
+
+    print(f'{"server":<24}{"idle":>6}{"req/s":>10}{"p50 ms":>9}'
+          f'{"p99 ms":>9}{"errors":>8}')
+
+    for name, command in SERVERS.items():
+        for idle_connections in args.idle_connections:
+            port = free_port()
+            server = start_server(command, port)
+
+            try:
+                result = asyncio.run(run_load(
+                    HOST, port, lambda: next(requests), args.connections,
+                    args.duration, idle_connections
+                ))
+            finally:
+                server.terminate()
+                server.wait()
+
+            print(f'{name:<24}{idle_connections:>6}'
+                  f'{result.throughput():>10.0f}'
+                  f'{result.percentile(50) * 1000:>9.2f}'
+                  f'{result.percentile(99) * 1000:>9.2f}'
+                  f'{result.errors:>8}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from app.benchmarks.payloads import example_receipts
+from app.receipt_database import ReceiptDatabase
+
+## Measure the latency of adding receipts while a snapshot is written. The
+## receipts are added repeatedly until the snapshot is written.
+##
+## Parameters:
+##     receipt_db (ReceiptDatabase): the database to add receipts to
+##     receipts (list[dict]): the receipts to add, one at a time
+##     snapshot (callable): the function that takes the snapshot and returns
+##                          once it is written
+##
+## Returns:
+##     A tuple containing a sorted list of floats for the seconds taken by
+##     each add during the snapshot and a float for the seconds the snapshot
+##     took.
+##
+def measure_adds(receipt_db: ReceiptDatabase, receipts: list[dict],
+                 snapshot: callable) -> tuple:
+    started = threading.Event()
+    done = threading.Event()
+    latencies = []
+
+    def add_receipts() -> None:
+        while not done.is_set():
+            for receipt in receipts:
+                if done.is_set():
+                    return
+                start = time.perf_counter()
+                receipt_db.add_receipt(receipt)
+                if started.is_set():
+                    latencies.append(time.perf_counter() - start)
+
+    writer = threading.Thread(target=add_receipts)
+    writer.start()
+    time.sleep(0.05)
+
+    started.set()
+    start = time.perf_counter()
+    snapshot()
+    snapshot_secs = time.perf_counter() - start
+
+    done.set()
+    writer.join()
+    return sorted(latencies), snapshot_secs
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description='Compare ingest latency during foreground and background '
+                    'snapshots.'
+    )
+    parser.add_argument('--size', type=int, default=200000,
+                        help='the amount of stored receipts')
+    parser.add_argument('--dir', default=None,
+                        help='the directory to keep the snapshots in')
+    args = parser.parse_args()
+
+    def background(receipt_db: ReceiptDatabase, path: str) -> None:
+        receipt_db.start_background_snapshot(path)
+        receipt_db.wait_for_snapshot()
+
+    modes = {
+        'foreground': lambda receipt_db, path: receipt_db.save_snapshot(path),
+        'background': background
+    }
+
+    print(f'{"mode":>11}{"snapshot s":>12}{"fork ms":>9}{"adds/s":>9}'
+          f'{"p50 us":>9}{"p99 us":>9}{"max ms":>9}')
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as dir:
+        for mode, snapshot in modes.items():
+            receipt_db = ReceiptDatabase()
+            receipt_db.add_receipts(example_receipts(args.size))
+            path = os.path.join(dir, f'{mode}.snapshot')
+
+            latencies, snapshot_secs = measure_adds(
+                receipt_db, example_receipts(1000),
+                lambda: snapshot(receipt_db, path)
+            )
+            fork_secs = receipt_db.get_snapshot_stats()['last_fork_duration']
+
+            print(f'{mode:>11}{snapshot_secs:>12.2f}{fork_secs * 1000:>9.2f}'
+                  f'{len(latencies) / snapshot_secs:>9.0f}'
+                  f'{latencies[len(latencies) // 2] * 1e6:>9.1f}'
+                  f'{latencies[int(len(latencies) * 0.99)] * 1e6:>9.1f}'
+                  f'{latencies[-1] * 1000:>9.2f}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+import argparse
+import threading
+import time
+
+from app.benchmarks.payloads import example_receipts
+from app.receipt_database import ReceiptDatabase
+
+## A database that serializes every call behind one lock, as a baseline for
+## the lock-free reads of ReceiptDatabase.
+##
+class GlobalLockDatabase(ReceiptDatabase):
+    ## Initialize member variables for the database.
+    ##
+    def __init__(self) -> None:
+        super().__init__()
+        self._lock = threading.Lock()
+
+    def add_receipts(self, receipts_data: list[dict]) -> list:
+        with self._lock:
+            return super().add_receipts(receipts_data)
+
+    def get_points(self, id: str) -> int:
+        with self._lock:
+            return super().get_points(id)
+
+## Read points from the database until the stop event is set.
+##
+## Parameters:
+##     receipt_db (ReceiptDatabase): the database to read from
+##     ids (list[str]): the ids to read the points of
+##     stop (Event): the event that ends the reads
+##     latencies (list[float]): the list to record the seconds of each read in
+##
+def read_points(receipt_db: ReceiptDatabase, ids: list[str],
+                stop: threading.Event, latencies: list[float]) -> None:
+    index = 0
+
+    while not stop.is_set():
+        start = time.perf_counter()
+        receipt_db.get_points(ids[index % len(ids)])
+        latencies.append(time.perf_counter() - start)
+        index += 1
+
+## Add batches of receipts to the database until the stop event is set.
+##
+## Parameters:
+##     receipt_db (ReceiptDatabase): the database to write to
+##     batch (list[dict]): the receipts to add in each batch
+##     stop (Event): the event that ends the writes
+##
+def write_receipts(receipt_db: ReceiptDatabase, batch: list[dict],
+                   stop: threading.Event) -> None:
+    while not stop.is_set():
+        receipt_db.add_receipts(batch)
+
+## Measure reads from the database while other threads write to it.
+##
+## Parameters:
+##     receipt_db (ReceiptDatabase): the database to measure
+##     readers (int): the amount of reading threads
+##     writers (int): the amount of writing threads
+##     batch_size (int): the amount of receipts in each written batch
+##     duration (float): the seconds to run for
+##
+## Returns:
+##     A tuple containing a float for the reads per second and floats for the
+##     p50, p99, and p99.9 read latencies in seconds.
+##
+def measure(receipt_db: ReceiptDatabase, readers: int, writers: int,
+            batch_size: int, duration: float) -> tuple:
+    ids = receipt_db.add_receipts(example_receipts(1000))
+    batch = example_receipts(batch_size)
+    stop = threading.Event()
+    latencies = [[] for i in range(readers)]
+    threads = [
+        threading.Thread(target=read_points,
+                         args=(receipt_db, ids, stop, latencies[i]))
+        for i in range(readers)
+    ] + [
+        threading.Thread(target=write_receipts,
+                         args=(receipt_db, batch, stop))
+        for i in range(writers)
+    ]
+
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    all_latencies = sorted(
+        latency for thread_latencies in latencies
+        for latency in thread_latencies
+    )
+    return (len(all_latencies) / duration,) + tuple(
+        all_latencies[int(len(all_latencies) * fraction)]
+        for fraction in (0.5, 0.99, 0.999)
+    )
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description='Measure whether reads wait behind concurrent writes.'
+    )
+    parser.add_argument('--readers', type=int, default=4,
+                        help='the amount of reading threads')
+    parser.add_argument('--writers', type=int, default=2,
+                        help='the amount of writing threads')
+    parser.add_argument('--batch-size', type=int, default=500,
+                        help='the amount of receipts in each written batch')
+    parser.add_argument('--duration', type=float, default=3.0,
+                        help='the seconds to run each measurement for')
+    args = parser.parse_args()
+
+    print(f'{"database":<20}{"writers":>8}{"reads/s":>12}'
+          f'{"p50 us":>10}{"p99 us":>10}{"p99.9 us":>10}')
+
+    for name, create_db in (('global lock', GlobalLockDatabase),
+                            ('ReceiptDatabase', ReceiptDatabase)):
+        for writers in (0, args.writers):
+            reads, p50, p99, p999 = measure(create_db(), args.readers,
+                                            writers, args.batch_size,
+                                            args.duration)
+            print(f'{name:<20}{writers:>8}{reads:>12.0f}'
+                  f'{p50 * 1e6:>10.2f}{p99 * 1e6:>10.2f}'
+                  f'{p999 * 1e6:>10.2f}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+import argparse
+import multiprocessing
+import time
+
+from app.benchmarks.bench_eviction import resident_mb
+from app.benchmarks.payloads import example_receipts
+from app.receipt_database import ReceiptDatabase
+
+## Create the given amount of distinct receipts by numbering the retailers of
+## the examples.
+##
+## Parameters:
+##     count (int): the amount of receipts to create
+##
+## Returns:
+##     A list of dicts for the receipts.
+##
+def distinct_receipts(count: int) -> list[dict]:
+    return [
+        dict(receipt, retailer=f'{receipt["retailer"]} {i}')
+        for i, receipt in enumerate(example_receipts(count))
+    ]
+
+## Submit each receipt, then submit all of them again as a client retrying
+## after timeouts would, and print the time taken by each pass and how many
+## receipts ended up stored. Meant to run in a fresh process so that runs
+## don't share memory.
+##
+## Parameters:
+##     id_mode (str): how the database generates ids
+##     receipts (int): the amount of distinct receipts to submit
+##
+def run_retries(id_mode: str, receipts: int) -> None:
+    receipt_db = ReceiptDatabase(points_cache='eager', id_mode=id_mode)
+    receipts_data = distinct_receipts(receipts)
+    rates = []
+
+    for submission in range(2):
+        start = time.perf_counter()
+        for receipt_data in receipts_data:
+            receipt_db.add_receipt(receipt_data)
+        rates.append(len(receipts_data) / (time.perf_counter() - start))
+
+    print(f'{id_mode:>11}{rates[0]:>11.0f}{rates[1]:>11.0f}'
+          f'{len(receipt_db.receipts):>10}{resident_mb():>9.1f}', flush=True)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description='Compare storing retried receipts with sequential and '
+                    'content ids.'
+    )
+    parser.add_argument('--receipts', type=int, default=100000,
+                        help='the amount of distinct receipts to submit')
+    args = parser.parse_args()
+
+    print(f'{"id mode":>11}{"first/s":>11}{"retry/s":>11}{"stored":>10}'
+          f'{"RSS MB":>9}')
+
+    context = multiprocessing.get_context('spawn')
+    for id_mode in ReceiptDatabase.ID_MODES:
+        process = context.Process(target=run_retries,
+                                  args=(id_mode, args.receipts))
+        process.start()
+        process.join()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+import argparse
+import multiprocessing
+import os
+import time
+
+from app.benchmarks.payloads import example_receipts
+from app.receipt_database import ReceiptDatabase
+from app.receipt_storage import LRUReceiptStorage
+
+## Read the resident set size of the current process.
+##
+## Returns:
+##     A float for the megabytes resident in memory.
+##
+def resident_mb() -> float:
+    with open('/proc/self/statm') as statm:
+        pages = int(statm.read().split()[1])
+    return pages * os.sysconf('SC_PAGE_SIZE') / 1e6
+
+## Ingest receipts in batches into a database with the given capacity and
+## print the resident memory and ingest rate at each checkpoint. Meant to run
+## in a fresh process so that runs don't share memory.
+##
+## Parameters:
+##     capacity (int): the most receipts to hold, or None for no limit
+##     receipts (int): the amount of receipts to ingest
+##     checkpoints (int): the amount of checkpoints to print
+##
+def run_ingest(capacity: int, receipts: int, checkpoints: int) -> None:
+    storage = LRUReceiptStorage(capacity) if capacity else None
+    receipt_db = ReceiptDatabase(points_cache='eager', storage=storage)
+    batch = example_receipts(1000)
+    per_checkpoint = receipts // checkpoints // len(batch)
+    label = str(capacity) if capacity else 'unbounded'
+
+    for checkpoint in range(1, checkpoints + 1):
+        start = time.perf_counter()
+        for i in range(per_checkpoint):
+            receipt_db.add_receipts(batch)
+        rate = per_checkpoint * len(batch) / (time.perf_counter() - start)
+
+        stats = receipt_db.get_eviction_stats()
+        print(f'{label:>10}{checkpoint * per_checkpoint * len(batch):>10}'
+              f'{stats["size"]:>10}{stats["evictions"]:>11}'
+              f'{resident_mb():>9.1f}{rate:>10.0f}', flush=True)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description='Compare resident memory under sustained ingest with and '
+                    'without a storage capacity.'
+    )
+    parser.add_argument('--receipts', type=int, default=1000000,
+                        help='the amount of receipts to ingest')
+    parser.add_argument('--capacity', type=int, default=100000,
+                        help='the most receipts the bounded storage holds')
+    parser.add_argument('--checkpoints', type=int, default=5,
+                        help='the amount of checkpoints to report')
+    args = parser.parse_args()
+
+    print(f'{"capacity":>10}{"ingested":>10}{"stored":>10}{"evictions":>11}'
+          f'{"RSS MB":>9}{"adds/s":>10}')
+
+    context = multiprocessing.get_context('spawn')
+    for capacity in (None, args.capacity):
+        process = context.Process(
+            target=run_ingest,
+            args=(capacity, args.receipts, args.checkpoints)
+        )
+        process.start()
+        process.join()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+from app import create_app
+from app.benchmarks.bench_ndjson import peak_mb
+from app.benchmarks.payloads import example_receipts
+from app.point_calculator import score_receipts
+from app.receipt import Receipt
+from app.receipt_stream import RESULT_ENCODER
+from app.receipt_storage import SqliteReceiptStorage
+
+## Store the given amount of receipts in a SQLite database file, so that the
+## receipts being exported are not held in the memory of the exporting
+## process.
+##
+## Parameters:
+##     path (str): the path of the SQLite database file
+##     receipts (int): the amount of receipts to store
+##
+def fill_storage(path: str, receipts: int) -> None:
+    storage = SqliteReceiptStorage(path)
+    for start in range(0, receipts, 1000):
+        batch = [
+            Receipt(receipt_data)
+            for receipt_data in example_receipts(min(1000, receipts - start))
+        ]
+        storage.update(dict(zip(storage.allocate_ids(len(batch)), batch)))
+
+## Export every receipt in the database file and print the export rate, the
+## bytes sent, and how much the peak memory grew. Meant to run in a fresh
+## process so that runs don't share memory.
+##
+## Parameters:
+##     mode (str): "ndjson", "csv", or "gzip" to stream the export endpoint,
+##                 or "list" to build the whole export in memory first
+##     path (str): the path of the SQLite database file
+##     receipts (int): the amount of receipts in the file
+##
+def run_export(mode: str, path: str, receipts: int) -> None:
+    app = create_app({
+        'RECEIPT_STORAGE': 'sqlite', 'RECEIPT_STORAGE_PATH': path
+    })
+    client = app.test_client()
+    baseline = peak_mb()
+    start = time.perf_counter()
+
+    if mode == 'list':
+        records = SqliteReceiptStorage(path).snapshot()
+        points = score_receipts([receipt for _id, receipt in records])
+        body = ''.join(
+            RESULT_ENCODER.encode(
+                dict(receipt.to_dict(), id=id, points=receipt_points)
+            ) + '\n'
+            for (id, receipt), receipt_points in zip(records, points)
+        ).encode()
+        sent = len(body)
+    else:
+        resp = client.get(
+            '/receipts/export',
+            query_string={'format': 'csv' if mode == 'csv' else 'ndjson'},
+            headers={'Accept-Encoding': 'gzip' if mode == 'gzip' else ''},
+            buffered=False
+        )
+        sent = sum(len(chunk) for chunk in resp.response)
+
+    secs = time.perf_counter() - start
+    print(f'{mode:>8}{receipts:>10}{receipts / secs:>11.0f}'
+          f'{sent / 1e6:>10.1f}{peak_mb() - baseline:>12.1f}', flush=True)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description='Compare the memory and rate of streaming an export of '
+                    'every receipt with building the export in memory.'
+    )
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[10000, 100000, 500000],
+                        help='the amounts of receipts to export')
+    parser.add_argument('--dir', default=None,
+                        help='the directory to write the databases in')
+    args = parser.parse_args()
+
+    print(f'{"mode":>8}{"receipts":>10}{"rows/s":>11}{"MB sent":>10}'
+          f'{"peak +MB":>12}')
+
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory(dir=args.dir) as dir:
+        for receipts in args.sizes:
+            path = os.path.join(dir, f'{receipts}.db')
+            fill_storage(path, receipts)
+
+            for mode in ('ndjson', 'csv', 'gzip', 'list'):
+                process = context.Process(target=run_export,
+                                          args=(mode, path, receipts))
+                process.start()
+                process.join()
+
+if __name__ == '__main__':
+    main()
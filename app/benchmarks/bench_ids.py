@@ -0,0 +1,87 @@
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from app.receipt_ids import SnowflakeIdGenerator
+from app.receipt_storage import (
+    MemoryReceiptStorage, PackedPointsStorage, SqliteReceiptStorage
+)
+
+## Measure how many ids per second the given function generates, splitting
+## the work between threads.
+##
+## Parameters:
+##     generate (callable): the function generating a list of ids per call
+##     calls (int): the amount of calls to make in total
+##     threads (int): the amount of threads making calls
+##
+## Returns:
+##     A tuple containing a float for the ids generated per second and a bool
+##     for whether every id was unique.
+##
+def measure(generate: callable, calls: int, threads: int) -> tuple:
+    results = [[] for i in range(threads)]
+
+    def run(ids: list) -> None:
+        for i in range(calls // threads):
+            ids.extend(generate())
+
+    workers = [
+        threading.Thread(target=run, args=(ids,)) for ids in results
+    ]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    secs = time.perf_counter() - start
+
+    ids = [id for thread_ids in results for id in thread_ids]
+    return len(ids) / secs, len(set(ids)) == len(ids)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description='Compare the throughput of snowflake ids with the ids '
+                    'allocated by the storage backends.'
+    )
+    parser.add_argument('--ids', type=int, default=200000,
+                        help='the amount of ids to generate per run')
+    parser.add_argument('--batch', type=int, default=100,
+                        help='the amount of ids per batched call')
+    parser.add_argument('--threads', type=int, default=4,
+                        help='the amount of threads in the threaded runs')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as dir:
+        sqlite = SqliteReceiptStorage(os.path.join(dir, 'receipts.db'))
+        generators = {
+            'memory counter': MemoryReceiptStorage(),
+            'packed counter': PackedPointsStorage(),
+            'sqlite counter': sqlite,
+            'snowflake': SnowflakeIdGenerator(1)
+        }
+
+        print(f'{"generator":>15}{"single/s":>11}{"batch/s":>11}'
+              f'{"threads/s":>11}{"unique":>8}')
+
+        for name, generator in generators.items():
+            if isinstance(generator, SnowflakeIdGenerator):
+                single = lambda: [generator.generate()]
+                batch = lambda: generator.generate_many(args.batch)
+            else:
+                single = lambda: [generator.allocate_id()]
+                batch = lambda: generator.allocate_ids(args.batch)
+
+            # The shared SQLite counter is too slow to run as many times.
+            ids = args.ids // 20 if generator is sqlite else args.ids
+            single_rate, _unique = measure(single, ids, 1)
+            batch_rate, _unique = measure(batch, ids // args.batch, 1)
+            threads_rate, unique = measure(single, ids, args.threads)
+
+            print(f'{name:>15}{single_rate:>11.0f}{batch_rate:>11.0f}'
+                  f'{threads_rate:>11.0f}{str(unique):>8}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+import argparse
+import os
+import tempfile
+import time
+
+from app.benchmarks.payloads import example_receipts
+from app.receipt_database import ReceiptDatabase
+from app.receipt_journal import ReceiptJournal
+
+## Measure the latency of adding receipts one at a time.
+##
+## Parameters:
+##     receipt_db (ReceiptDatabase): the database to add the receipts to
+##     receipts_data (list[dict]): the receipts to add
+##
+## Returns:
+##     A tuple containing floats for the p50 and p99 latencies in seconds.
+##
+def measure_ingest(receipt_db: ReceiptDatabase,
+                   receipts_data: list[dict]) -> tuple:
+    latencies = []
+
+    for receipt_data in receipts_data:
+        start = time.perf_counter()
+        receipt_db.add_receipt(receipt_data)
+        latencies.append(time.perf_counter() - start)
+
+    latencies.sort()
+    return (latencies[len(latencies) // 2],
+            latencies[int(len(latencies) * 0.99)])
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description='Measure the cost of journaling receipts.'
+    )
+    parser.add_argument('--receipts', type=int, default=2000,
+                        help='the amount of receipts to add one at a time')
+    parser.add_argument('--replay-receipts', type=int, default=100000,
+                        help='the amount of receipts to replay')
+    parser.add_argument('--dir', default=None,
+                        help='the directory to keep the journals in')
+    args = parser.parse_args()
+
+    receipts_data = example_receipts(args.receipts)
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as dir:
+        print(f'{"fsync policy":<14}{"p50 us":>10}{"p99 us":>10}')
+
+        for fsync in (None, 'os', 'group', 'always'):
+            journal = None
+            if fsync is not None:
+                journal = ReceiptJournal(os.path.join(dir, f'{fsync}.journal'),
+                                         fsync=fsync)
+
+            p50, p99 = measure_ingest(ReceiptDatabase(journal=journal),
+                                      receipts_data)
+            print(f'{fsync or "no journal":<14}'
+                  f'{p50 * 1e6:>10.1f}{p99 * 1e6:>10.1f}')
+
+            if journal is not None:
+                journal.close()
+
+        for points_only in (False, True):
+            path = os.path.join(dir, f'replay-{points_only}.journal')
+            journal = ReceiptJournal(path, fsync='os')
+            ReceiptDatabase(journal=journal, points_only=points_only) \
+                .add_receipts(example_receipts(args.replay_receipts))
+            journal.close()
+
+            start = time.perf_counter()
+            ReceiptDatabase(journal=ReceiptJournal(path, fsync='os'),
+                            points_only=points_only)
+            secs = time.perf_counter() - start
+
+            mode = 'points-only' if points_only else 'receipts'
+            print(f'replay {args.replay_receipts} {mode}: {secs:.2f} s '
+                  f'({os.path.getsize(path) / 1e6:.1f} MB, '
+                  f'{args.replay_receipts / secs:.0f} receipts/s)')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+import argparse
+import gc
+import json
+import tracemalloc
+
+from app.benchmarks.payloads import example_receipts
+from app.receipt_database import ReceiptDatabase
+
+## Measure the memory retained by a database holding the given receipts. Each
+## receipt is decoded from JSON right before it is stored, like a request body,
+## so that its strings are counted towards the database.
+##
+## Parameters:
+##     receipts_json (list[str]): the JSON for each receipt to store
+##     points_only (bool): whether the database only stores points
+##
+## Returns:
+##     An int for the amount of bytes retained after storing the receipts.
+##
+def measure_database(receipts_json: list[str], points_only: bool) -> int:
+    gc.collect()
+    tracemalloc.start()
+    receipt_db = ReceiptDatabase(points_only=points_only)
+
+    for receipt_json in receipts_json:
+        receipt_db.add_receipt(json.loads(receipt_json))
+
+    gc.collect()
+    allocated, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return allocated
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description='Measure the memory used per stored receipt.'
+    )
+    parser.add_argument('--receipts', type=int, default=100000,
+                        help='the amount of receipts to store')
+    parser.add_argument('--points-only', action='store_true',
+                        help='store only the points of each receipt')
+    args = parser.parse_args()
+
+    receipts_json = [
+        json.dumps(receipt_data)
+        for receipt_data in example_receipts(args.receipts)
+    ]
+    allocated = measure_database(receipts_json, args.points_only)
+
+    print(f'receipts stored:   {args.receipts}')
+    print(f'bytes allocated:   {allocated}')
+    print(f'bytes per receipt: {allocated / args.receipts:.1f}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+import argparse
+import time
+
+from flask import Response, request
+
+from app import create_app
+from app.benchmarks.payloads import example_receipts
+from app.request_metrics import (
+    REQUEST_START_KEY, Histogram, RequestMetrics
+)
+
+## Measure the microseconds per call of the given function, taking the best
+## of several runs to leave out noise from other processes.
+##
+## Parameters:
+##     call (callable): the function to call
+##     calls (int): the amount of calls per run
+##     runs (int): the amount of runs
+##
+## Returns:
+##     A float for the fewest microseconds per call among the runs.
+##
+def measure(call: callable, calls: int, runs: int = 5) -> float:
+    best = float('inf')
+    for run in range(runs):
+        start = time.perf_counter()
+        for i in range(calls):
+            call()
+        best = min(best, (time.perf_counter() - start) / calls)
+
+    return best * 1e6
+
+## Create a test client for the application with metrics enabled or not, with
+## a receipt stored for lookups of points.
+##
+## Parameters:
+##     enabled (bool): whether to instrument the application with metrics
+##
+## Returns:
+##     A tuple containing the FlaskClient for the application and the data
+##     of the stored receipt.
+##
+def create_client(enabled: bool) -> tuple:
+    client = create_app({'RECEIPT_METRICS': enabled}).test_client()
+    receipt_data = example_receipts(1)[0]
+    client.post('/receipts/process', json=receipt_data)
+    return client, receipt_data
+
+## Measure the microseconds the hook recording a request takes once its
+## response is ready, from inside a request context.
+##
+## Returns:
+##     A float for the fewest microseconds per call of the hook.
+##
+def measure_hook() -> float:
+    app = create_app()
+    record_request = app.after_request_funcs[None][0]
+    response = Response()
+
+    with app.test_request_context('/receipts/1/points'):
+        current_request = request._get_current_object()
+        current_request.url_rule = app.url_map.bind('').match(
+            '/receipts/1/points', return_rule=True
+        )[0]
+        current_request.environ[REQUEST_START_KEY] = time.perf_counter()
+        return measure(lambda: record_request(response), 200000)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description='Measure the overhead of recording request metrics.'
+    )
+    parser.add_argument('--requests', type=int, default=2000,
+                        help='the amount of requests per run')
+    parser.add_argument('--runs', type=int, default=10,
+                        help='the amount of runs per application')
+    args = parser.parse_args()
+
+    histogram = Histogram()
+    metrics = RequestMetrics(None)
+    observations = {
+        'Histogram.observe': lambda: histogram.observe(0.0012),
+        'RequestMetrics.observe': lambda: metrics.observe(
+            '/receipts/<id>/points', 'GET', 200, 0.0012
+        )
+    }
+    for name, observe in observations.items():
+        print(f'{name}: {measure(observe, 200000):.2f} us')
+    print(f'after_request hook: {measure_hook():.2f} us')
+
+    routes = {
+        'store': lambda client, data: client.post('/receipts/process',
+                                                  json=data),
+        'points': lambda client, data: client.get('/receipts/1/points')
+    }
+    clients = {enabled: create_client(enabled) for enabled in (False, True)}
+
+    # Runs alternate between the applications, so that drift in the speed
+    # of the machine affects both alike.
+    print(f'{"route":>8}{"off us":>10}{"on us":>10}{"overhead us":>14}')
+    for name, route in routes.items():
+        times = {False: float('inf'), True: float('inf')}
+        for run in range(args.runs):
+            for enabled, (client, data) in clients.items():
+                times[enabled] = min(times[enabled], measure(
+                    lambda: route(client, data), args.requests, runs=1
+                ))
+
+        print(f'{name:>8}{times[False]:>10.1f}{times[True]:>10.1f}'
+              f'{times[True] - times[False]:>14.1f}')
+
+if __name__ == '__main__':
+    main()
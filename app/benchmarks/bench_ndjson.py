@@ -0,0 +1,97 @@
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+
+from app import create_app
+from app.benchmarks.payloads import example_receipts
+
+## Read the peak resident set size of the current process.
+##
+## Returns:
+##     A float for the most megabytes the process has held in memory.
+##
+def peak_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1000
+
+## Write the given amount of receipts to a file, one JSON object per line.
+##
+## Parameters:
+##     path (str): the path of the file to write
+##     receipts (int): the amount of receipts to write
+##
+def write_ndjson(path: str, receipts: int) -> None:
+    with open(path, 'w') as ndjson:
+        for start in range(0, receipts, 1000):
+            for receipt in example_receipts(min(1000, receipts - start)):
+                ndjson.write(json.dumps(receipt) + '\n')
+
+## Upload the receipts in the file to a fresh application and print the
+## upload rate and how much the peak memory grew. The storage is bounded, so
+## that only memory used by the request itself grows with the upload. Meant
+## to run in a fresh process so that runs don't share memory.
+##
+## Parameters:
+##     endpoint (str): "stream" to upload the file as it is, or "batch" to
+##                     upload its receipts as one JSON array
+##     path (str): the path of the file of receipts, one per line
+##     receipts (int): the amount of receipts in the file
+##
+def run_upload(endpoint: str, path: str, receipts: int) -> None:
+    client = create_app({
+        'RECEIPT_STORAGE_CAPACITY': 10000,
+        'RECEIPT_BATCH_LIMIT': receipts
+    }).test_client()
+    baseline = peak_mb()
+    start = time.perf_counter()
+
+    if endpoint == 'stream':
+        with open(path, 'rb') as ndjson:
+            resp = client.post('/receipts/process/stream',
+                               input_stream=ndjson,
+                               content_length=os.path.getsize(path),
+                               content_type='application/x-ndjson',
+                               buffered=False)
+            results = sum(1 for line in resp.response)
+    else:
+        with open(path, 'rb') as ndjson:
+            body = b'[' + b','.join(line.rstrip() for line in ndjson) + b']'
+        resp = client.post('/receipts/process/batch', data=body,
+                           content_type='application/json')
+        results = len(resp.json['results'])
+
+    secs = time.perf_counter() - start
+    print(f'{endpoint:>8}{receipts:>10}{results / secs:>11.0f}'
+          f'{peak_mb() - baseline:>12.1f}', flush=True)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description='Compare the memory and rate of uploading receipts as a '
+                    'stream of lines and as one JSON array.'
+    )
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[10000, 50000, 200000],
+                        help='the amounts of receipts to upload')
+    parser.add_argument('--dir', default=None,
+                        help='the directory to write the uploads in')
+    args = parser.parse_args()
+
+    print(f'{"endpoint":>8}{"receipts":>10}{"adds/s":>11}{"peak +MB":>12}')
+
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory(dir=args.dir) as dir:
+        for receipts in args.sizes:
+            path = os.path.join(dir, f'{receipts}.ndjson')
+            write_ndjson(path, receipts)
+
+            for endpoint in ('stream', 'batch'):
+                process = context.Process(target=run_upload,
+                                          args=(endpoint, path, receipts))
+                process.start()
+                process.join()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+import argparse
+import json
+import timeit
+
+from app.benchmarks.payloads import load_examples
+from app.purchased_item import PurchasedItem
+from app.receipt import Receipt
+
+## Measure the average seconds per call of the given function.
+##
+## Parameters:
+##     func (callable): the function to measure
+##     number (int): the amount of calls per repetition
+##     repeat (int): the amount of repetitions, of which the fastest is kept
+##
+## Returns:
+##     A float for the seconds per call.
+##
+def per_call(func: callable, number: int, repeat: int) -> float:
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description='Measure the cost of parsing a receipt.'
+    )
+    parser.add_argument('--number', type=int, default=20000,
+                        help='the amount of parses per repetition')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='the amount of repetitions')
+    args = parser.parse_args()
+
+    for receipt_data in load_examples():
+        receipt_json = json.dumps(receipt_data)
+        item_data = receipt_data['items'][0]
+
+        receipt_secs = per_call(lambda: Receipt(receipt_data),
+                                args.number, args.repeat)
+        decode_secs = per_call(lambda: Receipt(json.loads(receipt_json)),
+                               args.number, args.repeat)
+        item_secs = per_call(lambda: PurchasedItem(item_data),
+                             args.number, args.repeat)
+
+        print(f'{receipt_data["retailer"]} '
+              f'({len(receipt_data["items"])} items)')
+        print(f'    Receipt:              {receipt_secs * 1e6:7.2f} us')
+        print(f'    json.loads + Receipt: {decode_secs * 1e6:7.2f} us')
+        print(f'    PurchasedItem:        {item_secs * 1e6:7.2f} us')
+
+if __name__ == '__main__':
+    main()
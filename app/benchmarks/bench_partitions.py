@@ -0,0 +1,82 @@
+import argparse
+import threading
+import time
+
+from app.benchmarks.payloads import example_receipts
+from app.receipt_database import create_receipt_db
+
+## Measure the throughput of threads that each store receipts one at a time
+## and look up the points of a receipt after every store.
+##
+## Parameters:
+##     receipt_db (any): the ReceiptDatabase or ShardedReceiptDatabase to use
+##     receipts (list[dict]): the receipts each thread stores
+##     threads (int): the amount of threads
+##
+## Returns:
+##     A float for the stores and lookups per second of every thread
+##     combined.
+##
+def measure(receipt_db: any, receipts: list[dict], threads: int) -> float:
+    start_barrier = threading.Barrier(threads + 1)
+
+    def run() -> None:
+        start_barrier.wait()
+        for receipt in receipts:
+            id = receipt_db.add_receipt(receipt)
+            receipt_db.get_points(id)
+
+    workers = [threading.Thread(target=run) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+
+    start_barrier.wait()
+    start = time.perf_counter()
+    for worker in workers:
+        worker.join()
+
+    return 2 * threads * len(receipts) / (time.perf_counter() - start)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description='Compare the concurrent throughput of a database as the '
+                    'amount of partitions varies.'
+    )
+    parser.add_argument('--receipts', type=int, default=20000,
+                        help='the amount of receipts each thread stores')
+    parser.add_argument('--threads', type=int, default=8,
+                        help='the amount of threads')
+    parser.add_argument('--partitions', type=int, nargs='+',
+                        default=[1, 2, 4, 8, 16],
+                        help='the amounts of partitions to compare')
+    parser.add_argument('--capacity', type=int, default=None,
+                        help='the most receipts to hold, split between the '
+                             'partitions')
+    parser.add_argument('--points-only', action='store_true',
+                        help='keep only the points of receipts')
+    args = parser.parse_args()
+
+    receipts = example_receipts(args.receipts)
+    print(f'{"partitions":>10}{"ops/s":>11}{"imbalance":>11}')
+
+    for partitions in args.partitions:
+        receipt_db = create_receipt_db({
+            'RECEIPT_PARTITIONS': partitions,
+            'RECEIPT_STORAGE_CAPACITY': args.capacity,
+            'RECEIPT_POINTS_ONLY': args.points_only
+        })
+        rate = measure(receipt_db, receipts, args.threads)
+
+        # The largest partition relative to an even spread.
+        imbalance = 1.0
+        if partitions > 1:
+            sizes = [
+                stats['receipts']
+                for stats in receipt_db.get_partition_stats()
+            ]
+            imbalance = max(sizes) * partitions / sum(sizes)
+
+        print(f'{partitions:>10}{rate:>11.0f}{imbalance:>11.2f}', flush=True)
+
+if __name__ == '__main__':
+    main()
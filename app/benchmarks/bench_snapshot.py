@@ -0,0 +1,73 @@
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from app.benchmarks.payloads import example_receipts
+from app.receipt_database import ReceiptDatabase
+from app.receipt_journal import ReceiptJournal
+
+## Measure the average seconds per call of looking up the given ids.
+##
+## Parameters:
+##     lookup (callable): the function to call with each id
+##     ids (list[str]): the ids to look up
+##
+## Returns:
+##     A float for the seconds per lookup.
+##
+def per_lookup(lookup: callable, ids: list[str]) -> float:
+    start = time.perf_counter()
+    for id in ids:
+        lookup(id)
+    return (time.perf_counter() - start) / len(ids)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description='Compare startup from a snapshot and from a journal.'
+    )
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[10000, 100000, 500000],
+                        help='the amounts of stored receipts')
+    parser.add_argument('--lookups', type=int, default=10000,
+                        help='the amount of random lookups after startup')
+    parser.add_argument('--dir', default=None,
+                        help='the directory to keep the files in')
+    args = parser.parse_args()
+
+    print(f'{"receipts":>9}{"journal start s":>17}{"snapshot start ms":>19}'
+          f'{"snapshot MB":>13}{"points us":>11}{"receipt us":>12}')
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as dir:
+        for size in args.sizes:
+            journal_path = os.path.join(dir, f'{size}.journal')
+            snapshot_path = os.path.join(dir, f'{size}.snapshot')
+
+            receipt_db = ReceiptDatabase()
+            receipt_db.add_receipts(example_receipts(size))
+            receipt_db.save_snapshot(snapshot_path)
+
+            journal = ReceiptJournal(journal_path, fsync='os')
+            journal.append_many(dict(receipt_db.receipts.snapshot()))
+            journal.close()
+
+            start = time.perf_counter()
+            ReceiptDatabase(journal=ReceiptJournal(journal_path, fsync='os'))
+            journal_secs = time.perf_counter() - start
+
+            start = time.perf_counter()
+            snapshot_db = ReceiptDatabase(snapshot_path=snapshot_path)
+            snapshot_secs = time.perf_counter() - start
+
+            ids = [str(random.randint(1, size)) for i in range(args.lookups)]
+            points_secs = per_lookup(snapshot_db.get_points, ids)
+            receipt_secs = per_lookup(snapshot_db.get_receipt, ids)
+
+            print(f'{size:>9}{journal_secs:>17.2f}'
+                  f'{snapshot_secs * 1000:>19.2f}'
+                  f'{os.path.getsize(snapshot_path) / 1e6:>13.1f}'
+                  f'{points_secs * 1e6:>11.2f}{receipt_secs * 1e6:>12.2f}')
+
+if __name__ == '__main__':
+    main()
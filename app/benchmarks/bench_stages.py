@@ -0,0 +1,52 @@
+import argparse
+import multiprocessing
+
+from app import create_app
+from app.benchmarks.bench_metrics import measure
+from app.benchmarks.payloads import example_receipts
+from app.receipt import Receipt
+from app.stage_timing import install_stage_functions
+
+## Measure the microseconds taken to construct a receipt and to store one
+## through the application, and print them. Meant to run in a fresh process,
+## since the stage functions stay wrapped once they are installed.
+##
+## Parameters:
+##     mode (str): "off" to leave the stage functions alone, "installed" to
+##                 wrap them without timing requests, or "timed" to time the
+##                 stages of every request
+##     calls (int): the amount of calls per run
+##
+def run_mode(mode: str, calls: int) -> None:
+    if mode == 'installed':
+        install_stage_functions()
+
+    client = create_app({
+        'RECEIPT_STAGE_TIMING': mode == 'timed',
+        'RECEIPT_STORAGE_CAPACITY': 10000
+    }).test_client()
+    receipt_data = example_receipts(1)[0]
+
+    construct = measure(lambda: Receipt(receipt_data), calls * 10)
+    store = measure(
+        lambda: client.post('/receipts/process', json=receipt_data), calls
+    )
+    print(f'{mode:>10}{construct:>15.2f}{store:>12.1f}', flush=True)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description='Measure the overhead of timing the stages of requests.'
+    )
+    parser.add_argument('--calls', type=int, default=2000,
+                        help='the amount of requests per run')
+    args = parser.parse_args()
+
+    print(f'{"mode":>10}{"Receipt() us":>15}{"store us":>12}')
+    context = multiprocessing.get_context('spawn')
+    for mode in ('off', 'installed', 'timed'):
+        process = context.Process(target=run_mode, args=(mode, args.calls))
+        process.start()
+        process.join()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from app.benchmarks.bench_eviction import resident_mb
+from app.benchmarks.payloads import example_receipts
+from app.receipt_database import ReceiptDatabase
+from app.receipt_storage import create_storage
+
+## Measure the average seconds per call of retrieving the given ids.
+##
+## Parameters:
+##     receipt_db (ReceiptDatabase): the database to retrieve receipts from
+##     ids (list[str]): the ids of the receipts to retrieve
+##
+## Returns:
+##     A float for the seconds per lookup.
+##
+def per_lookup(receipt_db: ReceiptDatabase, ids: list[str]) -> float:
+    start = time.perf_counter()
+    for id in ids:
+        receipt_db.get_receipt(id)
+    return (time.perf_counter() - start) / len(ids)
+
+## Store receipts with the given storage and print the resident memory, the
+## ingest rate, and the latency of looking up recent receipts, old receipts,
+## and the same old receipts again. Meant to run in a fresh process so that
+## runs don't share memory.
+##
+## Parameters:
+##     kind (str): the kind of storage
+##     path (str): the path of the database file for the storage
+##     receipts (int): the amount of receipts to store
+##     hot_capacity (int): the most receipts tiered storage keeps in memory
+##     lookups (int): the amount of lookups of recent and of old receipts
+##
+def run_storage(kind: str, path: str, receipts: int, hot_capacity: int,
+                lookups: int) -> None:
+    capacity = hot_capacity if kind == 'tiered' else None
+    receipt_db = ReceiptDatabase(
+        points_cache='off', storage=create_storage(kind, path, False, capacity)
+    )
+    batch = example_receipts(1000)
+
+    start = time.perf_counter()
+    for i in range(receipts // len(batch)):
+        receipt_db.add_receipts(batch)
+    rate = receipts / (time.perf_counter() - start)
+
+    recent = [
+        str(random.randint(receipts - hot_capacity // 2, receipts))
+        for i in range(lookups)
+    ]
+    old = [str(random.randint(1, receipts // 2)) for i in range(lookups)]
+    recent_secs = per_lookup(receipt_db, recent)
+    old_secs = per_lookup(receipt_db, old)
+    repeat_secs = per_lookup(receipt_db, old)
+
+    print(f'{kind:>8}{rate:>10.0f}{resident_mb():>9.1f}'
+          f'{recent_secs * 1e6:>11.1f}{old_secs * 1e6:>8.1f}'
+          f'{repeat_secs * 1e6:>11.1f}', flush=True)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description='Compare memory and lookup latency of memory, SQLite, '
+                    'and tiered storage.'
+    )
+    parser.add_argument('--receipts', type=int, default=500000,
+                        help='the amount of receipts to store')
+    parser.add_argument('--hot-capacity', type=int, default=50000,
+                        help='the most receipts tiered storage keeps in '
+                             'memory')
+    parser.add_argument('--lookups', type=int, default=10000,
+                        help='the amount of lookups of recent and of old '
+                             'receipts')
+    parser.add_argument('--dir', default=None,
+                        help='the directory to keep the database files in')
+    args = parser.parse_args()
+
+    print(f'{"storage":>8}{"adds/s":>10}{"RSS MB":>9}{"recent us":>11}'
+          f'{"old us":>8}{"repeat us":>11}')
+
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory(dir=args.dir) as dir:
+        for kind in ('memory', 'sqlite', 'tiered'):
+            process = context.Process(target=run_storage, args=(
+                kind, os.path.join(dir, f'{kind}.db'), args.receipts,
+                args.hot_capacity, args.lookups
+            ))
+            process.start()
+            process.join()
+
+if __name__ == '__main__':
+    main()
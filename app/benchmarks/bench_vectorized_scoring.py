@@ -0,0 +1,51 @@
+import argparse
+import time
+
+from app.benchmarks.payloads import load_examples
+from app.point_calculator import score_receipt
+from app.receipt import Receipt
+from app.vectorized_scoring import ReceiptColumns, score_columns
+
+## Time the given function.
+##
+## Parameters:
+##     func (callable): the function to time
+##
+## Returns:
+##     A tuple of the value returned by the function and a float for the
+##     seconds it took.
+##
+def timed(func: callable) -> tuple:
+    start = time.perf_counter()
+    value = func()
+    return value, time.perf_counter() - start
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description='Compare scalar and vectorized receipt scoring.'
+    )
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[1000, 100000, 1000000],
+                        help='the amounts of receipts to score')
+    args = parser.parse_args()
+
+    examples = [Receipt(receipt_data) for receipt_data in load_examples()]
+    print(f'{"receipts":>10} {"scalar":>10} {"columns":>10} '
+          f'{"vectorized":>10} {"speedup":>8}')
+
+    for size in args.sizes:
+        receipts = [examples[i % len(examples)] for i in range(size)]
+
+        scalar, scalar_secs = timed(
+            lambda: [score_receipt(receipt) for receipt in receipts]
+        )
+        columns, columns_secs = timed(lambda: ReceiptColumns(receipts))
+        vectorized, vectorized_secs = timed(lambda: score_columns(columns))
+
+        assert vectorized.tolist() == scalar
+        print(f'{size:>10} {scalar_secs:>9.4f}s {columns_secs:>9.4f}s '
+              f'{vectorized_secs:>9.4f}s '
+              f'{scalar_secs / vectorized_secs:>7.1f}x')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,315 @@
+import asyncio
+import math
+import statistics
+import time
+
+## A request for the load generator to send.
+##
+## Attributes:
+##     method (str): the HTTP method of the request
+##     path (str): the path of the request
+##     body (bytes): the JSON body of the request
+##     headers (dict): any extra headers of the request
+##
+class LoadRequest:
+    __slots__ = ('method', 'path', 'body', 'headers')
+
+    ## Initialize member variables for the request.
+    ##
+    def __init__(self, method: str, path: str, body: bytes = b'',
+                 headers: dict = None) -> None:
+        self.method = method
+        self.path = path
+        self.body = body
+        self.headers = headers or {}
+
+    ## Encode the request as HTTP/1.1 for the given host.
+    ##
+    ## Parameters:
+    ##     host (str): the host the request is sent to
+    ##
+    ## Returns:
+    ##     The bytes of the request.
+    ##
+    def encode(self, host: str) -> bytes:
+        head = (
+            f'{self.method} {self.path} HTTP/1.1\r\n'
+            f'Host: {host}\r\n'
+            f'Content-Type: application/json\r\n'
+            f'Content-Length: {len(self.body)}\r\n'
+        )
+        for name, value in self.headers.items():
+            head += f'{name}: {value}\r\n'
+        head += '\r\n'
+        return head.encode() + self.body
+
+## The outcome of a load run.
+##
+## Attributes:
+##     latencies (list[float]): the seconds taken by each completed request
+##     statuses (dict): the amount of responses for each response code
+##     errors (int): the amount of requests that failed or timed out without a
+##                   response
+##     duration (float): the seconds the run took
+##
+class LoadResult:
+    ## Initialize member variables for the result.
+    ##
+    def __init__(self) -> None:
+        self.latencies = []
+        self.statuses = {}
+        self.errors = 0
+        self.duration = 0.0
+
+    ## Calculate the throughput of the run.
+    ##
+    ## Returns:
+    ##     A float for the completed requests per second.
+    ##
+    def throughput(self) -> float:
+        return len(self.latencies) / self.duration if self.duration else 0.0
+
+    ## Calculate a percentile of the request latencies.
+    ##
+    ## Parameters:
+    ##     percent (float): the percentile to calculate, from 0 to 100
+    ##
+    ## Returns:
+    ##     A float for the latency in seconds at the percentile.
+    ##
+    def percentile(self, percent: float) -> float:
+        if not self.latencies:
+            return 0.0
+
+        latencies = sorted(self.latencies)
+        index = min(len(latencies) - 1, int(len(latencies) * percent / 100))
+        return latencies[index]
+
+    ## Calculate the latency distribution of the run the way HdrHistogram
+    ## reports it, with percentiles that get closer together each time the
+    ## distance to 100% halves.
+    ##
+    ## Parameters:
+    ##     ticks_per_half (int): the amount of percentiles reported each time
+    ##                           the distance to 100% halves
+    ##
+    ## Returns:
+    ##     A list of (latency, fraction, count) tuples from the fastest
+    ##     request to the slowest, where the fraction of requests took at
+    ##     most the latency in seconds and count is the amount of them.
+    ##
+    def percentile_distribution(self, ticks_per_half: int = 5) -> list:
+        latencies = sorted(self.latencies)
+        if not latencies:
+            return []
+
+        fractions = []
+        remaining = 1.0
+        while remaining * len(latencies) >= 1:
+            for tick in range(ticks_per_half):
+                fractions.append(1 - remaining + remaining * tick
+                                 / (2 * ticks_per_half))
+            remaining /= 2
+        fractions.append(1.0)
+
+        distribution = []
+        for fraction in fractions:
+            count = max(1, math.ceil(fraction * len(latencies)))
+            distribution.append((latencies[count - 1], fraction, count))
+            # Like HdrHistogram, stop at the first percentile reaching the
+            # slowest request, followed by 100%.
+            if count == len(latencies):
+                break
+
+        if distribution[-1][1] < 1:
+            distribution.append((latencies[-1], 1.0, len(latencies)))
+        return distribution
+
+    ## Format the latency distribution of the run like the percentile
+    ## distribution output of HdrHistogram, in milliseconds.
+    ##
+    ## Parameters:
+    ##     ticks_per_half (int): the amount of percentiles reported each time
+    ##                           the distance to 100% halves
+    ##
+    ## Returns:
+    ##     A string for the table of percentiles followed by the mean,
+    ##     standard deviation, maximum, and count of the latencies.
+    ##
+    def format_distribution(self, ticks_per_half: int = 5) -> str:
+        lines = [
+            f'{"Value":>12} {"Percentile":>14} {"TotalCount":>10} '
+            f'{"1/(1-Percentile)":>14}',
+            ''
+        ]
+        for latency, fraction, count in self.percentile_distribution(
+            ticks_per_half
+        ):
+            line = f'{latency * 1000:>12.3f} {fraction:>14.12f} {count:>10}'
+            if fraction < 1:
+                line += f' {1 / (1 - fraction):>14.2f}'
+            lines.append(line)
+
+        latencies = self.latencies or [0.0]
+        lines.append(
+            f'#[Mean    = {statistics.fmean(latencies) * 1000:>12.3f}, '
+            f'StdDeviation   = {statistics.pstdev(latencies) * 1000:>12.3f}]'
+        )
+        lines.append(
+            f'#[Max     = {max(latencies) * 1000:>12.3f}, '
+            f'Total count    = {len(self.latencies):>12}]'
+        )
+        return '\n'.join(lines)
+
+## Read one HTTP/1.1 response with a Content-Length from the stream.
+##
+## Parameters:
+##     reader (StreamReader): the stream to read the response from
+##
+## Returns:
+##     A tuple containing an int for the response code and a bool for whether
+##     the server will close the connection.
+##
+async def read_response(reader: asyncio.StreamReader) -> tuple:
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split()[1])
+    content_length = 0
+    closing = False
+
+    for line in lines[1:]:
+        name, _sep, value = line.partition(':')
+        name = name.strip().lower()
+
+        if name == 'content-length':
+            content_length = int(value)
+        elif name == 'connection' and value.strip().lower() == 'close':
+            closing = True
+
+    await reader.readexactly(content_length)
+    return status, closing
+
+## Send requests over one connection until the deadline, reconnecting whenever
+## the server closes the connection. Each request is sent once the response
+## to the previous one arrived, and when an interval is given, no sooner than
+## its turn in a schedule spaced by the interval. A paced request's latency
+## counts from its turn, so that a slow response also delays the requests
+## waiting behind it, as it would for clients arriving at a steady rate.
+##
+## Parameters:
+##     host (str): the host of the server
+##     port (int): the port of the server
+##     next_request (callable): a function returning the next LoadRequest
+##     deadline (float): the time.perf_counter value to stop at
+##     result (LoadResult): the result to record each request in
+##     timeout (float): the seconds to wait for a response
+##     interval (float): the seconds between the turns of requests, or None
+##                       to send each request as soon as possible
+##     first_turn (float): the time.perf_counter value of the turn of the
+##                         first request, if paced
+##
+async def drive_connection(host: str, port: int, next_request: callable,
+                           deadline: float, result: LoadResult,
+                           timeout: float, interval: float = None,
+                           first_turn: float = 0.0) -> None:
+    reader = writer = None
+    turn = first_turn
+
+    while time.perf_counter() < deadline:
+        if interval is not None:
+            if turn >= deadline:
+                break
+
+            delay = turn - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+        try:
+            start = time.perf_counter() if interval is None else turn
+
+            if writer is None:
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection(host, port), timeout
+                )
+
+            writer.write(next_request().encode(host))
+            status, closing = await asyncio.wait_for(read_response(reader),
+                                                     timeout)
+            result.latencies.append(time.perf_counter() - start)
+            result.statuses[status] = result.statuses.get(status, 0) + 1
+        except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+            result.errors += 1
+            closing = True
+
+        if closing and writer is not None:
+            writer.close()
+            reader = writer = None
+
+        if interval is not None:
+            turn += interval
+
+    if writer is not None:
+        writer.close()
+
+## Hold a connection open without sending a request, like a slow client.
+##
+## Parameters:
+##     host (str): the host of the server
+##     port (int): the port of the server
+##     stop (Event): the event that ends the connection
+##
+async def hold_idle_connection(host: str, port: int,
+                               stop: asyncio.Event) -> None:
+    try:
+        _reader, writer = await asyncio.open_connection(host, port)
+    except OSError:
+        return
+
+    await stop.wait()
+    writer.close()
+
+## Drive load against a server with concurrent connections.
+##
+## Parameters:
+##     host (str): the host of the server
+##     port (int): the port of the server
+##     next_request (callable): a function returning the next LoadRequest
+##     connections (int): the amount of connections sending requests
+##     duration (float): the seconds to send requests for
+##     idle_connections (int): the amount of extra connections held open
+##                             without sending anything
+##     timeout (float): the seconds to wait for each response
+##     rate (float): the requests per second to spread evenly over the
+##                   connections, or None to send requests as fast as the
+##                   server answers them
+##
+## Returns:
+##     A LoadResult for the run.
+##
+async def run_load(host: str, port: int, next_request: callable,
+                   connections: int, duration: float,
+                   idle_connections: int = 0, timeout: float = 5.0,
+                   rate: float = None) -> LoadResult:
+    result = LoadResult()
+    stop = asyncio.Event()
+    idle = [
+        asyncio.create_task(hold_idle_connection(host, port, stop))
+        for i in range(idle_connections)
+    ]
+    await asyncio.sleep(0.1 if idle_connections else 0)
+
+    start = time.perf_counter()
+    deadline = start + duration
+    interval = connections / rate if rate else None
+    await asyncio.gather(*[
+        drive_connection(
+            host, port, next_request, deadline, result, timeout, interval,
+            start + i / rate if rate else 0.0
+        )
+        for i in range(connections)
+    ])
+    result.duration = time.perf_counter() - start
+
+    stop.set()
+    await asyncio.gather(*idle)
+    return result
@@ -0,0 +1,187 @@
+import argparse
+import asyncio
+import json
+import random
+import sys
+
+from app.benchmarks.bench_asgi import HOST, free_port, start_server
+from app.benchmarks.http_load import LoadRequest, LoadResult, run_load
+from app.benchmarks.synthetic import ReceiptGenerator
+
+## Create the requests storing the given amount of generated receipts. When
+## idempotency keys are sent, a duplicate receipt is sent with the key of the
+## receipt it repeats, like a client retrying after a timeout.
+##
+## Parameters:
+##     generator (ReceiptGenerator): the generator of the receipts
+##     count (int): the amount of requests to create
+##     idempotency_keys (bool): whether to send an Idempotency-Key header
+##
+## Returns:
+##     A list of LoadRequests for the requests.
+##
+def store_requests(generator: ReceiptGenerator, count: int,
+                   idempotency_keys: bool) -> list[LoadRequest]:
+    requests = []
+    for i in range(count):
+        receipt_data, number = generator.generate()
+        headers = None
+        if idempotency_keys:
+            headers = {'Idempotency-Key': f'load-{number}'}
+
+        requests.append(LoadRequest(
+            'POST', '/receipts/process', json.dumps(receipt_data).encode(),
+            headers
+        ))
+
+    return requests
+
+## Create a function returning the next request of the load, storing the
+## receipts in turn and looking up the points of stored ones for the given
+## fraction of requests. Lookups assume the server's default sequential ids
+## and pick among the ids of receipts already sent, so a few get 404 for
+## receipts still in flight or duplicates that didn't take an id.
+##
+## Parameters:
+##     stores (list[LoadRequest]): the requests storing receipts, repeated
+##                                 from the start once all are sent
+##     read_ratio (float): the fraction of requests looking up points
+##     seed (int): the seed of the random numbers
+##
+## Returns:
+##     A callable returning the next LoadRequest.
+##
+def request_mix(stores: list[LoadRequest], read_ratio: float,
+                seed: int) -> callable:
+    rng = random.Random(seed)
+    sent = 0
+
+    def next_request() -> LoadRequest:
+        nonlocal sent
+
+        if sent and rng.random() < read_ratio:
+            receipt_id = rng.randint(1, sent)
+            return LoadRequest('GET', f'/receipts/{receipt_id}/points')
+
+        sent += 1
+        return stores[(sent - 1) % len(stores)]
+
+    return next_request
+
+## Format a summary of a load run.
+##
+## Parameters:
+##     result (LoadResult): the result of the run
+##
+## Returns:
+##     A string listing the throughput, response codes, errors, and the
+##     p50, p99, and p99.9 latencies in milliseconds.
+##
+def format_summary(result: LoadResult) -> str:
+    statuses = ', '.join(
+        f'{status}: {count}' for status, count in sorted(
+            result.statuses.items()
+        )
+    )
+    return (
+        f'Requests/sec: {result.throughput():.1f}\n'
+        f'Responses: {statuses or "none"}, errors: {result.errors}\n'
+        f'Latency ms: p50={result.percentile(50) * 1000:.3f} '
+        f'p99={result.percentile(99) * 1000:.3f} '
+        f'p99.9={result.percentile(99.9) * 1000:.3f}'
+    )
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description='Drive app/server.py with generated receipts at a target '
+                    'rate and report throughput and latency percentiles.'
+    )
+    parser.add_argument('--port', type=int, default=None,
+                        help='the port of a server already running on the '
+                             'local host; one is started if not given')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='the gunicorn workers of the started server')
+    parser.add_argument('--threads', type=int, default=1,
+                        help='the threads per worker of the started server')
+    parser.add_argument('--rate', type=float, default=None,
+                        help='the target requests per second; as fast as '
+                             'the server answers if not given')
+    parser.add_argument('--connections', type=int, default=64,
+                        help='the amount of connections sending requests')
+    parser.add_argument('--duration', type=float, default=10.0,
+                        help='the seconds to send requests for')
+    parser.add_argument('--timeout', type=float, default=5.0,
+                        help='the seconds to wait for each response')
+    parser.add_argument('--receipts', type=int, default=50000,
+                        help='the amount of receipts generated before the '
+                             'run, repeated if more are sent')
+    parser.add_argument('--read-ratio', type=float, default=0.0,
+                        help='the fraction of requests looking up points')
+    parser.add_argument('--idempotency-keys', action='store_true',
+                        help='send an Idempotency-Key with each receipt, '
+                             'repeated by its duplicates')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='the seed of the generated load')
+    parser.add_argument('--mean-items', type=float, default=3.0,
+                        help='the mean amount of items per receipt')
+    parser.add_argument('--max-items', type=int, default=50,
+                        help='the most items per receipt')
+    parser.add_argument('--mean-description', type=float, default=14.0,
+                        help='the mean characters of item descriptions')
+    parser.add_argument('--description-spread', type=float, default=5.0,
+                        help='the standard deviation of the characters of '
+                             'item descriptions')
+    parser.add_argument('--retailers', type=int, default=100,
+                        help='the amount of retailers in the pool')
+    parser.add_argument('--retailer-skew', type=float, default=1.0,
+                        help='the Zipf exponent of how often each retailer '
+                             'is drawn; 0 draws them evenly')
+    parser.add_argument('--peak-hour', type=float, default=14.0,
+                        help='the hour of the day purchases peak at')
+    parser.add_argument('--hour-spread', type=float, default=3.0,
+                        help='the standard deviation of purchase times in '
+                             'hours; 0 spreads them evenly over the day')
+    parser.add_argument('--duplicate-rate', type=float, default=0.0,
+                        help='the fraction of receipts repeating a recent '
+                             'one')
+    args = parser.parse_args()
+
+    generator = ReceiptGenerator(
+        seed=args.seed, mean_items=args.mean_items, max_items=args.max_items,
+        mean_description=args.mean_description,
+        description_spread=args.description_spread,
+        retailers=args.retailers, retailer_skew=args.retailer_skew,
+        peak_hour=args.peak_hour, hour_spread=args.hour_spread or None,
+        duplicate_rate=args.duplicate_rate
+    )
+    stores = store_requests(generator, args.receipts, args.idempotency_keys)
+    next_request = request_mix(stores, args.read_ratio, args.seed)
+
+    server = None
+    port = args.port
+    if port is None:
+        port = free_port()
+        server = start_server([
+            sys.executable, '-m', 'gunicorn', '--config',
+            'python:app.gunicorn_conf', '-w', str(args.workers),
+            '--threads', str(args.threads), '-b', '{bind}', 'app.server:app'
+        ], port)
+
+    try:
+        result = asyncio.run(run_load(
+            HOST, port, next_request, args.connections, args.duration,
+            timeout=args.timeout, rate=args.rate
+        ))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    rate = f'{args.rate:.0f} req/s' if args.rate else 'unpaced'
+    print(f'{args.duration:.0f}s, {rate}, {args.connections} connections')
+    print(format_summary(result))
+    print()
+    print(result.format_distribution())
+
+if __name__ == '__main__':
+    main()
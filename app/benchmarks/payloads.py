@@ -0,0 +1,38 @@
+import json
+from pathlib import Path
+
+EXAMPLES_DIR = Path(__file__).resolve().parents[2] / 'examples'
+
+## Load the example receipts used as benchmark payloads along with their
+## names.
+##
+## Returns:
+##     A dict of the name of each file in the examples directory, without
+##     its extension, to a dict for its receipt, sorted by file name.
+##
+def load_named_examples() -> dict:
+    return {
+        path.stem: json.loads(path.read_text())
+        for path in sorted(EXAMPLES_DIR.glob('*.json'))
+    }
+
+## Load the example receipts used as benchmark payloads.
+##
+## Returns:
+##     A list of dicts for the receipts in the examples directory, sorted by
+##     file name.
+##
+def load_examples() -> list[dict]:
+    return list(load_named_examples().values())
+
+## Create the given amount of receipts by cycling through the examples.
+##
+## Parameters:
+##     count (int): the amount of receipts to create
+##
+## Returns:
+##     A list of dicts for the receipts.
+##
+def example_receipts(count: int) -> list[dict]:
+    examples = load_examples()
+    return [examples[i % len(examples)] for i in range(count)]
@@ -0,0 +1,242 @@
+import argparse
+from collections.abc import Iterator
+import itertools
+import json
+import os
+import platform
+import random
+import sys
+import time
+import timeit
+
+from app import create_app
+from app import point_calculator
+from app.benchmarks.payloads import example_receipts, load_named_examples
+from app.receipt import Receipt
+from app.receipt_database import ReceiptDatabase
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+DATABASE_SIZES = (1000, 10000, 100000, 1000000, 10000000)
+QUICK_DATABASE_SIZES = (1000, 10000, 100000)
+
+# The scoring rules with the attribute of a receipt each one scores.
+SCORE_RULES = (
+    ('_score_name', 'retailer'),
+    ('_score_purchase_date', 'purchase_date'),
+    ('_score_purchase_time', 'purchase_time'),
+    ('_score_total_cost', 'total_cents'),
+    ('_score_purchased_items', 'purchased_items')
+)
+
+## Measure the seconds per call of the given function, keeping the fastest
+## of several repetitions to leave out noise from other processes.
+##
+## Parameters:
+##     func (callable): the function to measure
+##     number (int): the amount of calls per repetition
+##     repeat (int): the amount of repetitions
+##
+## Returns:
+##     A float for the seconds per call.
+##
+def per_call(func: callable, number: int, repeat: int) -> float:
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+## Produce the cases parsing each example receipt.
+##
+## Parameters:
+##     examples (dict): a dict of the name of each example to its receipt
+##
+## Returns:
+##     An Iterator of (name, function, calls) tuples for the cases.
+##
+def parse_cases(examples: dict) -> Iterator[tuple]:
+    for name, receipt_data in examples.items():
+        yield (f'parse/Receipt/{name}',
+               lambda receipt_data=receipt_data: Receipt(receipt_data), 20000)
+
+## Produce the cases scoring each example receipt, as a whole and with each
+## scoring rule.
+##
+## Parameters:
+##     examples (dict): a dict of the name of each example to its receipt
+##
+## Returns:
+##     An Iterator of (name, function, calls) tuples for the cases.
+##
+def score_cases(examples: dict) -> Iterator[tuple]:
+    for name, receipt_data in examples.items():
+        receipt = Receipt(receipt_data)
+        yield (f'score/score_receipt/{name}',
+               lambda receipt=receipt: point_calculator.score_receipt(receipt),
+               50000)
+
+        for rule, attribute in SCORE_RULES:
+            score = getattr(point_calculator, rule)
+            value = getattr(receipt, attribute)
+            yield (f'score/{rule}/{name}',
+                   lambda score=score, value=value: score(value), 100000)
+
+## Produce the cases adding receipts to and looking up points in databases
+## already holding each of the given amounts of receipts. The prefilled
+## receipts share one Receipt, so that large databases hold little more
+## than their ids.
+##
+## Parameters:
+##     sizes (tuple): the amounts of receipts to prefill the databases with
+##
+## Returns:
+##     An Iterator of (name, function, calls) tuples for the cases.
+##
+def database_cases(sizes: tuple) -> Iterator[tuple]:
+    payloads = itertools.cycle(example_receipts(100))
+    shared_receipt = Receipt(next(payloads))
+
+    for size in sizes:
+        receipt_db = ReceiptDatabase()
+        for start in range(1, size + 1, 100000):
+            receipt_db.receipts.update({
+                str(id): shared_receipt
+                for id in range(start, min(start + 100000, size + 1))
+            })
+        receipt_db.receipts.reserve_ids(size)
+
+        random_ids = itertools.cycle([
+            str(random.randint(1, size)) for i in range(10000)
+        ])
+        yield (f'database/add_receipt/{size}',
+               lambda add=receipt_db.add_receipt: add(next(payloads)), 5000)
+        yield (f'database/get_points/{size}',
+               lambda get=receipt_db.get_points: get(next(random_ids)), 20000)
+
+## Produce the cases sending requests to both routes of the application
+## through the Flask test client.
+##
+## Returns:
+##     An Iterator of (name, function, calls) tuples for the cases.
+##
+def http_cases() -> Iterator[tuple]:
+    client = create_app({'RECEIPT_STORAGE_CAPACITY': 100000}).test_client()
+    payloads = itertools.cycle(example_receipts(100))
+    client.post('/receipts/process', json=next(payloads))
+
+    yield ('http/process',
+           lambda: client.post('/receipts/process', json=next(payloads)),
+           1000)
+    yield 'http/points', lambda: client.get('/receipts/1/points'), 1000
+
+## Run every case, printing each result as it is measured.
+##
+## Parameters:
+##     cases (Iterator[tuple]): the (name, function, calls) tuples to run
+##     scale (float): the factor to scale the calls of each case by
+##     repeat (int): the amount of repetitions of each case
+##
+## Returns:
+##     A dict of the name of each case to a dict with the keys
+##     "seconds_per_op" and "ops_per_sec".
+##
+def run_cases(cases: Iterator[tuple], scale: float, repeat: int) -> dict:
+    results = {}
+    for name, func, calls in cases:
+        seconds = per_call(func, max(1, int(calls * scale)), repeat)
+        results[name] = {
+            'seconds_per_op': seconds, 'ops_per_sec': 1 / seconds
+        }
+        print(f'{name:<48}{seconds * 1e6:>12.2f} us{1 / seconds:>14.0f}/s',
+              flush=True)
+
+    return results
+
+## Compare results with a baseline, flagging cases that got slower by more
+## than the threshold.
+##
+## Parameters:
+##     results (dict): the results of run_cases
+##     baseline (dict): the results of an earlier run
+##     threshold (float): the largest allowed slowdown, as a fraction of the
+##                        baseline time
+##
+## Returns:
+##     A list of (name, ratio) tuples for the cases that regressed, where the
+##     ratio is the time of the case divided by its baseline time.
+##
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+
+        ratio = result['seconds_per_op'] / baseline[name]['seconds_per_op']
+        if ratio > 1 + threshold:
+            regressions.append((name, ratio))
+
+    return regressions
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description='Measure parsing, scoring, storing, and serving receipts '
+                    'and compare the results with a baseline.'
+    )
+    parser.add_argument('--quick', action='store_true',
+                        help='run fewer calls and skip the largest databases')
+    parser.add_argument('--sizes', type=int, nargs='+', default=None,
+                        help='the amounts of receipts to prefill databases '
+                             'with')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='the amount of repetitions of each case')
+    parser.add_argument('--output', default=None,
+                        help='the path to write the results to as JSON')
+    parser.add_argument('--baseline', default=BASELINE_PATH,
+                        help='the path of the results to compare with')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='the largest allowed slowdown from the baseline, '
+                             'as a fraction')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='write the results to the baseline path')
+    args = parser.parse_args()
+
+    sizes = args.sizes
+    if sizes is None:
+        sizes = QUICK_DATABASE_SIZES if args.quick else DATABASE_SIZES
+
+    examples = load_named_examples()
+    cases = itertools.chain(
+        parse_cases(examples), score_cases(examples), database_cases(sizes),
+        http_cases()
+    )
+    results = run_cases(cases, 0.2 if args.quick else 1.0, args.repeat)
+    report = {
+        'time': time.time(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results
+    }
+
+    if args.output is not None:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as output:
+            json.dump(report, output, indent=2)
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f'No baseline found at {args.baseline}')
+        return
+
+    with open(args.baseline) as baseline_file:
+        baseline = json.load(baseline_file)['results']
+
+    regressions = compare(results, baseline, args.threshold)
+    for name, ratio in regressions:
+        print(f'REGRESSION {name}: {ratio:.2f}x the baseline time')
+
+    print(f'{len(regressions)} of {len(results)} cases regressed by more '
+          f'than {args.threshold:.0%}')
+    if regressions:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,224 @@
+from datetime import date, timedelta
+import itertools
+import math
+import random
+
+# Words the descriptions of items are made of, so that they pass the pattern
+# of descriptions in the API specification.
+WORDS = (
+    'Pepsi', 'Dasani', 'Mountain', 'Dew', 'Emils', 'Cheese', 'Pizza',
+    'Knorr', 'Creamy', 'Chicken', 'Doritos', 'Nacho', 'Klarbrunn', 'Sparkling',
+    'Water', 'Gatorade', 'Organic', 'Bananas', 'Whole', 'Milk', 'Bread',
+    'Eggs', 'Large', 'Family', 'Size', '12-oz', '2-Liter', '6-Pack', 'Lite',
+    'Frozen', 'Fresh', 'Greek', 'Yogurt', 'Coffee', 'Beans', 'Paper', 'Towels'
+)
+RETAILER_WORDS = (
+    'Target', 'Walgreens', 'M&M', 'Corner', 'Market', 'Fresh', 'Foods',
+    'Super', 'Save', 'Green', 'Valley', 'City', 'Mart', 'Express', 'Depot'
+)
+
+## Generates receipts from configurable distributions, so that load can go
+## beyond the example receipts while staying reproducible for a seed.
+##
+## Item counts are 1 plus a geometric variable with the given mean, capped at
+## the maximum. Description lengths are normally distributed in characters.
+## Retailers are drawn from a fixed pool with Zipf weights, so a skew of 0
+## draws each equally often and larger skews favor the first few. Purchase
+## times are normally distributed around the peak hour, wrapping around
+## midnight, or uniform without a spread. Prices are log-normal in cents,
+## and totals are the sums of the prices.
+##
+## A fraction of the receipts are duplicates of recently generated ones, like
+## the retries of clients whose responses timed out.
+##
+class ReceiptGenerator:
+    ## Initialize member variables for the generator.
+    ##
+    ## Parameters:
+    ##     seed (int): the seed of the random numbers
+    ##     mean_items (float): the mean amount of items of a receipt
+    ##     max_items (int): the most items of a receipt
+    ##     mean_description (float): the mean characters of a description
+    ##     description_spread (float): the standard deviation of the
+    ##                                 characters of a description
+    ##     retailers (int): the amount of retailers in the pool
+    ##     retailer_skew (float): the Zipf exponent of the retailer weights
+    ##     peak_hour (float): the hour of the day purchases peak at
+    ##     hour_spread (float): the standard deviation of purchase times in
+    ##                          hours, or None for uniform times
+    ##     duplicate_rate (float): the fraction of receipts that repeat a
+    ##                             recently generated one
+    ##     start_date (date): the earliest purchase date
+    ##     days (int): the amount of days purchase dates are spread over
+    ##
+    ## Raises:
+    ##     ValueError: if a distribution parameter is out of range
+    ##
+    def __init__(self, seed: int = 0, mean_items: float = 3.0,
+                 max_items: int = 50, mean_description: float = 14.0,
+                 description_spread: float = 5.0, retailers: int = 100,
+                 retailer_skew: float = 1.0, peak_hour: float = 14.0,
+                 hour_spread: float = 3.0, duplicate_rate: float = 0.0,
+                 start_date: date = date(2022, 1, 1),
+                 days: int = 365) -> None:
+        if mean_items < 1 or max_items < 1:
+            raise ValueError('Receipts must have at least 1 item')
+        if retailers < 1:
+            raise ValueError('The retailer pool must not be empty')
+        if not 0 <= duplicate_rate < 1:
+            raise ValueError('The duplicate rate must be from 0 up to 1')
+
+        self.random = random.Random(seed)
+        self.mean_items = mean_items
+        self.max_items = max_items
+        self.mean_description = mean_description
+        self.description_spread = description_spread
+        self.peak_hour = peak_hour
+        self.hour_spread = hour_spread
+        self.duplicate_rate = duplicate_rate
+        self.start_date = start_date
+        self.days = days
+
+        self.retailers = [self._retailer(i) for i in range(retailers)]
+        self.retailer_weights = list(itertools.accumulate(
+            1 / rank ** retailer_skew for rank in range(1, retailers + 1)
+        ))
+        self.generated = 0
+        self.recent = []
+
+    ## Create the name of a retailer in the pool, unique to its index.
+    ##
+    ## Parameters:
+    ##     index (int): the index of the retailer in the pool
+    ##
+    ## Returns:
+    ##     A string for the name of the retailer.
+    ##
+    def _retailer(self, index: int) -> str:
+        words = self.random.sample(RETAILER_WORDS, self.random.randint(1, 2))
+        return f'{" ".join(words)} {index}'
+
+    ## Draw the amount of items of a receipt.
+    ##
+    ## Returns:
+    ##     An int for the amount of items.
+    ##
+    def _item_count(self) -> int:
+        if self.mean_items == 1:
+            return 1
+
+        # Flooring an exponential variable with this rate gives a geometric
+        # variable with a mean of mean_items - 1.
+        rate = math.log(self.mean_items / (self.mean_items - 1))
+        return min(self.max_items, 1 + int(self.random.expovariate(rate)))
+
+    ## Draw the short description of an item.
+    ##
+    ## Returns:
+    ##     A string of words cut to the drawn length.
+    ##
+    def _description(self) -> str:
+        length = max(1, round(self.random.gauss(self.mean_description,
+                                                self.description_spread)))
+        words = [self.random.choice(WORDS)]
+        while len(' '.join(words)) < length:
+            words.append(self.random.choice(WORDS))
+
+        return ' '.join(words)[:length].rstrip()
+
+    ## Draw the purchase time of a receipt.
+    ##
+    ## Returns:
+    ##     A string for the time formatted as "HH:MM".
+    ##
+    def _purchase_time(self) -> str:
+        if self.hour_spread is None:
+            minutes = self.random.randrange(24 * 60)
+        else:
+            hours = self.random.gauss(self.peak_hour, self.hour_spread)
+            minutes = int(hours * 60) % (24 * 60)
+
+        return f'{minutes // 60:02d}:{minutes % 60:02d}'
+
+    ## Draw the price of an item, mostly a few dollars with a long tail.
+    ##
+    ## Returns:
+    ##     An int for the price in cents.
+    ##
+    def _price_cents(self) -> int:
+        price = int(self.random.lognormvariate(5.5, 1.0))
+        # Round amounts score extra points, so some prices are whole dollars
+        # or quarters, as they are on real receipts.
+        roll = self.random.random()
+        if roll < 0.05:
+            price -= price % 100
+        elif roll < 0.2:
+            price -= price % 25
+
+        return max(1, price)
+
+    ## Generate the data of the next receipt.
+    ##
+    ## Returns:
+    ##     A tuple containing a dict for the receipt data and an int for the
+    ##     number of the receipt, counting from 0 in the order receipts were
+    ##     first generated, so that a duplicate has the number of the receipt
+    ##     it repeats.
+    ##
+    def generate(self) -> tuple:
+        if self.recent and self.random.random() < self.duplicate_rate:
+            return self.random.choice(self.recent)
+
+        prices = [self._price_cents() for i in range(self._item_count())]
+        purchase_date = self.start_date + timedelta(
+            days=self.random.randrange(self.days)
+        )
+        receipt_data = {
+            'retailer': self.random.choices(
+                self.retailers, cum_weights=self.retailer_weights
+            )[0],
+            'purchaseDate': purchase_date.isoformat(),
+            'purchaseTime': self._purchase_time(),
+            'total': _format_cents(sum(prices)),
+            'items': [
+                {
+                    'shortDescription': self._description(),
+                    'price': _format_cents(price)
+                }
+                for price in prices
+            ]
+        }
+
+        generated = receipt_data, self.generated
+        self.generated += 1
+
+        # Retries follow their first attempt closely, so only recent
+        # receipts are repeated.
+        if len(self.recent) < 1000:
+            self.recent.append(generated)
+        else:
+            self.recent[self.random.randrange(1000)] = generated
+
+        return generated
+
+    ## Generate the data of the given amount of receipts.
+    ##
+    ## Parameters:
+    ##     count (int): the amount of receipts to generate
+    ##
+    ## Returns:
+    ##     A list of dicts for the receipts.
+    ##
+    def receipts(self, count: int) -> list[dict]:
+        return [self.generate()[0] for i in range(count)]
+
+## Format an amount of cents as dollars with two decimals.
+##
+## Parameters:
+##     cents (int): the amount to format
+##
+## Returns:
+##     A string like "12.05".
+##
+def _format_cents(cents: int) -> str:
+    return f'{cents // 100}.{cents % 100:02d}'
@@ -0,0 +1,37 @@
+# Gunicorn settings for the application, loaded with
+# "gunicorn --config python:app.gunicorn_conf app.server:app".
+import itertools
+import os
+
+from gunicorn.arbiter import Arbiter
+from gunicorn.workers.base import Worker
+
+## Give the worker about to be forked the smallest index that no running
+## worker has, so that indexes stay below twice the amount of workers even as
+## workers are replaced or reloaded.
+##
+## Parameters:
+##     server (Arbiter): the gunicorn master
+##     worker (Worker): the worker about to be forked
+##
+def pre_fork(server: Arbiter, worker: Worker) -> None:
+    used = {
+        getattr(running, 'receipt_worker_index', None)
+        for running in server.WORKERS.values()
+    }
+    worker.receipt_worker_index = next(
+        index for index in itertools.count() if index not in used
+    )
+
+## Pass the index of the worker to the application it loads as
+## FLASK_RECEIPT_WORKER_INDEX, which is added to FLASK_RECEIPT_SHARD_ID so
+## that workers of a node generate snowflake ids for distinct shards.
+##
+## Parameters:
+##     server (Arbiter): the gunicorn master
+##     worker (Worker): the forked worker
+##
+def post_fork(server: Arbiter, worker: Worker) -> None:
+    os.environ['FLASK_RECEIPT_WORKER_INDEX'] = str(
+        worker.receipt_worker_index
+    )
@@ -0,0 +1,111 @@
+from collections import OrderedDict
+from concurrent.futures import Future
+import threading
+
+## A bounded cache of the ids of receipts stored with an idempotency key, so
+## that a client retrying a request with the same key gets the id of the
+## receipt stored by the first request instead of storing it again. Once
+## full, the least recently used keys are forgotten.
+##
+class IdempotencyCache:
+    ## Initialize member variables for the cache.
+    ##
+    ## Parameters:
+    ##     capacity (int): the most keys to remember
+    ##
+    ## Raises:
+    ##     ValueError: if capacity is less than 1
+    ##
+    def __init__(self, capacity: int) -> None:
+        if capacity < 1:
+            raise ValueError('Idempotency cache capacity must be at least 1')
+
+        self.capacity = capacity
+        self._entries = OrderedDict()
+        # The keys whose receipts are being stored, to the fingerprint and a
+        # Future for the id of each, which retries of the key wait on.
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    ## Store a receipt for the given key, unless a receipt was already stored
+    ## for it. The lock is only held to look up and claim the key, so that
+    ## receipts with different keys are stored at the same time, while retries
+    ## arriving during the first request wait for its id instead of storing
+    ## the receipt again. A receipt that fails to be stored isn't remembered,
+    ## so waiting retries, and later ones, store it themselves.
+    ##
+    ## Parameters:
+    ##     key (str): the idempotency key of the request
+    ##     fingerprint (str): the content id of the receipt, to tell apart a
+    ##                        retry from a different receipt reusing the key
+    ##     store (callable): the function storing the receipt and returning
+    ##                       its id
+    ##
+    ## Raises:
+    ##     ValueError: if the key was already used for a different receipt
+    ##
+    ## Returns:
+    ##     A string for the id of the stored receipt.
+    ##
+    def store_once(self, key: str, fingerprint: str, store: callable) -> str:
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+
+                if entry is not None:
+                    _check_fingerprint(entry[0], fingerprint)
+                    self._entries.move_to_end(key)
+                    return entry[1]
+
+                pending = self._pending.get(key)
+                if pending is None:
+                    future = Future()
+                    self._pending[key] = (fingerprint, future)
+                    break
+
+            _check_fingerprint(pending[0], fingerprint)
+            try:
+                return pending[1].result()
+            except Exception:
+                # The first request failed, so this one tries in turn.
+                continue
+
+        try:
+            id = store()
+        except BaseException as err:
+            with self._lock:
+                del self._pending[key]
+            future.set_exception(err)
+            raise
+
+        with self._lock:
+            del self._pending[key]
+            self._entries[key] = (fingerprint, id)
+            if len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+        future.set_result(id)
+        return id
+
+    ## Retrieve the amount of remembered keys.
+    ##
+    ## Returns:
+    ##     An int for the amount of keys.
+    ##
+    def __len__(self) -> int:
+        return len(self._entries)
+
+## Check that a request reusing an idempotency key sends the same receipt.
+##
+## Parameters:
+##     stored (str): the fingerprint of the receipt stored for the key
+##     fingerprint (str): the fingerprint of the receipt of the request
+##
+## Raises:
+##     ValueError: if the fingerprints differ
+##
+def _check_fingerprint(stored: str, fingerprint: str) -> None:
+    if stored != fingerprint:
+        raise ValueError(
+            'Idempotency key was already used for a different receipt'
+        )
@@ -1,5 +1,4 @@
 from datetime import date, datetime
-import math
 
 from app.receipt import Receipt
 from app.purchased_item import PurchasedItem
@@ -18,11 +17,23 @@ def score_receipt(receipt: Receipt) -> int:
     total_points += _score_name(receipt.get_retailer())
     total_points += _score_purchase_date(receipt.get_purchase_date())
     total_points += _score_purchase_time(receipt.get_purchase_time())
-    total_points += _score_total_cost(receipt.get_total_cost())
+    total_points += _score_total_cost(receipt.get_total_cents())
     total_points += _score_purchased_items(receipt.get_purchased_items())
 
     return total_points
 
+## Calculate the amount of points for each of the receipts.
+##
+## Parameters:
+##     receipts (list[Receipt]): the receipts to score
+##
+## Returns:
+##     A list of ints for the amount of points scored for each receipt in the
+##     same order.
+##
+def score_receipts(receipts: list[Receipt]) -> list[int]:
+    return [score_receipt(receipt) for receipt in receipts]
+
 ## Calculate the amount of points for the retailer name of the receipt.
 ##
 ## Parameters:
@@ -75,19 +86,17 @@ def _score_purchase_time(purchase_time: datetime) -> int:
 ## Calculate the amount of points for the total cost of the receipt.
 ##
 ## Parameters:
-##     total_cost (float): the total cost of the receipt
+##     total_cents (int): the total cost of the receipt in cents
 ##
 ## Returns:
 ##     An int for the amount of points scored for the total cost.
 ##
-def _score_total_cost(total_cost: float) -> int:
+def _score_total_cost(total_cents: int) -> int:
     cost_points = 0
-    cost_cents, _cost_dollars = math.modf(total_cost)
-    cost_cents *= 100
 
-    if cost_cents % 25 == 0:
+    if total_cents % 25 == 0:
         cost_points += 25
-    if cost_cents == 0:
+    if total_cents % 100 == 0:
         cost_points += 50
 
     return cost_points
@@ -109,6 +118,7 @@ def _score_purchased_items(items: list[PurchasedItem]) -> int:
     for item in items:
         short_desc = item.get_short_description()
         if len(short_desc.strip()) % 3 == 0:
-            item_points += math.ceil(item.get_price() * 0.2)
+            # 20% of the price in dollars, rounded up: ceil(cents / 500).
+            item_points += -(-item.get_price_cents() // 500)
 
     return item_points
\ No newline at end of file
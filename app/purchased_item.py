@@ -1,8 +1,16 @@
 import pprint
+import sys
 
-## An item purchased from a retailer.
+from app.receipt_parser import format_cents, parse_cents
+
+## An item purchased from a retailer. Items are stored for as long as their
+## receipt, so they use slots instead of a per-instance dict and share equal
+## descriptions through interning.
 ##
 class PurchasedItem:
+    __slots__ = ('short_description', 'price_cents')
+    EXPECTED_KEYS = ('shortDescription', 'price')
+
     ## Initialize member variables for the purchased item.
     ##
     ## Parameters:
@@ -10,20 +18,62 @@ class PurchasedItem:
     ##                  the purchased item
     ##
     ## Raises:
+    ##     ValueError: if item is not a dict or its short description is not
+    ##                 a string
     ##     KeyError: if item doesn't contain "shortDescription" or "price"
     ##               as keys
     ##
     def __init__(self, item: dict) -> None:
-        expected_keys = ['shortDescription', 'price']
+        try:
+            short_description = item['shortDescription']
+            price = item['price']
+        except (KeyError, TypeError):
+            self._raise_missing_key(item)
+            raise
 
-        for key in expected_keys:
+        self.short_description = self._parse_short_description(
+            short_description
+        )
+        self.price_cents = self._parse_price(price)
+
+    ## Raise an error for the first expected key missing from the item.
+    ##
+    ## Parameters:
+    ##     item (dict): the item to check for missing keys
+    ##
+    ## Raises:
+    ##     ValueError: if item is not a dict
+    ##     KeyError: if item doesn't contain "shortDescription" or "price"
+    ##               as keys
+    ##
+    def _raise_missing_key(self, item: dict) -> None:
+        if not isinstance(item, dict):
+            error_msg = 'Item in receipt must be a JSON object: '
+            raise ValueError(error_msg + repr(item))
+
+        for key in self.EXPECTED_KEYS:
             if not key in item:
                 error_msg = f'Item in receipt must define the {key} key:\n'
                 item_str = pprint.pformat(item, sort_dicts=False)
                 raise KeyError(error_msg + item_str)
 
-        self.short_description = item['shortDescription']
-        self.price = self._parse_price(item['price'])
+    ## Check that the given short description is a string and intern it.
+    ##
+    ## Parameters:
+    ##     short_description (str): the short description of the item
+    ##
+    ## Raises:
+    ##     ValueError: if the short description is not a string
+    ##
+    ## Returns:
+    ##     The interned string for the short description.
+    ##
+    def _parse_short_description(self, short_description: str) -> str:
+        try:
+            return _intern(short_description)
+        except TypeError:
+            error_msg = 'Item short description must be a string: '
+            raise ValueError(error_msg + repr(short_description)) from None
 
     ## Parse the price from the given string.
     ##
@@ -34,14 +84,14 @@ class PurchasedItem:
     ##     ValueError: if the price could not be parsed from the given string
     ##
     ## Returns:
-    ##     A float for the parsed price.
+    ##     An int for the parsed price in cents.
     ##
-    def _parse_price(self, price_str: str) -> float:
+    def _parse_price(self, price_str: str) -> int:
         try:
-            return float(price_str)
-        except ValueError:
+            return parse_cents(price_str)
+        except (ValueError, TypeError):
             error_msg = 'Price could not be parsed for item: '
-            raise ValueError(error_msg + price_str)
+            raise ValueError(error_msg + str(price_str)) from None
 
     ## Retrieve the short description for the purchased item.
     ##
@@ -54,10 +104,30 @@ class PurchasedItem:
     ## Retrieve the price for the purchased item.
     ##
     ## Returns:
-    ##     A float for the price.
+    ##     An int for the price in cents.
+    ##
+    def get_price_cents(self) -> int:
+        return self.price_cents
+
+    ## Retrieve the price for the purchased item in dollars.
+    ##
+    ## Returns:
+    ##     A float for the price in dollars.
     ##
     def get_price(self) -> float:
-        return self.price
+        return self.price_cents / 100
+
+    ## Convert the purchased item into the format it was initialized from.
+    ##
+    ## Returns:
+    ##     A dict with keys "shortDescription" and "price" for the purchased
+    ##     item.
+    ##
+    def to_dict(self) -> dict:
+        return {
+            'shortDescription': self.short_description,
+            'price': format_cents(self.price_cents)
+        }
 
     ## Check if the given object is equivalent to this object.
     ##
@@ -70,8 +140,25 @@ class PurchasedItem:
     ##
     def __eq__(self, other: any) -> bool:
         if isinstance(other, PurchasedItem):
-            self_attr = (self.short_description, self.price)
-            other_attr = (other.short_description, other.price)
+            self_attr = (self.short_description, self.price_cents)
+            other_attr = (other.short_description, other.price_cents)
             return self_attr == other_attr
 
-        return False
\ No newline at end of file
+        return False
+
+## Intern the given string so that equal strings share memory.
+##
+## Parameters:
+##     value (str): the string to intern
+##
+## Raises:
+##     TypeError: if value is not a string
+##
+## Returns:
+##     The interned string.
+##
+def _intern(value: str) -> str:
+    if type(value) is not str:
+        raise TypeError(f'Expected a string: {value!r}')
+
+    return sys.intern(value)
\ No newline at end of file
@@ -1,11 +1,26 @@
 from datetime import date, datetime
 import pprint
 
-from app.purchased_item import PurchasedItem
+from app.purchased_item import PurchasedItem, _intern
+from app.receipt_parser import (
+    format_cents, parse_cents, parse_date, parse_time
+)
 
-## A receipt for items purchased from a retailer.
+## A receipt for items purchased from a retailer. Receipts use slots instead of
+## a per-instance dict to reduce the memory of stored receipts.
 ##
 class Receipt:
+    __slots__ = (
+        'retailer',
+        'purchase_date',
+        'purchase_time',
+        'total_cents',
+        'purchased_items'
+    )
+    EXPECTED_KEYS = (
+        'retailer', 'purchaseDate', 'purchaseTime', 'total', 'items'
+    )
+
     ## Initialize member variables for the receipt.
     ##
     ## Parameters:
@@ -14,25 +29,66 @@ class Receipt:
     ##                          receipt
     ##
     ## Raises:
+    ##     ValueError: if receipt_data is not a dict, its retailer is not a
+    ##                 string, or its items are not a list of dicts
     ##     KeyError: if receipt_data doesn't contain "retailer", "purchaseDate",
     ##               "purchaseTime", "total", or "items" as keys
     ##
     def __init__(self, receipt_data: dict) -> None:
-        expected_keys = [
-            'retailer', 'purchaseDate', 'purchaseTime', 'total', 'items'
-        ]
+        try:
+            retailer = receipt_data['retailer']
+            purchase_date = receipt_data['purchaseDate']
+            purchase_time = receipt_data['purchaseTime']
+            total_cost = receipt_data['total']
+            items = receipt_data['items']
+        except (KeyError, TypeError):
+            self._raise_missing_key(receipt_data)
+            raise
 
-        for key in expected_keys:
+        self.retailer = self._parse_retailer(retailer)
+        self.purchase_date = self._parse_date(purchase_date)
+        self.purchase_time = self._parse_time(purchase_time)
+        self.total_cents = self._parse_total_cost(total_cost)
+        self.purchased_items = self._parse_purchased_items(items)
+
+    ## Raise an error for the first expected key missing from the receipt data.
+    ##
+    ## Parameters:
+    ##     receipt_data (dict): the receipt data to check for missing keys
+    ##
+    ## Raises:
+    ##     ValueError: if receipt_data is not a dict
+    ##     KeyError: if receipt_data doesn't contain "retailer", "purchaseDate",
+    ##               "purchaseTime", "total", or "items" as keys
+    ##
+    def _raise_missing_key(self, receipt_data: dict) -> None:
+        if not isinstance(receipt_data, dict):
+            error_msg = 'Receipt must be a JSON object: '
+            raise ValueError(error_msg + repr(receipt_data))
+
+        for key in self.EXPECTED_KEYS:
             if not key in receipt_data:
                 error_msg = f'Receipt must define the {key} key:\n'
                 receipt_str = pprint.pformat(receipt_data, sort_dicts=False)
                 raise KeyError(error_msg + receipt_str)
 
-        self.retailer = receipt_data['retailer']
-        self.purchase_date = self._parse_date(receipt_data['purchaseDate'])
-        self.purchase_time = self._parse_time(receipt_data['purchaseTime'])
-        self.total_cost = self._parse_total_cost(receipt_data['total'])
-        self.purchased_items = self._parse_purchased_items(receipt_data['items'])
+    ## Check that the given retailer is a string and intern it.
+    ##
+    ## Parameters:
+    ##     retailer (str): the name of the retailer
+    ##
+    ## Raises:
+    ##     ValueError: if the retailer is not a string
+    ##
+    ## Returns:
+    ##     The interned string for the retailer.
+    ##
+    def _parse_retailer(self, retailer: str) -> str:
+        try:
+            return _intern(retailer)
+        except TypeError:
+            error_msg = 'Receipt retailer must be a string: '
+            raise ValueError(error_msg + repr(retailer)) from None
 
     ## Parse the purchase date from the given string.
     ##
@@ -47,10 +103,10 @@ class Receipt:
     ##
     def _parse_date(self, purchase_date: str) -> date:
         try:
-            return date.fromisoformat(purchase_date)
-        except ValueError:
+            return parse_date(purchase_date)
+        except (ValueError, TypeError):
             error_msg = 'Receipt purchase date does not match "YYYY-MM-DD": '
-            raise ValueError(error_msg + purchase_date)
+            raise ValueError(error_msg + str(purchase_date)) from None
 
     ## Parse the purchase time from the given string.
     ##
@@ -65,10 +121,10 @@ class Receipt:
     ##
     def _parse_time(self, purchase_time: str) -> datetime:
         try:
-            return datetime.strptime(purchase_time, '%H:%M').time()
-        except ValueError:
+            return parse_time(purchase_time)
+        except (ValueError, TypeError):
             error_msg = 'Receipt purchase time does not match "H:M": '
-            raise ValueError(error_msg + purchase_time)
+            raise ValueError(error_msg + str(purchase_time)) from None
 
     ## Parse the total cost from the given string.
     ##
@@ -79,14 +135,14 @@ class Receipt:
     ##     ValueError: if the total cost cannot be parsed from the given string
     ##
     ## Returns:
-    ##     A float for the total cost of the receipt.
+    ##     An int for the total cost of the receipt in cents.
     ##
-    def _parse_total_cost(self, total_cost: str) -> float:
+    def _parse_total_cost(self, total_cost: str) -> int:
         try:
-            return float(total_cost)
-        except ValueError:
+            return parse_cents(total_cost)
+        except (ValueError, TypeError):
             error_msg = 'Total could not be parsed for receipt: '
-            raise ValueError(error_msg + total_cost)
+            raise ValueError(error_msg + str(total_cost)) from None
 
     ## Parse the purchased items from the given list.
     ##
@@ -95,10 +151,17 @@ class Receipt:
     ##                         the keys "shortDescription" and "price" for the
     ##                         purchased item
     ##
+    ## Raises:
+    ##     ValueError: if items is not a list or an item is not a dict
+    ##
     ## Returns:
     ##     A list of PurchasedItems representing the receipt's purchased items.
     ##
     def _parse_purchased_items(self, items: list[dict]) -> list[PurchasedItem]:
+        if not isinstance(items, list):
+            error_msg = 'Receipt items must be a JSON array: '
+            raise ValueError(error_msg + repr(items))
+
         return [PurchasedItem(item) for item in items]
 
     ## Retrieve the retailer for the receipt.
@@ -128,10 +191,18 @@ class Receipt:
     ## Retrieve the total cost for the receipt.
     ##
     ## Returns:
+    ##     An int for the total cost in cents.
+    ##
+    def get_total_cents(self) -> int:
+        return self.total_cents
+
+    ## Retrieve the total cost for the receipt in dollars.
+    ##
+    ## Returns:
     ##     A float for the total cost in dollars.
     ##
     def get_total_cost(self) -> float:
-        return self.total_cost
+        return self.total_cents / 100
 
     ## Retrieve the purchased items for the receipt.
     ##
@@ -141,6 +212,21 @@ class Receipt:
     def get_purchased_items(self) -> list[PurchasedItem]:
         return self.purchased_items
 
+    ## Convert the receipt into the format it was initialized from.
+    ##
+    ## Returns:
+    ##     A dict with keys "retailer", "purchaseDate", "purchaseTime", "total",
+    ##     and "items" for the receipt.
+    ##
+    def to_dict(self) -> dict:
+        return {
+            'retailer': self.retailer,
+            'purchaseDate': self.purchase_date.isoformat(),
+            'purchaseTime': self.purchase_time.strftime('%H:%M'),
+            'total': format_cents(self.total_cents),
+            'items': [item.to_dict() for item in self.purchased_items]
+        }
+
     ## Check if the given object is equivalent to this object.
     ##
     ## Parameters:
@@ -156,14 +242,14 @@ class Receipt:
                 self.retailer,
                 self.purchase_date,
                 self.purchase_time,
-                self.total_cost,
+                self.total_cents,
                 self.purchased_items
             )
             other_attr = (
                 other.retailer,
                 other.purchase_date,
                 other.purchase_time,
-                other.total_cost,
+                other.total_cents,
                 other.purchased_items
             )
             return self_attr == other_attr
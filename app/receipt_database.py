@@ -1,45 +1,792 @@
+import atexit
+from collections.abc import Iterator
+import gc
+import heapq
+import itertools
+import os
+import signal
+import threading
+import time
+import traceback
+import zlib
+
+from app.idempotency_cache import IdempotencyCache
+from app.point_calculator import score_receipt, score_receipts
 from app.receipt import Receipt
+from app.receipt_ids import (
+    IdGenerator, SequentialIdGenerator, SnowflakeIdGenerator, content_id
+)
+from app.receipt_journal import ReceiptJournal
+from app.receipt_snapshot import (
+    ReceiptSnapshot, SnapshotReceiptStorage, write_snapshot
+)
+from app.receipt_storage import (
+    create_storage, MemoryReceiptStorage, PackedPointsStorage, ReceiptStorage,
+    TieredReceiptStorage
+)
+from app.striped_counter import StripedCounter
 
-## A database storing receipt information.
+## A database storing receipt information. It is safe to share between the
+## threads of a worker: ids are allocated atomically by the storage, cached
+## points are written with single dict operations, and the cache statistics are
+## kept in striped counters, so no request holds a lock on the whole database.
+## Lookups that miss the cache at the same time may score a receipt twice, but
+## always cache the same points.
 ##
 class ReceiptDatabase:
+    POINTS_CACHE_MODES = ('eager', 'lazy', 'off')
+    ID_MODES = ('sequential', 'content')
+
     ## Initialize member variables for the database.
     ##
-    def __init__(self) -> None:
-        self.receipts = {}
-        self._receipts_added = 0
+    ## Parameters:
+    ##     points_cache (str): when to cache the points of each receipt;
+    ##                         "eager" scores a receipt as it is added,
+    ##                         "lazy" scores a receipt on its first lookup,
+    ##                         and "off" scores a receipt on every lookup
+    ##     storage (ReceiptStorage): the backend to store receipts in; receipts
+    ##                               are kept in memory if not given
+    ##     points_only (bool): whether to score receipts as they are added and
+    ##                         store only their points instead of the receipts
+    ##     journal (ReceiptJournal): the journal to record added receipts in,
+    ##                               whose receipts are restored into the
+    ##                               storage first; receipts are not journaled
+    ##                               if not given
+    ##     snapshot_path (str): the path of the snapshot to serve receipts
+    ##                          from, restored before the journal is
+    ##                          replayed and written by save_snapshot, if any
+    ##     id_mode (str): how ids are generated; "sequential" allocates the
+    ##                    next id from the storage and "content" derives the
+    ##                    id from the content of the receipt, so a receipt
+    ##                    submitted again gets its existing id and is stored
+    ##                    once
+    ##     id_generator (IdGenerator): the generator of ids used instead of
+    ##                                 the storage in "sequential" mode, if any
+    ##     idempotency_keys (int): the most idempotency keys to remember, or 0
+    ##                             to ignore idempotency keys
+    ##     snapshot_timeout (float): the seconds a forked child may take to
+    ##                               write a background snapshot before it
+    ##                               is killed and the snapshot fails
+    ##
+    ## Raises:
+    ##     ValueError: if points_cache or id_mode is not a supported mode, an
+    ##                 id generator is given for content ids, or the journal
+    ##                 or snapshot only holds points but the database is not
+    ##                 in points-only mode
+    ##
+    def __init__(self, points_cache: str = 'lazy',
+                 storage: ReceiptStorage = None,
+                 points_only: bool = False,
+                 journal: ReceiptJournal = None,
+                 snapshot_path: str = None,
+                 id_mode: str = 'sequential',
+                 id_generator: IdGenerator = None,
+                 idempotency_keys: int = 10000,
+                 snapshot_timeout: float = 300.0) -> None:
+        if points_cache not in self.POINTS_CACHE_MODES:
+            error_msg = 'Points cache mode must be one of '
+            raise ValueError(error_msg + ', '.join(self.POINTS_CACHE_MODES))
+
+        if id_mode not in self.ID_MODES:
+            error_msg = 'Id mode must be one of '
+            raise ValueError(error_msg + ', '.join(self.ID_MODES))
+
+        if id_mode == 'content' and id_generator is not None:
+            raise ValueError('Content ids are not generated')
+
+        if storage is None and points_only:
+            storage = PackedPointsStorage()
+        elif storage is None:
+            storage = MemoryReceiptStorage()
+
+        # Cached points of evicted receipts would otherwise grow unbounded.
+        storage.on_evict = self._evict_points
+
+        self.receipts = storage
+        self.points_only = points_only
+        self.points = {}
+        self.points_cache = points_cache
+        self.id_mode = id_mode
+        self.id_generator = id_generator
+        self.idempotency_cache = None
+        if idempotency_keys:
+            self.idempotency_cache = IdempotencyCache(idempotency_keys)
+        self._cache_hits = StripedCounter()
+        self._cache_misses = StripedCounter()
+        self.journal = journal
+        self.snapshot_path = snapshot_path
+        self.snapshot_timeout = snapshot_timeout
+        self._snapshot_start_lock = threading.Lock()
+        self._snapshot_write_lock = threading.Lock()
+        self._snapshot_thread = None
+        self._snapshot_stats = dict.fromkeys(
+            ('last_time', 'last_duration', 'last_fork_duration', 'last_status')
+        )
+
+        if snapshot_path is not None and os.path.exists(snapshot_path):
+            self._restore_snapshot(ReceiptSnapshot(snapshot_path))
+
+        if journal is not None:
+            self._restore(journal.replay())
 
-    ## Store the receipt in the database.
+        # Receipts may also have been restored from a database file, so the
+        # ids of every stored receipt are checked.
+        if id_generator is not None and len(self.receipts):
+            id_generator.restore(self.receipts.iter_ids())
+
+    ## Store the receipt in the database. Only the points of the receipt are
+    ## stored if the database is in points-only mode. With an idempotency key
+    ## that was already used for the same receipt, the receipt isn't stored
+    ## again and the id from the first time is returned.
     ##
     ## Parameters:
     ##     receipt_data (dict): a dict with keys "retailer", "purchaseDate",
     ##                          "purchaseTime", "total", and "items" for the
     ##                          receipt
+    ##     idempotency_key (str): the idempotency key the receipt was
+    ##                            submitted with, if any
+    ##
+    ## Raises:
+    ##     ValueError: if the receipt is invalid or the idempotency key was
+    ##                 already used for a different receipt
     ##
     ## Returns:
     ##     A string for the unique id of the receipt.
     ##
-    def add_receipt(self, receipt_data: dict) -> str:
+    def add_receipt(self, receipt_data: dict,
+                    idempotency_key: str = None) -> str:
+        if idempotency_key is None or self.idempotency_cache is None:
+            return self._add_receipt(receipt_data)
+
+        return self.idempotency_cache.store_once(
+            idempotency_key, content_id(receipt_data),
+            lambda: self._add_receipt(receipt_data)
+        )
+
+    ## Store the receipt in the database, unless it is already stored under
+    ## its content id.
+    ##
+    ## Parameters:
+    ##     receipt_data (dict): a dict with keys "retailer", "purchaseDate",
+    ##                          "purchaseTime", "total", and "items" for the
+    ##                          receipt
+    ##
+    ## Returns:
+    ##     A string for the unique id of the receipt.
+    ##
+    def _add_receipt(self, receipt_data: dict) -> str:
+        id = None
+        if self.id_mode == 'content':
+            id = content_id(receipt_data)
+            if id in self.receipts:
+                return id
+
         receipt = Receipt(receipt_data)
-        id = self._generate_id(receipt)
+        if id is None:
+            id = self._generate_id(receipt)
+
+        if self.points_only:
+            points = score_receipt(receipt)
+            self.receipts[id] = points
+            self._journal({id: points})
+            return id
+
         self.receipts[id] = receipt
+        self._journal({id: receipt})
+
+        if self.points_cache == 'eager':
+            self.points[id] = score_receipt(receipt)
+
         return id
 
+    ## Store each of the receipts in the database. Invalid receipts are
+    ## skipped while the valid ones are stored together. With content ids,
+    ## receipts already stored or repeated in the batch aren't stored again.
+    ##
+    ## Parameters:
+    ##     receipts_data (list[dict]): a list where each element is a dict with
+    ##                                 keys "retailer", "purchaseDate",
+    ##                                 "purchaseTime", "total", and "items" for
+    ##                                 a receipt
+    ##
+    ## Returns:
+    ##     A list with an element for each receipt in the same order, which is
+    ##     either a string for the unique id of the stored receipt or the
+    ##     ValueError or KeyError that caused the receipt to be rejected.
+    ##
+    def add_receipts(self, receipts_data: list[dict]) -> list:
+        results, receipts, ids = _parse_batch(
+            receipts_data, self.id_mode, self.receipts.__contains__
+        )
+        if self.id_mode != 'content':
+            ids = self._generate_ids(receipts)
+
+        self.store_receipts(dict(zip(ids, receipts)))
+        return _batch_results(results, ids)
+
+    ## Store parsed receipts under the given ids at once, such as receipts a
+    ## ShardedReceiptDatabase routes to the partition by their ids.
+    ##
+    ## Parameters:
+    ##     receipts (dict): a dict of unique ids to the Receipts to store
+    ##
+    def store_receipts(self, receipts: dict) -> None:
+        if self.points_only:
+            points = score_receipts(list(receipts.values()))
+            stored = dict(zip(receipts, points))
+        else:
+            stored = receipts
+
+            if self.points_cache == 'eager':
+                points = score_receipts(list(receipts.values()))
+                self.points.update(zip(receipts, points))
+
+        self.receipts.update(stored)
+        self._journal(stored)
+
     ## Retrieve the receipt that matches the given id.
     ##
     ## Parameters:
     ##     id (str): the unique id of the receipt to retrieve
     ##
+    ## Raises:
+    ##     ValueError: if the database is in points-only mode
+    ##
     ## Returns:
     ##     A Receipt for the receipt that matches the id or None if no receipt
     ##     was found.
     ##
     def get_receipt(self, id: str) -> Receipt:
-        if id in self.receipts:
-            return self.receipts[id]
-        else:
+        if self.points_only:
+            raise ValueError('Receipts are not kept in points-only mode')
+
+        return self.receipts.get(id)
+
+    ## Retrieve the amount of points for the receipt that matches the given id.
+    ## Receipts never change once stored, so their points are served from the
+    ## points cache whenever possible.
+    ##
+    ## Parameters:
+    ##     id (str): the unique id of the receipt to score
+    ##
+    ## Returns:
+    ##     An int for the amount of points scored for the receipt that matches
+    ##     the id or None if no receipt was found.
+    ##
+    def get_points(self, id: str) -> int:
+        if self.points_only:
+            return self.receipts.get(id)
+
+        points = self.points.get(id)
+        if points is None:
+            points = self.receipts.get_stored_points(id)
+
+        if points is not None:
+            self._cache_hits.add()
+            return points
+
+        receipt = self.get_receipt(id)
+        if receipt is None:
             return None
 
+        self._cache_misses.add()
+        points = score_receipt(receipt)
+
+        if self.points_cache != 'off':
+            self.points[id] = points
+
+        return points
+
+    ## Retrieve the receipts that match the given ids.
+    ##
+    ## Parameters:
+    ##     ids (list[str]): the unique ids of the receipts to retrieve
+    ##
+    ## Raises:
+    ##     ValueError: if the database is in points-only mode
+    ##
+    ## Returns:
+    ##     A dict of each id to the Receipt that matches it or None if no
+    ##     receipt was found.
+    ##
+    def get_receipts(self, ids: list[str]) -> dict:
+        if self.points_only:
+            raise ValueError('Receipts are not kept in points-only mode')
+
+        return self.receipts.get_many(ids)
+
+    ## Retrieve the amount of points for each receipt that matches the given
+    ## ids. Cached points are served directly while the remaining receipts are
+    ## retrieved and scored together.
+    ##
+    ## Parameters:
+    ##     ids (list[str]): the unique ids of the receipts to score
+    ##
+    ## Returns:
+    ##     A dict of each id to an int for the amount of points scored for the
+    ##     receipt that matches it or None if no receipt was found.
+    ##
+    def get_receipts_points(self, ids: list[str]) -> dict:
+        if self.points_only:
+            return self.receipts.get_many(ids)
+
+        points = {}
+        missed_ids = []
+
+        for id in ids:
+            cached_points = self.points.get(id)
+            if cached_points is None:
+                cached_points = self.receipts.get_stored_points(id)
+
+            if cached_points is not None:
+                self._cache_hits.add()
+                points[id] = cached_points
+            else:
+                missed_ids.append(id)
+
+        receipts = self.get_receipts(missed_ids)
+        found = {
+            id: receipt for id, receipt in receipts.items()
+            if receipt is not None
+        }
+        scored = dict(zip(found, score_receipts(list(found.values()))))
+        self._cache_misses.add(len(scored))
+
+        if self.points_cache != 'off':
+            self.points.update(scored)
+
+        for id in missed_ids:
+            points[id] = scored.get(id)
+
+        return points
+
+    ## Iterate over every stored receipt along with its points in id order,
+    ## so that an export can be resumed after the last id received. The ids
+    ## are sorted up front, while the receipts are read from the storage a
+    ## chunk at a time so that only one chunk is held in memory. Receipts
+    ## stored while iterating may or may not be included. Points missing from
+    ## the cache are scored without being cached, so that an export doesn't
+    ## fill the cache.
+    ##
+    ## Parameters:
+    ##     since (str): the id to export the receipts after, if any; ids are
+    ##                  ordered as by _id_order
+    ##     chunk_size (int): the most receipts to read at once
+    ##
+    ## Returns:
+    ##     An Iterator of (id, receipt, points) tuples for the stored
+    ##     receipts, where the receipt is None in points-only mode.
+    ##
+    def export(self, since: str = None,
+               chunk_size: int = 1000) -> Iterator[tuple]:
+        ids = sorted(self.receipts.iter_ids(), key=_id_order)
+        if since is not None:
+            ids = (id for id in ids if _is_after(id, since))
+        else:
+            ids = iter(ids)
+
+        while chunk := list(itertools.islice(ids, chunk_size)):
+            found = self.receipts.get_many(chunk)
+
+            if self.points_only:
+                for id, points in found.items():
+                    if points is not None:
+                        yield id, None, points
+                continue
+
+            points = {}
+            missed = {}
+            for id, receipt in found.items():
+                if receipt is None:
+                    continue
+
+                cached_points = self.points.get(id)
+                if cached_points is None:
+                    cached_points = self.receipts.get_stored_points(id)
+
+                if cached_points is not None:
+                    points[id] = cached_points
+                else:
+                    missed[id] = receipt
+
+            points.update(zip(missed, score_receipts(list(missed.values()))))
+
+            for id, receipt in found.items():
+                if receipt is not None:
+                    yield id, receipt, points[id]
+
+    ## Retrieve the statistics for the points cache.
+    ##
+    ## Returns:
+    ##     A dict with the keys "hits", "misses", and "size" for the amount of
+    ##     cache hits, cache misses, and cached receipts respectively.
+    ##
+    def get_cache_stats(self) -> dict:
+        return {
+            'hits': self._cache_hits.value(),
+            'misses': self._cache_misses.value(),
+            'size': len(self.points)
+        }
+
+    ## Check whether the receipt with the given id was stored but has since
+    ## been evicted to stay within the capacity of the storage.
+    ##
+    ## Parameters:
+    ##     id (str): the unique id of the receipt
+    ##
+    ## Returns:
+    ##     A bool for whether the receipt was evicted.
+    ##
+    def is_evicted(self, id: str) -> bool:
+        return self.receipts.was_evicted(id)
+
+    ## Retrieve the statistics for evictions from the storage.
+    ##
+    ## Returns:
+    ##     A dict with the keys "evictions", "size", and "capacity" for the
+    ##     amount of evicted receipts, the amount of stored receipts, and the
+    ##     most receipts the storage holds (None if it is unbounded).
+    ##
+    def get_eviction_stats(self) -> dict:
+        return self.receipts.get_eviction_stats()
+
+    ## Remove the cached points of receipts evicted from the memory of the
+    ## storage.
+    ##
+    ## Parameters:
+    ##     evicted (dict): a dict of the ids of the evicted receipts to the
+    ##                     receipts
+    ##
+    def _evict_points(self, evicted: dict) -> None:
+        for id in evicted:
+            self.points.pop(id, None)
+
+    ## Record stored receipts in the journal, if there is one. Once the
+    ## journal has grown enough, it is compacted, or a background snapshot is
+    ## started if the database has a snapshot path.
+    ##
+    ## Parameters:
+    ##     stored (dict): a dict of ids to the stored receipts, or their points
+    ##                    in points-only mode
+    ##
+    def _journal(self, stored: dict) -> None:
+        if self.journal is None:
+            return
+
+        self.journal.append_many(stored)
+
+        if not self.journal.needs_compaction():
+            return
+
+        if self.snapshot_path is not None:
+            self.start_background_snapshot()
+        else:
+            self.journal.start_compaction(self.receipts.snapshot)
+
+    ## Restore the receipts replayed from the journal into the storage.
+    ## Receipts are scored in points-only mode and in eager mode.
+    ##
+    ## Parameters:
+    ##     replayed (dict): a dict of ids to the replayed receipts, or their
+    ##                      points
+    ##
+    ## Raises:
+    ##     ValueError: if the journal only holds points but the database is
+    ##                 not in points-only mode
+    ##
+    def _restore(self, replayed: dict) -> None:
+        receipts = {
+            id: value for id, value in replayed.items()
+            if isinstance(value, Receipt)
+        }
+
+        if not self.points_only and len(receipts) < len(replayed):
+            raise ValueError('Journal only holds points of receipts')
+
+        scored = {}
+        if self.points_only or self.points_cache == 'eager':
+            points = score_receipts(list(receipts.values()))
+            scored = dict(zip(receipts, points))
+
+        if self.points_only:
+            self.receipts.load({**replayed, **scored})
+        else:
+            # Cached first, so that receipts the storage drops on load are
+            # also dropped from the cache.
+            self.points.update(scored)
+            self.receipts.load(receipts)
+
+    ## Serve the receipts of the snapshot from its memory mapping, beneath the
+    ## storage of the database.
+    ##
+    ## Parameters:
+    ##     snapshot (ReceiptSnapshot): the snapshot to restore
+    ##
+    ## Raises:
+    ##     ValueError: if the snapshot only holds points but the database is
+    ##                 not in points-only mode
+    ##
+    def _restore_snapshot(self, snapshot: ReceiptSnapshot) -> None:
+        if snapshot.points_only and not self.points_only:
+            raise ValueError('Snapshot only holds points of receipts')
+
+        self.receipts = SnapshotReceiptStorage(snapshot, self.receipts)
+
+    ## Write a snapshot of every stored receipt, which is served from a memory
+    ## mapping when the database is next created with the snapshot. The
+    ## journal, if any, is rewritten to only hold receipts stored after the
+    ## snapshot was taken. The snapshot is written by the current thread, so
+    ## writes to the database are slowed down while it runs.
+    ##
+    ## Parameters:
+    ##     path (str): the path to write the snapshot to; the snapshot path of
+    ##                 the database is used if not given
+    ##
+    ## Raises:
+    ##     ValueError: if no path is given and the database has no snapshot
+    ##                 path
+    ##
+    def save_snapshot(self, path: str = None) -> None:
+        self._run_snapshot(self._snapshot_target(path), self._write_snapshot)
+
+    ## Write a snapshot of every stored receipt in the background, like
+    ## save_snapshot, unless a background snapshot is already running. The
+    ## process is forked and the child writes the snapshot from its
+    ## copy-on-write view of the receipts, so the database keeps serving
+    ## requests while the snapshot is written.
+    ##
+    ## Parameters:
+    ##     path (str): the path to write the snapshot to; the snapshot path of
+    ##                 the database is used if not given
+    ##
+    ## Raises:
+    ##     ValueError: if no path is given and the database has no snapshot
+    ##                 path
+    ##
+    ## Returns:
+    ##     A bool for whether a background snapshot was started.
+    ##
+    def start_background_snapshot(self, path: str = None) -> bool:
+        path = self._snapshot_target(path)
+
+        # Never block, since this is also called from signal handlers.
+        if not self._snapshot_start_lock.acquire(blocking=False):
+            return False
+
+        try:
+            if self.is_snapshot_running():
+                return False
+
+            self._snapshot_thread = threading.Thread(
+                target=self._run_background_snapshot, args=(path,),
+                daemon=True
+            )
+            self._snapshot_thread.start()
+            return True
+        finally:
+            self._snapshot_start_lock.release()
+
+    ## Check whether a background snapshot is running.
+    ##
+    ## Returns:
+    ##     A bool for whether a background snapshot is running.
+    ##
+    def is_snapshot_running(self) -> bool:
+        thread = self._snapshot_thread
+        return thread is not None and thread.is_alive()
+
+    ## Wait for the running background snapshot, if any, to finish.
+    ##
+    ## Parameters:
+    ##     timeout (float): the most seconds to wait, or None to wait until
+    ##                      the snapshot finishes
+    ##
+    ## Returns:
+    ##     A bool for whether no background snapshot is running anymore.
+    ##
+    def wait_for_snapshot(self, timeout: float = None) -> bool:
+        thread = self._snapshot_thread
+        if thread is not None:
+            thread.join(timeout)
+
+        return not self.is_snapshot_running()
+
+    ## Retrieve the statistics for snapshots.
+    ##
+    ## Returns:
+    ##     A dict with the keys "in_progress" for whether a background
+    ##     snapshot is running, "last_time" for the Unix time the last
+    ##     successful snapshot finished, "last_duration" for the seconds it
+    ##     took, "last_fork_duration" for the seconds the database was paused
+    ##     to fork for it (0 for snapshots written in the foreground), and
+    ##     "last_status" for "ok" or "failed" for the last snapshot. Values are
+    ##     None before the first snapshot.
+    ##
+    def get_snapshot_stats(self) -> dict:
+        return dict(self._snapshot_stats,
+                    in_progress=self.is_snapshot_running())
+
+    ## Find the path to write a snapshot to.
+    ##
+    ## Parameters:
+    ##     path (str): the path given for the snapshot, if any
+    ##
+    ## Raises:
+    ##     ValueError: if no path is given and the database has no snapshot
+    ##                 path
+    ##
+    ## Returns:
+    ##     A string for the path of the snapshot.
+    ##
+    def _snapshot_target(self, path: str) -> str:
+        path = path if path is not None else self.snapshot_path
+        if path is None:
+            raise ValueError('No path to save the snapshot to')
+
+        return path
+
+    ## Write a snapshot with the given function, one snapshot at a time, and
+    ## record its statistics. With a journal, the snapshot is written while
+    ## the journal is compacted, so that the journal keeps the receipts stored
+    ## while the snapshot is written.
+    ##
+    ## Parameters:
+    ##     path (str): the path to write the snapshot to
+    ##     write (callable): the function writing the snapshot to a path and
+    ##                       returning the seconds the database was paused
+    ##
+    def _run_snapshot(self, path: str, write: callable) -> None:
+        with self._snapshot_write_lock:
+            start = time.perf_counter()
+            fork_duration = 0.0
+            status = 'failed'
+
+            def write_for_journal() -> list:
+                nonlocal fork_duration
+                fork_duration = write(path)
+                return []
+
+            try:
+                if self.journal is not None:
+                    self.journal.compact(write_for_journal)
+                else:
+                    write_for_journal()
+                status = 'ok'
+            finally:
+                stats = {'last_status': status}
+                if status == 'ok':
+                    stats.update(
+                        last_time=time.time(),
+                        last_duration=time.perf_counter() - start,
+                        last_fork_duration=fork_duration
+                    )
+                self._snapshot_stats = dict(self._snapshot_stats, **stats)
+
+    ## Write a snapshot from a forked child process for a background thread,
+    ## reporting a failure instead of raising it since nothing waits on the
+    ## thread. The failure is recorded in the statistics.
+    ##
+    ## Parameters:
+    ##     path (str): the path to write the snapshot to
+    ##
+    def _run_background_snapshot(self, path: str) -> None:
+        try:
+            self._run_snapshot(path, self._fork_snapshot)
+        except Exception:
+            traceback.print_exc()
+
+    ## Write a snapshot of every stored receipt from the current process.
+    ##
+    ## Parameters:
+    ##     path (str): the path to write the snapshot to
+    ##
+    ## Returns:
+    ##     A float for the seconds the database was paused, which is 0 since
+    ##     the database isn't paused.
+    ##
+    def _write_snapshot(self, path: str) -> float:
+        write_snapshot(path, self.receipts.snapshot(), self.points_only)
+        return 0.0
+
+    ## Write a snapshot of every stored receipt from a forked child process
+    ## and wait for the child to finish. Existing objects are frozen out of
+    ## garbage collection until the child finishes, since collections touch
+    ## every object they track and would copy the shared pages of the parent
+    ## and the child. The process is forked with other threads running, so a
+    ## child stuck on a lock one of them held is killed once the snapshot
+    ## timeout passes.
+    ##
+    ## Parameters:
+    ##     path (str): the path to write the snapshot to
+    ##
+    ## Raises:
+    ##     RuntimeError: if the child failed to write the snapshot or timed
+    ##                   out
+    ##
+    ## Returns:
+    ##     A float for the seconds the database was paused to fork.
+    ##
+    def _fork_snapshot(self, path: str) -> float:
+        start = time.perf_counter()
+        gc.freeze()
+
+        try:
+            pid = os.fork()
+
+            if pid == 0:
+                exit_code = 1
+                try:
+                    self._write_snapshot(path)
+                    exit_code = 0
+                except BaseException:
+                    traceback.print_exc()
+                finally:
+                    os._exit(exit_code)
+
+            fork_duration = time.perf_counter() - start
+            wait_status = self._wait_for_child(pid)
+        finally:
+            gc.unfreeze()
+
+        if wait_status is None:
+            raise RuntimeError(
+                f'Background snapshot to {path} timed out after '
+                f'{self.snapshot_timeout}s'
+            )
+        if os.waitstatus_to_exitcode(wait_status) != 0:
+            raise RuntimeError(f'Background snapshot to {path} failed')
+
+        return fork_duration
+
+    ## Wait for a forked child to exit, polling with a growing interval so
+    ## that short snapshots aren't held up, and kill it once the snapshot
+    ## timeout passes.
+    ##
+    ## Parameters:
+    ##     pid (int): the process id of the child
+    ##
+    ## Returns:
+    ##     An int for the wait status of the child or None if it was killed
+    ##     for taking too long.
+    ##
+    def _wait_for_child(self, pid: int) -> int:
+        deadline = time.monotonic() + self.snapshot_timeout
+        interval = 0.001
+
+        while True:
+            waited_pid, wait_status = os.waitpid(pid, os.WNOHANG)
+            if waited_pid != 0:
+                return wait_status
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+                return None
+
+            time.sleep(min(interval, remaining))
+            interval = min(interval * 2, 0.05)
+
     ## Generate the unique id for the given receipt.
     ##
     ## Parameters:
@@ -49,5 +796,536 @@ class ReceiptDatabase:
     ##     A string for the unique id of the given receipt.
     ##
     def _generate_id(self, _receipt: Receipt) -> str:
-        self._receipts_added += 1
-        return str(self._receipts_added)
\ No newline at end of file
+        if self.id_generator is not None:
+            return self.id_generator.generate()
+        return self.receipts.allocate_id()
+
+    ## Generate the unique ids for the given receipts.
+    ##
+    ## Parameters:
+    ##     receipts (list[Receipt]): the receipts to generate the ids for
+    ##
+    ## Returns:
+    ##     A list of strings for the unique ids of the given receipts.
+    ##
+    def _generate_ids(self, receipts: list[Receipt]) -> list[str]:
+        if self.id_generator is not None:
+            return self.id_generator.generate_many(len(receipts))
+        return self.receipts.allocate_ids(len(receipts))
+
+## A drop-in replacement for ReceiptDatabase that spreads receipts across
+## independent partitions by a hash of their ids. Each partition is a
+## ReceiptDatabase with its own storage, locks, points cache, and statistics,
+## so receipts in different partitions never contend for the same dict or
+## lock. Ids are generated before a receipt is routed to its partition, from
+## a counter shared by the partitions unless an id generator is given.
+## Partitions don't keep a journal or snapshot.
+##
+class ShardedReceiptDatabase:
+    ## Initialize member variables for the database.
+    ##
+    ## Parameters:
+    ##     partitions (list[ReceiptDatabase]): the partitions to spread the
+    ##                                         receipts across, all in the
+    ##                                         same points-only mode
+    ##     id_mode (str): how ids are generated, as for ReceiptDatabase
+    ##     id_generator (IdGenerator): the generator of ids in "sequential"
+    ##                                 mode, if not the shared counter
+    ##     idempotency_keys (int): the most idempotency keys to remember, or 0
+    ##                             to ignore idempotency keys
+    ##
+    ## Raises:
+    ##     ValueError: if there are no partitions, id_mode is not a supported
+    ##                 mode, or an id generator is given for content ids
+    ##
+    def __init__(self, partitions: list[ReceiptDatabase],
+                 id_mode: str = 'sequential',
+                 id_generator: IdGenerator = None,
+                 idempotency_keys: int = 10000) -> None:
+        if not partitions:
+            raise ValueError('Sharded database requires a partition')
+
+        if id_mode not in ReceiptDatabase.ID_MODES:
+            error_msg = 'Id mode must be one of '
+            raise ValueError(error_msg + ', '.join(ReceiptDatabase.ID_MODES))
+
+        if id_mode == 'content' and id_generator is not None:
+            raise ValueError('Content ids are not generated')
+
+        if id_generator is None and id_mode == 'sequential':
+            id_generator = SequentialIdGenerator()
+
+        self.partitions = partitions
+        self.points_only = partitions[0].points_only
+        self.id_mode = id_mode
+        self.id_generator = id_generator
+        self.idempotency_cache = None
+        if idempotency_keys:
+            self.idempotency_cache = IdempotencyCache(idempotency_keys)
+        self.snapshot_path = None
+
+    ## Store the receipt in the partition for its id. With an idempotency key
+    ## that was already used for the same receipt, the receipt isn't stored
+    ## again and the id from the first time is returned.
+    ##
+    ## Parameters:
+    ##     receipt_data (dict): a dict with keys "retailer", "purchaseDate",
+    ##                          "purchaseTime", "total", and "items" for the
+    ##                          receipt
+    ##     idempotency_key (str): the idempotency key the receipt was
+    ##                            submitted with, if any
+    ##
+    ## Raises:
+    ##     ValueError: if the receipt is invalid or the idempotency key was
+    ##                 already used for a different receipt
+    ##
+    ## Returns:
+    ##     A string for the unique id of the receipt.
+    ##
+    def add_receipt(self, receipt_data: dict,
+                    idempotency_key: str = None) -> str:
+        if idempotency_key is None or self.idempotency_cache is None:
+            return self._add_receipt(receipt_data)
+
+        return self.idempotency_cache.store_once(
+            idempotency_key, content_id(receipt_data),
+            lambda: self._add_receipt(receipt_data)
+        )
+
+    ## Store the receipt in the partition for its id, unless it is already
+    ## stored under its content id.
+    ##
+    ## Parameters:
+    ##     receipt_data (dict): a dict with keys "retailer", "purchaseDate",
+    ##                          "purchaseTime", "total", and "items" for the
+    ##                          receipt
+    ##
+    ## Returns:
+    ##     A string for the unique id of the receipt.
+    ##
+    def _add_receipt(self, receipt_data: dict) -> str:
+        if self.id_mode == 'content':
+            id = content_id(receipt_data)
+            partition = self._partition(id)
+            if id not in partition.receipts:
+                partition.store_receipts({id: Receipt(receipt_data)})
+            return id
+
+        receipt = Receipt(receipt_data)
+        id = self.id_generator.generate()
+        self._partition(id).store_receipts({id: receipt})
+        return id
+
+    ## Store each of the receipts in the partitions for their ids, storing
+    ## the receipts of each partition together. Invalid receipts are skipped
+    ## and, with content ids, so are receipts already stored or repeated in
+    ## the batch.
+    ##
+    ## Parameters:
+    ##     receipts_data (list[dict]): a list where each element is a dict with
+    ##                                 keys "retailer", "purchaseDate",
+    ##                                 "purchaseTime", "total", and "items" for
+    ##                                 a receipt
+    ##
+    ## Returns:
+    ##     A list with an element for each receipt in the same order, which is
+    ##     either a string for the unique id of the stored receipt or the
+    ##     ValueError or KeyError that caused the receipt to be rejected.
+    ##
+    def add_receipts(self, receipts_data: list[dict]) -> list:
+        results, receipts, ids = _parse_batch(
+            receipts_data, self.id_mode,
+            lambda id: id in self._partition(id).receipts
+        )
+        if self.id_mode != 'content':
+            ids = self.id_generator.generate_many(len(receipts))
+
+        stored = dict(zip(ids, receipts))
+        for partition, partition_ids in self._scatter(ids).items():
+            partition.store_receipts({id: stored[id] for id in partition_ids})
+
+        return _batch_results(results, ids)
+
+    ## Retrieve the receipt that matches the given id from its partition.
+    ##
+    ## Parameters:
+    ##     id (str): the unique id of the receipt to retrieve
+    ##
+    ## Raises:
+    ##     ValueError: if the database is in points-only mode
+    ##
+    ## Returns:
+    ##     A Receipt for the receipt that matches the id or None if no receipt
+    ##     was found.
+    ##
+    def get_receipt(self, id: str) -> Receipt:
+        return self._partition(id).get_receipt(id)
+
+    ## Retrieve the amount of points for the receipt that matches the given id
+    ## from its partition.
+    ##
+    ## Parameters:
+    ##     id (str): the unique id of the receipt to score
+    ##
+    ## Returns:
+    ##     An int for the amount of points scored for the receipt that matches
+    ##     the id or None if no receipt was found.
+    ##
+    def get_points(self, id: str) -> int:
+        return self._partition(id).get_points(id)
+
+    ## Retrieve the receipts that match the given ids, asking each partition
+    ## for all of its receipts at once.
+    ##
+    ## Parameters:
+    ##     ids (list[str]): the unique ids of the receipts to retrieve
+    ##
+    ## Raises:
+    ##     ValueError: if the database is in points-only mode
+    ##
+    ## Returns:
+    ##     A dict of each id to the Receipt that matches it or None if no
+    ##     receipt was found.
+    ##
+    def get_receipts(self, ids: list[str]) -> dict:
+        return self._gather(
+            ids, lambda partition, ids: partition.get_receipts(ids)
+        )
+
+    ## Retrieve the amount of points for each receipt that matches the given
+    ## ids, asking each partition for all of its points at once.
+    ##
+    ## Parameters:
+    ##     ids (list[str]): the unique ids of the receipts to score
+    ##
+    ## Returns:
+    ##     A dict of each id to an int for the amount of points scored for the
+    ##     receipt that matches it or None if no receipt was found.
+    ##
+    def get_receipts_points(self, ids: list[str]) -> dict:
+        return self._gather(
+            ids, lambda partition, ids: partition.get_receipts_points(ids)
+        )
+
+    ## Iterate over every stored receipt along with its points in id order,
+    ## merging the exports of the partitions.
+    ##
+    ## Parameters:
+    ##     since (str): the id to export the receipts after, if any
+    ##     chunk_size (int): the most receipts to read at once
+    ##
+    ## Returns:
+    ##     An Iterator of (id, receipt, points) tuples for the stored
+    ##     receipts, where the receipt is None in points-only mode.
+    ##
+    def export(self, since: str = None,
+               chunk_size: int = 1000) -> Iterator[tuple]:
+        yield from heapq.merge(
+            *(partition.export(since, chunk_size)
+              for partition in self.partitions),
+            key=lambda row: _id_order(row[0])
+        )
+
+    ## Retrieve the statistics for the points caches of every partition
+    ## combined.
+    ##
+    ## Returns:
+    ##     A dict with the keys "hits", "misses", and "size" for the amount of
+    ##     cache hits, cache misses, and cached receipts respectively.
+    ##
+    def get_cache_stats(self) -> dict:
+        stats = [partition.get_cache_stats() for partition in self.partitions]
+        return {key: sum(stat[key] for stat in stats) for key in stats[0]}
+
+    ## Retrieve the statistics of each partition, to see how evenly the
+    ## receipts are spread.
+    ##
+    ## Returns:
+    ##     A list with a dict for each partition with the keys "receipts",
+    ##     "hits", "misses", and "size" for the amount of stored receipts and
+    ##     the statistics for the points cache of the partition.
+    ##
+    def get_partition_stats(self) -> list[dict]:
+        return [
+            {'receipts': len(partition.receipts),
+             **partition.get_cache_stats()}
+            for partition in self.partitions
+        ]
+
+    ## Check whether the receipt with the given id was stored but has since
+    ## been evicted from its partition.
+    ##
+    ## Parameters:
+    ##     id (str): the unique id of the receipt
+    ##
+    ## Returns:
+    ##     A bool for whether the receipt was evicted.
+    ##
+    def is_evicted(self, id: str) -> bool:
+        return self._partition(id).is_evicted(id)
+
+    ## Retrieve the statistics for evictions from every partition combined.
+    ##
+    ## Returns:
+    ##     A dict with the keys "evictions", "size", and "capacity" for the
+    ##     amount of evicted receipts, the amount of stored receipts, and the
+    ##     most receipts the partitions hold (None if they are unbounded).
+    ##
+    def get_eviction_stats(self) -> dict:
+        stats = [
+            partition.get_eviction_stats() for partition in self.partitions
+        ]
+        capacities = [stat['capacity'] for stat in stats]
+
+        return {
+            'evictions': sum(stat['evictions'] for stat in stats),
+            'size': sum(stat['size'] for stat in stats),
+            'capacity': None if None in capacities else sum(capacities)
+        }
+
+    ## Find the partition for the given id. CRC-32 spreads sequential ids
+    ## evenly and, unlike hash, is the same in every process.
+    ##
+    ## Parameters:
+    ##     id (str): the unique id of a receipt
+    ##
+    ## Returns:
+    ##     The ReceiptDatabase of the partition.
+    ##
+    def _partition(self, id: str) -> ReceiptDatabase:
+        index = zlib.crc32(id.encode()) % len(self.partitions)
+        return self.partitions[index]
+
+    ## Group the given ids by their partitions.
+    ##
+    ## Parameters:
+    ##     ids (list[str]): the unique ids of receipts
+    ##
+    ## Returns:
+    ##     A dict of each ReceiptDatabase holding any of the ids to a list of
+    ##     the ids it holds, in order.
+    ##
+    def _scatter(self, ids: list[str]) -> dict:
+        groups = {}
+        for id in ids:
+            groups.setdefault(self._partition(id), []).append(id)
+        return groups
+
+    ## Run a bulk read for the given ids on each partition holding any of
+    ## them and combine the results in the order of the ids.
+    ##
+    ## Parameters:
+    ##     ids (list[str]): the unique ids of receipts
+    ##     read (callable): the function taking a partition and its ids and
+    ##                      returning a dict of each id to its result
+    ##
+    ## Returns:
+    ##     A dict of each id to its result.
+    ##
+    def _gather(self, ids: list[str], read: callable) -> dict:
+        results = {}
+        for partition, partition_ids in self._scatter(ids).items():
+            results.update(read(partition, partition_ids))
+        return {id: results[id] for id in ids}
+
+## Parse a batch of receipts for storing. Invalid receipts are skipped and,
+## with content ids, so are receipts already stored or repeated in the batch.
+##
+## Parameters:
+##     receipts_data (list[dict]): the data of each receipt in the batch
+##     id_mode (str): how the ids of the receipts are generated
+##     is_stored (callable): the function checking whether a receipt with the
+##                           given id is already stored
+##
+## Returns:
+##     A tuple containing a list with an element for each receipt (None if
+##     it is to be stored, or else its existing id or the ValueError or
+##     KeyError rejecting it), a list of the Receipts to store, and a list of
+##     their content ids (empty unless id_mode is "content").
+##
+def _parse_batch(receipts_data: list[dict], id_mode: str,
+                 is_stored: callable) -> tuple:
+    results = []
+    receipts = []
+    content_ids = {}
+
+    for receipt_data in receipts_data:
+        id = None
+        if id_mode == 'content':
+            id = content_id(receipt_data)
+            if id in content_ids or is_stored(id):
+                results.append(id)
+                continue
+
+        try:
+            receipt = Receipt(receipt_data)
+            results.append(None)
+            receipts.append(receipt)
+            if id is not None:
+                content_ids[id] = None
+        except (ValueError, KeyError) as err:
+            results.append(err)
+
+    return results, receipts, list(content_ids)
+
+## Fill in the ids of the stored receipts among the results of a batch.
+##
+## Parameters:
+##     results (list): the results of _parse_batch
+##     ids (list[str]): the ids of the stored receipts, in order
+##
+## Returns:
+##     A list with an element for each receipt in the batch, which is either
+##     a string for its id or the error rejecting it.
+##
+def _batch_results(results: list, ids: list[str]) -> list:
+    stored_ids = iter(ids)
+    return [
+        next(stored_ids) if result is None else result
+        for result in results
+    ]
+
+## Find the key ordering the given id among other ids. Ids made of digits
+## come first, ordered as numbers, followed by any others ordered as strings.
+##
+## Parameters:
+##     id (str): the id to order
+##
+## Returns:
+##     A tuple to compare with the keys of other ids.
+##
+def _id_order(id: str) -> tuple:
+    if id.isascii() and id.isdigit():
+        return 0, int(id), id
+    return 1, 0, id
+
+## Check whether an id comes after another in the order of _id_order.
+##
+## Parameters:
+##     id (str): the id to check
+##     since (str): the id to compare against
+##
+## Returns:
+##     A bool for whether the id comes after the other id.
+##
+def _is_after(id: str, since: str) -> bool:
+    return _id_order(id) > _id_order(since)
+
+## Create the database described by the given settings, which use the names of
+## the application config without the "FLASK_" prefix (e.g.
+## RECEIPT_POINTS_CACHE).
+##
+## Parameters:
+##     config (dict): the settings for the database
+##
+## Raises:
+##     ValueError: if the settings ask for partitions along with storage
+##                 other than memory, a journal, or a snapshot, or the shard
+##                 of snowflake ids is not between 0 and 1023
+##
+## Returns:
+##     A ReceiptDatabase configured by the settings, or a
+##     ShardedReceiptDatabase if RECEIPT_PARTITIONS isn't 1.
+##
+def create_receipt_db(
+    config: dict
+) -> ReceiptDatabase | ShardedReceiptDatabase:
+    points_only = config.get('RECEIPT_POINTS_ONLY', False)
+    id_mode = config.get('RECEIPT_ID_MODE', 'sequential')
+    id_generator = None
+    if id_mode == 'snowflake':
+        # The gunicorn settings in app/gunicorn_conf.py give each worker of
+        # a node its own index, added to the base shard of the node.
+        shard = (config.get('RECEIPT_SHARD_ID', 0)
+                 + config.get('RECEIPT_WORKER_INDEX', 0))
+        id_mode = 'sequential'
+        id_generator = SnowflakeIdGenerator(shard)
+
+    partitions = config.get('RECEIPT_PARTITIONS', 1)
+    if partitions != 1:
+        return _create_sharded_db(config, partitions, id_mode, id_generator)
+
+    storage = create_storage(
+        config.get('RECEIPT_STORAGE', 'memory'),
+        config.get('RECEIPT_STORAGE_PATH'),
+        points_only,
+        config.get('RECEIPT_STORAGE_CAPACITY')
+    )
+    if isinstance(storage, TieredReceiptStorage):
+        atexit.register(storage.flush)
+
+    journal = None
+    journal_path = config.get('RECEIPT_JOURNAL_PATH')
+    if journal_path is not None:
+        journal = ReceiptJournal(
+            journal_path,
+            fsync=config.get('RECEIPT_JOURNAL_FSYNC', 'group'),
+            group_interval=config.get('RECEIPT_JOURNAL_GROUP_MS', 100) / 1000
+        )
+        atexit.register(journal.close)
+
+    receipt_db = ReceiptDatabase(
+        points_cache=config.get('RECEIPT_POINTS_CACHE', 'lazy'),
+        storage=storage,
+        points_only=points_only,
+        journal=journal,
+        snapshot_path=config.get('RECEIPT_SNAPSHOT_PATH'),
+        id_mode=id_mode,
+        id_generator=id_generator,
+        idempotency_keys=config.get('RECEIPT_IDEMPOTENCY_KEYS', 10000),
+        snapshot_timeout=config.get('RECEIPT_SNAPSHOT_TIMEOUT', 300.0)
+    )
+
+    # Registered after closing the journal, so that it runs before it. The
+    # child of a background snapshot is killed once it times out, so waiting
+    # a little longer than that bounds shutdown.
+    if receipt_db.snapshot_path is not None:
+        atexit.register(receipt_db.wait_for_snapshot,
+                        receipt_db.snapshot_timeout + 5)
+
+    return receipt_db
+
+## Create a database with the given amount of partitions kept in memory,
+## splitting the storage capacity in the settings between them.
+##
+## Parameters:
+##     config (dict): the settings for the database
+##     partitions (int): the amount of partitions
+##     id_mode (str): how ids are generated
+##     id_generator (IdGenerator): the generator of ids, if any
+##
+## Raises:
+##     ValueError: if the settings ask for storage other than memory, a
+##                 journal, or a snapshot
+##
+## Returns:
+##     A ShardedReceiptDatabase configured by the settings.
+##
+def _create_sharded_db(config: dict, partitions: int, id_mode: str,
+                       id_generator: IdGenerator) -> ShardedReceiptDatabase:
+    if (config.get('RECEIPT_STORAGE', 'memory') != 'memory'
+            or config.get('RECEIPT_JOURNAL_PATH') is not None
+            or config.get('RECEIPT_SNAPSHOT_PATH') is not None):
+        raise ValueError(
+            'Partitions are only kept in memory, without a journal or snapshot'
+        )
+
+    points_only = config.get('RECEIPT_POINTS_ONLY', False)
+    capacity = config.get('RECEIPT_STORAGE_CAPACITY')
+    if capacity is not None and partitions > 0:
+        capacity = -(-capacity // partitions)
+
+    return ShardedReceiptDatabase(
+        [
+            ReceiptDatabase(
+                points_cache=config.get('RECEIPT_POINTS_CACHE', 'lazy'),
+                storage=create_storage('memory', None, points_only, capacity),
+                points_only=points_only,
+                idempotency_keys=0
+            )
+            for i in range(partitions)
+        ],
+        id_mode=id_mode,
+        id_generator=id_generator,
+        idempotency_keys=config.get('RECEIPT_IDEMPOTENCY_KEYS', 10000)
+    )
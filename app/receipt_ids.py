@@ -0,0 +1,248 @@
+from abc import ABC, abstractmethod
+from collections.abc import Iterable
+import hashlib
+import itertools
+import json
+import re
+import threading
+import time
+
+# Sorting keys and dropping whitespace makes the same receipt always encode to
+# the same bytes, whatever order or spacing it was submitted with.
+CANONICAL_ENCODER = json.JSONEncoder(sort_keys=True, separators=(',', ':'),
+                                     ensure_ascii=False)
+
+# Snowflake ids pack 41 bits of milliseconds since the epoch, the shard, and
+# a sequence number within the millisecond into 63 bits.
+SNOWFLAKE_EPOCH_MS = 1704067200000  # 2024-01-01T00:00:00Z
+SHARD_BITS = 10
+SEQUENCE_BITS = 12
+MAX_SHARD = (1 << SHARD_BITS) - 1
+SEQUENCE_MASK = (1 << SEQUENCE_BITS) - 1
+SNOWFLAKE_ID = re.compile(r'[0-9a-f]{8}-[0-9a-f]{8}')
+
+## Derive the id of a receipt from its content, so that submitting the same
+## receipt again gives the same id. The id is a 128-bit BLAKE2b hash of the
+## canonical JSON of the receipt data, formatted as a UUID. It is computed from
+## the data as submitted, without parsing the receipt.
+##
+## Parameters:
+##     receipt_data (dict): the data of the receipt
+##
+## Returns:
+##     A string for the id of the receipt.
+##
+def content_id(receipt_data: dict) -> str:
+    canonical = CANONICAL_ENCODER.encode(receipt_data).encode()
+    digest = hashlib.blake2b(canonical, digest_size=16).hexdigest()
+    # Formatted by hand, since building a uuid.UUID takes longer than hashing.
+    return (f'{digest[:8]}-{digest[8:12]}-{digest[12:16]}-{digest[16:20]}-'
+            f'{digest[20:]}')
+
+## The interface for a generator of unique ids for receipts, used instead of
+## the ids allocated by the storage.
+##
+class IdGenerator(ABC):
+    ## Generate the next unique id for a receipt.
+    ##
+    ## Returns:
+    ##     A string for the unique id.
+    ##
+    @abstractmethod
+    def generate(self) -> str:
+        pass
+
+    ## Generate the given amount of unique ids for receipts at once.
+    ##
+    ## Parameters:
+    ##     count (int): the amount of ids to generate
+    ##
+    ## Returns:
+    ##     A list of strings for the unique ids.
+    ##
+    def generate_many(self, count: int) -> list[str]:
+        return [self.generate() for i in range(count)]
+
+    ## Make sure that ids generated afterwards differ from the given ids
+    ## already in use, such as the ids of receipts restored from a journal,
+    ## a snapshot, or a database file. Called before the generator is shared
+    ## between threads.
+    ##
+    ## Parameters:
+    ##     ids (Iterable[str]): the ids already in use
+    ##
+    def restore(self, ids: Iterable[str]) -> None:
+        pass
+
+## A generator of sequential ids for receipts, counting up from 1 like the
+## ids allocated by the storage. It is safe to share between threads without
+## locking, since ids come from an atomic counter.
+##
+class SequentialIdGenerator(IdGenerator):
+    ## Initialize member variables for the generator.
+    ##
+    def __init__(self) -> None:
+        self._ids = itertools.count(1)
+
+    ## Generate the next unique id for a receipt.
+    ##
+    ## Returns:
+    ##     A string for the unique id.
+    ##
+    def generate(self) -> str:
+        return str(next(self._ids))
+
+    ## Generate the given amount of unique ids for receipts at once.
+    ##
+    ## Parameters:
+    ##     count (int): the amount of ids to generate
+    ##
+    ## Returns:
+    ##     A list of strings for the unique ids.
+    ##
+    def generate_many(self, count: int) -> list[str]:
+        return [str(id) for id in itertools.islice(self._ids, count)]
+
+    ## Continue counting after the largest of the given ids made of digits.
+    ##
+    ## Parameters:
+    ##     ids (Iterable[str]): the ids already in use
+    ##
+    def restore(self, ids: Iterable[str]) -> None:
+        last_id = max(
+            (int(id) for id in ids if id.isascii() and id.isdigit()),
+            default=0
+        )
+        next_id = next(self._ids)
+        self._ids = itertools.count(max(next_id, last_id + 1))
+
+## A generator of time-ordered ids that are unique across workers without any
+## coordination between them, as long as each worker generates ids for a
+## different shard. Each id holds the millisecond it was generated in, the
+## shard, and a sequence number within the millisecond, written as 16 hex
+## digits split by a hyphen, so that ids sort in the order they were
+## generated and are never mistaken for sequential ids.
+##
+## More than 4096 ids in a millisecond borrow from the next millisecond, and
+## the clock going back reuses the last millisecond, so ids keep increasing
+## without ever waiting for the clock.
+##
+class SnowflakeIdGenerator(IdGenerator):
+    ## Initialize member variables for the generator.
+    ##
+    ## Parameters:
+    ##     shard (int): the shard embedded in the ids, unique to the worker
+    ##     clock (callable): the function returning the current time in
+    ##                       nanoseconds since the Unix epoch
+    ##
+    ## Raises:
+    ##     ValueError: if shard is not between 0 and 1023
+    ##
+    def __init__(self, shard: int, clock: callable = time.time_ns) -> None:
+        if not 0 <= shard <= MAX_SHARD:
+            raise ValueError(f'Shard must be between 0 and {MAX_SHARD}')
+
+        self.shard = shard
+        self._clock = clock
+        self._shard_bits = shard << SEQUENCE_BITS
+        # The milliseconds and sequence of the last id, as one number.
+        self._last_tick = -1
+        self._lock = threading.Lock()
+
+    ## Generate the next unique id for a receipt. Generating an id is on the
+    ## path of every stored receipt, so the steps of generate_many are
+    ## inlined.
+    ##
+    ## Returns:
+    ##     A string for the unique id.
+    ##
+    def generate(self) -> str:
+        now = self._clock() // 1000000 - SNOWFLAKE_EPOCH_MS << SEQUENCE_BITS
+
+        with self._lock:
+            tick = self._last_tick + 1
+            if tick < now:
+                tick = now
+            self._last_tick = tick
+
+        return self._format(tick)
+
+    ## Generate the given amount of unique ids for receipts while holding the
+    ## lock once.
+    ##
+    ## Parameters:
+    ##     count (int): the amount of ids to generate
+    ##
+    ## Returns:
+    ##     A list of strings for the unique ids.
+    ##
+    def generate_many(self, count: int) -> list[str]:
+        now = self._clock() // 1000000 - SNOWFLAKE_EPOCH_MS << SEQUENCE_BITS
+
+        with self._lock:
+            first = max(now, self._last_tick + 1)
+            self._last_tick = first + count - 1
+
+        return [self._format(tick) for tick in range(first, first + count)]
+
+    ## Continue after the tick of the largest of the given snowflake ids, so
+    ## that no id is issued again when the clock is behind the restored ids,
+    ## such as after it was stepped back across a restart.
+    ##
+    ## Parameters:
+    ##     ids (Iterable[str]): the ids already in use
+    ##
+    def restore(self, ids: Iterable[str]) -> None:
+        # Snowflake ids have a fixed width, so they sort like their values.
+        last_id = max(
+            (id for id in ids if SNOWFLAKE_ID.fullmatch(id) is not None),
+            default=None
+        )
+        if last_id is None:
+            return
+
+        milliseconds, _shard, sequence = decode_snowflake(last_id)
+        tick = (
+            milliseconds - SNOWFLAKE_EPOCH_MS << SEQUENCE_BITS | sequence
+        )
+        with self._lock:
+            self._last_tick = max(self._last_tick, tick)
+
+    ## Format the id for the given tick, which is the milliseconds and
+    ## sequence of the id as one number.
+    ##
+    ## Parameters:
+    ##     tick (int): the tick of the id
+    ##
+    ## Returns:
+    ##     A string for the id.
+    ##
+    def _format(self, tick: int) -> str:
+        value = (
+            tick >> SEQUENCE_BITS << SHARD_BITS + SEQUENCE_BITS
+            | self._shard_bits | tick & SEQUENCE_MASK
+        )
+        digits = f'{value:016x}'
+        return f'{digits[:8]}-{digits[8:]}'
+
+## Decode the parts of a snowflake id.
+##
+## Parameters:
+##     id (str): the id to decode
+##
+## Returns:
+##     A tuple containing an int for the milliseconds since the Unix epoch
+##     the id was generated in, an int for its shard, and an int for its
+##     sequence within the millisecond, or None if the id isn't a snowflake
+##     id.
+##
+def decode_snowflake(id: str) -> tuple:
+    if SNOWFLAKE_ID.fullmatch(id) is None:
+        return None
+
+    value = int(id[:8] + id[9:], 16)
+    return (
+        (value >> (SHARD_BITS + SEQUENCE_BITS)) + SNOWFLAKE_EPOCH_MS,
+        (value >> SEQUENCE_BITS) & MAX_SHARD,
+        value & SEQUENCE_MASK
+    )
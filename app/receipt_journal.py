@@ -0,0 +1,408 @@
+import fcntl
+import gc
+import json
+import os
+import threading
+
+from app.receipt import Receipt
+
+# Reused for every record, since json.dumps builds a new encoder whenever it is
+# given options.
+RECORD_ENCODER = json.JSONEncoder(separators=(',', ':'))
+
+## An append-only journal of the receipts stored in a database, replayed at
+## startup to restore them. Each record is a line of JSON holding the id and
+## either the receipt, the points of the receipt in points-only mode, or null
+## for a removed receipt.
+##
+## How often the journal is synced to disk depends on its fsync policy:
+## "always" syncs on every write before it returns, "group" syncs in the
+## background every group interval so writes never wait on the disk (at most
+## one interval of writes can be lost), and "os" hands every write to the OS
+## and leaves syncing to it.
+##
+## The journal is compacted in the background once it has grown enough, by
+## rewriting it from a snapshot of the stored receipts while new writes are
+## appended to both the old journal and the rewrite.
+##
+## Only one journal can be open for a path at a time, enforced with an
+## exclusive lock on a lock file next to the journal, since another process
+## appending to it would write receipts this one never replays and ids that
+## collide with its own. The lock file is locked instead of the journal, which
+## compaction replaces.
+##
+class ReceiptJournal:
+    FSYNC_POLICIES = ('always', 'group', 'os')
+    # Compact once the journal is larger than this and has doubled in size
+    # since it was last compacted.
+    COMPACT_MIN_BYTES = 64 * 1024 * 1024
+    COMPACT_GROWTH = 2.0
+    REPAIR_CHUNK_BYTES = 64 * 1024
+
+    ## Open the journal at the given path for appending, creating it if it
+    ## doesn't exist. A partially written record at the end of the journal,
+    ## left by a crash, is truncated.
+    ##
+    ## Parameters:
+    ##     path (str): the path of the journal file
+    ##     fsync (str): the fsync policy, one of "always", "group", or "os"
+    ##     group_interval (float): the seconds between syncs for the "group"
+    ##                             policy
+    ##
+    ## Raises:
+    ##     ValueError: if fsync is not a supported policy
+    ##     RuntimeError: if the journal is already open, in this or another
+    ##                   process
+    ##
+    def __init__(self, path: str, fsync: str = 'group',
+                 group_interval: float = 0.1) -> None:
+        if fsync not in self.FSYNC_POLICIES:
+            error_msg = 'Journal fsync policy must be one of '
+            raise ValueError(error_msg + ', '.join(self.FSYNC_POLICIES))
+
+        self._lock_file = self._acquire(path)
+        self.path = path
+        self.fsync = fsync
+        self.group_interval = group_interval
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._dirty = False
+        self._pending = None
+        self._compactor = None
+        self._compact_lock = threading.Lock()
+
+        self._repair()
+        self._file = open(path, 'ab')
+        self._size = self._compacted_size = self._file.tell()
+
+        self._syncer = None
+        if fsync == 'group':
+            self._syncer = threading.Thread(target=self._sync_periodically,
+                                            daemon=True)
+            self._syncer.start()
+
+    ## Take the exclusive lock of the journal at the given path without
+    ## waiting for it.
+    ##
+    ## Parameters:
+    ##     path (str): the path of the journal file
+    ##
+    ## Raises:
+    ##     RuntimeError: if the lock is already held
+    ##
+    ## Returns:
+    ##     The open lock file, which holds the lock until it is closed.
+    ##
+    def _acquire(self, path: str) -> any:
+        lock_file = open(path + '.lock', 'ab')
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            error_msg = 'Journal is already in use by another writer: '
+            raise RuntimeError(error_msg + path) from None
+
+        return lock_file
+
+    ## Truncate a partially written record at the end of the journal.
+    ##
+    def _repair(self) -> None:
+        try:
+            file = open(self.path, 'r+b')
+        except FileNotFoundError:
+            return
+
+        with file:
+            end = file.seek(0, os.SEEK_END)
+
+            while end > 0:
+                start = max(0, end - self.REPAIR_CHUNK_BYTES)
+                file.seek(start)
+                newline = file.read(end - start).rfind(b'\n')
+
+                if newline >= 0:
+                    end = start + newline + 1
+                    break
+                end = start
+
+            if end < file.seek(0, os.SEEK_END):
+                file.truncate(end)
+
+    ## Read every record in the journal. Later records for an id replace
+    ## earlier ones and removed receipts are left out. The garbage collector
+    ## is paused while the receipts are built, since the many new objects
+    ## would otherwise trigger repeated full collections that can't free
+    ## anything.
+    ##
+    ## Raises:
+    ##     ValueError: if a record in the journal is corrupt
+    ##
+    ## Returns:
+    ##     A dict of each id to the Receipt, or int for the points, stored for
+    ##     it.
+    ##
+    def replay(self) -> dict:
+        with self._lock:
+            self._file.flush()
+            with open(self.path, 'rb') as file:
+                data = file.read()
+
+        gc_enabled = gc.isenabled()
+        gc.disable()
+
+        try:
+            values = {}
+            for id, value in self._decode(data):
+                if value is None:
+                    values.pop(id, None)
+                else:
+                    values[id] = value
+
+            return {
+                id: Receipt(value) if isinstance(value, dict) else value
+                for id, value in values.items()
+            }
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+    ## Decode the records in the given journal contents with a single parse.
+    ##
+    ## Parameters:
+    ##     data (bytes): the lines of the journal
+    ##
+    ## Raises:
+    ##     ValueError: if a record is corrupt
+    ##
+    ## Returns:
+    ##     A list of [id, value] lists for the records.
+    ##
+    def _decode(self, data: bytes) -> list:
+        if not data:
+            return []
+
+        # JSON never contains a raw newline, so the lines join into an array.
+        try:
+            return json.loads(b'[' + data[:-1].replace(b'\n', b',') + b']')
+        except ValueError:
+            pass
+
+        for line_num, line in enumerate(data.splitlines(), 1):
+            try:
+                json.loads(line)
+            except ValueError:
+                raise ValueError(
+                    f'Corrupt journal record on line {line_num}'
+                ) from None
+
+        raise ValueError('Corrupt journal')
+
+    ## Encode a record for the journal.
+    ##
+    ## Parameters:
+    ##     id (str): the id of the receipt
+    ##     value (Receipt | int): the receipt, its points, or None if the
+    ##                            receipt was removed
+    ##
+    ## Returns:
+    ##     The bytes of the line for the record.
+    ##
+    def _encode(self, id: str, value: Receipt | int) -> bytes:
+        if isinstance(value, Receipt):
+            value = value.to_dict()
+
+        return (RECORD_ENCODER.encode([id, value]) + '\n').encode()
+
+    ## Append a record for a stored receipt to the journal.
+    ##
+    ## Parameters:
+    ##     id (str): the id of the receipt
+    ##     value (Receipt | int): the receipt, its points, or None if the
+    ##                            receipt was removed
+    ##
+    def append(self, id: str, value: Receipt | int) -> None:
+        self._write(self._encode(id, value))
+
+    ## Append records for many stored receipts to the journal at once.
+    ##
+    ## Parameters:
+    ##     records (dict): a dict of ids to the receipts, their points, or
+    ##                     None for removed receipts
+    ##
+    def append_many(self, records: dict) -> None:
+        if records:
+            self._write(b''.join(
+                self._encode(id, value) for id, value in records.items()
+            ))
+
+    ## Write encoded records to the journal following the fsync policy.
+    ##
+    ## Parameters:
+    ##     data (bytes): the lines of the records
+    ##
+    def _write(self, data: bytes) -> None:
+        with self._lock:
+            self._file.write(data)
+            self._size += len(data)
+
+            if self._pending is not None:
+                self._pending.append(data)
+
+            if self.fsync == 'always':
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            elif self.fsync == 'os':
+                self._file.flush()
+            else:
+                self._dirty = True
+
+    ## Sync the records written since the last sync to disk. Writes can
+    ## continue while the disk syncs.
+    ##
+    def sync(self) -> None:
+        with self._sync_lock:
+            with self._lock:
+                self._file.flush()
+                dirty = self._dirty
+                self._dirty = False
+
+            if dirty or self.fsync != 'group':
+                os.fsync(self._file.fileno())
+
+    ## Sync the journal every group interval until it is closed.
+    ##
+    def _sync_periodically(self) -> None:
+        while not self._closed.wait(self.group_interval):
+            self.sync()
+
+    ## Check whether the journal has grown enough to be compacted.
+    ##
+    ## Returns:
+    ##     A bool for whether the journal should be compacted.
+    ##
+    def needs_compaction(self) -> bool:
+        threshold = max(self.COMPACT_MIN_BYTES,
+                        self._compacted_size * self.COMPACT_GROWTH)
+        return self._compactor is None and self._size >= threshold
+
+    ## Compact the journal in a background thread, unless a compaction is
+    ## already running.
+    ##
+    ## Parameters:
+    ##     snapshot (callable): a function returning a list of (id, value)
+    ##                          pairs for every stored receipt
+    ##
+    def start_compaction(self, snapshot: callable) -> None:
+        with self._lock:
+            if self._compactor is not None:
+                return
+
+            self._compactor = threading.Thread(
+                target=self._compact_in_background, args=(snapshot,),
+                daemon=True
+            )
+            self._compactor.start()
+
+    ## Compact the journal and allow the next background compaction to start.
+    ##
+    ## Parameters:
+    ##     snapshot (callable): a function returning a list of (id, value)
+    ##                          pairs for every stored receipt
+    ##
+    def _compact_in_background(self, snapshot: callable) -> None:
+        try:
+            self.compact(snapshot)
+        finally:
+            with self._lock:
+                self._compactor = None
+
+    ## Rewrite the journal from a snapshot of the stored receipts, dropping
+    ## replaced and removed records. Records written while the rewrite runs
+    ## are appended to it before it replaces the journal. Only one compaction
+    ## runs at a time.
+    ##
+    ## Parameters:
+    ##     snapshot (callable): a function returning a list of (id, value)
+    ##                          pairs for every stored receipt
+    ##
+    def compact(self, snapshot: callable) -> None:
+        with self._compact_lock:
+            self._rewrite(snapshot)
+
+    ## Rewrite the journal from a snapshot of the stored receipts. The compact
+    ## lock must be held.
+    ##
+    ## Parameters:
+    ##     snapshot (callable): a function returning a list of (id, value)
+    ##                          pairs for every stored receipt
+    ##
+    def _rewrite(self, snapshot: callable) -> None:
+        rewrite_path = self.path + '.compact'
+
+        with self._lock:
+            self._pending = []
+
+        try:
+            with open(rewrite_path, 'wb') as rewrite:
+                for id, value in snapshot():
+                    rewrite.write(self._encode(id, value))
+
+                with self._sync_lock, self._lock:
+                    rewrite.write(b''.join(self._pending))
+                    rewrite.flush()
+                    os.fsync(rewrite.fileno())
+
+                    self._file.close()
+                    os.replace(rewrite_path, self.path)
+                    self._fsync_directory()
+                    self._file = open(self.path, 'ab')
+                    self._size = self._compacted_size = self._file.tell()
+                    self._dirty = False
+                    self._pending = None
+        finally:
+            with self._lock:
+                self._pending = None
+
+            if os.path.exists(rewrite_path):
+                os.remove(rewrite_path)
+
+    ## Sync the directory of the journal so that a rename of the journal
+    ## survives a crash.
+    ##
+    def _fsync_directory(self) -> None:
+        dir_fd = os.open(os.path.dirname(os.path.abspath(self.path)),
+                         os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+    ## Retrieve the size of the journal.
+    ##
+    ## Returns:
+    ##     An int for the amount of bytes written to the journal.
+    ##
+    def get_size(self) -> int:
+        return self._size
+
+    ## Wait for any compaction to finish, sync the journal to disk, and close
+    ## it.
+    ##
+    def close(self) -> None:
+        if self._closed.is_set():
+            return
+
+        self._closed.set()
+        if self._syncer is not None:
+            self._syncer.join()
+
+        compactor = self._compactor
+        if compactor is not None:
+            compactor.join()
+
+        self.sync()
+        self._file.close()
+        # Closed rather than unlocked, so that a forked child closing its copy
+        # doesn't release the lock of its parent.
+        self._lock_file.close()
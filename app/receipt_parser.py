@@ -0,0 +1,84 @@
+from datetime import date, time
+from functools import lru_cache
+import re
+
+# Formats of the receipt schema in api.yml, checked before any conversion.
+DATE_PATTERN = re.compile(r'(\d{4})-(\d{2})-(\d{2})', re.ASCII)
+TIME_PATTERN = re.compile(r'(\d{1,2}):(\d{1,2})', re.ASCII)
+MONEY_PATTERN = re.compile(r'\d+\.\d{2}', re.ASCII)
+
+## Parse a date in the format "YYYY-MM-DD". Receipts share few distinct dates,
+## so parsed dates are cached and the same date object is shared between
+## receipts.
+##
+## Parameters:
+##     date_str (str): the string to parse for the date
+##
+## Raises:
+##     ValueError: if the string doesn't match "YYYY-MM-DD" or is not a valid
+##                 date
+##
+## Returns:
+##     A date for the parsed date.
+##
+@lru_cache(maxsize=4096)
+def parse_date(date_str: str) -> date:
+    match = DATE_PATTERN.fullmatch(date_str)
+    if match is None:
+        raise ValueError(date_str)
+
+    year, month, day = match.groups()
+    return date(int(year), int(month), int(day))
+
+## Parse a 24-hour time in the format "H:M", where the hour and minute have one
+## or two digits. There are only 1440 valid times, so parsed times are cached
+## and the same time object is shared between receipts.
+##
+## Parameters:
+##     time_str (str): the string to parse for the time
+##
+## Raises:
+##     ValueError: if the string doesn't match "H:M" or is not a valid time
+##
+## Returns:
+##     A time for the parsed time.
+##
+@lru_cache(maxsize=2048)
+def parse_time(time_str: str) -> time:
+    match = TIME_PATTERN.fullmatch(time_str)
+    if match is None:
+        raise ValueError(time_str)
+
+    hour, minute = match.groups()
+    return time(int(hour), int(minute))
+
+## Parse an amount of money in the format of digits followed by a decimal
+## point and two digits for the cents, without converting through a float.
+## Prices repeat often across receipts, so recently parsed amounts are cached.
+##
+## Parameters:
+##     money_str (str): the string to parse for the amount of money
+##
+## Raises:
+##     ValueError: if the string doesn't match the money format
+##
+## Returns:
+##     An int for the amount of money in cents.
+##
+@lru_cache(maxsize=4096)
+def parse_cents(money_str: str) -> int:
+    if MONEY_PATTERN.fullmatch(money_str) is None:
+        raise ValueError(money_str)
+
+    return int(money_str.replace('.', ''))
+
+## Format an amount of money in cents in the format parsed by parse_cents.
+##
+## Parameters:
+##     cents (int): the amount of money in cents
+##
+## Returns:
+##     A string for the amount of money in dollars with two decimals.
+##
+def format_cents(cents: int) -> str:
+    return f'{cents // 100}.{cents % 100:02d}'
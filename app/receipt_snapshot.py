@@ -0,0 +1,570 @@
+from array import array
+from bisect import bisect_left
+from collections.abc import Iterable, Iterator
+from datetime import date
+import mmap
+import os
+import struct
+
+from app.point_calculator import score_receipts
+from app.receipt import Receipt
+from app.receipt_parser import format_cents
+from app.receipt_storage import last_sequential_id, ReceiptStorage
+
+MAGIC = b'RCPTSNP1'
+# The magic, flags, receipt count, item count, and largest sequential id,
+# followed by the offset and length of each column.
+HEADER = struct.Struct('<8sQQQQ')
+COLUMN = struct.Struct('<QQ')
+FLAG_POINTS_ONLY = 1
+
+# The columns of a snapshot in file order, with the array type of each one.
+# Columns ending in "_offsets" index into the bytes of the following "_blob".
+# Receipts with sequential ids come first, sorted by the ids in "numeric_ids",
+# followed by the receipts with any other ids sorted by their bytes.
+COLUMNS = (
+    ('numeric_ids', 'q'),
+    ('id_offsets', 'Q'),
+    ('id_blob', 'B'),
+    ('points', 'q'),
+    ('retailer_offsets', 'Q'),
+    ('retailer_blob', 'B'),
+    ('days', 'i'),
+    ('minutes', 'i'),
+    ('total_cents', 'q'),
+    ('item_starts', 'Q'),
+    ('desc_offsets', 'Q'),
+    ('desc_blob', 'B'),
+    ('price_cents', 'q')
+)
+
+## Build the offsets and bytes of a column of strings.
+##
+## Parameters:
+##     strings (list[bytes]): the encoded strings of the column
+##
+## Returns:
+##     A tuple containing an array of the offset of each string, with a final
+##     offset for the end, and the bytes of every string joined together.
+##
+def _string_column(strings: list[bytes]) -> tuple:
+    offsets = array('Q', [0])
+    end = 0
+
+    for string in strings:
+        end += len(string)
+        offsets.append(end)
+
+    return offsets, b''.join(strings)
+
+## Convert an id to the int stored for it in the numeric ids of a snapshot.
+##
+## Parameters:
+##     id (str): the id to convert
+##
+## Returns:
+##     An int for the id or None if it isn't a sequential id, made of digits
+##     without leading zeros and small enough for an 8-byte int.
+##
+def _numeric_id(id: str) -> int:
+    if id.isascii() and id.isdigit() and id[0] != '0' and len(id) < 19:
+        return int(id)
+
+    return None
+
+## Write a snapshot of the given receipts to a file. Receipts are stored in
+## columns sorted by id along with their points, so that a ReceiptSnapshot can
+## serve them from a memory mapping of the file without decoding it. The file
+## is written next to the path and renamed over it once complete.
+##
+## Parameters:
+##     path (str): the path of the snapshot file
+##     records (list[tuple]): (id, value) pairs for every stored receipt, where
+##                            the value is a Receipt or, in points-only mode,
+##                            an int for its points
+##     points_only (bool): whether the values are points instead of receipts
+##
+def write_snapshot(path: str, records: list[tuple],
+                   points_only: bool = False) -> None:
+    numeric_records = []
+    other_records = []
+    for id, value in records:
+        numeric_id = _numeric_id(id)
+
+        if numeric_id is not None:
+            numeric_records.append((numeric_id, id, value))
+        else:
+            other_records.append((id.encode(), id, value))
+
+    numeric_records.sort(key=lambda record: record[0])
+    other_records.sort(key=lambda record: record[0])
+    records = numeric_records + other_records
+    values = [value for _key, _id, value in records]
+    columns = dict.fromkeys([name for name, _typecode in COLUMNS], b'')
+    item_count = 0
+
+    columns['numeric_ids'] = array('q', [
+        numeric_id for numeric_id, _id, _value in numeric_records
+    ])
+    columns['id_offsets'], columns['id_blob'] = _string_column([
+        key for key, _id, _value in other_records
+    ])
+
+    if points_only:
+        columns['points'] = array('q', values)
+    else:
+        columns['points'] = array('q', score_receipts(values))
+        columns['retailer_offsets'], columns['retailer_blob'] = (
+            _string_column([
+                receipt.get_retailer().encode() for receipt in values
+            ])
+        )
+        columns['days'] = array('i', [
+            receipt.get_purchase_date().toordinal() for receipt in values
+        ])
+        columns['minutes'] = array('i', [
+            receipt.get_purchase_time().hour * 60
+            + receipt.get_purchase_time().minute
+            for receipt in values
+        ])
+        columns['total_cents'] = array('q', [
+            receipt.get_total_cents() for receipt in values
+        ])
+
+        items = [
+            item for receipt in values
+            for item in receipt.get_purchased_items()
+        ]
+        item_count = len(items)
+        columns['item_starts'] = array('Q', [0])
+        for receipt in values:
+            columns['item_starts'].append(
+                columns['item_starts'][-1]
+                + len(receipt.get_purchased_items())
+            )
+
+        columns['desc_offsets'], columns['desc_blob'] = _string_column([
+            item.get_short_description().encode() for item in items
+        ])
+        columns['price_cents'] = array('q', [
+            item.get_price_cents() for item in items
+        ])
+
+    last_id = last_sequential_id([id for _key, id, _value in records])
+    flags = FLAG_POINTS_ONLY if points_only else 0
+    header = HEADER.pack(MAGIC, flags, len(records), item_count, last_id)
+
+    # Columns start on 8-byte boundaries so they can be cast in place.
+    offset = len(header) + COLUMN.size * len(COLUMNS)
+    layout = []
+    for name, _typecode in COLUMNS:
+        offset += -offset % 8
+        data = bytes(columns[name])
+        layout.append((offset, data))
+        offset += len(data)
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as file:
+        file.write(header)
+        for column_offset, data in layout:
+            file.write(COLUMN.pack(column_offset, len(data)))
+
+        for column_offset, data in layout:
+            file.write(b'\0' * (column_offset - file.tell()))
+            file.write(data)
+
+        file.flush()
+        os.fsync(file.fileno())
+
+    os.replace(tmp_path, path)
+
+## A sequence of the ids in a snapshot that aren't sequential, in sorted
+## order, for binary search.
+##
+class _SnapshotIds:
+    ## Initialize member variables for the ids.
+    ##
+    ## Parameters:
+    ##     offsets (memoryview): the offsets of the ids in the blob
+    ##     blob (mmap): the mapping holding the bytes of the ids
+    ##     blob_start (int): the position of the bytes of the ids in the blob
+    ##
+    def __init__(self, offsets: memoryview, blob: mmap.mmap,
+                 blob_start: int) -> None:
+        self._offsets = offsets
+        self._blob = blob
+        self._blob_start = blob_start
+
+    def __getitem__(self, index: int) -> bytes:
+        start = self._blob_start + self._offsets[index]
+        return self._blob[start:self._blob_start + self._offsets[index + 1]]
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+## A snapshot of receipts written by write_snapshot, served from a read-only
+## memory mapping of the file. Opening a snapshot only reads its header, so it
+## takes the same time for any amount of receipts, and each Receipt is only
+## built when it is retrieved.
+##
+class ReceiptSnapshot:
+    ## Map the snapshot at the given path.
+    ##
+    ## Parameters:
+    ##     path (str): the path of the snapshot file
+    ##
+    ## Raises:
+    ##     ValueError: if the file is not a snapshot
+    ##
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+        with open(path, 'rb') as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, flags, count, _item_count, last_id = (
+            HEADER.unpack_from(self._mmap)
+        )
+        if magic != MAGIC:
+            raise ValueError(f'Not a receipt snapshot: {path}')
+
+        self.points_only = bool(flags & FLAG_POINTS_ONLY)
+        self.last_id = last_id
+        self._count = count
+
+        view = memoryview(self._mmap)
+        self._columns = {}
+        self._starts = {}
+
+        for i, (name, typecode) in enumerate(COLUMNS):
+            offset, length = COLUMN.unpack_from(
+                self._mmap, HEADER.size + i * COLUMN.size
+            )
+            self._starts[name] = offset
+            self._columns[name] = view[offset:offset + length].cast(typecode)
+
+        self._numeric_ids = self._columns['numeric_ids']
+        self._other_ids = _SnapshotIds(self._columns['id_offsets'],
+                                       self._mmap, self._starts['id_blob'])
+
+    ## Find the position of the given id in the columns with a binary search
+    ## of the sorted ids. Sequential ids are searched among the 8-byte ints of
+    ## the numeric ids, where the search runs entirely in C.
+    ##
+    ## Parameters:
+    ##     id (str): the id to find
+    ##
+    ## Returns:
+    ##     An int for the position of the id or None if it isn't in the
+    ##     snapshot.
+    ##
+    def _find(self, id: str) -> int:
+        if type(id) is not str:
+            return None
+
+        numeric_id = _numeric_id(id)
+        if numeric_id is not None:
+            ids = self._numeric_ids
+            index = bisect_left(ids, numeric_id)
+            if index < len(ids) and ids[index] == numeric_id:
+                return index
+            return None
+
+        key = id.encode()
+        index = bisect_left(self._other_ids, key)
+        if index < len(self._other_ids) and self._other_ids[index] == key:
+            return len(self._numeric_ids) + index
+
+        return None
+
+    ## Read a string from a column of strings.
+    ##
+    ## Parameters:
+    ##     name (str): the name of the column without the "_offsets" suffix
+    ##     index (int): the position of the string in the column
+    ##
+    ## Returns:
+    ##     The decoded string.
+    ##
+    def _string(self, name: str, index: int) -> str:
+        offsets = self._columns[name + '_offsets']
+        start = self._starts[name + '_blob']
+        return self._mmap[start + offsets[index]:
+                          start + offsets[index + 1]].decode()
+
+    ## Retrieve the points of the receipt with the given id.
+    ##
+    ## Parameters:
+    ##     id (str): the id of the receipt
+    ##
+    ## Returns:
+    ##     An int for the points of the receipt or None if it isn't in the
+    ##     snapshot.
+    ##
+    def get_points(self, id: str) -> int:
+        index = self._find(id)
+        return self._columns['points'][index] if index is not None else None
+
+    ## Build the receipt with the given id from the columns.
+    ##
+    ## Parameters:
+    ##     id (str): the id of the receipt
+    ##
+    ## Raises:
+    ##     ValueError: if the snapshot only holds points
+    ##
+    ## Returns:
+    ##     A Receipt for the receipt or None if it isn't in the snapshot.
+    ##
+    def get_receipt(self, id: str) -> Receipt:
+        if self.points_only:
+            raise ValueError('Snapshot only holds points of receipts')
+
+        index = self._find(id)
+        if index is None:
+            return None
+
+        item_starts = self._columns['item_starts']
+        minutes = self._columns['minutes'][index]
+        hour, minute = divmod(minutes, 60)
+
+        return Receipt({
+            'retailer': self._string('retailer', index),
+            'purchaseDate': date.fromordinal(
+                self._columns['days'][index]
+            ).isoformat(),
+            'purchaseTime': f'{hour:02d}:{minute:02d}',
+            'total': format_cents(self._columns['total_cents'][index]),
+            'items': [
+                {
+                    'shortDescription': self._string('desc', item),
+                    'price': format_cents(self._columns['price_cents'][item])
+                }
+                for item in range(item_starts[index], item_starts[index + 1])
+            ]
+        })
+
+    ## Retrieve the value stored for the given id: the receipt, or its points
+    ## if the snapshot only holds points.
+    ##
+    ## Parameters:
+    ##     id (str): the id of the receipt
+    ##
+    ## Returns:
+    ##     A Receipt or an int for the value or None if the id isn't in the
+    ##     snapshot.
+    ##
+    def get(self, id: str) -> Receipt | int:
+        if self.points_only:
+            return self.get_points(id)
+
+        return self.get_receipt(id)
+
+    ## Iterate over the ids in the snapshot, with the sequential ids first in
+    ## numeric order.
+    ##
+    ## Returns:
+    ##     An iterator of strings for the ids.
+    ##
+    def ids(self) -> Iterator[str]:
+        yield from map(str, self._numeric_ids)
+
+        for i in range(len(self._other_ids)):
+            yield self._other_ids[i].decode()
+
+    def __contains__(self, id: any) -> bool:
+        return self._find(id) is not None
+
+    def __len__(self) -> int:
+        return self._count
+
+## A backend serving the receipts of a snapshot from its memory mapping, with
+## another backend layered on top for receipts stored after the snapshot.
+## Receipts in the snapshot that are replaced or removed are hidden, while the
+## snapshot itself is never modified.
+##
+class SnapshotReceiptStorage(ReceiptStorage):
+    ## Initialize member variables for the storage and continue allocating ids
+    ## after the largest id in the snapshot.
+    ##
+    ## Parameters:
+    ##     snapshot (ReceiptSnapshot): the snapshot to serve receipts from
+    ##     overlay (ReceiptStorage): the backend to store new receipts in
+    ##
+    def __init__(self, snapshot: ReceiptSnapshot,
+                 overlay: ReceiptStorage) -> None:
+        self.snapshot_file = snapshot
+        self.overlay = overlay
+        self._hidden = set()
+        overlay.reserve_ids(snapshot.last_id)
+
+    ## Allocate the next unique id for a receipt.
+    ##
+    ## Returns:
+    ##     A string for the unique id.
+    ##
+    def allocate_id(self) -> str:
+        return self.overlay.allocate_id()
+
+    ## Allocate the given amount of unique ids for receipts at once.
+    ##
+    ## Parameters:
+    ##     count (int): the amount of ids to allocate
+    ##
+    ## Returns:
+    ##     A list of strings for the unique ids.
+    ##
+    def allocate_ids(self, count: int) -> list[str]:
+        return self.overlay.allocate_ids(count)
+
+    ## Store the given receipts at once.
+    ##
+    ## Parameters:
+    ##     receipts (dict): a dict of ids to the receipts to store
+    ##
+    def update(self, receipts: dict) -> None:
+        self._hide(receipts)
+        self.overlay.update(receipts)
+
+    ## Store receipts restored from a journal, making sure that ids allocated
+    ## afterwards don't collide with the restored ids.
+    ##
+    ## Parameters:
+    ##     receipts (dict): a dict of ids to the receipts to store
+    ##
+    def load(self, receipts: dict) -> None:
+        self._hide(receipts)
+        self.overlay.load(receipts)
+
+    ## Make sure that ids allocated afterwards are larger than the given id.
+    ##
+    ## Parameters:
+    ##     last_id (int): the largest sequential id already in use
+    ##
+    def reserve_ids(self, last_id: int) -> None:
+        self.overlay.reserve_ids(last_id)
+
+    ## Retrieve the points of the receipt with the given id from the snapshot,
+    ## without building or scoring the receipt.
+    ##
+    ## Parameters:
+    ##     id (str): the unique id of the receipt
+    ##
+    ## Returns:
+    ##     An int for the points or None if the snapshot doesn't hold them.
+    ##
+    def get_stored_points(self, id: str) -> int:
+        if id in self._hidden:
+            return self.overlay.get_stored_points(id)
+
+        points = self.snapshot_file.get_points(id)
+        if points is None:
+            return self.overlay.get_stored_points(id)
+        return points
+
+    ## Check whether the receipt with the given id was evicted from the
+    ## backend layered on top of the snapshot.
+    ##
+    ## Parameters:
+    ##     id (str): the unique id of the receipt
+    ##
+    ## Returns:
+    ##     A bool for whether the receipt was evicted.
+    ##
+    def was_evicted(self, id: str) -> bool:
+        return id not in self and self.overlay.was_evicted(id)
+
+    ## Retrieve the statistics for evictions. Receipts are only evicted from
+    ## the backend layered on top of the snapshot, so the evictions and the
+    ## capacity are its own, while the size counts the receipts served from
+    ## the snapshot as well.
+    ##
+    ## Returns:
+    ##     A dict with the keys "evictions", "size", and "capacity" for the
+    ##     amount of evicted receipts, the amount of stored receipts, and the
+    ##     most receipts the backend on top of the snapshot holds (None if it
+    ##     is unbounded).
+    ##
+    def get_eviction_stats(self) -> dict:
+        return dict(self.overlay.get_eviction_stats(), size=len(self))
+
+    ## Copy every stored receipt, building the receipts of the snapshot.
+    ##
+    ## Returns:
+    ##     A list of (id, receipt) pairs for the stored receipts.
+    ##
+    def snapshot(self) -> list[tuple]:
+        hidden = set(self._hidden)
+        return [
+            (id, self.snapshot_file.get(id))
+            for id in self.snapshot_file.ids() if id not in hidden
+        ] + self.overlay.snapshot()
+
+    ## Hide the receipts in the snapshot with the given ids.
+    ##
+    ## Parameters:
+    ##     ids (Iterable[str]): the ids to hide
+    ##
+    def _hide(self, ids: Iterable[str]) -> None:
+        self._hidden.update(id for id in ids if id in self.snapshot_file)
+
+    ## Mapping protocol for looking up receipts by id.
+    ##
+    def get(self, id: str, default: any = None) -> any:
+        value = self.overlay.get(id)
+        if value is not None:
+            return value
+
+        if id not in self._hidden:
+            value = self.snapshot_file.get(id)
+        return value if value is not None else default
+
+    def __getitem__(self, id: str) -> Receipt | int:
+        value = self.get(id)
+        if value is None:
+            raise KeyError(id)
+        return value
+
+    def __setitem__(self, id: str, value: Receipt | int) -> None:
+        self._hide([id])
+        self.overlay[id] = value
+
+    def __delitem__(self, id: str) -> None:
+        if id in self.overlay:
+            self._hide([id])
+            del self.overlay[id]
+        elif id not in self._hidden and id in self.snapshot_file:
+            self._hidden.add(id)
+        else:
+            raise KeyError(id)
+
+    def __contains__(self, id: any) -> bool:
+        if id in self.overlay:
+            return True
+
+        return id not in self._hidden and id in self.snapshot_file
+
+    def __iter__(self) -> Iterator[str]:
+        hidden = set(self._hidden)
+        for id in self.snapshot_file.ids():
+            if id not in hidden:
+                yield id
+
+        yield from self.overlay
+
+    ## Iterate over the stored ids, reading the ids in the snapshot from its
+    ## memory mapping as they go before the ids stored since.
+    ##
+    ## Returns:
+    ##     An Iterator of strings for the ids.
+    ##
+    def iter_ids(self) -> Iterator[str]:
+        hidden = set(self._hidden)
+        for id in self.snapshot_file.ids():
+            if id not in hidden:
+                yield id
+
+        yield from self.overlay.iter_ids()
+
+    def __len__(self) -> int:
+        return len(self.snapshot_file) - len(self._hidden) + len(self.overlay)
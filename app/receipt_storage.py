@@ -0,0 +1,1294 @@
+from abc import abstractmethod
+from array import array
+from collections import OrderedDict
+from collections.abc import Iterable, Iterator, MutableMapping
+import itertools
+import json
+import os
+import sqlite3
+import threading
+
+from app.receipt import Receipt
+from app.receipt_journal import RECORD_ENCODER
+
+## The interface for a backend that stores receipts by their unique id. Each
+## backend behaves like a dict of ids to receipts and is responsible for
+## handing out ids that are unique across every user of the backend. Like
+## the MutableMapping it extends, it is an abstract base class.
+##
+class ReceiptStorage(MutableMapping):
+    # A function called with a dict of ids to the receipts a backend drops
+    # from memory, for backends that bound their memory.
+    on_evict = None
+
+    ## Allocate the next unique id for a receipt.
+    ##
+    ## Returns:
+    ##     A string for the unique id.
+    ##
+    @abstractmethod
+    def allocate_id(self) -> str:
+        pass
+
+    ## Allocate the given amount of unique ids for receipts at once.
+    ##
+    ## Parameters:
+    ##     count (int): the amount of ids to allocate
+    ##
+    ## Returns:
+    ##     A list of strings for the unique ids.
+    ##
+    def allocate_ids(self, count: int) -> list[str]:
+        return [self.allocate_id() for i in range(count)]
+
+    ## Retrieve the receipts that match the given ids at once.
+    ##
+    ## Parameters:
+    ##     ids (list[str]): the unique ids of the receipts to retrieve
+    ##
+    ## Returns:
+    ##     A dict of each id to the Receipt that matches it or None if no
+    ##     receipt was found.
+    ##
+    def get_many(self, ids: list[str]) -> dict:
+        return {id: self.get(id) for id in ids}
+
+    ## Copy every stored receipt at once, while other threads may keep
+    ## storing receipts.
+    ##
+    ## Returns:
+    ##     A list of (id, receipt) pairs for the stored receipts.
+    ##
+    def snapshot(self) -> list[tuple]:
+        return list(self.items())
+
+    ## Iterate over the stored ids while other threads may keep storing
+    ## receipts. Backends holding their ids in memory copy them first, which
+    ## only copies references, while backends in a file read them as they go.
+    ##
+    ## Returns:
+    ##     An Iterator of strings for the ids.
+    ##
+    def iter_ids(self) -> Iterator[str]:
+        return iter(list(self))
+
+    ## Store receipts restored from a journal or snapshot, making sure that
+    ## ids allocated afterwards don't collide with the restored ids.
+    ##
+    ## Parameters:
+    ##     receipts (dict): a dict of ids to the receipts to store
+    ##
+    @abstractmethod
+    def load(self, receipts: dict) -> None:
+        pass
+
+    ## Make sure that ids allocated afterwards are larger than the given id.
+    ##
+    ## Parameters:
+    ##     last_id (int): the largest sequential id already in use
+    ##
+    @abstractmethod
+    def reserve_ids(self, last_id: int) -> None:
+        pass
+
+    ## Retrieve the points the storage already holds for the receipt with the
+    ## given id, without scoring it.
+    ##
+    ## Parameters:
+    ##     id (str): the unique id of the receipt
+    ##
+    ## Returns:
+    ##     An int for the points or None if the storage doesn't hold them.
+    ##
+    def get_stored_points(self, id: str) -> int:
+        return None
+
+    ## Check whether the receipt with the given id was stored but has since
+    ## been evicted to stay within the capacity of the storage.
+    ##
+    ## Parameters:
+    ##     id (str): the unique id of the receipt
+    ##
+    ## Returns:
+    ##     A bool for whether the receipt was evicted.
+    ##
+    def was_evicted(self, id: str) -> bool:
+        return False
+
+    ## Retrieve the statistics for evictions from the storage.
+    ##
+    ## Returns:
+    ##     A dict with the keys "evictions", "size", and "capacity" for the
+    ##     amount of evicted receipts, the amount of stored receipts, and the
+    ##     most receipts the storage holds (None if it is unbounded).
+    ##
+    def get_eviction_stats(self) -> dict:
+        return {'evictions': 0, 'size': len(self), 'capacity': None}
+
+## Find the largest sequential id among the given ids.
+##
+## Parameters:
+##     ids (Iterable[str]): the ids to search
+##
+## Returns:
+##     An int for the largest id made of digits or 0 if there is none.
+##
+def last_sequential_id(ids: Iterable[str]) -> int:
+    return max(
+        (int(id) for id in ids if id.isascii() and id.isdigit()), default=0
+    )
+
+## A backend storing receipts in the memory of the current process. It is
+## safe to share between threads without locking: ids come from an atomic
+## counter and every lookup or write is a single dict operation.
+##
+class MemoryReceiptStorage(ReceiptStorage):
+    ## Initialize member variables for the storage.
+    ##
+    def __init__(self) -> None:
+        self._receipts = {}
+        self._ids = itertools.count(1)
+
+    ## Allocate the next unique id for a receipt.
+    ##
+    ## Returns:
+    ##     A string for the unique id.
+    ##
+    def allocate_id(self) -> str:
+        return str(next(self._ids))
+
+    ## Store the given receipts at once.
+    ##
+    ## Parameters:
+    ##     receipts (dict): a dict of ids to the receipts to store
+    ##
+    def update(self, receipts: dict) -> None:
+        self._receipts.update(receipts)
+
+    ## Copy every stored receipt at once. Copying the dict items never runs
+    ## Python code, so it can't interleave with other threads.
+    ##
+    ## Returns:
+    ##     A list of (id, receipt) pairs for the stored receipts.
+    ##
+    def snapshot(self) -> list[tuple]:
+        return list(self._receipts.items())
+
+    ## Store receipts restored from a journal or snapshot and continue
+    ## allocating ids after the largest restored id.
+    ##
+    ## Parameters:
+    ##     receipts (dict): a dict of ids to the receipts to store
+    ##
+    def load(self, receipts: dict) -> None:
+        self._receipts.update(receipts)
+        self.reserve_ids(last_sequential_id(self._receipts))
+
+    ## Make sure that ids allocated afterwards are larger than the given id.
+    ## Ids are reserved while restoring receipts, before the storage is shared
+    ## between threads.
+    ##
+    ## Parameters:
+    ##     last_id (int): the largest sequential id already in use
+    ##
+    def reserve_ids(self, last_id: int) -> None:
+        next_id = next(self._ids)
+        self._ids = itertools.count(max(next_id, last_id + 1))
+
+    ## Mapping protocol for looking up receipts by id.
+    ##
+    def get(self, id: str, default: any = None) -> any:
+        return self._receipts.get(id, default)
+
+    def __getitem__(self, id: str) -> Receipt:
+        return self._receipts[id]
+
+    def __setitem__(self, id: str, receipt: Receipt) -> None:
+        self._receipts[id] = receipt
+
+    def __delitem__(self, id: str) -> None:
+        del self._receipts[id]
+
+    def __contains__(self, id: any) -> bool:
+        return id in self._receipts
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._receipts)
+
+    def __len__(self) -> int:
+        return len(self._receipts)
+
+## A backend storing only the points of receipts in the memory of the current
+## process. Points for the sequential ids it allocates are packed into an array
+## of 8-byte ints indexed by id, while any other ids fall back to a dict.
+## Allocations and writes grow the array in several steps, so they hold a lock,
+## while lookups read the array without one.
+##
+class PackedPointsStorage(ReceiptStorage):
+    MISSING = -1
+
+    ## Initialize member variables for the storage.
+    ##
+    def __init__(self) -> None:
+        self._points = array('q')
+        self._other_points = {}
+        self._receipts_added = 0
+        self._stored = 0
+        self._write_lock = threading.Lock()
+        self._pid = os.getpid()
+
+    ## Allocate the next unique id for a receipt.
+    ##
+    ## Returns:
+    ##     A string for the unique id.
+    ##
+    def allocate_id(self) -> str:
+        with self._write_lock:
+            self._receipts_added += 1
+            return str(self._receipts_added)
+
+    ## Allocate the given amount of unique ids for receipts while holding the
+    ## lock once.
+    ##
+    ## Parameters:
+    ##     count (int): the amount of ids to allocate
+    ##
+    ## Returns:
+    ##     A list of strings for the unique ids.
+    ##
+    def allocate_ids(self, count: int) -> list[str]:
+        with self._write_lock:
+            first = self._receipts_added + 1
+            self._receipts_added += count
+
+        return [str(id) for id in range(first, first + count)]
+
+    ## Store the points of many receipts while holding the lock once.
+    ##
+    ## Parameters:
+    ##     points (dict): a dict of ids to the points to store
+    ##
+    def update(self, points: dict) -> None:
+        with self._write_lock:
+            for id, receipt_points in points.items():
+                self._set_points(id, receipt_points)
+
+    ## Copy the points of every stored receipt at once. In a forked child,
+    ## such as a background snapshot, the lock is replaced first, since it
+    ## may have been held by a thread that wasn't copied into the child.
+    ##
+    ## Returns:
+    ##     A list of (id, points) pairs for the stored receipts.
+    ##
+    def snapshot(self) -> list[tuple]:
+        if self._pid != os.getpid():
+            self._write_lock = threading.Lock()
+            self._pid = os.getpid()
+
+        with self._write_lock:
+            packed = self._points[:]
+            other = list(self._other_points.items())
+
+        return [
+            (str(index + 1), points)
+            for index, points in enumerate(packed) if points >= 0
+        ] + other
+
+    ## Store points restored from a journal or snapshot and continue
+    ## allocating ids after the largest restored id.
+    ##
+    ## Parameters:
+    ##     points (dict): a dict of ids to the points to store
+    ##
+    def load(self, points: dict) -> None:
+        self.reserve_ids(last_sequential_id(points))
+        self.update(points)
+
+    ## Make sure that ids allocated afterwards are larger than the given id.
+    ##
+    ## Parameters:
+    ##     last_id (int): the largest sequential id already in use
+    ##
+    def reserve_ids(self, last_id: int) -> None:
+        with self._write_lock:
+            self._receipts_added = max(self._receipts_added, last_id)
+
+    ## Find the index in the packed array for the given id.
+    ##
+    ## Parameters:
+    ##     id (any): the id to find the index for
+    ##
+    ## Returns:
+    ##     An int for the index of the id or None if the id isn't a sequential
+    ##     id allocated by this storage.
+    ##
+    def _index(self, id: any) -> int:
+        if type(id) is str and id.isascii() and id.isdigit() and id[0] != '0':
+            index = int(id) - 1
+            if index < self._receipts_added:
+                return index
+
+        return None
+
+    ## Store the points for the given id. The write lock must be held.
+    ##
+    ## Parameters:
+    ##     id (str): the id to store the points for
+    ##     points (int): the points to store
+    ##
+    def _set_points(self, id: str, points: int) -> None:
+        index = self._index(id)
+
+        if index is None or points < 0:
+            self._other_points[id] = points
+            return
+
+        if index == len(self._points):
+            self._points.append(points)
+            self._stored += 1
+            return
+
+        missing = index + 1 - len(self._points)
+        if missing > 0:
+            self._points.extend([self.MISSING] * missing)
+
+        if self._points[index] == self.MISSING:
+            self._stored += 1
+        self._points[index] = points
+
+    ## Mapping protocol for looking up points by id.
+    ##
+    def get(self, id: str, default: any = None) -> any:
+        index = self._index(id)
+
+        if index is None:
+            return self._other_points.get(id, default)
+        elif index < len(self._points) and self._points[index] >= 0:
+            return self._points[index]
+        else:
+            return default
+
+    def __getitem__(self, id: str) -> int:
+        points = self.get(id)
+        if points is None:
+            raise KeyError(id)
+        return points
+
+    def __setitem__(self, id: str, points: int) -> None:
+        with self._write_lock:
+            self._set_points(id, points)
+
+    def __delitem__(self, id: str) -> None:
+        with self._write_lock:
+            index = self._index(id)
+
+            if index is None:
+                del self._other_points[id]
+            elif index < len(self._points) and self._points[index] >= 0:
+                self._points[index] = self.MISSING
+                self._stored -= 1
+            else:
+                raise KeyError(id)
+
+    def __contains__(self, id: any) -> bool:
+        return self.get(id) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        for index, points in enumerate(self._points):
+            if points >= 0:
+                yield str(index + 1)
+
+        yield from list(self._other_points)
+
+    ## Iterate over the stored ids while other threads may keep storing
+    ## points. Packed points have no id objects to copy, so the array is read
+    ## by index as it grows and the ids are made as they go.
+    ##
+    ## Returns:
+    ##     An Iterator of strings for the ids.
+    ##
+    def iter_ids(self) -> Iterator[str]:
+        return iter(self)
+
+    def __len__(self) -> int:
+        return self._stored + len(self._other_points)
+
+## A backend storing receipts in a SQLite database file. The database runs in
+## WAL mode so that several processes (e.g. gunicorn workers) can share the
+## receipts and ids with concurrent readers.
+##
+class SqliteReceiptStorage(ReceiptStorage):
+    # Stay below the limit on host parameters in a statement for old versions.
+    MAX_QUERY_PARAMS = 500
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS receipts '
+        '(id TEXT PRIMARY KEY, data TEXT NOT NULL)',
+        'CREATE TABLE IF NOT EXISTS counters '
+        '(name TEXT PRIMARY KEY, value INTEGER NOT NULL)',
+        "INSERT OR IGNORE INTO counters VALUES ('receipt_id', 0)"
+    )
+
+    ## Initialize member variables for the storage and create the database
+    ## tables if they don't exist.
+    ##
+    ## Parameters:
+    ##     path (str): the path of the SQLite database file
+    ##     timeout (float): the seconds to wait for another process to release
+    ##                      a lock on the database
+    ##
+    def __init__(self, path: str, timeout: float = 5.0) -> None:
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+
+        conn = self._connection()
+        conn.execute('PRAGMA journal_mode=WAL')
+        with conn:
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+
+    ## Retrieve the connection to the database for the current thread,
+    ## opening a new one for new threads and forked processes.
+    ##
+    ## Returns:
+    ##     A Connection to the SQLite database.
+    ##
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout,
+                                   isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+
+        return conn
+
+    ## Allocate the next unique id for a receipt. The counter is shared by
+    ## every process using the database file.
+    ##
+    ## Returns:
+    ##     A string for the unique id.
+    ##
+    def allocate_id(self) -> str:
+        row = self._connection().execute(
+            "UPDATE counters SET value = value + 1 "
+            "WHERE name = 'receipt_id' RETURNING value"
+        ).fetchone()
+        return str(row[0])
+
+    ## Allocate the given amount of unique ids for receipts with a single
+    ## update of the shared counter.
+    ##
+    ## Parameters:
+    ##     count (int): the amount of ids to allocate
+    ##
+    ## Returns:
+    ##     A list of strings for the unique ids.
+    ##
+    def allocate_ids(self, count: int) -> list[str]:
+        if count == 0:
+            return []
+
+        row = self._connection().execute(
+            "UPDATE counters SET value = value + ? "
+            "WHERE name = 'receipt_id' RETURNING value", (count,)
+        ).fetchone()
+        return [str(id) for id in range(row[0] - count + 1, row[0] + 1)]
+
+    ## Store the given receipts in a single transaction.
+    ##
+    ## Parameters:
+    ##     receipts (dict): a dict of ids to the receipts to store
+    ##
+    ## Raises:
+    ##     IntegrityError: if an id is already in use by a different receipt
+    ##
+    def update(self, receipts: dict) -> None:
+        conn = self._connection()
+        rows = [(id, self._encode(receipt)) for id, receipt in receipts.items()]
+
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            self._insert(conn, rows)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    ## Insert the given rows, never replacing a stored receipt. Rows already
+    ## stored with the same data are skipped, since the same receipt may be
+    ## stored again under its content id or restored again from a journal.
+    ##
+    ## Parameters:
+    ##     conn (Connection): the connection to insert the rows with
+    ##     rows (list[tuple]): the (id, data) rows to insert
+    ##
+    ## Raises:
+    ##     IntegrityError: if an id is already in use by a different receipt
+    ##
+    def _insert(self, conn: sqlite3.Connection, rows: list[tuple]) -> None:
+        try:
+            conn.executemany('INSERT INTO receipts VALUES (?, ?)', rows)
+            return
+        except sqlite3.IntegrityError:
+            pass
+
+        # Rows inserted before the conflict are kept and skipped below, so
+        # this only runs when an id is reused.
+        for id, data in rows:
+            stored = conn.execute(
+                'SELECT data FROM receipts WHERE id = ?', (id,)
+            ).fetchone()
+            if stored is None:
+                conn.execute('INSERT INTO receipts VALUES (?, ?)', (id, data))
+            elif stored[0] != data:
+                raise sqlite3.IntegrityError(
+                    f'Receipt id already in use by a different receipt: {id}'
+                )
+
+    ## Retrieve the receipts that match the given ids with as few queries as
+    ## possible.
+    ##
+    ## Parameters:
+    ##     ids (list[str]): the unique ids of the receipts to retrieve
+    ##
+    ## Returns:
+    ##     A dict of each id to the Receipt that matches it or None if no
+    ##     receipt was found.
+    ##
+    def get_many(self, ids: list[str]) -> dict:
+        conn = self._connection()
+        receipts = dict.fromkeys(ids)
+        unique_ids = list(receipts)
+
+        for start in range(0, len(unique_ids), self.MAX_QUERY_PARAMS):
+            chunk = unique_ids[start:start + self.MAX_QUERY_PARAMS]
+            placeholders = ','.join('?' * len(chunk))
+            cursor = conn.execute(
+                f'SELECT id, data FROM receipts WHERE id IN ({placeholders})',
+                chunk
+            )
+
+            for id, data in cursor:
+                receipts[id] = self._decode(data)
+
+        return receipts
+
+    ## Copy every stored receipt with a single query.
+    ##
+    ## Returns:
+    ##     A list of (id, receipt) pairs for the stored receipts.
+    ##
+    def snapshot(self) -> list[tuple]:
+        cursor = self._connection().execute(
+            'SELECT id, data FROM receipts ORDER BY rowid'
+        )
+        return [(id, self._decode(data)) for id, data in cursor]
+
+    ## Store receipts restored from a journal or snapshot and move the shared
+    ## id counter past the largest restored id.
+    ##
+    ## Parameters:
+    ##     receipts (dict): a dict of ids to the receipts to store
+    ##
+    def load(self, receipts: dict) -> None:
+        self.update(receipts)
+        self.reserve_ids(last_sequential_id(receipts))
+
+    ## Move the shared id counter past the given id.
+    ##
+    ## Parameters:
+    ##     last_id (int): the largest sequential id already in use
+    ##
+    def reserve_ids(self, last_id: int) -> None:
+        self._connection().execute(
+            "UPDATE counters SET value = MAX(value, ?) "
+            "WHERE name = 'receipt_id'", (last_id,)
+        )
+
+    ## Serialize the receipt, or the points of a receipt for databases in
+    ## points-only mode, for storage in the database.
+    ##
+    ## Parameters:
+    ##     value (Receipt | int): the receipt or points to serialize
+    ##
+    ## Returns:
+    ##     A string of compact JSON for the receipt or points.
+    ##
+    def _encode(self, value: Receipt | int) -> str:
+        if isinstance(value, Receipt):
+            value = value.to_dict()
+
+        return RECORD_ENCODER.encode(value)
+
+    ## Deserialize a receipt, or the points of a receipt, stored in the
+    ## database.
+    ##
+    ## Parameters:
+    ##     data (str): the JSON for the receipt or points
+    ##
+    ## Returns:
+    ##     A Receipt for the stored receipt or an int for the stored points.
+    ##
+    def _decode(self, data: str) -> Receipt | int:
+        value = json.loads(data)
+        return Receipt(value) if isinstance(value, dict) else value
+
+    ## Mapping protocol for looking up receipts by id.
+    ##
+    def get(self, id: str, default: any = None) -> any:
+        row = self._connection().execute(
+            'SELECT data FROM receipts WHERE id = ?', (id,)
+        ).fetchone()
+        return self._decode(row[0]) if row is not None else default
+
+    def __getitem__(self, id: str) -> Receipt:
+        receipt = self.get(id)
+        if receipt is None:
+            raise KeyError(id)
+        return receipt
+
+    def __setitem__(self, id: str, receipt: Receipt) -> None:
+        self._insert(self._connection(), [(id, self._encode(receipt))])
+
+    def __delitem__(self, id: str) -> None:
+        cursor = self._connection().execute(
+            'DELETE FROM receipts WHERE id = ?', (id,)
+        )
+        if cursor.rowcount == 0:
+            raise KeyError(id)
+
+    def __contains__(self, id: any) -> bool:
+        row = self._connection().execute(
+            'SELECT 1 FROM receipts WHERE id = ?', (id,)
+        ).fetchone()
+        return row is not None
+
+    def __iter__(self) -> Iterator[str]:
+        cursor = self._connection().execute(
+            'SELECT id FROM receipts ORDER BY rowid'
+        )
+        return (row[0] for row in cursor)
+
+    ## Iterate over the stored ids from a cursor, so that only the ids read so
+    ## far are held in memory.
+    ##
+    ## Returns:
+    ##     An Iterator of strings for the ids.
+    ##
+    def iter_ids(self) -> Iterator[str]:
+        return iter(self)
+
+    def __len__(self) -> int:
+        return self._connection().execute(
+            'SELECT COUNT(*) FROM receipts'
+        ).fetchone()[0]
+
+## A backend holding at most a given amount of receipts in another backend,
+## evicting the least recently used receipts once it is full so that memory
+## stays flat under sustained ingest. Lookups mark a receipt as used without
+## a lock, while writes and evictions hold one. The ids of the most recently
+## evicted receipts are remembered, so that lookups can tell them apart from
+## ids that were never stored.
+##
+class LRUReceiptStorage(ReceiptStorage):
+    ## Initialize member variables for the storage.
+    ##
+    ## Parameters:
+    ##     capacity (int): the most receipts to hold
+    ##     storage (ReceiptStorage): the backend to hold the receipts in;
+    ##                               receipts are kept in memory if not given
+    ##     on_evict (callable): a function called with a dict of the ids of
+    ##                          evicted receipts to the receipts, while the
+    ##                          write lock is held and before they are
+    ##                          removed, if any
+    ##     evict_batch (int): the least amount of receipts to evict at once
+    ##                        when full, so that the eviction callback sees
+    ##                        fewer and larger batches
+    ##     evicted_limit (int): the most ids of evicted receipts to remember,
+    ##                          forgetting the oldest first; as many as the
+    ##                          capacity if not given
+    ##
+    ## Raises:
+    ##     ValueError: if capacity is less than 1, evict_batch is not between
+    ##                 1 and capacity, or evicted_limit is negative
+    ##
+    def __init__(self, capacity: int, storage: ReceiptStorage = None,
+                 on_evict: callable = None, evict_batch: int = 1,
+                 evicted_limit: int = None) -> None:
+        if capacity < 1:
+            raise ValueError('Receipt storage capacity must be at least 1')
+        if not 1 <= evict_batch <= capacity:
+            raise ValueError('Eviction batch must be between 1 and capacity')
+        if evicted_limit is not None and evicted_limit < 0:
+            raise ValueError('Evicted id limit must not be negative')
+
+        self.capacity = capacity
+        self.evict_batch = evict_batch
+        self.evicted_limit = (
+            capacity if evicted_limit is None else evicted_limit
+        )
+        self.storage = storage if storage is not None else (
+            MemoryReceiptStorage()
+        )
+        self.on_evict = on_evict
+        self._recency = OrderedDict()
+        self._evicted = OrderedDict()
+        self._evictions = 0
+        self._write_lock = threading.Lock()
+
+    ## Allocate the next unique id for a receipt.
+    ##
+    ## Returns:
+    ##     A string for the unique id.
+    ##
+    def allocate_id(self) -> str:
+        return self.storage.allocate_id()
+
+    ## Allocate the given amount of unique ids for receipts at once.
+    ##
+    ## Parameters:
+    ##     count (int): the amount of ids to allocate
+    ##
+    ## Returns:
+    ##     A list of strings for the unique ids.
+    ##
+    def allocate_ids(self, count: int) -> list[str]:
+        return self.storage.allocate_ids(count)
+
+    ## Store the given receipts at once, evicting the least recently used
+    ## receipts beyond the capacity.
+    ##
+    ## Parameters:
+    ##     receipts (dict): a dict of ids to the receipts to store
+    ##
+    def update(self, receipts: dict) -> None:
+        with self._write_lock:
+            self.storage.update(receipts)
+            self._track(receipts)
+
+    ## Retrieve the receipts that match the given ids at once, marking the
+    ## ones found as used.
+    ##
+    ## Parameters:
+    ##     ids (list[str]): the unique ids of the receipts to retrieve
+    ##
+    ## Returns:
+    ##     A dict of each id to the Receipt that matches it or None if no
+    ##     receipt was found.
+    ##
+    def get_many(self, ids: list[str]) -> dict:
+        receipts = self.storage.get_many(ids)
+
+        for id, receipt in receipts.items():
+            if receipt is not None:
+                self._use(id)
+
+        return receipts
+
+    ## Copy every stored receipt at once.
+    ##
+    ## Returns:
+    ##     A list of (id, receipt) pairs for the stored receipts.
+    ##
+    def snapshot(self) -> list[tuple]:
+        return self.storage.snapshot()
+
+    ## Store receipts restored from a journal or snapshot, keeping only the
+    ## most recently stored ones that fit, and continue allocating ids after
+    ## the largest restored id.
+    ##
+    ## Parameters:
+    ##     receipts (dict): a dict of ids to the receipts to store, from the
+    ##                      least to the most recently stored
+    ##
+    def load(self, receipts: dict) -> None:
+        kept = dict(list(receipts.items())[-self.capacity:])
+
+        with self._write_lock:
+            self.storage.load(kept)
+            self.storage.reserve_ids(last_sequential_id(receipts))
+            dropped = {
+                id: value for id, value in receipts.items() if id not in kept
+            }
+            self._notify(dropped)
+            self._remember_evicted(dropped)
+            self._track(kept)
+
+    ## Make sure that ids allocated afterwards are larger than the given id.
+    ##
+    ## Parameters:
+    ##     last_id (int): the largest sequential id already in use
+    ##
+    def reserve_ids(self, last_id: int) -> None:
+        self.storage.reserve_ids(last_id)
+
+    ## Retrieve the points the storage already holds for the receipt with the
+    ## given id, without scoring it.
+    ##
+    ## Parameters:
+    ##     id (str): the unique id of the receipt
+    ##
+    ## Returns:
+    ##     An int for the points or None if the storage doesn't hold them.
+    ##
+    def get_stored_points(self, id: str) -> int:
+        return self.storage.get_stored_points(id)
+
+    ## Check whether the receipt with the given id was stored but has since
+    ## been evicted. Receipts evicted before the most recent evicted_limit
+    ## evictions are forgotten and count as never stored.
+    ##
+    ## Parameters:
+    ##     id (str): the unique id of the receipt
+    ##
+    ## Returns:
+    ##     A bool for whether the receipt was evicted.
+    ##
+    def was_evicted(self, id: str) -> bool:
+        return id in self._evicted
+
+    ## Retrieve the statistics for evictions from the storage.
+    ##
+    ## Returns:
+    ##     A dict with the keys "evictions", "size", and "capacity" for the
+    ##     amount of evicted receipts, the amount of stored receipts, and the
+    ##     most receipts the storage holds.
+    ##
+    def get_eviction_stats(self) -> dict:
+        return {
+            'evictions': self._evictions,
+            'size': len(self._recency),
+            'capacity': self.capacity
+        }
+
+    ## Mark stored receipts as the most recently used and evict the least
+    ## recently used receipts beyond the capacity. The write lock must be
+    ## held.
+    ##
+    ## Parameters:
+    ##     receipts (dict): a dict of ids to the stored receipts
+    ##
+    def _track(self, receipts: dict) -> None:
+        for id in receipts:
+            self._recency[id] = None
+            self._recency.move_to_end(id)
+            # A receipt stored again after its eviction, such as one with a
+            # content id, is no longer evicted.
+            if self._evicted:
+                self._evicted.pop(id, None)
+
+        excess = len(self._recency) - self.capacity
+        if excess <= 0:
+            return
+
+        evicted_ids = [
+            self._recency.popitem(last=False)[0]
+            for i in range(max(excess, self.evict_batch))
+        ]
+
+        # Passed on while the receipts can still be read, so that lookups
+        # never miss a receipt that is moved elsewhere.
+        self._notify(self.storage.get_many(evicted_ids))
+        for id in evicted_ids:
+            del self.storage[id]
+
+        self._remember_evicted(evicted_ids)
+        self._evictions += len(evicted_ids)
+
+    ## Remember the ids of evicted receipts, forgetting the oldest ones
+    ## beyond the limit. The write lock must be held.
+    ##
+    ## Parameters:
+    ##     ids (Iterable[str]): the ids of the evicted receipts
+    ##
+    def _remember_evicted(self, ids: Iterable[str]) -> None:
+        if not self.evicted_limit:
+            return
+
+        for id in ids:
+            self._evicted[id] = None
+        while len(self._evicted) > self.evicted_limit:
+            self._evicted.popitem(last=False)
+
+    ## Mark the receipt with the given id as the most recently used. It may
+    ## be evicted by another thread at the same time, in which case it stays
+    ## evicted.
+    ##
+    ## Parameters:
+    ##     id (str): the unique id of the receipt
+    ##
+    def _use(self, id: str) -> None:
+        try:
+            self._recency.move_to_end(id)
+        except KeyError:
+            pass
+
+    ## Pass evicted receipts to the eviction callback, if any.
+    ##
+    ## Parameters:
+    ##     evicted (dict): a dict of the ids of the evicted receipts to the
+    ##                     receipts
+    ##
+    def _notify(self, evicted: dict) -> None:
+        if evicted and self.on_evict is not None:
+            self.on_evict(evicted)
+
+    ## Mapping protocol for looking up receipts by id.
+    ##
+    def get(self, id: str, default: any = None) -> any:
+        value = self.storage.get(id)
+        if value is None:
+            return default
+
+        self._use(id)
+        return value
+
+    def __getitem__(self, id: str) -> Receipt | int:
+        value = self.get(id)
+        if value is None:
+            raise KeyError(id)
+        return value
+
+    def __setitem__(self, id: str, value: Receipt | int) -> None:
+        self.update({id: value})
+
+    def __delitem__(self, id: str) -> None:
+        with self._write_lock:
+            del self.storage[id]
+            self._recency.pop(id, None)
+
+    def __contains__(self, id: any) -> bool:
+        return id in self._recency
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._recency))
+
+    def __len__(self) -> int:
+        return len(self._recency)
+
+## A backend keeping the most recently used receipts in memory and the rest in
+## a SQLite database file, for a large capacity with a small memory footprint.
+## Receipts are demoted to the file once the memory tier is full, and lookups
+## read through to the file and promote the receipts they find back into
+## memory. Receipts are demoted in batches, and promoted receipts stay in the
+## file, so demoting them again is free.
+## Ids are allocated from the counter in the file in blocks. Receipts in memory
+## are only written to the file once demoted or flushed, so each process keeps
+## its own memory tier.
+##
+class TieredReceiptStorage(ReceiptStorage):
+    DEFAULT_HOT_CAPACITY = 100000
+    ID_BLOCK = 1000
+    # Demote up to this many receipts at once, at most 1% of the memory tier,
+    # so that each write to the file is shared by many receipts.
+    DEMOTE_BATCH = 256
+
+    ## Initialize member variables for the storage.
+    ##
+    ## Parameters:
+    ##     hot_capacity (int): the most receipts to keep in memory
+    ##     cold (ReceiptStorage): the backend to demote receipts to
+    ##
+    ## Raises:
+    ##     ValueError: if hot_capacity is less than 1
+    ##
+    def __init__(self, hot_capacity: int, cold: ReceiptStorage) -> None:
+        # Receipts leaving memory are demoted rather than evicted, so their
+        # ids aren't remembered.
+        self.hot = LRUReceiptStorage(
+            hot_capacity, on_evict=self._demote,
+            evict_batch=max(1, min(self.DEMOTE_BATCH, hot_capacity // 100)),
+            evicted_limit=0
+        )
+        self.cold = cold
+        self._promoted = set()
+        self._free_ids = []
+        self._promotions = 0
+        self._demotions = 0
+        self._lock = threading.Lock()
+        self._id_lock = threading.Lock()
+
+    ## Allocate the next unique id for a receipt.
+    ##
+    ## Returns:
+    ##     A string for the unique id.
+    ##
+    def allocate_id(self) -> str:
+        return self.allocate_ids(1)[0]
+
+    ## Allocate the given amount of unique ids for receipts, reserving blocks
+    ## of ids from the file as needed.
+    ##
+    ## Parameters:
+    ##     count (int): the amount of ids to allocate
+    ##
+    ## Returns:
+    ##     A list of strings for the unique ids.
+    ##
+    def allocate_ids(self, count: int) -> list[str]:
+        with self._id_lock:
+            if len(self._free_ids) < count:
+                needed = count - len(self._free_ids)
+                self._free_ids.extend(
+                    self.cold.allocate_ids(max(needed, self.ID_BLOCK))
+                )
+
+            ids = self._free_ids[:count]
+            del self._free_ids[:count]
+            return ids
+
+    ## Store the given receipts in memory at once, demoting the least
+    ## recently used receipts beyond the capacity of the memory tier.
+    ##
+    ## Parameters:
+    ##     receipts (dict): a dict of ids to the receipts to store
+    ##
+    def update(self, receipts: dict) -> None:
+        with self._lock:
+            self._promoted.difference_update(receipts)
+            self.hot.update(receipts)
+
+    ## Retrieve the receipts that match the given ids at once, reading the
+    ## ones missing from memory from the file with as few queries as
+    ## possible and promoting them.
+    ##
+    ## Parameters:
+    ##     ids (list[str]): the unique ids of the receipts to retrieve
+    ##
+    ## Returns:
+    ##     A dict of each id to the Receipt that matches it or None if no
+    ##     receipt was found.
+    ##
+    def get_many(self, ids: list[str]) -> dict:
+        receipts = self.hot.get_many(ids)
+        missed_ids = [
+            id for id, receipt in receipts.items() if receipt is None
+        ]
+
+        if missed_ids:
+            found = {
+                id: receipt
+                for id, receipt in self.cold.get_many(missed_ids).items()
+                if receipt is not None
+            }
+            self._promote(found)
+            receipts.update(found)
+
+        return receipts
+
+    ## Copy every stored receipt, reading the file with a single query.
+    ##
+    ## Returns:
+    ##     A list of (id, receipt) pairs for the stored receipts.
+    ##
+    def snapshot(self) -> list[tuple]:
+        hot = self.hot.snapshot()
+        hot_ids = {id for id, _receipt in hot}
+        return [
+            (id, receipt) for id, receipt in self.cold.snapshot()
+            if id not in hot_ids
+        ] + hot
+
+    ## Store receipts restored from a journal or snapshot in the file, so that
+    ## restoring doesn't grow the memory tier, and continue allocating ids
+    ## after the largest restored id.
+    ##
+    ## Parameters:
+    ##     receipts (dict): a dict of ids to the receipts to store
+    ##
+    def load(self, receipts: dict) -> None:
+        self.cold.update(receipts)
+        self.reserve_ids(last_sequential_id(receipts))
+
+    ## Make sure that ids allocated afterwards are larger than the given id,
+    ## dropping reserved ids that aren't.
+    ##
+    ## Parameters:
+    ##     last_id (int): the largest sequential id already in use
+    ##
+    def reserve_ids(self, last_id: int) -> None:
+        with self._id_lock:
+            self.cold.reserve_ids(last_id)
+            self._free_ids = [
+                id for id in self._free_ids if int(id) > last_id
+            ]
+
+    ## Write every receipt that is only held in memory to the file, so that
+    ## the receipts survive a restart. The receipts stay in memory.
+    ##
+    def flush(self) -> None:
+        with self._lock:
+            self.cold.update({
+                id: receipt for id, receipt in self.hot.snapshot()
+                if id not in self._promoted
+            })
+            self._promoted.update(self.hot)
+
+    ## Retrieve the statistics for the tiers of the storage.
+    ##
+    ## Returns:
+    ##     A dict with the keys "hot_size" and "hot_capacity" for the amount
+    ##     of receipts in memory and the most receipts kept in memory, and
+    ##     "promotions" and "demotions" for the amount of receipts moved into
+    ##     and out of memory.
+    ##
+    def get_tier_stats(self) -> dict:
+        return {
+            'hot_size': len(self.hot),
+            'hot_capacity': self.hot.capacity,
+            'promotions': self._promotions,
+            'demotions': self._demotions
+        }
+
+    ## Move receipts read from the file into memory, unless another thread
+    ## already has.
+    ##
+    ## Parameters:
+    ##     found (dict): a dict of ids to the receipts read from the file
+    ##
+    def _promote(self, found: dict) -> None:
+        with self._lock:
+            promoted = {
+                id: receipt for id, receipt in found.items()
+                if id not in self.hot
+            }
+            self._promoted.update(promoted)
+            self.hot.update(promoted)
+            self._promotions += len(promoted)
+
+    ## Write receipts evicted from memory to the file, skipping promoted
+    ## receipts that the file still holds. Called by the memory tier while
+    ## the lock is held and before the receipts leave memory.
+    ##
+    ## Parameters:
+    ##     evicted (dict): a dict of ids to the evicted receipts
+    ##
+    def _demote(self, evicted: dict) -> None:
+        demoted = {
+            id: receipt for id, receipt in evicted.items()
+            if id not in self._promoted
+        }
+        self._promoted.difference_update(evicted)
+
+        if demoted:
+            self.cold.update(demoted)
+
+        self._demotions += len(evicted)
+        if self.on_evict is not None:
+            self.on_evict(evicted)
+
+    ## Mapping protocol for looking up receipts by id.
+    ##
+    def get(self, id: str, default: any = None) -> any:
+        value = self.hot.get(id)
+        if value is not None:
+            return value
+
+        value = self.cold.get(id)
+        if value is None:
+            return default
+
+        self._promote({id: value})
+        return value
+
+    def __getitem__(self, id: str) -> Receipt | int:
+        value = self.get(id)
+        if value is None:
+            raise KeyError(id)
+        return value
+
+    def __setitem__(self, id: str, value: Receipt | int) -> None:
+        self.update({id: value})
+
+    def __delitem__(self, id: str) -> None:
+        with self._lock:
+            found = id in self.hot
+            if found:
+                del self.hot[id]
+
+            if found and id not in self._promoted:
+                return
+
+            self._promoted.discard(id)
+            del self.cold[id]
+
+    def __contains__(self, id: any) -> bool:
+        return id in self.hot or id in self.cold
+
+    def __iter__(self) -> Iterator[str]:
+        promoted = set(self._promoted)
+        for id in self.hot:
+            if id not in promoted:
+                yield id
+
+        yield from self.cold
+
+    ## Iterate over the stored ids, copying the ids of the memory tier and
+    ## reading the ids in the file as they go. Receipts demoted while the ids
+    ## are read may be seen in both tiers.
+    ##
+    ## Returns:
+    ##     An Iterator of strings for the ids.
+    ##
+    def iter_ids(self) -> Iterator[str]:
+        promoted = set(self._promoted)
+        for id in self.hot.iter_ids():
+            if id not in promoted:
+                yield id
+
+        yield from self.cold.iter_ids()
+
+    def __len__(self) -> int:
+        return len(self.hot) - len(self._promoted) + len(self.cold)
+
+## Create the storage backend with the given kind.
+##
+## Parameters:
+##     kind (str): "memory" for in-process storage, "sqlite" for storage
+##                 shared through a SQLite database file, or "tiered" for
+##                 recent receipts in memory and the rest in a SQLite file
+##     path (str): the path of the database file for "sqlite" and "tiered"
+##                 storage
+##     points_only (bool): whether the storage only has to hold the points of
+##                         receipts, which packs "memory" storage into an array
+##     capacity (int): the most receipts "memory" storage holds before it
+##                     evicts the least recently used ones (it is unbounded
+##                     if not given), or the most receipts "tiered" storage
+##                     keeps in memory
+##
+## Raises:
+##     ValueError: if kind is not a supported backend, a path is required but
+##                 not given, or a capacity is given for "sqlite" storage
+##
+## Returns:
+##     A ReceiptStorage of the given kind.
+##
+def create_storage(kind: str = 'memory', path: str = None,
+                   points_only: bool = False,
+                   capacity: int = None) -> ReceiptStorage:
+    if capacity is not None and kind == 'sqlite':
+        raise ValueError('SQLite receipt storage has no capacity')
+
+    if kind == 'memory' and capacity is not None:
+        # The packed array never shrinks, so evicted points are kept in a dict.
+        return LRUReceiptStorage(capacity)
+    elif kind == 'memory' and points_only:
+        return PackedPointsStorage()
+    elif kind == 'memory':
+        return MemoryReceiptStorage()
+    elif kind == 'sqlite':
+        if path is None:
+            raise ValueError('SQLite receipt storage requires a path')
+        return SqliteReceiptStorage(path)
+    elif kind == 'tiered':
+        if path is None:
+            raise ValueError('Tiered receipt storage requires a path')
+        if capacity is None:
+            capacity = TieredReceiptStorage.DEFAULT_HOT_CAPACITY
+        return TieredReceiptStorage(capacity, SqliteReceiptStorage(path))
+    else:
+        raise ValueError(f'Unknown receipt storage: {kind}')
@@ -0,0 +1,217 @@
+from collections.abc import Iterator
+import csv
+import io
+import json
+from typing import BinaryIO
+import zlib
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+CSV_MIMETYPE = 'text/csv'
+EXPORT_FORMATS = ('ndjson', 'csv')
+RESULT_ENCODER = json.JSONEncoder(separators=(',', ':'))
+CSV_COLUMNS = (
+    'id', 'retailer', 'purchaseDate', 'purchaseTime', 'total', 'items',
+    'points'
+)
+
+## Read the lines of a stream one at a time, so that only one line is held in
+## memory however long the stream is. Lines longer than the limit are skipped
+## without being held in memory.
+##
+## Parameters:
+##     stream (BinaryIO): the stream to read, such as the body of a request
+##     line_limit (int): the most bytes in a line, not counting its newline
+##
+## Returns:
+##     An Iterator of the bytes of each line without its newline, or None for
+##     a line longer than the limit.
+##
+def read_lines(stream: BinaryIO,
+               line_limit: int) -> Iterator[bytes | None]:
+    # Reading a line from a raw stream, like the body of a request, reads
+    # one byte at a time.
+    if isinstance(stream, io.RawIOBase):
+        stream = io.BufferedReader(stream)
+
+    while True:
+        line = stream.readline(line_limit + 2)
+        if not line:
+            return
+
+        if line.endswith(b'\n'):
+            line = line[:-1]
+        elif len(line) > line_limit:
+            _skip_line(stream, line_limit)
+            yield None
+            continue
+
+        if line.endswith(b'\r'):
+            line = line[:-1]
+
+        yield None if len(line) > line_limit else line
+
+## Read a stream until the end of the current line.
+##
+## Parameters:
+##     stream (BinaryIO): the stream to read
+##     chunk_size (int): the most bytes to read at once
+##
+def _skip_line(stream: BinaryIO, chunk_size: int) -> None:
+    while True:
+        chunk = stream.readline(chunk_size)
+        if not chunk or chunk.endswith(b'\n'):
+            return
+
+## Store the receipt on each line of newline-delimited JSON as the line is
+## read, and produce the result for it right away. Blank lines are skipped.
+##
+## Parameters:
+##     receipt_db (any): the ReceiptDatabase or ShardedReceiptDatabase to
+##                       store the receipts in
+##     lines (Iterator[bytes | None]): the lines, as produced by read_lines
+##     line_limit (int): the most bytes in a line, for the error of longer
+##                       lines
+##     on_error (callable): the function called without arguments for each
+##                          rejected receipt, if any
+##
+## Returns:
+##     An Iterator of the bytes of a line of JSON for each receipt, which is
+##     an object with either the "id" of the stored receipt or the "error"
+##     rejecting it.
+##
+def ingest_lines(receipt_db: any, lines: Iterator[bytes | None],
+                 line_limit: int,
+                 on_error: callable = None) -> Iterator[bytes]:
+    for line in lines:
+        if line is not None and not line.strip():
+            continue
+
+        try:
+            if line is None:
+                raise ValueError(
+                    f'Receipt must not be longer than {line_limit} bytes'
+                )
+
+            receipt_data = json.loads(line)
+            if not isinstance(receipt_data, dict):
+                raise ValueError('Receipt must be a JSON object')
+
+            result = {'id': receipt_db.add_receipt(receipt_data)}
+        except UnicodeDecodeError as err:
+            result = {'error': str(err)}
+        except (ValueError, KeyError) as err:
+            result = {'error': str(err.args[0])}
+        except Exception as err:
+            result = {'error': repr(err)}
+
+        if on_error is not None and 'error' in result:
+            on_error()
+
+        yield (RESULT_ENCODER.encode(result) + '\n').encode()
+
+## Format exported receipts as lines of newline-delimited JSON.
+##
+## Parameters:
+##     rows (Iterator[tuple]): the (id, receipt, points) tuples produced by
+##                             the export of a database
+##
+## Returns:
+##     An Iterator of a string for the line of each receipt, which is an
+##     object with its "id", the keys of its receipt data, and its "points".
+##     Receipts without their data, in points-only mode, only have the "id"
+##     and "points" keys.
+##
+def ndjson_lines(rows: Iterator[tuple]) -> Iterator[str]:
+    for id, receipt, points in rows:
+        record = {'id': id}
+        if receipt is not None:
+            record.update(receipt.to_dict())
+        record['points'] = points
+
+        yield RESULT_ENCODER.encode(record) + '\n'
+
+## Format exported receipts as lines of CSV after a header line. The items of
+## each receipt are a JSON array in a single column.
+##
+## Parameters:
+##     rows (Iterator[tuple]): the (id, receipt, points) tuples produced by
+##                             the export of a database
+##     points_only (bool): whether the receipts have only their points, in
+##                         which case only the "id" and "points" columns are
+##                         written
+##
+## Returns:
+##     An Iterator of a string for each line of CSV.
+##
+def csv_lines(rows: Iterator[tuple],
+              points_only: bool = False) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def line(values: list) -> str:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow(values)
+        return buffer.getvalue()
+
+    if points_only:
+        yield line(('id', 'points'))
+        for id, _receipt, points in rows:
+            yield line((id, points))
+        return
+
+    yield line(CSV_COLUMNS)
+    for id, receipt, points in rows:
+        receipt_data = receipt.to_dict()
+        yield line((
+            id, receipt_data['retailer'], receipt_data['purchaseDate'],
+            receipt_data['purchaseTime'], receipt_data['total'],
+            RESULT_ENCODER.encode(receipt_data['items']), points
+        ))
+
+## Join lines into chunks of about the given size, so that a streamed
+## response is written in a few large chunks instead of one per line.
+##
+## Parameters:
+##     lines (Iterator[str]): the lines to join
+##     chunk_size (int): the fewest bytes in each chunk but the last
+##
+## Returns:
+##     An Iterator of the bytes of each chunk.
+##
+def join_chunks(lines: Iterator[str],
+                chunk_size: int = 65536) -> Iterator[bytes]:
+    chunk = []
+    size = 0
+
+    for line in lines:
+        chunk.append(line)
+        size += len(line)
+
+        if size >= chunk_size:
+            yield ''.join(chunk).encode()
+            chunk = []
+            size = 0
+
+    if chunk:
+        yield ''.join(chunk).encode()
+
+## Compress chunks into a gzip stream as they are produced. Each chunk is
+## flushed, so a client can decompress everything sent so far.
+##
+## Parameters:
+##     chunks (Iterator[bytes]): the chunks to compress
+##     level (int): the compression level, from 1 for the fastest to 9 for
+##                  the smallest
+##
+## Returns:
+##     An Iterator of the bytes of each compressed chunk.
+##
+def gzip_chunks(chunks: Iterator[bytes], level: int = 6) -> Iterator[bytes]:
+    # The extra 16 in wbits writes a gzip header and trailer.
+    compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+    for chunk in chunks:
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    yield compressor.flush()
@@ -0,0 +1,299 @@
+import bisect
+import threading
+import time
+
+from flask import Flask, Response, request
+
+from app.striped_counter import StripedCounter
+
+METRICS_MIMETYPE = 'text/plain; version=0.0.4; charset=utf-8'
+REQUEST_START_KEY = 'receipt_processor.request_start'
+
+## A histogram of observed values, counted in fixed buckets so that observing
+## a value is a binary search and two additions under a lock.
+##
+class Histogram:
+    # Upper bounds in seconds, from 100us to 10s, for request latencies.
+    BUCKETS = (
+        0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+        0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+    )
+
+    ## Initialize member variables for the histogram.
+    ##
+    ## Parameters:
+    ##     buckets (tuple): the upper bounds of the buckets, in increasing
+    ##                      order
+    ##
+    def __init__(self, buckets: tuple = BUCKETS) -> None:
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        # The last count is for values above every bucket.
+        self._counts = [0] * (len(buckets) + 1)
+        self._sum = 0.0
+
+    ## Count the given value in its bucket.
+    ##
+    ## Parameters:
+    ##     value (float): the value to count
+    ##
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    ## Copy the counts of the histogram at once.
+    ##
+    ## Returns:
+    ##     A tuple containing a list of the cumulative count of each bucket
+    ##     followed by the total count, and a float for the sum of every
+    ##     observed value.
+    ##
+    def snapshot(self) -> tuple:
+        with self._lock:
+            counts = self._counts[:]
+            total = self._sum
+
+        cumulative = []
+        count = 0
+        for bucket_count in counts:
+            count += bucket_count
+            cumulative.append(count)
+
+        return cumulative, total
+
+## Metrics for the requests handled by the application and the database they
+## are served from, rendered in the Prometheus text format. A histogram of
+## latencies is kept for each route, method, and status code, which is a
+## bounded set since routes are labeled by their rule rather than their path.
+##
+class RequestMetrics:
+    ERROR_STAGES = ('parse', 'score')
+
+    ## Initialize member variables for the metrics.
+    ##
+    ## Parameters:
+    ##     receipt_db (any): the ReceiptDatabase or ShardedReceiptDatabase to
+    ##                       report the size and cache statistics of
+    ##
+    def __init__(self, receipt_db: any) -> None:
+        self.receipt_db = receipt_db
+        # The StageTimer whose histograms are rendered along with the
+        # metrics, if stages are timed.
+        self.stage_timer = None
+        self._latencies = {}
+        self._errors = {stage: StripedCounter() for stage in self.ERROR_STAGES}
+
+    ## Record the latency of a handled request.
+    ##
+    ## Parameters:
+    ##     route (str): the rule of the route that handled the request
+    ##     method (str): the HTTP method of the request
+    ##     status (int): the response code
+    ##     seconds (float): the seconds taken to handle the request
+    ##
+    def observe(self, route: str, method: str, status: int,
+                seconds: float) -> None:
+        key = (route, method, status)
+        histogram = self._latencies.get(key)
+        if histogram is None:
+            histogram = self._latencies.setdefault(key, Histogram())
+
+        histogram.observe(seconds)
+
+    ## Count receipts that failed at the given stage.
+    ##
+    ## Parameters:
+    ##     stage (str): "parse" for receipts that couldn't be parsed or
+    ##                  "score" for receipts that couldn't be scored
+    ##     amount (int): the amount of failed receipts
+    ##
+    def count_errors(self, stage: str, amount: int = 1) -> None:
+        if amount:
+            self._errors[stage].add(amount)
+
+    ## Render every metric in the Prometheus text format.
+    ##
+    ## Returns:
+    ##     A string for the metrics.
+    ##
+    def render(self) -> str:
+        lines = []
+
+        def metric(name: str, kind: str, help: str, samples: list) -> None:
+            lines.append(f'# HELP {name} {help}')
+            lines.append(f'# TYPE {name} {kind}')
+            for suffix, labels, value in samples:
+                lines.append(f'{name}{suffix}{_labels(labels)} {value}')
+
+        latencies = sorted(
+            (key, histogram.snapshot())
+            for key, histogram in list(self._latencies.items())
+        )
+        metric('receipt_http_requests_total', 'counter',
+               'Requests handled, by route, method, and status code.', [
+                   ('', _request_labels(key), counts[-1])
+                   for key, (counts, _total) in latencies
+               ])
+
+        duration_samples = []
+        for key, snapshot in latencies:
+            duration_samples.extend(_histogram_samples(
+                _request_labels(key), Histogram.BUCKETS, snapshot
+            ))
+        metric('receipt_http_request_duration_seconds', 'histogram',
+               'Seconds taken to handle requests, by route, method, and '
+               'status code.', duration_samples)
+
+        if self.stage_timer is not None:
+            stage_samples = []
+            for stage, histogram in self.stage_timer.histograms.items():
+                stage_samples.extend(_histogram_samples(
+                    [('stage', stage)], histogram.buckets,
+                    histogram.snapshot()
+                ))
+            metric('receipt_stage_duration_seconds', 'histogram',
+                   'Seconds spent in each stage of handling requests, '
+                   'leaving out nested stages.', stage_samples)
+
+        metric('receipt_errors_total', 'counter',
+               'Receipts rejected while parsing or failed while scoring.', [
+                   ('', [('stage', stage)], counter.value())
+                   for stage, counter in self._errors.items()
+               ])
+
+        eviction_stats = self.receipt_db.get_eviction_stats()
+        metric('receipt_store_size', 'gauge', 'Receipts stored.',
+               [('', [], eviction_stats['size'])])
+        metric('receipt_store_evictions_total', 'counter',
+               'Receipts evicted to stay within the storage capacity.',
+               [('', [], eviction_stats['evictions'])])
+
+        cache_stats = self.receipt_db.get_cache_stats()
+        lookups = cache_stats['hits'] + cache_stats['misses']
+        metric('receipt_points_cache_hits_total', 'counter',
+               'Lookups of points served without scoring the receipt.',
+               [('', [], cache_stats['hits'])])
+        metric('receipt_points_cache_misses_total', 'counter',
+               'Lookups of points that scored the receipt.',
+               [('', [], cache_stats['misses'])])
+        metric('receipt_points_cache_hit_ratio', 'gauge',
+               'Share of lookups of points served without scoring.',
+               [('', [], repr(cache_stats['hits'] / lookups if lookups
+                              else 0.0))])
+        metric('receipt_points_cache_size', 'gauge',
+               'Receipts with cached points.',
+               [('', [], cache_stats['size'])])
+
+        return '\n'.join(lines) + '\n'
+
+## Build the samples of a histogram for the Prometheus text format.
+##
+## Parameters:
+##     labels (list): (name, value) pairs for the labels of the histogram
+##     buckets (tuple): the upper bounds of the buckets of the histogram
+##     snapshot (tuple): the cumulative counts and sum of the histogram, as
+##                       produced by Histogram.snapshot
+##
+## Returns:
+##     A list of (suffix, labels, value) tuples for the samples.
+##
+def _histogram_samples(labels: list, buckets: tuple,
+                       snapshot: tuple) -> list:
+    counts, total = snapshot
+    samples = [
+        ('_bucket', labels + [('le', le)], count)
+        for le, count in zip([*map(repr, buckets), '+Inf'], counts)
+    ]
+    samples.append(('_sum', labels, repr(total)))
+    samples.append(('_count', labels, counts[-1]))
+    return samples
+
+## Format labels for a sample in the Prometheus text format.
+##
+## Parameters:
+##     labels (list): (name, value) pairs for the labels
+##
+## Returns:
+##     A string for the labels in braces, or an empty string if there are
+##     none.
+##
+def _labels(labels: list) -> str:
+    if not labels:
+        return ''
+
+    return '{' + ','.join(
+        f'{name}="{_escape(str(value))}"' for name, value in labels
+    ) + '}'
+
+## Escape a label value for the Prometheus text format.
+##
+## Parameters:
+##     value (str): the label value
+##
+## Returns:
+##     A string for the escaped value.
+##
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace(
+        '\n', '\\n'
+    )
+
+## Build the labels of a request from its key in the latencies.
+##
+## Parameters:
+##     key (tuple): the route, method, and status code of the request
+##
+## Returns:
+##     A list of (name, value) pairs for the labels.
+##
+def _request_labels(key: tuple) -> list:
+    route, method, status = key
+    return [('route', route), ('method', method), ('status', status)]
+
+## Time every request handled by the application and serve the metrics on
+## /metrics. Requests are timed from when the application receives them until
+## their response is ready, so the body of a streamed response isn't
+## included. Requests that match no route are labeled with the route
+## "unmatched".
+##
+## Parameters:
+##     app (Flask): the application to instrument
+##     metrics (RequestMetrics): the metrics to record requests in
+##
+def instrument_app(app: Flask, metrics: RequestMetrics) -> None:
+    wsgi_app = app.wsgi_app
+
+    # The start time is kept in the WSGI environment rather than in g, since
+    # each read through a Flask context proxy costs about a microsecond.
+    def timed_wsgi_app(environ: dict, start_response: callable) -> any:
+        environ[REQUEST_START_KEY] = time.perf_counter()
+        return wsgi_app(environ, start_response)
+
+    app.wsgi_app = timed_wsgi_app
+
+    @app.after_request
+    def record_request(response: Response) -> Response:
+        current_request = request._get_current_object()
+        start = current_request.environ.get(REQUEST_START_KEY)
+
+        if start is not None:
+            rule = current_request.url_rule
+            metrics.observe(
+                rule.rule if rule is not None else 'unmatched',
+                current_request.method, response.status_code,
+                time.perf_counter() - start
+            )
+
+        return response
+
+    ## Retrieve every metric in the Prometheus text format.
+    ##
+    ## Returns:
+    ##     A Response containing the metrics.
+    ##
+    @app.route("/metrics")
+    def get_metrics() -> Response:
+        return Response(metrics.render(), content_type=METRICS_MIMETYPE)
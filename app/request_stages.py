@@ -0,0 +1,64 @@
+import functools
+import threading
+import time
+
+STAGES = ('parse', 'validate', 'items', 'store', 'lookup', 'score')
+
+# The stage times of the request being timed by each thread, if any.
+_current = threading.local()
+
+## Time a function as the given stage of the request being timed by the
+## current thread. Time spent in stages nested inside it is left out, so that
+## the stages of a request add up to the time spent in all of them. Outside
+## of timed requests, calls only check that no request is being timed.
+##
+## Parameters:
+##     stage (str): the stage to add the time of each call to
+##
+## Returns:
+##     A callable decorating the function to time.
+##
+def timed_stage(stage: str) -> callable:
+    def decorate(func: callable) -> callable:
+        @functools.wraps(func)
+        def timed(*args, **kwargs) -> any:
+            stages = getattr(_current, 'stages', None)
+            if stages is None:
+                return func(*args, **kwargs)
+
+            outer_nested = _current.nested
+            _current.nested = 0.0
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                stages[stage] = (stages.get(stage, 0.0) + elapsed
+                                 - _current.nested)
+                _current.nested = outer_nested + elapsed
+
+        return timed
+
+    return decorate
+
+## Start timing the stages of a request in the current thread.
+##
+def start_stages() -> None:
+    _current.stages = {}
+    _current.nested = 0.0
+    _current.start = time.perf_counter()
+
+## Stop timing the stages of the request of the current thread.
+##
+## Returns:
+##     A tuple containing a dict of each stage that ran to its seconds and
+##     a float for the seconds since timing started, or None if no request
+##     was being timed.
+##
+def stop_stages() -> tuple:
+    stages = getattr(_current, 'stages', None)
+    if stages is None:
+        return None
+
+    _current.stages = None
+    return stages, time.perf_counter() - _current.start
@@ -0,0 +1,83 @@
+import os
+import signal
+import threading
+
+from app.receipt_database import ReceiptDatabase
+
+## Start background snapshots of the database on a schedule, from a daemon
+## thread. A snapshot is skipped when the previous one is still running.
+##
+## Parameters:
+##     receipt_db (ReceiptDatabase): the database to snapshot, which must have
+##                                   a snapshot path
+##     interval (float): the seconds between snapshots
+##
+## Returns:
+##     An Event that stops the schedule when set.
+##
+def schedule_snapshots(receipt_db: ReceiptDatabase,
+                       interval: float) -> threading.Event:
+    stop = threading.Event()
+
+    def run_schedule() -> None:
+        while not stop.wait(interval):
+            receipt_db.start_background_snapshot()
+
+    threading.Thread(target=run_schedule, daemon=True).start()
+    return stop
+
+## Start a background snapshot of the database when the process receives one
+## of the given signals, then pass the signal on to the handler that was
+## installed before. If that handler was the default one, the signal is
+## delivered again with the default handler, which ends the process while the
+## forked child finishes writing the snapshot. Must be called from the main
+## thread.
+##
+## Parameters:
+##     receipt_db (ReceiptDatabase): the database to snapshot, which must have
+##                                   a snapshot path
+##     signals (tuple): the signals to snapshot on
+##
+def snapshot_on_signals(receipt_db: ReceiptDatabase,
+                        signals: tuple = (signal.SIGINT,
+                                          signal.SIGTERM)) -> None:
+    previous_handlers = {}
+
+    def handle_signal(signum: int, frame: any) -> None:
+        receipt_db.start_background_snapshot()
+        previous = previous_handlers[signum]
+
+        if callable(previous):
+            previous(signum, frame)
+        elif previous == signal.SIG_DFL:
+            signal.signal(signum, signal.SIG_DFL)
+            os.kill(os.getpid(), signum)
+
+    for signum in signals:
+        previous_handlers[signum] = signal.signal(signum, handle_signal)
+
+## Set up the snapshot triggers described by the given settings, which use the
+## names of the application config without the "FLASK_" prefix. Signal
+## handlers are only installed from the main thread.
+##
+## Parameters:
+##     receipt_db (ReceiptDatabase): the database to snapshot
+##     config (dict): the settings for the snapshots
+##
+## Raises:
+##     ValueError: if a trigger is enabled but the database has no snapshot
+##                 path
+##
+def configure_snapshot_triggers(receipt_db: ReceiptDatabase,
+                                config: dict) -> None:
+    interval = config.get('RECEIPT_SNAPSHOT_INTERVAL')
+    on_signal = config.get('RECEIPT_SNAPSHOT_ON_SIGNAL', False)
+
+    if (interval or on_signal) and receipt_db.snapshot_path is None:
+        raise ValueError('Snapshot triggers require a snapshot path')
+
+    if interval:
+        schedule_snapshots(receipt_db, interval)
+
+    if on_signal and threading.current_thread() is threading.main_thread():
+        snapshot_on_signals(receipt_db)
@@ -0,0 +1,209 @@
+import logging
+import threading
+
+from flask import Flask, Request, Response, request
+
+from app import receipt_database
+from app.receipt import Receipt
+from app.receipt_database import ReceiptDatabase, ShardedReceiptDatabase
+from app.request_metrics import Histogram
+from app.request_stages import (
+    STAGES, start_stages, stop_stages, timed_stage
+)
+
+# Upper bounds in seconds, from 10us to 10s, since a stage often takes less
+# than the shortest request.
+STAGE_BUCKETS = (0.00001, 0.000025, 0.00005) + Histogram.BUCKETS
+
+# The functions timed for each stage, as (stage, owner, name) for the
+# attribute holding the function. Scoring is looked up from the database
+# module, which imports score_receipt and score_receipts by name.
+STAGE_FUNCTIONS = (
+    ('validate', Receipt, '__init__'),
+    ('items', Receipt, '_parse_purchased_items'),
+    ('store', ReceiptDatabase, 'add_receipt'),
+    ('store', ReceiptDatabase, 'add_receipts'),
+    ('store', ShardedReceiptDatabase, 'add_receipt'),
+    ('store', ShardedReceiptDatabase, 'add_receipts'),
+    ('lookup', ReceiptDatabase, 'get_points'),
+    ('lookup', ReceiptDatabase, 'get_receipts_points'),
+    ('lookup', ShardedReceiptDatabase, 'get_points'),
+    ('lookup', ShardedReceiptDatabase, 'get_receipts_points'),
+    ('score', receipt_database, 'score_receipt'),
+    ('score', receipt_database, 'score_receipts')
+)
+
+_install_lock = threading.Lock()
+# The amount of installs not yet uninstalled, and the original functions
+# while the stage functions are wrapped.
+_installs = 0
+_originals = []
+
+## Wrap the functions of every stage so that they are timed during requests
+## timed by a StageTimer. Until the first install, and after the last one is
+## uninstalled, the functions are left unwrapped and cost nothing extra.
+## While installed, calls outside of timed requests only check that no
+## request is being timed.
+##
+def install_stage_functions() -> None:
+    global _installs
+
+    with _install_lock:
+        _installs += 1
+        if _installs > 1:
+            return
+
+        for stage, owner, name in STAGE_FUNCTIONS:
+            func = owner.__dict__[name]
+            _originals.append((owner, name, func))
+            setattr(owner, name, timed_stage(stage)(func))
+
+## Undo an install of the stage functions, restoring the original functions
+## once every install is undone.
+##
+def uninstall_stage_functions() -> None:
+    global _installs
+
+    with _install_lock:
+        if _installs == 0:
+            return
+
+        _installs -= 1
+        if _installs > 0:
+            return
+
+        for owner, name, func in _originals:
+            setattr(owner, name, func)
+        _originals.clear()
+
+## A request class that times parsing its JSON body as the parse stage.
+##
+class TimedRequest(Request):
+    get_json = timed_stage('parse')(Request.get_json)
+
+## Times each stage of the requests handled by an application, recording the
+## times in a histogram per stage and passing them to any added hooks.
+## Requests slower than the threshold are logged with the time of each stage.
+##
+class StageTimer:
+    ## Initialize member variables for the timer.
+    ##
+    ## Parameters:
+    ##     slow_threshold (float): the seconds after which a request is
+    ##                             logged as slow, or None to log no requests
+    ##     logger (logging.Logger): the logger for slow requests; the
+    ##                              "app.slow_requests" logger if not given
+    ##
+    def __init__(self, slow_threshold: float = None,
+                 logger: logging.Logger = None) -> None:
+        self.slow_threshold = slow_threshold
+        self.logger = logger or logging.getLogger('app.slow_requests')
+        self.histograms = {
+            stage: Histogram(STAGE_BUCKETS) for stage in STAGES
+        }
+        self.hooks = []
+
+    ## Add a hook called with the stage times of every timed request.
+    ##
+    ## Parameters:
+    ##     hook (callable): the function called with the route, method, and
+    ##                      status code of the request, a dict of each stage
+    ##                      that ran to its seconds, and the total seconds
+    ##
+    def add_hook(self, hook: callable) -> None:
+        self.hooks.append(hook)
+
+    ## Start timing the stages of a request in the current thread.
+    ##
+    def start_request(self) -> None:
+        start_stages()
+
+    ## Stop timing the request of the current thread without recording it,
+    ## such as when it failed before its response was ready.
+    ##
+    def discard_request(self) -> None:
+        stop_stages()
+
+    ## Finish timing the request of the current thread, recording its stage
+    ## times and logging the request if it was slow.
+    ##
+    ## Parameters:
+    ##     route (str): the rule of the route that handled the request
+    ##     method (str): the HTTP method of the request
+    ##     status (int): the response code
+    ##
+    ## Returns:
+    ##     A dict of each stage that ran to its seconds, or None if no
+    ##     request was being timed.
+    ##
+    def finish_request(self, route: str, method: str,
+                       status: int) -> dict:
+        stopped = stop_stages()
+        if stopped is None:
+            return None
+
+        stages, seconds = stopped
+
+        for stage, stage_seconds in stages.items():
+            self.histograms[stage].observe(stage_seconds)
+
+        for hook in self.hooks:
+            hook(route, method, status, stages, seconds)
+
+        if self.slow_threshold is not None and seconds >= self.slow_threshold:
+            self.logger.warning(
+                'Slow request %s %s (%d) took %.1fms: %s', method, route,
+                status, seconds * 1000, _format_stages(stages, seconds)
+            )
+
+        return stages
+
+## Format the stage times of a request for the slow-request log.
+##
+## Parameters:
+##     stages (dict): a dict of each stage that ran to its seconds
+##     seconds (float): the total seconds of the request
+##
+## Returns:
+##     A string listing the milliseconds of each stage, followed by the time
+##     spent outside of every stage.
+##
+def _format_stages(stages: dict, seconds: float) -> str:
+    parts = [
+        f'{stage}={stages[stage] * 1000:.2f}ms'
+        for stage in STAGES if stage in stages
+    ]
+    parts.append(f'other={(seconds - sum(stages.values())) * 1000:.2f}ms')
+    return ' '.join(parts)
+
+## Time the stages of every request handled by the application. Stages that
+## run while a streamed response is sent aren't included, since the request
+## is finished once its response is ready. The stage functions are wrapped
+## for as long as the process runs, and other applications in the process are
+## still left untimed, since stages are only timed in threads handling a
+## request of this one.
+##
+## Parameters:
+##     app (Flask): the application to instrument
+##     timer (StageTimer): the timer to record the stages in
+##
+def instrument_stages(app: Flask, timer: StageTimer) -> None:
+    install_stage_functions()
+    app.request_class = TimedRequest
+
+    @app.before_request
+    def start_stages() -> None:
+        timer.start_request()
+
+    @app.after_request
+    def finish_stages(response: Response) -> Response:
+        rule = request.url_rule
+        timer.finish_request(
+            rule.rule if rule is not None else 'unmatched', request.method,
+            response.status_code
+        )
+        return response
+
+    @app.teardown_request
+    def discard_stages(_error: BaseException) -> None:
+        timer.discard_request()
@@ -0,0 +1,36 @@
+import threading
+
+## A counter that many threads can increment without contending on one lock.
+## The count is split into stripes, each with its own lock, and every thread
+## increments the stripe chosen by its thread id.
+##
+class StripedCounter:
+    STRIPES = 16
+
+    ## Initialize member variables for the counter.
+    ##
+    ## Parameters:
+    ##     stripes (int): the amount of stripes to split the count into
+    ##
+    def __init__(self, stripes: int = STRIPES) -> None:
+        self._locks = [threading.Lock() for i in range(stripes)]
+        self._counts = [0] * stripes
+
+    ## Add the given amount to the count.
+    ##
+    ## Parameters:
+    ##     amount (int): the amount to add
+    ##
+    def add(self, amount: int = 1) -> None:
+        stripe = threading.get_native_id() % len(self._counts)
+
+        with self._locks[stripe]:
+            self._counts[stripe] += amount
+
+    ## Retrieve the total count across every stripe.
+    ##
+    ## Returns:
+    ##     An int for the count.
+    ##
+    def value(self) -> int:
+        return sum(self._counts)
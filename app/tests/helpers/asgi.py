@@ -0,0 +1,48 @@
+import asyncio
+import json
+
+## Send a request to an ASGI application and collect its response.
+##
+## Parameters:
+##     app (callable): the ASGI application to send the request to
+##     method (str): the HTTP method of the request
+##     path (str): the path of the request
+##     json_data (any): the data to send as the JSON body, if any, along
+##                      with a JSON Content-Type header
+##     headers (dict): the headers to send with the request, if any
+##     body (bytes): the raw body to send instead of json_data, if any
+##
+## Returns:
+##     A tuple containing an int for the response code, a dict of the
+##     response headers, and the bytes of the response body.
+##
+def asgi_request(app: callable, method: str, path: str,
+                 json_data: any = None, headers: dict = None,
+                 body: bytes = b'') -> tuple:
+    if json_data is not None:
+        body = json.dumps(json_data).encode()
+        headers = {'Content-Type': 'application/json', **(headers or {})}
+
+    events = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    sent = []
+
+    async def receive() -> dict:
+        return events.pop(0)
+
+    async def send(event: dict) -> None:
+        sent.append(event)
+
+    scope = {
+        'type': 'http', 'method': method, 'path': path,
+        'headers': [
+            (name.lower().encode(), value.encode())
+            for name, value in (headers or {}).items()
+        ]
+    }
+    asyncio.run(app(scope, receive, send))
+
+    start, body_event = sent
+    response_headers = {
+        name.decode(): value.decode() for name, value in start['headers']
+    }
+    return start['status'], response_headers, body_event['body']
@@ -25,7 +25,7 @@ def mock_receipt(mocker: MockerFixture, name: str, date: date, time: datetime,
     receipt.retailer = name
     receipt.purchase_date = date
     receipt.purchase_time = time
-    receipt.total_cost = total
+    receipt.total_cents = round(total * 100)
     receipt.purchased_items = items
 
     mocker.patch.object(receipt, 'get_retailer',
@@ -34,8 +34,9 @@ def mock_receipt(mocker: MockerFixture, name: str, date: date, time: datetime,
                         return_value=receipt.purchase_date)
     mocker.patch.object(receipt, 'get_purchase_time',
                         return_value=receipt.purchase_time)
-    mocker.patch.object(receipt, 'get_total_cost',
-                        return_value=receipt.total_cost)
+    mocker.patch.object(receipt, 'get_total_cents',
+                        return_value=receipt.total_cents)
+    mocker.patch.object(receipt, 'get_total_cost', return_value=total)
     mocker.patch.object(receipt, 'get_purchased_items',
                         return_value=receipt.purchased_items)
 
@@ -55,10 +56,12 @@ def mock_purchased_item(mocker: MockerFixture, desc: str,
                         price: float) -> PurchasedItem:
     item = Mock(PurchasedItem)
     item.short_description = desc
-    item.price = price
+    item.price_cents = round(price * 100)
 
     mocker.patch.object(item, 'get_short_description',
                         return_value=item.short_description)
-    mocker.patch.object(item, 'get_price', return_value=item.price)
+    mocker.patch.object(item, 'get_price_cents',
+                        return_value=item.price_cents)
+    mocker.patch.object(item, 'get_price', return_value=price)
 
     return item
\ No newline at end of file
@@ -1,5 +1,13 @@
+import csv
+import gzip
+import io
+import json
+
 from flask.testing import FlaskClient
 
+from app import create_app
+from app.receipt_ids import decode_snowflake
+
 class TestStoreReceipt:
     ROUTE = '/receipts/process'
 
@@ -67,6 +75,19 @@ class TestStoreReceipt:
 
         assert resp.status_code == 400
 
+    def test_non_string_retailer(self, client: FlaskClient) -> None:
+        resp = client.post(self.ROUTE, json={
+            'retailer': 5,
+            'purchaseDate': '2022-01-02',
+            'purchaseTime': '13:13',
+            'total': '1.25',
+            'items': [
+                {'shortDescription': 'Pepsi - 12-oz', 'price': '1.25'}
+            ]
+        })
+
+        assert resp.status_code == 400
+
     def test_multiple_stores_resp_code(self, client: FlaskClient) -> None:
         client.post(self.ROUTE, json={
             'retailer': 'Toys 'R' Us',
@@ -555,4 +576,431 @@ class TestGetPoints:
         })
         resp = client.get('receipts/3/points')
 
-        assert resp.json == {'points': 89}
\ No newline at end of file
+        assert resp.json == {'points': 89}
+
+class TestStoreReceipts:
+    ROUTE = '/receipts/process/batch'
+    RECEIPT_DATA = {
+        'retailer': 'Target',
+        'purchaseDate': '2022-01-02',
+        'purchaseTime': '13:13',
+        'total': '1.25',
+        'items': [
+            {'shortDescription': 'Pepsi - 12-oz', 'price': '1.25'}
+        ]
+    }
+
+    def test_valid_resp_code(self, client: FlaskClient) -> None:
+        resp = client.post(self.ROUTE, json=[self.RECEIPT_DATA] * 2)
+        assert resp.status_code == 200
+
+    def test_valid_data(self, client: FlaskClient) -> None:
+        resp = client.post(self.ROUTE, json=[self.RECEIPT_DATA] * 2)
+        assert resp.json == {'results': [{'id': '1'}, {'id': '2'}]}
+
+    def test_invalid_receipt_data(self, client: FlaskClient) -> None:
+        invalid_data = dict(self.RECEIPT_DATA, purchaseTime='Midnight')
+        resp = client.post(self.ROUTE, json=[invalid_data, self.RECEIPT_DATA])
+        results = resp.json['results']
+
+        error_msg = 'Receipt purchase time does not match "H:M":'
+        assert results[0]['error'].startswith(error_msg)
+        assert results[1] == {'id': '1'}
+
+    def test_stored_points(self, client: FlaskClient) -> None:
+        client.post(self.ROUTE, json=[self.RECEIPT_DATA] * 2)
+        resp = client.get('/receipts/2/points')
+        assert resp.json == {'points': 31}
+
+    def test_not_array(self, client: FlaskClient) -> None:
+        resp = client.post(self.ROUTE, json=self.RECEIPT_DATA)
+        assert resp.status_code == 400
+
+    def test_not_object(self, client: FlaskClient) -> None:
+        invalid_item = dict(self.RECEIPT_DATA, items=[5])
+        resp = client.post(self.ROUTE, json=[self.RECEIPT_DATA, 1, invalid_item])
+        results = resp.json['results']
+
+        assert resp.status_code == 200
+        assert results[0] == {'id': '1'}
+        assert results[1]['error'].startswith('Receipt must be a JSON object:')
+        error_msg = 'Item in receipt must be a JSON object:'
+        assert results[2]['error'].startswith(error_msg)
+
+    def test_over_limit(self) -> None:
+        client = create_app({'RECEIPT_BATCH_LIMIT': 2}).test_client()
+        resp = client.post(self.ROUTE, json=[self.RECEIPT_DATA] * 3)
+        assert resp.status_code == 400
+
+class TestGetBatchPoints:
+    ROUTE = '/receipts/points'
+    RECEIPT_DATA = TestStoreReceipts.RECEIPT_DATA
+
+    def test_valid_resp_code(self, client: FlaskClient) -> None:
+        client.post('/receipts/process', json=self.RECEIPT_DATA)
+        resp = client.post(self.ROUTE, json=['1'])
+        assert resp.status_code == 200
+
+    def test_valid_data(self, client: FlaskClient) -> None:
+        client.post('/receipts/process/batch', json=[self.RECEIPT_DATA] * 2)
+        resp = client.post(self.ROUTE, json=['1', '2', '3'])
+        assert resp.json == {'points': {'1': 31, '2': 31, '3': None}}
+
+    def test_empty(self, client: FlaskClient) -> None:
+        resp = client.post(self.ROUTE, json=[])
+        assert resp.json == {'points': {}}
+
+    def test_not_array(self, client: FlaskClient) -> None:
+        resp = client.post(self.ROUTE, json={'ids': ['1']})
+        assert resp.status_code == 400
+
+    def test_non_string_id(self, client: FlaskClient) -> None:
+        resp = client.post(self.ROUTE, json=[1])
+        assert resp.status_code == 400
+
+    def test_over_limit(self) -> None:
+        client = create_app({'RECEIPT_POINTS_BATCH_LIMIT': 2}).test_client()
+        resp = client.post(self.ROUTE, json=['1', '2', '3'])
+        assert resp.status_code == 400
+
+class TestPointsOnly:
+    RECEIPT_DATA = TestStoreReceipts.RECEIPT_DATA
+
+    def test_points(self) -> None:
+        client = create_app({'RECEIPT_POINTS_ONLY': True}).test_client()
+        id = client.post('/receipts/process', json=self.RECEIPT_DATA).json['id']
+        resp = client.get(f'/receipts/{id}/points')
+
+        assert resp.json == {'points': 31}
+
+    def test_missing(self) -> None:
+        client = create_app({'RECEIPT_POINTS_ONLY': True}).test_client()
+        resp = client.get('/receipts/1/points')
+        assert resp.status_code == 404
+
+    def test_batch_points(self) -> None:
+        client = create_app({'RECEIPT_POINTS_ONLY': True}).test_client()
+        client.post('/receipts/process/batch', json=[self.RECEIPT_DATA] * 2)
+        resp = client.post('/receipts/points', json=['1', '2', '3'])
+
+        assert resp.json == {'points': {'1': 31, '2': 31, '3': None}}
+
+class TestStreamReceipts:
+    ROUTE = '/receipts/process/stream'
+    RECEIPT_DATA = TestStoreReceipts.RECEIPT_DATA
+
+    def ndjson(self, *lines: any) -> bytes:
+        return b''.join(
+            (json.dumps(line) if isinstance(line, dict) else line).encode()
+            + b'\n'
+            for line in lines
+        )
+
+    def test_results(self, client: FlaskClient) -> None:
+        body = self.ndjson(self.RECEIPT_DATA, '', '{"retailer": "Target"}',
+                           self.RECEIPT_DATA)
+        resp = client.post(self.ROUTE, data=body,
+                           content_type='application/x-ndjson')
+        results = [json.loads(line) for line in resp.data.splitlines()]
+
+        assert resp.status_code == 200
+        assert resp.mimetype == 'application/x-ndjson'
+        assert results[0] == {'id': '1'} and results[2] == {'id': '2'}
+        assert 'error' in results[1] and len(results) == 3
+        assert client.get('/receipts/2/points').json == {'points': 31}
+
+    def test_wrong_content_type(self, client: FlaskClient) -> None:
+        resp = client.post(self.ROUTE, data=self.ndjson(self.RECEIPT_DATA),
+                           content_type='application/json')
+
+        assert resp.status_code == 415
+
+    def test_line_limit(self) -> None:
+        client = create_app({'RECEIPT_STREAM_LINE_LIMIT': 500}).test_client()
+        long_data = dict(self.RECEIPT_DATA, items=[
+            {'shortDescription': 'Pepsi - 12-oz', 'price': '1.25'}
+        ] * 20)
+        resp = client.post(self.ROUTE,
+                           data=self.ndjson(long_data, self.RECEIPT_DATA),
+                           content_type='application/x-ndjson')
+
+        assert [json.loads(line) for line in resp.data.splitlines()] == [
+            {'error': 'Receipt must not be longer than 500 bytes'},
+            {'id': '1'}
+        ]
+
+    def test_reads_as_it_streams(self, client: FlaskClient) -> None:
+        body = self.ndjson(*[self.RECEIPT_DATA] * 500)
+        stream = io.BytesIO(body)
+        resp = client.post(self.ROUTE, input_stream=stream,
+                           content_length=len(body),
+                           content_type='application/x-ndjson',
+                           buffered=False)
+        results = iter(resp.response)
+        next(results)
+
+        assert stream.tell() < len(body)
+        assert len(list(results)) == 499
+
+class TestExportReceipts:
+    ROUTE = '/receipts/export'
+    RECEIPT_DATA = TestStoreReceipts.RECEIPT_DATA
+
+    def test_ndjson(self, client: FlaskClient) -> None:
+        client.post('/receipts/process', json=self.RECEIPT_DATA)
+        resp = client.get(self.ROUTE)
+
+        assert resp.status_code == 200
+        assert resp.mimetype == 'application/x-ndjson'
+        assert [json.loads(line) for line in resp.data.splitlines()] == [
+            dict(self.RECEIPT_DATA, id='1', points=31)
+        ]
+
+    def test_csv(self, client: FlaskClient) -> None:
+        client.post('/receipts/process', json=self.RECEIPT_DATA)
+        resp = client.get(self.ROUTE, query_string={'format': 'csv'})
+        rows = list(csv.reader(io.StringIO(resp.data.decode())))
+
+        assert resp.mimetype == 'text/csv'
+        assert rows[0] == [
+            'id', 'retailer', 'purchaseDate', 'purchaseTime', 'total',
+            'items', 'points'
+        ]
+        assert rows[1][:5] == ['1', 'Target', '2022-01-02', '13:13', '1.25']
+        assert json.loads(rows[1][5]) == self.RECEIPT_DATA['items']
+        assert rows[1][6] == '31' and len(rows) == 2
+
+    def test_since(self, client: FlaskClient) -> None:
+        for i in range(12):
+            client.post('/receipts/process', json=self.RECEIPT_DATA)
+        resp = client.get(self.ROUTE, query_string={'since': '9'})
+
+        assert [
+            json.loads(line)['id'] for line in resp.data.splitlines()
+        ] == ['10', '11', '12']
+
+    def test_unknown_format(self, client: FlaskClient) -> None:
+        resp = client.get(self.ROUTE, query_string={'format': 'xml'})
+        assert resp.status_code == 400
+
+    def test_gzip(self, client: FlaskClient) -> None:
+        client.post('/receipts/process', json=self.RECEIPT_DATA)
+        resp = client.get(self.ROUTE, headers={'Accept-Encoding': 'gzip'})
+
+        assert resp.headers['Content-Encoding'] == 'gzip'
+        assert json.loads(gzip.decompress(resp.data)) == dict(
+            self.RECEIPT_DATA, id='1', points=31
+        )
+
+    def test_no_gzip(self, client: FlaskClient) -> None:
+        resp = client.get(self.ROUTE)
+        assert 'Content-Encoding' not in resp.headers
+
+    def test_streams(self, client: FlaskClient) -> None:
+        client.post('/receipts/process/batch',
+                    json=[self.RECEIPT_DATA] * 1000)
+        resp = client.get(self.ROUTE, buffered=False)
+
+        assert 'Content-Length' not in resp.headers
+        assert len(list(resp.response)) > 1
+
+    def test_points_only(self) -> None:
+        client = create_app({'RECEIPT_POINTS_ONLY': True}).test_client()
+        client.post('/receipts/process', json=self.RECEIPT_DATA)
+        resp = client.get(self.ROUTE, query_string={'format': 'csv'})
+
+        assert resp.data.decode().splitlines() == ['id,points', '1,31']
+
+class TestMetrics:
+    ROUTE = '/metrics'
+    RECEIPT_DATA = TestStoreReceipts.RECEIPT_DATA
+
+    def get_samples(self, client: FlaskClient) -> dict:
+        lines = client.get(self.ROUTE).data.decode().splitlines()
+        return dict(
+            line.rsplit(' ', 1) for line in lines if not line.startswith('#')
+        )
+
+    def requests_total(self, route: str, method: str, status: int) -> str:
+        labels = f'route="{route}",method="{method}",status="{status}"'
+        return f'receipt_http_requests_total{{{labels}}}'
+
+    def test_content_type(self, client: FlaskClient) -> None:
+        resp = client.get(self.ROUTE)
+
+        assert resp.status_code == 200
+        assert resp.content_type == 'text/plain; version=0.0.4; charset=utf-8'
+
+    def test_requests(self, client: FlaskClient) -> None:
+        client.post('/receipts/process', json=self.RECEIPT_DATA)
+        client.get('/receipts/1/points')
+        client.get('/receipts/1/points')
+        samples = self.get_samples(client)
+
+        assert samples[
+            self.requests_total('/receipts/process', 'POST', 200)
+        ] == '1'
+        assert samples[
+            self.requests_total('/receipts/<id>/points', 'GET', 200)
+        ] == '2'
+        assert samples['receipt_store_size'] == '1'
+        assert samples['receipt_points_cache_hits_total'] == '1'
+
+    def test_status_codes(self, client: FlaskClient) -> None:
+        client.get('/receipts/7/points')
+        client.get('/unknown')
+        samples = self.get_samples(client)
+
+        assert samples[
+            self.requests_total('/receipts/<id>/points', 'GET', 404)
+        ] == '1'
+        assert samples[self.requests_total('unmatched', 'GET', 404)] == '1'
+
+    def test_parse_errors(self, client: FlaskClient) -> None:
+        client.post('/receipts/process', json={'retailer': 'Target'})
+        client.post('/receipts/process/batch',
+                    json=[self.RECEIPT_DATA, {}, {}])
+        client.post('/receipts/process/stream', data=b'{bad\n',
+                    content_type='application/x-ndjson')
+        samples = self.get_samples(client)
+
+        assert samples['receipt_errors_total{stage="parse"}'] == '4'
+        assert samples['receipt_errors_total{stage="score"}'] == '0'
+
+    def test_disabled(self) -> None:
+        client = create_app({'RECEIPT_METRICS': False}).test_client()
+        assert client.get(self.ROUTE).status_code == 404
+
+class TestIdempotency:
+    RECEIPT_DATA = TestStoreReceipts.RECEIPT_DATA
+
+    def test_idempotency_key(self, client: FlaskClient) -> None:
+        headers = {'Idempotency-Key': 'retry-1'}
+        resp1 = client.post('/receipts/process', json=self.RECEIPT_DATA,
+                            headers=headers)
+        resp2 = client.post('/receipts/process', json=self.RECEIPT_DATA,
+                            headers=headers)
+
+        assert resp1.json == resp2.json == {'id': '1'}
+
+    def test_key_reused(self, client: FlaskClient) -> None:
+        headers = {'Idempotency-Key': 'retry-1'}
+        client.post('/receipts/process', json=self.RECEIPT_DATA,
+                    headers=headers)
+        resp = client.post('/receipts/process',
+                           json=dict(self.RECEIPT_DATA, total='2.00'),
+                           headers=headers)
+
+        assert resp.status_code == 400
+
+    def test_content_ids(self) -> None:
+        client = create_app({'RECEIPT_ID_MODE': 'content'}).test_client()
+        resp1 = client.post('/receipts/process', json=self.RECEIPT_DATA)
+        resp2 = client.post('/receipts/process', json=self.RECEIPT_DATA)
+        resp = client.get(f'/receipts/{resp1.json["id"]}/points')
+
+        assert resp1.json == resp2.json and resp.json == {'points': 31}
+
+class TestSnowflakeIds:
+    RECEIPT_DATA = TestStoreReceipts.RECEIPT_DATA
+
+    def test_store_and_get(self) -> None:
+        client = create_app({
+            'RECEIPT_ID_MODE': 'snowflake', 'RECEIPT_SHARD_ID': 3
+        }).test_client()
+        resp = client.post('/receipts/process', json=self.RECEIPT_DATA)
+        id = resp.json['id']
+        resp = client.get(f'/receipts/{id}/points')
+
+        assert decode_snowflake(id)[1] == 3 and resp.json == {'points': 31}
+
+class TestPartitions:
+    RECEIPT_DATA = TestStoreReceipts.RECEIPT_DATA
+
+    def test_store_and_get(self) -> None:
+        client = create_app({'RECEIPT_PARTITIONS': 4}).test_client()
+        client.post('/receipts/process', json=self.RECEIPT_DATA)
+        resp = client.post('/receipts/process/batch',
+                           json=[self.RECEIPT_DATA] * 3)
+        points = client.post('/receipts/points', json=['3', '1', '5'])
+
+        assert resp.json == {
+            'results': [{'id': '2'}, {'id': '3'}, {'id': '4'}]
+        }
+        assert client.get('/receipts/4/points').json == {'points': 31}
+        assert points.json == {'points': {'3': 31, '1': 31, '5': None}}
+
+class TestCapacity:
+    RECEIPT_DATA = TestStoreReceipts.RECEIPT_DATA
+
+    def test_evicted(self) -> None:
+        client = create_app({'RECEIPT_STORAGE_CAPACITY': 1}).test_client()
+        client.post('/receipts/process/batch', json=[self.RECEIPT_DATA] * 2)
+        resp = client.get('/receipts/1/points')
+
+        assert resp.status_code == 410
+        assert resp.text == 'Receipt with the id of 1 was evicted'
+
+    def test_kept(self) -> None:
+        client = create_app({'RECEIPT_STORAGE_CAPACITY': 1}).test_client()
+        client.post('/receipts/process/batch', json=[self.RECEIPT_DATA] * 2)
+        resp = client.get('/receipts/2/points')
+
+        assert resp.json == {'points': 31}
+
+    def test_never_stored(self) -> None:
+        client = create_app({'RECEIPT_STORAGE_CAPACITY': 1}).test_client()
+        resp = client.get('/receipts/1/points')
+        assert resp.status_code == 404
+
+class TestTieredStorage:
+    RECEIPT_DATA = TestStoreReceipts.RECEIPT_DATA
+
+    def test_reads_demoted_receipts(self, tmp_path) -> None:
+        client = create_app({
+            'RECEIPT_STORAGE': 'tiered',
+            'RECEIPT_STORAGE_PATH': str(tmp_path / 'receipts.db'),
+            'RECEIPT_STORAGE_CAPACITY': 1
+        }).test_client()
+        client.post('/receipts/process/batch', json=[self.RECEIPT_DATA] * 3)
+
+        for id in ('1', '2', '3'):
+            resp = client.get(f'/receipts/{id}/points')
+            assert resp.json == {'points': 31}
+
+class TestSharedStorage:
+    RECEIPT_DATA = {
+        'retailer': 'Target',
+        'purchaseDate': '2022-01-02',
+        'purchaseTime': '13:13',
+        'total': '1.25',
+        'items': [
+            {'shortDescription': 'Pepsi - 12-oz', 'price': '1.25'}
+        ]
+    }
+
+    def test_workers_share_receipts(self, tmp_path) -> None:
+        config = {
+            'RECEIPT_STORAGE': 'sqlite',
+            'RECEIPT_STORAGE_PATH': str(tmp_path / 'receipts.db')
+        }
+        worker1 = create_app(config).test_client()
+        worker2 = create_app(config).test_client()
+
+        id = worker1.post('/receipts/process', json=self.RECEIPT_DATA).json['id']
+        resp = worker2.get(f'/receipts/{id}/points')
+
+        assert resp.json == {'points': 31}
+
+    def test_workers_unique_ids(self, tmp_path) -> None:
+        config = {
+            'RECEIPT_STORAGE': 'sqlite',
+            'RECEIPT_STORAGE_PATH': str(tmp_path / 'receipts.db')
+        }
+        worker1 = create_app(config).test_client()
+        worker2 = create_app(config).test_client()
+
+        resp1 = worker1.post('/receipts/process', json=self.RECEIPT_DATA)
+        resp2 = worker2.post('/receipts/process', json=self.RECEIPT_DATA)
+
+        assert resp1.json != resp2.json
@@ -0,0 +1,203 @@
+import asyncio
+import json
+import pytest
+import threading
+
+from app import create_app
+from app.asgi import create_asgi_app, ReceiptProcessorASGI
+from app.tests.helpers.asgi import asgi_request
+
+RECEIPT_DATA = {
+    'retailer': 'Target',
+    'purchaseDate': '2022-01-01',
+    'purchaseTime': '13:01',
+    'items': [
+        {'shortDescription': 'Mountain Dew 12PK', 'price': '6.49'},
+        {'shortDescription': 'Emils Cheese Pizza', 'price': '12.25'},
+        {'shortDescription': 'Knorr Creamy Chicken', 'price': '1.26'},
+        {'shortDescription': 'Doritos Nacho Cheese', 'price': '3.35'},
+        {'shortDescription': '   Klarbrunn 12-PK 12 FL OZ  ', 'price': '12.00'}
+    ],
+    'total': '35.35'
+}
+
+@pytest.fixture(scope='function')
+def asgi_app() -> ReceiptProcessorASGI:
+    return create_asgi_app()
+
+class TestStoreReceipt:
+    ROUTE = '/receipts/process'
+
+    def test_valid_store(self, asgi_app: ReceiptProcessorASGI) -> None:
+        status, headers, body = asgi_request(asgi_app, 'POST', self.ROUTE,
+                                             RECEIPT_DATA)
+
+        assert status == 200 and json.loads(body) == {'id': '1'}
+        assert headers['content-type'] == 'application/json'
+
+    def test_missing_key(self, asgi_app: ReceiptProcessorASGI) -> None:
+        receipt_data = dict(RECEIPT_DATA)
+        del receipt_data['total']
+        status, _headers, body = asgi_request(asgi_app, 'POST', self.ROUTE,
+                                              receipt_data)
+
+        assert status == 400
+        assert body.decode().startswith('Receipt must define the total key:')
+
+    def test_invalid_json(self, asgi_app: ReceiptProcessorASGI) -> None:
+        status, _headers, body = asgi_request(
+            asgi_app, 'POST', self.ROUTE,
+            headers={'Content-Type': 'application/json'}, body=b'{"total'
+        )
+
+        assert status == 500
+        assert body == b"<BadRequest '400: Bad Request'>"
+
+    def test_not_json_content_type(self,
+                                   asgi_app: ReceiptProcessorASGI) -> None:
+        status, _headers, body = asgi_request(
+            asgi_app, 'POST', self.ROUTE,
+            headers={'Content-Type': 'text/plain'},
+            body=json.dumps(RECEIPT_DATA).encode()
+        )
+
+        assert status == 500
+        assert body == b"<UnsupportedMediaType '415: Unsupported Media Type'>"
+
+    def test_wrong_method(self, asgi_app: ReceiptProcessorASGI) -> None:
+        status, _headers, _body = asgi_request(asgi_app, 'GET', self.ROUTE)
+        assert status == 405
+
+    def test_same_as_flask(self, asgi_app: ReceiptProcessorASGI) -> None:
+        flask_resp = create_app().test_client().post(self.ROUTE,
+                                                     json=RECEIPT_DATA)
+        _status, _headers, body = asgi_request(asgi_app, 'POST', self.ROUTE,
+                                               RECEIPT_DATA)
+
+        assert body == flask_resp.data
+
+    def test_idempotency_key(self, asgi_app: ReceiptProcessorASGI) -> None:
+        headers = {'Idempotency-Key': 'retry-1'}
+        responses = [
+            asgi_request(asgi_app, 'POST', self.ROUTE, RECEIPT_DATA, headers)
+            for i in range(2)
+        ]
+
+        assert [json.loads(body) for _status, _headers, body in responses] == [
+            {'id': '1'}, {'id': '1'}
+        ]
+
+class TestGetPoints:
+    def test_points(self, asgi_app: ReceiptProcessorASGI) -> None:
+        asgi_request(asgi_app, 'POST', '/receipts/process', RECEIPT_DATA)
+        status, _headers, body = asgi_request(asgi_app, 'GET',
+                                              '/receipts/1/points')
+
+        assert status == 200 and json.loads(body) == {'points': 28}
+
+    def test_missing(self, asgi_app: ReceiptProcessorASGI) -> None:
+        status, headers, body = asgi_request(asgi_app, 'GET',
+                                             '/receipts/7/points')
+
+        assert status == 404
+        assert body == b'No receipt found with the id of 7'
+        assert headers['content-type'] == 'text/html; charset=utf-8'
+
+    def test_evicted(self) -> None:
+        asgi_app = create_asgi_app({'RECEIPT_STORAGE_CAPACITY': 1})
+        asgi_request(asgi_app, 'POST', '/receipts/process', RECEIPT_DATA)
+        asgi_request(asgi_app, 'POST', '/receipts/process', RECEIPT_DATA)
+        status, _headers, body = asgi_request(asgi_app, 'GET',
+                                              '/receipts/1/points')
+
+        assert status == 410
+        assert body == b'Receipt with the id of 1 was evicted'
+
+    def test_unknown_path(self, asgi_app: ReceiptProcessorASGI) -> None:
+        status, _headers, _body = asgi_request(asgi_app, 'GET', '/receipts')
+        assert status == 404
+
+    def test_config(self) -> None:
+        asgi_app = create_asgi_app({'RECEIPT_POINTS_ONLY': True})
+        asgi_request(asgi_app, 'POST', '/receipts/process', RECEIPT_DATA)
+        assert asgi_app.receipt_db.receipts['1'] == 28
+
+class TestFlaskParity:
+    @pytest.mark.parametrize('content_type, body', [
+        ('application/json', json.dumps(RECEIPT_DATA).encode()),
+        ('application/json; charset=utf-8', json.dumps(RECEIPT_DATA).encode()),
+        ('application/vnd.receipt+json', json.dumps(RECEIPT_DATA).encode()),
+        ('application/json', b'{"retailer": "Target"}'),
+        ('application/json', b'[1]'),
+        ('application/json', b'{"total'),
+        ('application/json', b'\xff'),
+        ('application/json', b''),
+        ('text/plain', json.dumps(RECEIPT_DATA).encode()),
+        (None, json.dumps(RECEIPT_DATA).encode())
+    ])
+    def test_store(self, asgi_app: ReceiptProcessorASGI,
+                   content_type: str, body: bytes) -> None:
+        headers = {} if content_type is None else {
+            'Content-Type': content_type
+        }
+        flask_resp = create_app().test_client().post(
+            '/receipts/process', data=body, headers=headers
+        )
+        status, response_headers, asgi_body = asgi_request(
+            asgi_app, 'POST', '/receipts/process', headers=headers, body=body
+        )
+
+        assert status == flask_resp.status_code
+        assert asgi_body == flask_resp.data
+        assert response_headers['content-type'] == flask_resp.content_type
+
+    @pytest.mark.parametrize('method', ['GET', 'HEAD'])
+    @pytest.mark.parametrize('id', ['1', '2'])
+    def test_points(self, asgi_app: ReceiptProcessorASGI, method: str,
+                    id: str) -> None:
+        client = create_app().test_client()
+        client.post('/receipts/process', json=RECEIPT_DATA)
+        asgi_request(asgi_app, 'POST', '/receipts/process', RECEIPT_DATA)
+        flask_resp = client.open(f'/receipts/{id}/points', method=method)
+        status, headers, body = asgi_request(asgi_app, method,
+                                             f'/receipts/{id}/points')
+
+        assert status == flask_resp.status_code and body == flask_resp.data
+        assert headers['content-length'] == flask_resp.headers[
+            'Content-Length'
+        ]
+
+class TestExecutor:
+    def test_database_off_event_loop(self,
+                                     asgi_app: ReceiptProcessorASGI) -> None:
+        threads = []
+        stored_add_receipt = asgi_app.receipt_db.add_receipt
+
+        def add_receipt(*args) -> str:
+            threads.append(threading.current_thread())
+            return stored_add_receipt(*args)
+
+        asgi_app.receipt_db.add_receipt = add_receipt
+        status, _headers, _body = asgi_request(asgi_app, 'POST',
+                                               '/receipts/process',
+                                               RECEIPT_DATA)
+
+        assert status == 200
+        assert threads[0] is not threading.main_thread()
+
+class TestLifespan:
+    def test_startup_and_shutdown(self,
+                                  asgi_app: ReceiptProcessorASGI) -> None:
+        events = [{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}]
+        sent = []
+
+        async def receive() -> dict:
+            return events.pop(0)
+
+        async def send(event: dict) -> None:
+            sent.append(event['type'])
+
+        asyncio.run(asgi_app({'type': 'lifespan'}, receive, send))
+        assert sent == [
+            'lifespan.startup.complete', 'lifespan.shutdown.complete'
+        ]
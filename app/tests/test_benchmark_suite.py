@@ -0,0 +1,48 @@
+from app.benchmarks.payloads import load_named_examples
+from app.benchmarks.suite import (
+    compare, database_cases, parse_cases, run_cases, score_cases
+)
+
+def result(seconds: float) -> dict:
+    return {'seconds_per_op': seconds, 'ops_per_sec': 1 / seconds}
+
+class TestCompare:
+    def test_regression(self) -> None:
+        regressions = compare(
+            {'fast': result(1.0), 'slow': result(2.0)},
+            {'fast': result(1.0), 'slow': result(1.0)}, 0.25
+        )
+        assert regressions == [('slow', 2.0)]
+
+    def test_within_threshold(self) -> None:
+        assert compare({'case': result(1.2)}, {'case': result(1.0)},
+                       0.25) == []
+
+    def test_faster(self) -> None:
+        assert compare({'case': result(0.5)}, {'case': result(1.0)},
+                       0.25) == []
+
+    def test_new_case(self) -> None:
+        assert compare({'new': result(1.0)}, {}, 0.25) == []
+
+class TestCases:
+    def test_names(self) -> None:
+        examples = load_named_examples()
+        names = [name for name, func, calls in parse_cases(examples)]
+        names += [name for name, func, calls in score_cases(examples)]
+
+        assert 'parse/Receipt/simple-receipt' in names
+        assert 'score/score_receipt/morning-receipt' in names
+        assert 'score/_score_purchase_time/simple-receipt' in names
+        assert len(names) == len(set(names))
+
+    def test_run_cases(self) -> None:
+        results = run_cases(database_cases((10,)), 0.001, 1)
+
+        assert set(results) == {
+            'database/add_receipt/10', 'database/get_points/10'
+        }
+        assert all(
+            case['seconds_per_op'] > 0 and case['ops_per_sec'] > 0
+            for case in results.values()
+        )
@@ -0,0 +1,41 @@
+import os
+from pytest_mock import MockerFixture
+
+from app import gunicorn_conf
+
+class FakeWorker:
+    pass
+
+class FakeServer:
+    def __init__(self) -> None:
+        self.WORKERS = {}
+
+    def spawn(self) -> FakeWorker:
+        worker = FakeWorker()
+        gunicorn_conf.pre_fork(self, worker)
+        self.WORKERS[id(worker)] = worker
+        return worker
+
+class TestWorkerIndex:
+    def test_distinct_indexes(self) -> None:
+        server = FakeServer()
+        workers = [server.spawn() for i in range(4)]
+
+        assert [worker.receipt_worker_index for worker in workers] == [
+            0, 1, 2, 3
+        ]
+
+    def test_reuses_index_of_stopped_worker(self) -> None:
+        server = FakeServer()
+        workers = [server.spawn() for i in range(3)]
+        del server.WORKERS[id(workers[1])]
+
+        assert server.spawn().receipt_worker_index == 1
+
+    def test_post_fork(self, mocker: MockerFixture) -> None:
+        mocker.patch.dict(os.environ)
+        worker = FakeWorker()
+        worker.receipt_worker_index = 5
+        gunicorn_conf.post_fork(FakeServer(), worker)
+
+        assert os.environ['FLASK_RECEIPT_WORKER_INDEX'] == '5'
@@ -0,0 +1,131 @@
+import pytest
+import threading
+
+from app.idempotency_cache import IdempotencyCache
+
+class TestIdempotencyCache:
+    def test_stores_once(self) -> None:
+        cache = IdempotencyCache(10)
+        ids = iter(['1', '2'])
+        store = lambda: next(ids)
+
+        assert cache.store_once('key', 'a', store) == '1'
+        assert cache.store_once('key', 'a', store) == '1'
+        assert cache.store_once('other', 'a', store) == '2'
+
+    def test_different_receipt(self) -> None:
+        cache = IdempotencyCache(10)
+        cache.store_once('key', 'a', lambda: '1')
+
+        with pytest.raises(ValueError):
+            cache.store_once('key', 'b', lambda: '2')
+
+    def test_failure_not_remembered(self) -> None:
+        cache = IdempotencyCache(10)
+
+        def fail() -> str:
+            raise ValueError('Invalid receipt')
+
+        with pytest.raises(ValueError):
+            cache.store_once('key', 'a', fail)
+        assert cache.store_once('key', 'a', lambda: '1') == '1'
+
+    def test_bounded(self) -> None:
+        cache = IdempotencyCache(2)
+        cache.store_once('1', 'a', lambda: '1')
+        cache.store_once('2', 'a', lambda: '2')
+        cache.store_once('1', 'a', lambda: 'unused')
+        cache.store_once('3', 'a', lambda: '3')
+
+        assert len(cache) == 2
+        assert cache.store_once('1', 'a', lambda: 'new') == '1'
+        assert cache.store_once('2', 'a', lambda: 'new') == 'new'
+
+    def test_invalid_capacity(self) -> None:
+        with pytest.raises(ValueError):
+            IdempotencyCache(0)
+
+class TestConcurrency:
+    ## Start storing a receipt for the key in another thread, with a store
+    ## function that blocks until the returned event is set.
+    ##
+    ## Parameters:
+    ##     cache (IdempotencyCache): the cache to store the receipt through
+    ##     key (str): the idempotency key
+    ##     result (any): the id to return, or an exception to raise
+    ##
+    ## Returns:
+    ##     A tuple containing the started thread and the event releasing the
+    ##     store function.
+    ##
+    def start_store(self, cache: IdempotencyCache, key: str,
+                    result: any) -> tuple:
+        release = threading.Event()
+        called = threading.Event()
+
+        def store() -> str:
+            called.set()
+            release.wait(5)
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        def run() -> None:
+            try:
+                cache.store_once(key, 'a', store)
+            except ValueError:
+                pass
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        assert called.wait(5)
+        return thread, release
+
+    def test_other_keys_not_blocked(self) -> None:
+        cache = IdempotencyCache(10)
+        thread, release = self.start_store(cache, 'slow', '1')
+
+        assert cache.store_once('fast', 'a', lambda: '2') == '2'
+        assert thread.is_alive()
+        release.set()
+        thread.join()
+
+    def test_retry_waits_for_first(self) -> None:
+        cache = IdempotencyCache(10)
+        thread, release = self.start_store(cache, 'key', '1')
+        stores = []
+        results = []
+        retry = threading.Thread(target=lambda: results.append(
+            cache.store_once('key', 'a', lambda: stores.append(1) or '2')
+        ))
+        retry.start()
+        release.set()
+        thread.join()
+        retry.join()
+
+        assert results == ['1'] and stores == []
+
+    def test_different_receipt_while_pending(self) -> None:
+        cache = IdempotencyCache(10)
+        thread, release = self.start_store(cache, 'key', '1')
+
+        with pytest.raises(ValueError):
+            cache.store_once('key', 'b', lambda: '2')
+        release.set()
+        thread.join()
+
+    def test_retry_after_failure(self) -> None:
+        cache = IdempotencyCache(10)
+        thread, release = self.start_store(
+            cache, 'key', ValueError('Invalid receipt')
+        )
+        results = []
+        retry = threading.Thread(target=lambda: results.append(
+            cache.store_once('key', 'a', lambda: '2')
+        ))
+        retry.start()
+        release.set()
+        thread.join()
+        retry.join()
+
+        assert results == ['2'] and len(cache) == 1
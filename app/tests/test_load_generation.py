@@ -0,0 +1,143 @@
+import asyncio
+import pytest
+
+from app.benchmarks.http_load import LoadRequest, LoadResult, run_load
+from app.benchmarks.load_test import request_mix, store_requests
+from app.benchmarks.synthetic import ReceiptGenerator
+from app.receipt import Receipt
+
+## Answer every request on a connection with an empty 200 response.
+##
+async def answer(reader: asyncio.StreamReader,
+                 writer: asyncio.StreamWriter) -> None:
+    try:
+        while True:
+            head = await reader.readuntil(b'\r\n\r\n')
+            length = int(head.split(b'Content-Length: ')[1].split(b'\r\n')[0])
+            await reader.readexactly(length)
+            writer.write(b'HTTP/1.1 200 OK\r\nContent-Length: 0\r\n\r\n')
+    except asyncio.IncompleteReadError:
+        writer.close()
+
+## Run a load against a local server answering every request at once.
+##
+async def run_local_load(**kwargs) -> LoadResult:
+    server = await asyncio.start_server(answer, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    async with server:
+        return await run_load(
+            '127.0.0.1', port, lambda: LoadRequest('GET', '/'), **kwargs
+        )
+
+class TestReceiptGenerator:
+    def test_valid_receipts(self) -> None:
+        for receipt_data in ReceiptGenerator().receipts(500):
+            receipt = Receipt(receipt_data)
+            assert receipt.get_total_cents() == sum(
+                item.get_price_cents()
+                for item in receipt.get_purchased_items()
+            )
+
+    def test_reproducible(self) -> None:
+        assert ReceiptGenerator(seed=3).receipts(50) == ReceiptGenerator(
+            seed=3
+        ).receipts(50)
+        assert ReceiptGenerator(seed=3).receipts(50) != ReceiptGenerator(
+            seed=4
+        ).receipts(50)
+
+    def test_distributions(self) -> None:
+        receipts = ReceiptGenerator(
+            mean_items=6, max_items=10, retailers=1, peak_hour=9,
+            hour_spread=0.1
+        ).receipts(2000)
+        counts = [len(receipt['items']) for receipt in receipts]
+
+        assert 5 < sum(counts) / len(counts) < 6
+        assert max(counts) == 10
+        assert len({receipt['retailer'] for receipt in receipts}) == 1
+        assert all(
+            receipt['purchaseTime'][:2] in ('08', '09') for receipt in receipts
+        )
+
+    def test_duplicates(self) -> None:
+        generator = ReceiptGenerator(duplicate_rate=0.2)
+        generated = [generator.generate() for i in range(5000)]
+        duplicates = len(generated) - generator.generated
+
+        assert 800 < duplicates < 1200
+        firsts = {}
+        for receipt_data, number in generated:
+            assert firsts.setdefault(number, receipt_data) == receipt_data
+
+    def test_invalid(self) -> None:
+        with pytest.raises(ValueError):
+            ReceiptGenerator(duplicate_rate=1)
+
+class TestLoadTest:
+    def test_idempotency_keys(self) -> None:
+        generator = ReceiptGenerator(duplicate_rate=0.5)
+        requests = store_requests(generator, 100, True)
+        keys = {}
+        for request in requests:
+            keys.setdefault(request.headers['Idempotency-Key'], set()).add(
+                request.body
+            )
+
+        assert len(keys) == generator.generated
+        assert all(len(bodies) == 1 for bodies in keys.values())
+        assert b'Idempotency-Key: load-0\r\n' in requests[0].encode('host')
+
+    def test_request_mix(self) -> None:
+        stores = [LoadRequest('POST', '/receipts/process', b'{}')]
+        next_request = request_mix(stores, 0.5, 0)
+        requests = [next_request() for i in range(1000)]
+        reads = [request for request in requests if request.method == 'GET']
+
+        assert requests[0].method == 'POST'
+        assert 400 < len(reads) < 600
+        assert all(
+            int(request.path.split('/')[2]) <= 1000 - len(reads)
+            for request in reads
+        )
+
+    def test_unpaced(self) -> None:
+        result = asyncio.run(run_local_load(connections=4, duration=0.2))
+
+        assert result.statuses[200] == len(result.latencies) > 0
+        assert result.errors == 0
+
+    def test_paced(self) -> None:
+        result = asyncio.run(run_local_load(
+            connections=4, duration=0.5, rate=100
+        ))
+
+        assert 30 <= len(result.latencies) <= 50
+
+class TestLoadResult:
+    def test_percentile_distribution(self) -> None:
+        result = LoadResult()
+        result.latencies = [i / 1000 for i in range(100, 0, -1)]
+        distribution = result.percentile_distribution()
+
+        assert distribution[0] == (0.001, 0.0, 1)
+        assert distribution[5] == (0.05, 0.5, 50)
+        assert distribution[-1] == (0.1, 1.0, 100)
+        assert [row[1] for row in distribution[5:10]] == [
+            0.5, 0.55, 0.6, 0.65, 0.7
+        ]
+
+    def test_format_distribution(self) -> None:
+        result = LoadResult()
+        result.latencies = [0.001, 0.002, 0.003, 0.004]
+        lines = result.format_distribution().splitlines()
+
+        assert lines[0].split() == [
+            'Value', 'Percentile', 'TotalCount', '1/(1-Percentile)'
+        ]
+        assert lines[2].split() == ['1.000', '0.000000000000', '1', '1.00']
+        assert lines[-3].split() == ['4.000', '1.000000000000', '4']
+        assert lines[-1].startswith('#[Max     =        4.000')
+
+    def test_empty(self) -> None:
+        assert LoadResult().percentile_distribution() == []
@@ -1,9 +1,12 @@
 import math
 from datetime import date, datetime
+from hypothesis import given, strategies as st
 from pytest_mock import MockerFixture
 
 import app.point_calculator as pc
 from app.purchased_item import PurchasedItem
+from app.receipt import Receipt
+from app.receipt_parser import parse_cents
 from app.tests.helpers.mockers import mock_purchased_item, mock_receipt
 
 class TestScoreName:
@@ -69,40 +72,40 @@ class TestScoreTotalCost:
         assert pc._score_total_cost(0) == 75
 
     def test_1_cent(self) -> None:
-        assert pc._score_total_cost(75.1) == 0
+        assert pc._score_total_cost(7510) == 0
 
     def test_24_cents(self) -> None:
-        assert pc._score_total_cost(100.24) == 0
+        assert pc._score_total_cost(10024) == 0
 
     def test_25_cents(self) -> None:
-        assert pc._score_total_cost(5.25) == 25
+        assert pc._score_total_cost(525) == 25
 
     def test_26_cents(self) -> None:
-        assert pc._score_total_cost(78.26) == 0
+        assert pc._score_total_cost(7826) == 0
 
     def test_49_cents(self) -> None:
-        assert pc._score_total_cost(2.49) == 0
+        assert pc._score_total_cost(249) == 0
 
     def test_50_cents(self) -> None:
-        assert pc._score_total_cost(8.50) == 25
+        assert pc._score_total_cost(850) == 25
 
     def test_51_cents(self) -> None:
-        assert pc._score_total_cost(20.51) == 0
+        assert pc._score_total_cost(2051) == 0
 
     def test_74_cents(self) -> None:
-        assert pc._score_total_cost(54.71) == 0
+        assert pc._score_total_cost(5471) == 0
 
     def test_75_cents(self) -> None:
-        assert pc._score_total_cost(0.75) == 25
+        assert pc._score_total_cost(75) == 25
 
     def test_76_cents(self) -> None:
-        assert pc._score_total_cost(5420.76) == 0
+        assert pc._score_total_cost(542076) == 0
 
     def test_99_cents(self) -> None:
-        assert pc._score_total_cost(90.99) == 0
+        assert pc._score_total_cost(9099) == 0
 
     def test_round_dollar_amt(self) -> None:
-        assert pc._score_total_cost(17.00) == 75
+        assert pc._score_total_cost(1700) == 75
 
 class TestScorePurchasedItems:
     PRICE_FACTOR = 0.2
@@ -112,7 +115,8 @@ class TestScorePurchasedItems:
 
     def test_empty_desc(self, mocker: MockerFixture) -> None:
         mock_item = mock_purchased_item(mocker, '', 2.50)
-        expected_score = int(math.ceil(mock_item.price * self.PRICE_FACTOR))
+        expected_score = int(math.ceil(mock_item.get_price()
+                                       * self.PRICE_FACTOR))
         assert pc._score_purchased_items([mock_item]) == expected_score
 
     def test_non_mult3_desc(self, mocker: MockerFixture) -> None:
@@ -121,12 +125,14 @@ class TestScorePurchasedItems:
 
     def test_mult3_desc(self, mocker: MockerFixture) -> None:
         mock_item = mock_purchased_item(mocker, 'And', 523)
-        expected_score = int(math.ceil(mock_item.price * self.PRICE_FACTOR))
+        expected_score = int(math.ceil(mock_item.get_price()
+                                       * self.PRICE_FACTOR))
         assert pc._score_purchased_items([mock_item]) == expected_score
 
     def test_mult3_starting_whitespace(self, mocker: MockerFixture) -> None:
         mock_item = mock_purchased_item(mocker, '  Course', 10.40)
-        expected_score = int(math.ceil(mock_item.price * self.PRICE_FACTOR))
+        expected_score = int(math.ceil(mock_item.get_price()
+                                       * self.PRICE_FACTOR))
         assert pc._score_purchased_items([mock_item]) == expected_score
 
     def test_non_mult3_starting_whitespace(self, mocker: MockerFixture) -> None:
@@ -135,7 +141,8 @@ class TestScorePurchasedItems:
 
     def test_mult3_ending_whitespace(self, mocker: MockerFixture) -> None:
         mock_item = mock_purchased_item(mocker, 'Ice Cream    ', 934.32)
-        expected_score = int(math.ceil(mock_item.price * self.PRICE_FACTOR))
+        expected_score = int(math.ceil(mock_item.get_price()
+                                       * self.PRICE_FACTOR))
         assert pc._score_purchased_items([mock_item]) == expected_score
 
     def test_non_mult3_ending_whitespace(self, mocker: MockerFixture) -> None:
@@ -144,7 +151,8 @@ class TestScorePurchasedItems:
 
     def test_mult3_whitespace_both(self, mocker:MockerFixture) -> None:
         mock_item = mock_purchased_item(mocker, '   Modern Computer ', 4100.89)
-        expected_score = int(math.ceil(mock_item.price * self.PRICE_FACTOR))
+        expected_score = int(math.ceil(mock_item.get_price()
+                                       * self.PRICE_FACTOR))
         assert pc._score_purchased_items([mock_item]) == expected_score
 
     def test_non_mult3_whitespace_both(self, mocker:MockerFixture) -> None:
@@ -237,4 +245,116 @@ class TestScoreReceipt:
             ]
         )
 
-        assert pc.score_receipt(receipt) == 81
\ No newline at end of file
+        assert pc.score_receipt(receipt) == 81
+
+class TestScoreReceipts:
+    def test_no_receipts(self) -> None:
+        assert pc.score_receipts([]) == []
+
+    def test_order(self, mocker: MockerFixture) -> None:
+        receipt1 = mock_receipt(
+            mocker,
+            'Target',
+            date(2022, 1, 1),
+            datetime(2022, 1, 1, hour=13, minute=1),
+            35.35,
+            []
+        )
+        receipt2 = mock_receipt(
+            mocker,
+            'Walmart',
+            date(2022, 1, 2),
+            datetime(2022, 1, 2, hour=15, minute=0),
+            1.00,
+            []
+        )
+
+        assert pc.score_receipts([receipt1, receipt2]) == [12, 92]
+
+## Calculate the points for a total cost with the float model that preceded
+## integer cents.
+##
+## Parameters:
+##     total_cost (float): the total cost of the receipt in dollars
+##
+## Returns:
+##     An int for the amount of points scored for the total cost.
+##
+def float_score_total_cost(total_cost: float) -> int:
+    cost_points = 0
+    cost_cents, _cost_dollars = math.modf(total_cost)
+    cost_cents *= 100
+
+    if cost_cents % 25 == 0:
+        cost_points += 25
+    if cost_cents == 0:
+        cost_points += 50
+
+    return cost_points
+
+## Calculate the points for an item price with the float model that preceded
+## integer cents.
+##
+## Parameters:
+##     price (float): the price of the item in dollars
+##
+## Returns:
+##     An int for the amount of points scored for the price of an item with a
+##     description whose trimmed length is a multiple of 3.
+##
+def float_score_price(price: float) -> int:
+    return math.ceil(price * 0.2)
+
+money_strings = st.builds(
+    lambda dollars, cents: f'{dollars}.{cents:02d}',
+    st.integers(min_value=0, max_value=10 ** 7),
+    st.integers(min_value=0, max_value=99)
+)
+
+class TestIntegerCentsProperties:
+    @given(money_strings)
+    def test_total_cost_matches_float_model(self, total: str) -> None:
+        expected = float_score_total_cost(float(total))
+        assert pc._score_total_cost(parse_cents(total)) == expected
+
+    @given(money_strings)
+    def test_price_matches_float_model(self, price: str) -> None:
+        item = PurchasedItem({'shortDescription': 'abc', 'price': price})
+        expected = float_score_price(float(price))
+        assert pc._score_purchased_items([item]) == expected
+
+    @given(
+        st.text(alphabet='ab &-1', max_size=20),
+        st.dates(),
+        st.times(),
+        money_strings,
+        st.lists(
+            st.tuples(st.text(alphabet='ab -1', max_size=12), money_strings),
+            max_size=6
+        )
+    )
+    def test_receipt_matches_float_model(self, retailer: str, purchase_date,
+                                         purchase_time, total: str,
+                                         items: list[tuple]) -> None:
+        receipt = Receipt({
+            'retailer': retailer,
+            'purchaseDate': purchase_date.isoformat(),
+            'purchaseTime': purchase_time.strftime('%H:%M'),
+            'total': total,
+            'items': [
+                {'shortDescription': desc, 'price': price}
+                for desc, price in items
+            ]
+        })
+
+        expected = pc._score_name(retailer)
+        expected += pc._score_purchase_date(receipt.get_purchase_date())
+        expected += pc._score_purchase_time(receipt.get_purchase_time())
+        expected += float_score_total_cost(float(total))
+        expected += 5 * (len(items) // 2)
+        expected += sum(
+            float_score_price(float(price))
+            for desc, price in items if len(desc.strip()) % 3 == 0
+        )
+
+        assert pc.score_receipt(receipt) == expected
@@ -41,6 +41,21 @@ class TestMissingKeys:
         error_msg = 'Item in receipt must define the price key:'
         assert str(excinfo.value.args[0]).startswith(error_msg)
 
+class TestInvalidData:
+    def test_not_object(self) -> None:
+        with pytest.raises(ValueError) as excinfo:
+            PurchasedItem(5)
+
+        error_msg = 'Item in receipt must be a JSON object: 5'
+        assert str(excinfo.value.args[0]) == error_msg
+
+    def test_non_string_desc(self) -> None:
+        with pytest.raises(ValueError) as excinfo:
+            PurchasedItem({'shortDescription': ['Curtains'], 'price': '1.00'})
+
+        error_msg = "Item short description must be a string: ['Curtains']"
+        assert str(excinfo.value.args[0]) == error_msg
+
 class TestParsePrice:
     EXPECTED_ERROR_MSG = 'Price could not be parsed for item:'
 
@@ -60,15 +75,15 @@ class TestParsePrice:
 
     def test_zero(self) -> None:
         item = self.create_test_item()
-        assert item._parse_price('0.00') == 0.00
+        assert item._parse_price('0.00') == 0
 
     def test_under_one_dollar(self) -> None:
         item = self.create_test_item()
-        assert item._parse_price('0.77') == 0.77
+        assert item._parse_price('0.77') == 77
 
     def test_normal_price(self) -> None:
         item = self.create_test_item()
-        assert item._parse_price('60.34') == 60.34
+        assert item._parse_price('60.34') == 6034
 
     def test_non_number(self) -> None:
         item = self.create_test_item()
@@ -88,6 +103,14 @@ class TestParsePrice:
 
         assert str(excinfo.value.args[0]).startswith(self.EXPECTED_ERROR_MSG)
 
+    def test_one_decimal(self) -> None:
+        item = self.create_test_item()
+
+        with pytest.raises(ValueError) as excinfo:
+            item._parse_price('6.5')
+
+        assert str(excinfo.value.args[0]).startswith(self.EXPECTED_ERROR_MSG)
+
 class TestGetShortDescription:
     def test_empty_string(self) -> None:
         item = PurchasedItem({
@@ -133,6 +156,15 @@ class TestGetShortDescription:
 
         assert item.get_short_description() == desc
 
+class TestGetPriceCents:
+    def test_normal_price(self) -> None:
+        item = PurchasedItem({
+            'shortDescription': 'Turkey',
+            'price': '30.39'
+        })
+
+        assert item.get_price_cents() == 3039
+
 class TestGetPrice:
     def test_normal_price(self) -> None:
         item = PurchasedItem({
@@ -164,4 +196,23 @@ class TestGetPrice:
             'price': '0.00'
         })
 
-        assert item.get_price() == 0.00
\ No newline at end of file
+        assert item.get_price() == 0.00
+
+class TestToDict:
+    def test_format(self) -> None:
+        item_data = {'shortDescription': 'Pear', 'price': '5.30'}
+        assert PurchasedItem(item_data).to_dict() == item_data
+
+class TestCompactStorage:
+    def test_no_instance_dict(self) -> None:
+        item = PurchasedItem({'shortDescription': 'Pear', 'price': '5.30'})
+        assert not hasattr(item, '__dict__')
+
+    def test_shared_description(self) -> None:
+        item1 = PurchasedItem({'shortDescription': 'Pear', 'price': '5.30'})
+        item2 = PurchasedItem({
+            'shortDescription': ''.join(['Pe', 'ar']),
+            'price': '5.30'
+        })
+
+        assert item1.short_description is item2.short_description
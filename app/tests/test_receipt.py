@@ -312,20 +312,66 @@ class TestParseTime:
 
         assert str(excinfo.value.args[0]).startswith(self.EXPECTED_ERROR_MSG)
 
+class TestInvalidData:
+    def test_not_object(self) -> None:
+        with pytest.raises(ValueError) as excinfo:
+            Receipt(['retailer'])
+
+        error_msg = 'Receipt must be a JSON object:'
+        assert str(excinfo.value.args[0]).startswith(error_msg)
+
+    def test_number(self) -> None:
+        with pytest.raises(ValueError):
+            Receipt(1)
+
+    def test_items_not_array(self) -> None:
+        receipt_data = create_test_receipt().to_dict()
+        receipt_data['items'] = {'shortDescription': 'Pepsi', 'price': '1.00'}
+        with pytest.raises(ValueError) as excinfo:
+            Receipt(receipt_data)
+
+        error_msg = 'Receipt items must be a JSON array:'
+        assert str(excinfo.value.args[0]).startswith(error_msg)
+
+    def test_item_not_object(self) -> None:
+        receipt_data = create_test_receipt().to_dict()
+        receipt_data['items'] = [5]
+        with pytest.raises(ValueError) as excinfo:
+            Receipt(receipt_data)
+
+        error_msg = 'Item in receipt must be a JSON object:'
+        assert str(excinfo.value.args[0]).startswith(error_msg)
+
+    def test_non_string_time(self) -> None:
+        with pytest.raises(ValueError) as excinfo:
+            create_test_receipt()._parse_time(1301)
+
+        error_msg = 'Receipt purchase time does not match "H:M": 1301'
+        assert str(excinfo.value.args[0]) == error_msg
+
+    def test_non_string_retailer(self) -> None:
+        receipt_data = create_test_receipt().to_dict()
+        receipt_data['retailer'] = 5
+        with pytest.raises(ValueError) as excinfo:
+            Receipt(receipt_data)
+
+        error_msg = 'Receipt retailer must be a string: 5'
+        assert str(excinfo.value.args[0]) == error_msg
+
 class TestParseTotalCost:
     EXPECTED_ERROR_MSG = 'Total could not be parsed for receipt:'
 
     def test_normal_cost(self) -> None:
         receipt = create_test_receipt()
-        assert receipt._parse_total_cost('132.86') == 132.86
+        assert receipt._parse_total_cost('132.86') == 13286
 
     def test_under_one_dollar(self) -> None:
         receipt = create_test_receipt()
-        assert receipt._parse_total_cost('0.01') == 0.01
+        assert receipt._parse_total_cost('0.01') == 1
 
     def test_zero(self) -> None:
         receipt = create_test_receipt()
-        assert receipt._parse_total_cost('0.00') == 0.00
+        assert receipt._parse_total_cost('0.00') == 0
 
     def test_empty_string(self) -> None:
         receipt = create_test_receipt()
@@ -351,6 +397,22 @@ class TestParseTotalCost:
 
         assert str(excinfo.value.args[0]).startswith(self.EXPECTED_ERROR_MSG)
 
+    def test_missing_cents(self) -> None:
+        receipt = create_test_receipt()
+
+        with pytest.raises(ValueError) as excinfo:
+            receipt._parse_total_cost('28')
+
+        assert str(excinfo.value.args[0]).startswith(self.EXPECTED_ERROR_MSG)
+
+    def test_number(self) -> None:
+        receipt = create_test_receipt()
+
+        with pytest.raises(ValueError) as excinfo:
+            receipt._parse_total_cost(28.5)
+
+        assert str(excinfo.value.args[0]).startswith(self.EXPECTED_ERROR_MSG)
+
 class TestParsePurchasedItems:
     def test_zero_items(self) -> None:
         receipt = create_test_receipt()
@@ -585,6 +647,23 @@ class TestGetTotalCost:
 
         assert receipt.get_total_cost() == 205.51
 
+class TestGetTotalCents:
+    def test_normal(self) -> None:
+        receipt = Receipt({
+            'retailer': 'Hobby Lobby',
+            'purchaseDate': '2008-12-03',
+            'purchaseTime': '02:39',
+            'items': [
+                {
+                    'shortDescription': 'Couch',
+                    'price': '35.35'
+                }
+            ],
+            'total': '35.35'
+        })
+
+        assert receipt.get_total_cents() == 3535
+
 class TestGetPurchasedItems:
     def test_zero_items(self) -> None:
         receipt = Receipt({
@@ -645,4 +724,33 @@ class TestGetPurchasedItems:
             mock_purchased_item(mocker, 'Necklace', 283.88)
         ]
 
-        assert receipt.get_purchased_items() == expected_items
\ No newline at end of file
+        assert receipt.get_purchased_items() == expected_items
+
+class TestToDict:
+    def test_round_trip(self) -> None:
+        receipt = create_test_receipt()
+        assert Receipt(receipt.to_dict()) == receipt
+
+    def test_format(self) -> None:
+        receipt_data = {
+            'retailer': 'Target',
+            'purchaseDate': '2022-01-02',
+            'purchaseTime': '08:13',
+            'total': '2.50',
+            'items': [
+                {'shortDescription': 'Pepsi - 12-oz', 'price': '1.25'},
+                {'shortDescription': 'Pepsi - 12-oz', 'price': '1.25'}
+            ]
+        }
+
+        assert Receipt(receipt_data).to_dict() == receipt_data
+
+class TestCompactStorage:
+    def test_no_instance_dict(self) -> None:
+        receipt = create_test_receipt()
+        assert not hasattr(receipt, '__dict__')
+
+    def test_shared_retailer(self) -> None:
+        receipt1 = create_test_receipt()
+        receipt2 = Receipt(receipt1.to_dict())
+        assert receipt1.retailer is receipt2.retailer
@@ -1,7 +1,21 @@
+import pytest
+import sys
+import threading
+import time
 from datetime import date, datetime
 from pytest_mock import MockerFixture
 
-from app.receipt_database import ReceiptDatabase
+from app.receipt import Receipt
+from app.receipt_database import (
+    create_receipt_db, ReceiptDatabase, ShardedReceiptDatabase
+)
+from app.receipt_ids import (
+    SequentialIdGenerator, SnowflakeIdGenerator, decode_snowflake
+)
+from app.receipt_journal import ReceiptJournal
+from app.receipt_storage import (
+    LRUReceiptStorage, PackedPointsStorage, SqliteReceiptStorage
+)
 from app.tests.helpers.mockers import mock_purchased_item, mock_receipt
 
 class TestGenerateId:
@@ -273,7 +287,7 @@ class TestAddReceipt:
 
         receipt_db.add_receipt(receipt_data)
         receipt = receipt_db.receipts['1']
-        assert receipt.total_cost == 29.98
+        assert receipt.total_cents == 2998
 
     def test_first_item(self, mocker: MockerFixture) -> None:
         receipt_db = ReceiptDatabase()
@@ -331,4 +345,1078 @@ class TestAddReceipt:
 
         receipt_db.add_receipt(receipt_data)
         second_item = receipt_db.receipts['1'].purchased_items[1]
-        assert second_item == item2
\ No newline at end of file
+        assert second_item == item2
+
+class TestPointsCache:
+    RECEIPT_DATA = {
+        'retailer': 'Target',
+        'purchaseDate': '2022-01-01',
+        'purchaseTime': '13:01',
+        'total': '35.35',
+        'items': [
+            {'shortDescription': 'Mountain Dew 12PK', 'price': '6.49'},
+            {'shortDescription': 'Emils Cheese Pizza', 'price': '12.25'},
+            {'shortDescription': 'Knorr Creamy Chicken', 'price': '1.26'},
+            {'shortDescription': 'Doritos Nacho Cheese', 'price': '3.35'},
+            {
+                'shortDescription': '   Klarbrunn 12-PK 12 FL OZ  ',
+                'price': '12.00'
+            }
+        ]
+    }
+
+    def test_invalid_mode(self) -> None:
+        with pytest.raises(ValueError):
+            ReceiptDatabase(points_cache='sometimes')
+
+    def test_missing(self) -> None:
+        receipt_db = ReceiptDatabase()
+        assert receipt_db.get_points('1') == None
+
+    def test_points(self) -> None:
+        receipt_db = ReceiptDatabase()
+        id = receipt_db.add_receipt(self.RECEIPT_DATA)
+        assert receipt_db.get_points(id) == 28
+
+    def test_lazy_fill(self) -> None:
+        receipt_db = ReceiptDatabase(points_cache='lazy')
+        id = receipt_db.add_receipt(self.RECEIPT_DATA)
+        assert id not in receipt_db.points
+
+        receipt_db.get_points(id)
+        assert receipt_db.points[id] == 28
+
+    def test_lazy_stats(self) -> None:
+        receipt_db = ReceiptDatabase(points_cache='lazy')
+        id = receipt_db.add_receipt(self.RECEIPT_DATA)
+
+        for i in range(3):
+            receipt_db.get_points(id)
+
+        stats = receipt_db.get_cache_stats()
+        assert stats == {'hits': 2, 'misses': 1, 'size': 1}
+
+    def test_eager_fill(self) -> None:
+        receipt_db = ReceiptDatabase(points_cache='eager')
+        id = receipt_db.add_receipt(self.RECEIPT_DATA)
+        assert receipt_db.points[id] == 28
+
+    def test_eager_stats(self) -> None:
+        receipt_db = ReceiptDatabase(points_cache='eager')
+        id = receipt_db.add_receipt(self.RECEIPT_DATA)
+
+        for i in range(3):
+            receipt_db.get_points(id)
+
+        stats = receipt_db.get_cache_stats()
+        assert stats == {'hits': 3, 'misses': 0, 'size': 1}
+
+    def test_off(self, mocker: MockerFixture) -> None:
+        receipt_db = ReceiptDatabase(points_cache='off')
+        id = receipt_db.add_receipt(self.RECEIPT_DATA)
+        score = mocker.patch('app.receipt_database.score_receipt',
+                             return_value=28)
+
+        for i in range(3):
+            assert receipt_db.get_points(id) == 28
+
+        assert score.call_count == 3
+        assert receipt_db.get_cache_stats()['size'] == 0
+
+    def test_hit_skips_scoring(self, mocker: MockerFixture) -> None:
+        receipt_db = ReceiptDatabase()
+        id = receipt_db.add_receipt(self.RECEIPT_DATA)
+        receipt_db.get_points(id)
+        score = mocker.patch('app.receipt_database.score_receipt')
+
+        receipt_db.get_points(id)
+        score.assert_not_called()
+
+class TestAddReceipts:
+    RECEIPT_DATA = {
+        'retailer': 'Sears',
+        'purchaseDate': '2018-04-30',
+        'purchaseTime': '15:08',
+        'total': '7.99',
+        'items': [
+            {
+                'shortDescription': 'Hangers',
+                'price': '7.99'
+            }
+        ]
+    }
+
+    def test_empty(self) -> None:
+        receipt_db = ReceiptDatabase()
+        assert receipt_db.add_receipts([]) == []
+
+    def test_ids(self) -> None:
+        receipt_db = ReceiptDatabase()
+        ids = receipt_db.add_receipts([self.RECEIPT_DATA] * 3)
+        assert ids == ['1', '2', '3']
+
+    def test_stored(self) -> None:
+        receipt_db = ReceiptDatabase()
+        ids = receipt_db.add_receipts([self.RECEIPT_DATA] * 2)
+
+        for id in ids:
+            assert receipt_db.get_receipt(id).retailer == 'Sears'
+
+    def test_invalid_receipt(self) -> None:
+        receipt_db = ReceiptDatabase()
+        invalid_data = dict(self.RECEIPT_DATA, total='Two')
+        results = receipt_db.add_receipts([
+            self.RECEIPT_DATA, invalid_data, self.RECEIPT_DATA
+        ])
+
+        assert results[0] == '1' and results[2] == '2'
+        assert isinstance(results[1], ValueError)
+
+    def test_missing_key(self) -> None:
+        receipt_db = ReceiptDatabase()
+        results = receipt_db.add_receipts([{'retailer': 'Sears'}])
+        assert isinstance(results[0], KeyError) and len(receipt_db.receipts) == 0
+
+    def test_not_object(self) -> None:
+        receipt_db = ReceiptDatabase()
+        invalid_item = dict(self.RECEIPT_DATA, items=[5])
+        results = receipt_db.add_receipts([
+            self.RECEIPT_DATA, 1, invalid_item, ['retailer']
+        ])
+
+        assert results[0] == '1'
+        assert all(isinstance(result, ValueError) for result in results[1:])
+
+    def test_not_object_content_ids(self) -> None:
+        receipt_db = ReceiptDatabase(id_mode='content')
+        results = receipt_db.add_receipts([1, self.RECEIPT_DATA])
+
+        assert isinstance(results[0], ValueError)
+        assert len(receipt_db.receipts) == 1
+
+    def test_continues_ids(self) -> None:
+        receipt_db = ReceiptDatabase()
+        receipt_db.add_receipt(self.RECEIPT_DATA)
+        assert receipt_db.add_receipts([self.RECEIPT_DATA]) == ['2']
+
+    def test_eager_points(self) -> None:
+        receipt_db = ReceiptDatabase(points_cache='eager')
+        ids = receipt_db.add_receipts([self.RECEIPT_DATA])
+        assert receipt_db.points[ids[0]] == 15
+
+class TestGetReceipts:
+    RECEIPT_DATA = TestAddReceipts.RECEIPT_DATA
+
+    def test_empty_db(self) -> None:
+        receipt_db = ReceiptDatabase()
+        assert receipt_db.get_receipts(['1', '2']) == {'1': None, '2': None}
+
+    def test_found_and_missing(self) -> None:
+        receipt_db = ReceiptDatabase()
+        receipt_db.add_receipts([self.RECEIPT_DATA] * 2)
+        receipts = receipt_db.get_receipts(['2', '3'])
+
+        assert receipts['2'] is receipt_db.receipts['2']
+        assert receipts['3'] == None
+
+class TestGetReceiptsPoints:
+    RECEIPT_DATA = TestAddReceipts.RECEIPT_DATA
+
+    def test_empty_db(self) -> None:
+        receipt_db = ReceiptDatabase()
+        assert receipt_db.get_receipts_points(['1']) == {'1': None}
+
+    def test_points(self) -> None:
+        receipt_db = ReceiptDatabase()
+        receipt_db.add_receipts([self.RECEIPT_DATA] * 2)
+        points = receipt_db.get_receipts_points(['1', '2', '3'])
+        assert points == {'1': 15, '2': 15, '3': None}
+
+    def test_fills_cache(self) -> None:
+        receipt_db = ReceiptDatabase()
+        receipt_db.add_receipts([self.RECEIPT_DATA] * 2)
+        receipt_db.get_receipts_points(['1', '2'])
+        assert receipt_db.points == {'1': 15, '2': 15}
+
+    def test_stats(self) -> None:
+        receipt_db = ReceiptDatabase()
+        receipt_db.add_receipts([self.RECEIPT_DATA] * 2)
+        receipt_db.get_points('1')
+        receipt_db.get_receipts_points(['1', '2'])
+
+        stats = receipt_db.get_cache_stats()
+        assert stats == {'hits': 1, 'misses': 2, 'size': 2}
+
+    def test_batch_scoring(self, mocker: MockerFixture) -> None:
+        receipt_db = ReceiptDatabase()
+        receipt_db.add_receipts([self.RECEIPT_DATA] * 3)
+        receipt_db.get_points('1')
+        score = mocker.patch('app.receipt_database.score_receipts',
+                             return_value=[15, 15])
+
+        receipt_db.get_receipts_points(['1', '2', '3'])
+        score.assert_called_once_with([
+            receipt_db.receipts['2'], receipt_db.receipts['3']
+        ])
+
+class TestExport:
+    RECEIPT_DATA = TestAddReceipts.RECEIPT_DATA
+
+    def test_empty_db(self) -> None:
+        assert list(ReceiptDatabase().export()) == []
+
+    def test_rows(self) -> None:
+        receipt_db = ReceiptDatabase()
+        receipt_db.add_receipts([self.RECEIPT_DATA] * 3)
+        rows = list(receipt_db.export(chunk_size=2))
+
+        assert [(id, points) for id, _receipt, points in rows] == [
+            ('1', 15), ('2', 15), ('3', 15)
+        ]
+        assert rows[0][1] is receipt_db.receipts['1']
+
+    def test_since(self) -> None:
+        receipt_db = ReceiptDatabase()
+        receipt_db.add_receipts([self.RECEIPT_DATA] * 12)
+        ids = [id for id, _receipt, _points in receipt_db.export('9')]
+        assert ids == ['10', '11', '12']
+
+    def test_since_other_ids(self) -> None:
+        receipt_db = ReceiptDatabase()
+        receipt = Receipt(self.RECEIPT_DATA)
+        receipt_db.store_receipts({'a': receipt, 'c': receipt})
+
+        assert list(receipt_db.export('b')) == [('c', receipt, 15)]
+
+    def test_does_not_fill_cache(self) -> None:
+        receipt_db = ReceiptDatabase()
+        receipt_db.add_receipts([self.RECEIPT_DATA] * 2)
+        receipt_db.get_points('1')
+        list(receipt_db.export())
+
+        assert receipt_db.points == {'1': 15}
+
+    def test_batch_scoring(self, mocker: MockerFixture) -> None:
+        receipt_db = ReceiptDatabase()
+        receipt_db.add_receipts([self.RECEIPT_DATA] * 3)
+        receipt_db.get_points('1')
+        score = mocker.patch('app.receipt_database.score_receipts',
+                             return_value=[15, 15])
+
+        list(receipt_db.export())
+        score.assert_called_once_with([
+            receipt_db.receipts['2'], receipt_db.receipts['3']
+        ])
+
+    def test_points_only(self) -> None:
+        receipt_db = ReceiptDatabase(points_only=True)
+        receipt_db.add_receipts([self.RECEIPT_DATA] * 2)
+        assert list(receipt_db.export()) == [('1', None, 15), ('2', None, 15)]
+
+    def test_store_while_exporting(self) -> None:
+        receipt_db = ReceiptDatabase()
+        receipt_db.add_receipts([self.RECEIPT_DATA] * 3)
+        rows = receipt_db.export(chunk_size=1)
+        next(rows)
+        receipt_db.add_receipt(self.RECEIPT_DATA)
+
+        assert [id for id, _receipt, _points in rows] == ['2', '3']
+
+    def test_sqlite_storage(self, tmp_path) -> None:
+        storage = SqliteReceiptStorage(str(tmp_path / 'receipts.db'))
+        receipt_db = ReceiptDatabase(storage=storage)
+        receipt_db.add_receipts([self.RECEIPT_DATA] * 3)
+        rows = list(receipt_db.export('1', chunk_size=1))
+
+        assert [(id, points) for id, _receipt, points in rows] == [
+            ('2', 15), ('3', 15)
+        ]
+
+    def test_resume_with_capacity(self) -> None:
+        receipt_db = create_receipt_db({'RECEIPT_STORAGE_CAPACITY': 20})
+        receipt_db.add_receipts([self.RECEIPT_DATA] * 10)
+        receipt_db.get_points('3')
+        rows = receipt_db.export(chunk_size=2)
+        first = [next(rows)[0] for i in range(6)]
+        resumed = [id for id, _receipt, _points in receipt_db.export(
+            first[-1]
+        )]
+
+        assert first + resumed == [str(id) for id in range(1, 11)]
+
+    def test_mixed_ids_in_order(self) -> None:
+        receipt_db = ReceiptDatabase()
+        receipt = Receipt(self.RECEIPT_DATA)
+        receipt_db.store_receipts({'b': receipt, '10': receipt,
+                                   'a': receipt, '9': receipt})
+
+        assert [id for id, _receipt, _points in receipt_db.export()] == [
+            '9', '10', 'a', 'b'
+        ]
+        assert [id for id, _receipt, _points in receipt_db.export('10')] == [
+            'a', 'b'
+        ]
+
+class TestPointsOnly:
+    RECEIPT_DATA = TestAddReceipts.RECEIPT_DATA
+
+    def test_packed_storage(self) -> None:
+        receipt_db = ReceiptDatabase(points_only=True)
+        assert isinstance(receipt_db.receipts, PackedPointsStorage)
+
+    def test_stores_points(self) -> None:
+        receipt_db = ReceiptDatabase(points_only=True)
+        id = receipt_db.add_receipt(self.RECEIPT_DATA)
+        assert receipt_db.receipts[id] == 15
+
+    def test_get_points(self) -> None:
+        receipt_db = ReceiptDatabase(points_only=True)
+        id = receipt_db.add_receipt(self.RECEIPT_DATA)
+        assert receipt_db.get_points(id) == 15
+
+    def test_get_missing_points(self) -> None:
+        receipt_db = ReceiptDatabase(points_only=True)
+        assert receipt_db.get_points('1') == None
+
+    def test_get_points_skips_scoring(self, mocker: MockerFixture) -> None:
+        receipt_db = ReceiptDatabase(points_only=True)
+        id = receipt_db.add_receipt(self.RECEIPT_DATA)
+        score = mocker.patch('app.receipt_database.score_receipt')
+
+        receipt_db.get_points(id)
+        score.assert_not_called()
+
+    def test_add_receipts(self) -> None:
+        receipt_db = ReceiptDatabase(points_only=True)
+        invalid_data = dict(self.RECEIPT_DATA, total='Two')
+        results = receipt_db.add_receipts([self.RECEIPT_DATA, invalid_data])
+
+        assert results[0] == '1' and isinstance(results[1], ValueError)
+        assert receipt_db.get_receipts_points(['1', '2']) == {
+            '1': 15, '2': None
+        }
+
+    def test_get_receipt(self) -> None:
+        receipt_db = ReceiptDatabase(points_only=True)
+        id = receipt_db.add_receipt(self.RECEIPT_DATA)
+
+        with pytest.raises(ValueError):
+            receipt_db.get_receipt(id)
+
+    def test_sqlite_storage(self, tmp_path) -> None:
+        storage = SqliteReceiptStorage(str(tmp_path / 'receipts.db'))
+        receipt_db = ReceiptDatabase(storage=storage, points_only=True)
+        id = receipt_db.add_receipt(self.RECEIPT_DATA)
+        assert receipt_db.get_points(id) == 15
+
+class TestConcurrency:
+    RECEIPT_DATA = TestAddReceipts.RECEIPT_DATA
+    THREADS = 8
+    RECEIPTS_PER_THREAD = 500
+
+    ## Run the function in many threads at once, switching between threads as
+    ## often as possible to expose races.
+    ##
+    ## Parameters:
+    ##     func (callable): the function to run in each thread
+    ##
+    ## Returns:
+    ##     A list of the values returned by each thread.
+    ##
+    def run_threads(self, func: callable) -> list:
+        results = [None] * self.THREADS
+        start = threading.Barrier(self.THREADS)
+        interval = sys.getswitchinterval()
+
+        def run(index: int) -> None:
+            start.wait()
+            results[index] = func()
+
+        threads = [
+            threading.Thread(target=run, args=(i,))
+            for i in range(self.THREADS)
+        ]
+
+        sys.setswitchinterval(1e-6)
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.setswitchinterval(interval)
+
+        return results
+
+    ## Add copies of the test receipt to the database one at a time.
+    ##
+    ## Parameters:
+    ##     receipt_db (ReceiptDatabase): the database to add the receipts to
+    ##
+    ## Returns:
+    ##     A list of strings for the ids of the added receipts.
+    ##
+    def add_receipts(self, receipt_db: ReceiptDatabase) -> list[str]:
+        return [
+            receipt_db.add_receipt(self.RECEIPT_DATA)
+            for i in range(self.RECEIPTS_PER_THREAD)
+        ]
+
+    @pytest.mark.parametrize('points_only', [False, True])
+    def test_unique_ids(self, points_only: bool) -> None:
+        receipt_db = ReceiptDatabase(points_only=points_only)
+        results = self.run_threads(lambda: self.add_receipts(receipt_db))
+
+        ids = [id for thread_ids in results for id in thread_ids]
+        total = self.THREADS * self.RECEIPTS_PER_THREAD
+        assert len(set(ids)) == total
+        assert len(receipt_db.receipts) == total
+        assert all(receipt_db.get_points(id) == 15 for id in ids)
+
+    def test_unique_batch_ids(self) -> None:
+        receipt_db = ReceiptDatabase(points_only=True)
+        results = self.run_threads(lambda: receipt_db.add_receipts(
+            [self.RECEIPT_DATA] * self.RECEIPTS_PER_THREAD
+        ))
+
+        ids = [id for thread_ids in results for id in thread_ids]
+        total = self.THREADS * self.RECEIPTS_PER_THREAD
+        assert len(set(ids)) == total
+        assert len(receipt_db.receipts) == total
+
+    def test_reads_during_writes(self) -> None:
+        receipt_db = ReceiptDatabase()
+        id = receipt_db.add_receipt(self.RECEIPT_DATA)
+
+        self.run_threads(lambda: [
+            receipt_db.get_points(id)
+            for i in range(self.RECEIPTS_PER_THREAD)
+        ] + self.add_receipts(receipt_db))
+
+        stats = receipt_db.get_cache_stats()
+        lookups = self.THREADS * self.RECEIPTS_PER_THREAD
+        assert stats['hits'] + stats['misses'] == lookups
+        assert stats['size'] == 1
+
+class TestContentIds:
+    RECEIPT_DATA = TestAddReceipts.RECEIPT_DATA
+
+    def test_same_receipt_same_id(self) -> None:
+        receipt_db = ReceiptDatabase(id_mode='content')
+        id = receipt_db.add_receipt(self.RECEIPT_DATA)
+
+        assert receipt_db.add_receipt(dict(self.RECEIPT_DATA)) == id
+        assert len(receipt_db.receipts) == 1
+
+    def test_resubmit_skips_parsing(self, mocker: MockerFixture) -> None:
+        receipt_db = ReceiptDatabase(id_mode='content')
+        id = receipt_db.add_receipt(self.RECEIPT_DATA)
+        parse = mocker.patch('app.receipt_database.Receipt')
+
+        assert receipt_db.add_receipt(self.RECEIPT_DATA) == id
+        parse.assert_not_called()
+
+    def test_different_receipts(self) -> None:
+        receipt_db = ReceiptDatabase(id_mode='content')
+        id = receipt_db.add_receipt(self.RECEIPT_DATA)
+        other_id = receipt_db.add_receipt(
+            dict(self.RECEIPT_DATA, retailer='Target')
+        )
+
+        assert other_id != id and len(receipt_db.receipts) == 2
+        assert receipt_db.get_points(id) == 15
+
+    def test_batch(self) -> None:
+        receipt_db = ReceiptDatabase(id_mode='content')
+        id = receipt_db.add_receipt(self.RECEIPT_DATA)
+        other_data = dict(self.RECEIPT_DATA, retailer='Target')
+        results = receipt_db.add_receipts([
+            other_data, self.RECEIPT_DATA, {'retailer': 'Target'}, other_data
+        ])
+
+        assert results[1] == id and results[0] == results[3] != id
+        assert isinstance(results[2], KeyError)
+        assert len(receipt_db.receipts) == 2
+
+    def test_points_only(self) -> None:
+        receipt_db = ReceiptDatabase(points_only=True, id_mode='content')
+        id = receipt_db.add_receipt(self.RECEIPT_DATA)
+
+        assert receipt_db.add_receipt(self.RECEIPT_DATA) == id
+        assert receipt_db.get_points(id) == 15
+
+    def test_restores_from_journal(self, tmp_path) -> None:
+        path = str(tmp_path / 'receipts.journal')
+        receipt_db = ReceiptDatabase(
+            journal=ReceiptJournal(path, fsync='os'), id_mode='content'
+        )
+        id = receipt_db.add_receipt(self.RECEIPT_DATA)
+        receipt_db.journal.close()
+
+        restored_db = ReceiptDatabase(
+            journal=ReceiptJournal(path, fsync='os'), id_mode='content'
+        )
+        assert restored_db.add_receipt(self.RECEIPT_DATA) == id
+        assert len(restored_db.receipts) == 1
+        restored_db.journal.close()
+
+    def test_invalid_mode(self) -> None:
+        with pytest.raises(ValueError):
+            ReceiptDatabase(id_mode='random')
+
+class TestIdGenerator:
+    RECEIPT_DATA = TestAddReceipts.RECEIPT_DATA
+
+    def test_add_receipt(self) -> None:
+        receipt_db = ReceiptDatabase(id_generator=SnowflakeIdGenerator(9))
+        id = receipt_db.add_receipt(self.RECEIPT_DATA)
+
+        assert decode_snowflake(id)[1] == 9 and receipt_db.get_points(id) == 15
+
+    def test_add_receipts(self) -> None:
+        receipt_db = ReceiptDatabase(id_generator=SnowflakeIdGenerator(9))
+        results = receipt_db.add_receipts(
+            [self.RECEIPT_DATA, {'retailer': 'Target'}, self.RECEIPT_DATA]
+        )
+
+        assert isinstance(results[1], KeyError)
+        assert results[0] < results[2]
+        assert receipt_db.get_receipts_points([results[0], results[2]]) == {
+            results[0]: 15, results[2]: 15
+        }
+
+    def test_points_only(self) -> None:
+        receipt_db = ReceiptDatabase(points_only=True,
+                                     id_generator=SnowflakeIdGenerator(9))
+        id = receipt_db.add_receipt(self.RECEIPT_DATA)
+
+        assert receipt_db.get_points(id) == 15
+        assert receipt_db.get_points('1') is None
+
+    # A clock that never advances, like one stepped back across a restart.
+    NOW = time.time_ns()
+
+    def test_restores_from_journal(self, tmp_path) -> None:
+        path = str(tmp_path / 'receipts.journal')
+        receipt_db = ReceiptDatabase(
+            journal=ReceiptJournal(path, fsync='os'),
+            id_generator=SnowflakeIdGenerator(9, clock=lambda: self.NOW)
+        )
+        ids = receipt_db.add_receipts([self.RECEIPT_DATA] * 3)
+        receipt_db.journal.close()
+
+        restored_db = ReceiptDatabase(
+            journal=ReceiptJournal(path, fsync='os'),
+            id_generator=SnowflakeIdGenerator(9, clock=lambda: self.NOW)
+        )
+        assert restored_db.get_points(ids[2]) == 15
+        assert restored_db.add_receipt(self.RECEIPT_DATA) > max(ids)
+        assert len(restored_db.receipts) == 4
+        restored_db.journal.close()
+
+    def test_restores_from_snapshot(self, tmp_path) -> None:
+        path = str(tmp_path / 'receipts.snapshot')
+        receipt_db = ReceiptDatabase(
+            snapshot_path=path,
+            id_generator=SnowflakeIdGenerator(9, clock=lambda: self.NOW)
+        )
+        ids = receipt_db.add_receipts([self.RECEIPT_DATA] * 3)
+        receipt_db.save_snapshot()
+
+        restored_db = ReceiptDatabase(
+            snapshot_path=path,
+            id_generator=SnowflakeIdGenerator(9, clock=lambda: self.NOW)
+        )
+        assert restored_db.add_receipt(self.RECEIPT_DATA) > max(ids)
+        assert len(restored_db.receipts) == 4
+
+    def test_restores_from_sqlite(self, tmp_path) -> None:
+        path = str(tmp_path / 'receipts.db')
+        receipt_db = ReceiptDatabase(
+            storage=SqliteReceiptStorage(path),
+            id_generator=SnowflakeIdGenerator(9, clock=lambda: self.NOW)
+        )
+        id = receipt_db.add_receipt(self.RECEIPT_DATA)
+
+        restored_db = ReceiptDatabase(
+            storage=SqliteReceiptStorage(path),
+            id_generator=SnowflakeIdGenerator(9, clock=lambda: self.NOW)
+        )
+        assert restored_db.add_receipt(self.RECEIPT_DATA) > id
+        assert len(restored_db.receipts) == 2
+
+    def test_sequential_generator_restores(self, tmp_path) -> None:
+        path = str(tmp_path / 'receipts.journal')
+        receipt_db = ReceiptDatabase(
+            journal=ReceiptJournal(path, fsync='os'),
+            id_generator=SequentialIdGenerator()
+        )
+        receipt_db.add_receipts([self.RECEIPT_DATA] * 3)
+        receipt_db.journal.close()
+
+        restored_db = ReceiptDatabase(
+            journal=ReceiptJournal(path, fsync='os'),
+            id_generator=SequentialIdGenerator()
+        )
+        assert restored_db.add_receipt(self.RECEIPT_DATA) == '4'
+        restored_db.journal.close()
+
+    def test_content_ids(self) -> None:
+        with pytest.raises(ValueError):
+            ReceiptDatabase(id_mode='content',
+                            id_generator=SnowflakeIdGenerator(9))
+
+    def test_create_from_config(self) -> None:
+        receipt_db = create_receipt_db({
+            'RECEIPT_ID_MODE': 'snowflake', 'RECEIPT_SHARD_ID': 12
+        })
+        id = receipt_db.add_receipt(self.RECEIPT_DATA)
+
+        assert receipt_db.id_mode == 'sequential'
+        assert decode_snowflake(id)[1] == 12
+
+    def test_create_from_config_default_shard(self) -> None:
+        receipt_db = create_receipt_db({'RECEIPT_ID_MODE': 'snowflake'})
+
+        assert receipt_db.id_generator.shard == 0
+
+    def test_create_from_config_worker_index(self) -> None:
+        receipt_db = create_receipt_db({
+            'RECEIPT_ID_MODE': 'snowflake', 'RECEIPT_SHARD_ID': 8,
+            'RECEIPT_WORKER_INDEX': 3
+        })
+
+        assert receipt_db.id_generator.shard == 11
+
+    def test_create_from_config_shard_too_large(self) -> None:
+        with pytest.raises(ValueError):
+            create_receipt_db({
+                'RECEIPT_ID_MODE': 'snowflake', 'RECEIPT_SHARD_ID': 1020,
+                'RECEIPT_WORKER_INDEX': 4
+            })
+
+class TestShardedReceiptDatabase:
+    RECEIPT_DATA = TestAddReceipts.RECEIPT_DATA
+
+    @pytest.fixture(scope='function')
+    def sharded_db(self) -> ShardedReceiptDatabase:
+        return ShardedReceiptDatabase(
+            [ReceiptDatabase(idempotency_keys=0) for i in range(4)]
+        )
+
+    def test_spreads_receipts(self,
+                              sharded_db: ShardedReceiptDatabase) -> None:
+        ids = [sharded_db.add_receipt(self.RECEIPT_DATA) for i in range(100)]
+        sizes = [
+            len(partition.receipts) for partition in sharded_db.partitions
+        ]
+
+        assert ids == [str(i) for i in range(1, 101)]
+        assert sum(sizes) == 100 and min(sizes) > 10
+
+    def test_routes_lookups(self,
+                            sharded_db: ShardedReceiptDatabase) -> None:
+        id = sharded_db.add_receipt(self.RECEIPT_DATA)
+        holders = [
+            partition for partition in sharded_db.partitions
+            if id in partition.receipts
+        ]
+
+        assert len(holders) == 1
+        assert sharded_db.get_points(id) == 15
+        assert sharded_db.get_receipt(id) is holders[0].get_receipt(id)
+        assert sharded_db.get_points('missing') is None
+
+    def test_add_receipts(self, sharded_db: ShardedReceiptDatabase) -> None:
+        results = sharded_db.add_receipts(
+            [self.RECEIPT_DATA, {'retailer': 'Target'}] * 3
+        )
+
+        assert results[0::2] == ['1', '2', '3']
+        assert all(isinstance(result, KeyError) for result in results[1::2])
+        assert sharded_db.get_points('3') == 15
+
+    def test_gathers_in_order(self,
+                              sharded_db: ShardedReceiptDatabase) -> None:
+        sharded_db.add_receipts([self.RECEIPT_DATA] * 10)
+        ids = ['7', 'missing', '2', '10', '5']
+
+        points = sharded_db.get_receipts_points(ids)
+        receipts = sharded_db.get_receipts(ids)
+
+        assert list(points) == ids and list(receipts) == ids
+        assert points == {
+            '7': 15, 'missing': None, '2': 15, '10': 15, '5': 15
+        }
+        assert receipts['missing'] is None
+
+    def test_content_ids(self) -> None:
+        sharded_db = ShardedReceiptDatabase(
+            [ReceiptDatabase(idempotency_keys=0) for i in range(4)],
+            id_mode='content'
+        )
+        id = sharded_db.add_receipt(self.RECEIPT_DATA)
+        other_data = dict(self.RECEIPT_DATA, retailer='Target')
+        results = sharded_db.add_receipts(
+            [other_data, self.RECEIPT_DATA, other_data]
+        )
+
+        assert sharded_db.add_receipt(self.RECEIPT_DATA) == id
+        assert results[1] == id and results[0] == results[2] != id
+        assert sharded_db.get_eviction_stats()['size'] == 2
+
+    def test_points_only(self) -> None:
+        sharded_db = ShardedReceiptDatabase(
+            [ReceiptDatabase(points_only=True) for i in range(3)]
+        )
+        ids = sharded_db.add_receipts([self.RECEIPT_DATA] * 5)
+        sharded_db.add_receipt(self.RECEIPT_DATA)
+
+        assert sharded_db.get_receipts_points(ids) == dict.fromkeys(ids, 15)
+        assert sharded_db.get_points('6') == 15
+        with pytest.raises(ValueError):
+            sharded_db.get_receipt('1')
+
+    def test_idempotency_key(self,
+                             sharded_db: ShardedReceiptDatabase) -> None:
+        id = sharded_db.add_receipt(self.RECEIPT_DATA, 'key')
+
+        assert sharded_db.add_receipt(self.RECEIPT_DATA, 'key') == id
+        with pytest.raises(ValueError):
+            sharded_db.add_receipt(dict(self.RECEIPT_DATA, total='1.00'),
+                                   'key')
+
+    def test_id_generator(self) -> None:
+        sharded_db = ShardedReceiptDatabase(
+            [ReceiptDatabase() for i in range(2)],
+            id_generator=SnowflakeIdGenerator(5)
+        )
+        id = sharded_db.add_receipt(self.RECEIPT_DATA)
+
+        assert decode_snowflake(id)[1] == 5 and sharded_db.get_points(id) == 15
+
+    def test_stats(self, sharded_db: ShardedReceiptDatabase) -> None:
+        ids = sharded_db.add_receipts([self.RECEIPT_DATA] * 8)
+        sharded_db.get_receipts_points(ids)
+        sharded_db.get_points('1')
+
+        assert sharded_db.get_cache_stats() == {
+            'hits': 1, 'misses': 8, 'size': 8
+        }
+        partition_stats = sharded_db.get_partition_stats()
+        assert len(partition_stats) == 4
+        assert sum(stat['receipts'] for stat in partition_stats) == 8
+        assert sum(stat['misses'] for stat in partition_stats) == 8
+
+    def test_eviction(self) -> None:
+        sharded_db = ShardedReceiptDatabase(
+            [
+                ReceiptDatabase(storage=LRUReceiptStorage(2, evicted_limit=6))
+                for i in range(2)
+            ]
+        )
+        sharded_db.add_receipts([self.RECEIPT_DATA] * 10)
+
+        assert sharded_db.get_eviction_stats() == {
+            'evictions': 6, 'size': 4, 'capacity': 4
+        }
+        evicted = [str(id) for id in range(1, 11)
+                   if sharded_db.is_evicted(str(id))]
+        assert len(evicted) == 6 and '10' not in evicted
+
+    def test_concurrent_adds(self,
+                             sharded_db: ShardedReceiptDatabase) -> None:
+        ids = []
+        threads = [
+            threading.Thread(target=lambda: ids.extend(
+                sharded_db.add_receipt(self.RECEIPT_DATA)
+                for i in range(200)
+            ))
+            for i in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(set(ids)) == 800
+        assert sharded_db.get_eviction_stats()['size'] == 800
+
+    def test_invalid(self) -> None:
+        with pytest.raises(ValueError):
+            ShardedReceiptDatabase([])
+        with pytest.raises(ValueError):
+            ShardedReceiptDatabase([ReceiptDatabase()], id_mode='random')
+        with pytest.raises(ValueError):
+            ShardedReceiptDatabase([ReceiptDatabase()], id_mode='content',
+                                   id_generator=SnowflakeIdGenerator(1))
+
+    def test_create_from_config(self) -> None:
+        sharded_db = create_receipt_db({
+            'RECEIPT_PARTITIONS': 3, 'RECEIPT_STORAGE_CAPACITY': 10,
+            'RECEIPT_POINTS_CACHE': 'eager'
+        })
+
+        assert len(sharded_db.partitions) == 3
+        assert sharded_db.get_eviction_stats()['capacity'] == 12
+        assert sharded_db.partitions[0].points_cache == 'eager'
+        assert sharded_db.partitions[0].idempotency_cache is None
+
+    def test_create_single_partition(self) -> None:
+        receipt_db = create_receipt_db({'RECEIPT_PARTITIONS': 1})
+
+        assert isinstance(receipt_db, ReceiptDatabase)
+
+    def test_create_unsupported(self, tmp_path) -> None:
+        with pytest.raises(ValueError):
+            create_receipt_db({
+                'RECEIPT_PARTITIONS': 2, 'RECEIPT_STORAGE': 'sqlite',
+                'RECEIPT_STORAGE_PATH': str(tmp_path / 'receipts.db')
+            })
+        with pytest.raises(ValueError):
+            create_receipt_db({
+                'RECEIPT_PARTITIONS': 2,
+                'RECEIPT_JOURNAL_PATH': str(tmp_path / 'receipts.journal')
+            })
+        with pytest.raises(ValueError):
+            create_receipt_db({'RECEIPT_PARTITIONS': 0})
+
+    def test_export(self, sharded_db: ShardedReceiptDatabase) -> None:
+        sharded_db.add_receipts([self.RECEIPT_DATA] * 20)
+        rows = list(sharded_db.export('10'))
+
+        assert sorted(int(id) for id, _receipt, _points in rows) == list(
+            range(11, 21)
+        )
+        assert {points for _id, _receipt, points in rows} == {15}
+
+    def test_export_resume(self) -> None:
+        sharded_db = create_receipt_db({'RECEIPT_PARTITIONS': 4})
+        sharded_db.add_receipts([self.RECEIPT_DATA] * 10)
+        rows = sharded_db.export(chunk_size=2)
+        first = [next(rows)[0] for i in range(4)]
+        resumed = [id for id, _receipt, _points in sharded_db.export(
+            first[-1]
+        )]
+
+        assert first + resumed == [str(id) for id in range(1, 11)]
+
+    def test_export_resume_with_capacity(self) -> None:
+        sharded_db = create_receipt_db({
+            'RECEIPT_PARTITIONS': 4, 'RECEIPT_STORAGE_CAPACITY': 40
+        })
+        sharded_db.add_receipts([self.RECEIPT_DATA] * 10)
+        sharded_db.get_points('3')
+        ids = [id for id, _receipt, _points in sharded_db.export('6')]
+
+        assert ids == ['7', '8', '9', '10']
+        assert [row[0] for row in sharded_db.export()] == [
+            str(id) for id in range(1, 11)
+        ]
+
+
+class TestIdempotencyKeys:
+    RECEIPT_DATA = TestAddReceipts.RECEIPT_DATA
+
+    def test_same_key(self) -> None:
+        receipt_db = ReceiptDatabase()
+        id = receipt_db.add_receipt(self.RECEIPT_DATA, 'key')
+
+        assert receipt_db.add_receipt(self.RECEIPT_DATA, 'key') == id
+        assert len(receipt_db.receipts) == 1
+
+    def test_different_keys(self) -> None:
+        receipt_db = ReceiptDatabase()
+        receipt_db.add_receipt(self.RECEIPT_DATA, 'key')
+        receipt_db.add_receipt(self.RECEIPT_DATA, 'other')
+        receipt_db.add_receipt(self.RECEIPT_DATA)
+
+        assert len(receipt_db.receipts) == 3
+
+    def test_key_reused_for_other_receipt(self) -> None:
+        receipt_db = ReceiptDatabase()
+        receipt_db.add_receipt(self.RECEIPT_DATA, 'key')
+
+        with pytest.raises(ValueError):
+            receipt_db.add_receipt(dict(self.RECEIPT_DATA, total='1.00'),
+                                   'key')
+
+    def test_disabled(self) -> None:
+        receipt_db = ReceiptDatabase(idempotency_keys=0)
+        receipt_db.add_receipt(self.RECEIPT_DATA, 'key')
+        receipt_db.add_receipt(self.RECEIPT_DATA, 'key')
+
+        assert len(receipt_db.receipts) == 2
+
+    def test_concurrent_retries(self) -> None:
+        receipt_db = ReceiptDatabase()
+        ids = []
+        threads = [
+            threading.Thread(target=lambda: ids.append(
+                receipt_db.add_receipt(self.RECEIPT_DATA, 'key')
+            ))
+            for i in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert set(ids) == {'1'} and len(receipt_db.receipts) == 1
+
+    def test_create_from_config(self) -> None:
+        receipt_db = create_receipt_db({
+            'RECEIPT_ID_MODE': 'content', 'RECEIPT_IDEMPOTENCY_KEYS': 5
+        })
+        assert receipt_db.id_mode == 'content'
+        assert receipt_db.idempotency_cache.capacity == 5
+
+class TestEviction:
+    RECEIPT_DATA = TestAddReceipts.RECEIPT_DATA
+
+    def test_is_evicted(self) -> None:
+        receipt_db = ReceiptDatabase(storage=LRUReceiptStorage(1))
+        id = receipt_db.add_receipt(self.RECEIPT_DATA)
+        receipt_db.add_receipt(self.RECEIPT_DATA)
+
+        assert receipt_db.get_points(id) == None
+        assert receipt_db.is_evicted(id)
+        assert not receipt_db.is_evicted('3')
+
+    def test_unbounded(self) -> None:
+        receipt_db = ReceiptDatabase()
+        receipt_db.add_receipt(self.RECEIPT_DATA)
+
+        assert not receipt_db.is_evicted('2')
+        assert receipt_db.get_eviction_stats() == {
+            'evictions': 0, 'size': 1, 'capacity': None
+        }
+
+    def test_evicts_cached_points(self) -> None:
+        receipt_db = ReceiptDatabase(points_cache='eager',
+                                     storage=LRUReceiptStorage(2))
+        receipt_db.add_receipts([self.RECEIPT_DATA] * 5)
+
+        assert receipt_db.points.keys() == {'4', '5'}
+        assert receipt_db.get_eviction_stats() == {
+            'evictions': 3, 'size': 2, 'capacity': 2
+        }
+
+    def test_evicts_lazily_cached_points(self) -> None:
+        receipt_db = ReceiptDatabase(storage=LRUReceiptStorage(1))
+        id = receipt_db.add_receipt(self.RECEIPT_DATA)
+        receipt_db.get_points(id)
+        receipt_db.add_receipt(self.RECEIPT_DATA)
+
+        assert receipt_db.points == {}
+
+    def test_points_only(self) -> None:
+        receipt_db = ReceiptDatabase(points_only=True,
+                                     storage=LRUReceiptStorage(1))
+        receipt_db.add_receipts([self.RECEIPT_DATA] * 2)
+
+        assert receipt_db.get_receipts_points(['1', '2']) == {
+            '1': None, '2': 15
+        }
+        assert receipt_db.is_evicted('1')
+
+    def test_restores_within_capacity(self, tmp_path) -> None:
+        path = str(tmp_path / 'receipts.journal')
+        receipt_db = ReceiptDatabase(
+            journal=ReceiptJournal(path, fsync='os')
+        )
+        receipt_db.add_receipts([self.RECEIPT_DATA] * 3)
+        receipt_db.journal.close()
+
+        restored_db = ReceiptDatabase(
+            points_cache='eager', storage=LRUReceiptStorage(2),
+            journal=ReceiptJournal(path, fsync='os')
+        )
+        assert list(restored_db.receipts) == ['2', '3']
+        assert restored_db.points.keys() == {'2', '3'}
+        assert restored_db.is_evicted('1')
+        restored_db.journal.close()
+
+    def test_create_with_capacity(self) -> None:
+        receipt_db = create_receipt_db({'RECEIPT_STORAGE_CAPACITY': 5})
+        assert receipt_db.get_eviction_stats()['capacity'] == 5
+
+class TestJournal:
+    RECEIPT_DATA = TestAddReceipts.RECEIPT_DATA
+
+    ## Open a journal in the given directory.
+    ##
+    ## Parameters:
+    ##     tmp_path (Path): the directory to keep the journal in
+    ##
+    ## Returns:
+    ##     A ReceiptJournal for the journal.
+    ##
+    def open_journal(self, tmp_path) -> ReceiptJournal:
+        return ReceiptJournal(str(tmp_path / 'receipts.journal'), fsync='os')
+
+    def test_restores_receipts(self, tmp_path) -> None:
+        receipt_db = ReceiptDatabase(journal=self.open_journal(tmp_path))
+        id = receipt_db.add_receipt(self.RECEIPT_DATA)
+        receipt_db.add_receipts([self.RECEIPT_DATA] * 2)
+        receipt_db.journal.close()
+
+        restored_db = ReceiptDatabase(journal=self.open_journal(tmp_path))
+        assert len(restored_db.receipts) == 3
+        assert restored_db.get_receipt(id).to_dict() == self.RECEIPT_DATA
+        assert restored_db.add_receipt(self.RECEIPT_DATA) == '4'
+
+    def test_restores_points(self, tmp_path) -> None:
+        receipt_db = ReceiptDatabase(journal=self.open_journal(tmp_path),
+                                     points_only=True)
+        id = receipt_db.add_receipt(self.RECEIPT_DATA)
+        receipt_db.journal.close()
+
+        restored_db = ReceiptDatabase(journal=self.open_journal(tmp_path),
+                                      points_only=True)
+        assert restored_db.get_points(id) == 15
+
+    def test_scores_receipts_for_points_only(self, tmp_path) -> None:
+        receipt_db = ReceiptDatabase(journal=self.open_journal(tmp_path))
+        id = receipt_db.add_receipt(self.RECEIPT_DATA)
+        receipt_db.journal.close()
+
+        restored_db = ReceiptDatabase(journal=self.open_journal(tmp_path),
+                                      points_only=True)
+        assert restored_db.receipts[id] == 15
+
+    def test_points_without_points_only(self, tmp_path) -> None:
+        receipt_db = ReceiptDatabase(journal=self.open_journal(tmp_path),
+                                     points_only=True)
+        receipt_db.add_receipt(self.RECEIPT_DATA)
+        receipt_db.journal.close()
+
+        with pytest.raises(ValueError):
+            ReceiptDatabase(journal=self.open_journal(tmp_path))
+
+    def test_eager_scores_restored(self, tmp_path) -> None:
+        receipt_db = ReceiptDatabase(journal=self.open_journal(tmp_path))
+        id = receipt_db.add_receipt(self.RECEIPT_DATA)
+        receipt_db.journal.close()
+
+        restored_db = ReceiptDatabase(journal=self.open_journal(tmp_path),
+                                      points_cache='eager')
+        assert restored_db.points == {id: 15}
+
+    def test_starts_compaction(self, tmp_path,
+                               mocker: MockerFixture) -> None:
+        journal = self.open_journal(tmp_path)
+        receipt_db = ReceiptDatabase(journal=journal)
+        mocker.patch.object(journal, 'needs_compaction', return_value=True)
+        start = mocker.patch.object(journal, 'start_compaction')
+
+        receipt_db.add_receipt(self.RECEIPT_DATA)
+        start.assert_called_once_with(receipt_db.receipts.snapshot)
+
+    def test_create_from_config(self, tmp_path) -> None:
+        receipt_db = create_receipt_db({
+            'RECEIPT_JOURNAL_PATH': str(tmp_path / 'receipts.journal'),
+            'RECEIPT_JOURNAL_FSYNC': 'always'
+        })
+        assert receipt_db.journal.fsync == 'always'
+        receipt_db.journal.close()
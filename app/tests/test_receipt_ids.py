@@ -0,0 +1,178 @@
+import threading
+import uuid
+
+import pytest
+
+from app.receipt_ids import (
+    SNOWFLAKE_EPOCH_MS, SequentialIdGenerator, SnowflakeIdGenerator,
+    content_id, decode_snowflake
+)
+
+RECEIPT_DATA = {
+    'retailer': 'Target',
+    'purchaseDate': '2022-01-02',
+    'purchaseTime': '13:13',
+    'total': '1.25',
+    'items': [
+        {'shortDescription': 'Pepsi - 12-oz', 'price': '1.25'}
+    ]
+}
+
+class TestContentId:
+    def test_uuid(self) -> None:
+        id = content_id(RECEIPT_DATA)
+        assert str(uuid.UUID(id)) == id
+
+    def test_same_content(self) -> None:
+        reordered = dict(reversed(list(RECEIPT_DATA.items())))
+        assert content_id(reordered) == content_id(RECEIPT_DATA)
+
+    def test_different_content(self) -> None:
+        other = dict(RECEIPT_DATA, total='1.26')
+        assert content_id(other) != content_id(RECEIPT_DATA)
+
+    def test_item_order(self) -> None:
+        items = [
+            {'shortDescription': 'Pepsi - 12-oz', 'price': '1.25'},
+            {'shortDescription': 'Dasani', 'price': '1.40'}
+        ]
+        receipt_data = dict(RECEIPT_DATA, items=items)
+        reordered = dict(RECEIPT_DATA, items=items[::-1])
+
+        assert content_id(reordered) != content_id(receipt_data)
+
+class TestSequentialIdGenerator:
+    def test_counts(self) -> None:
+        generator = SequentialIdGenerator()
+
+        assert generator.generate() == '1'
+        assert generator.generate_many(3) == ['2', '3', '4']
+        assert generator.generate_many(0) == []
+        assert generator.generate() == '5'
+
+    def test_restore(self) -> None:
+        generator = SequentialIdGenerator()
+        generator.restore(['3', '12', 'abc', '0522a130-44005000'])
+
+        assert generator.generate() == '13'
+
+    def test_concurrent(self) -> None:
+        generator = SequentialIdGenerator()
+        ids = []
+        threads = [
+            threading.Thread(target=lambda: ids.extend(
+                generator.generate_many(10) + [generator.generate()]
+                for i in range(500)
+            ))
+            for i in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        flat = [id for group in ids for id in group]
+        assert sorted(flat, key=int) == [str(i) for i in range(1, 22001)]
+
+class FakeClock:
+    def __init__(self, ms: int) -> None:
+        self.ms = ms
+
+    def __call__(self) -> int:
+        return self.ms * 1000000
+
+class TestSnowflakeIdGenerator:
+    START_MS = SNOWFLAKE_EPOCH_MS + 1000
+
+    def test_decodes(self) -> None:
+        generator = SnowflakeIdGenerator(7, clock=FakeClock(self.START_MS))
+        ids = [generator.generate(), generator.generate()]
+
+        assert decode_snowflake(ids[0]) == (self.START_MS, 7, 0)
+        assert decode_snowflake(ids[1]) == (self.START_MS, 7, 1)
+
+    def test_time_ordered(self) -> None:
+        clock = FakeClock(self.START_MS)
+        generator = SnowflakeIdGenerator(1, clock=clock)
+        ids = [generator.generate()]
+        clock.ms += 1
+        ids += generator.generate_many(3)
+        clock.ms += 1000
+        ids.append(generator.generate())
+
+        assert ids == sorted(ids) and len(set(ids)) == 5
+        assert decode_snowflake(ids[1]) == (self.START_MS + 1, 1, 0)
+
+    def test_shards_never_collide(self) -> None:
+        clock = FakeClock(self.START_MS)
+        ids1 = SnowflakeIdGenerator(1, clock=clock).generate_many(100)
+        ids2 = SnowflakeIdGenerator(2, clock=clock).generate_many(100)
+
+        assert not set(ids1) & set(ids2)
+
+    def test_sequence_overflow(self) -> None:
+        generator = SnowflakeIdGenerator(3, clock=FakeClock(self.START_MS))
+        ids = generator.generate_many(5000)
+
+        assert ids == sorted(ids) and len(set(ids)) == 5000
+        assert decode_snowflake(ids[4095]) == (self.START_MS, 3, 4095)
+        assert decode_snowflake(ids[4096]) == (self.START_MS + 1, 3, 0)
+
+    def test_clock_going_back(self) -> None:
+        clock = FakeClock(self.START_MS)
+        generator = SnowflakeIdGenerator(0, clock=clock)
+        first = generator.generate()
+        clock.ms -= 5000
+        second = generator.generate()
+
+        assert second > first
+        assert decode_snowflake(second) == (self.START_MS, 0, 1)
+
+    def test_concurrent(self) -> None:
+        generator = SnowflakeIdGenerator(0)
+        ids = []
+        threads = [
+            threading.Thread(target=lambda: ids.extend(
+                generator.generate() for i in range(2000)
+            ))
+            for i in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(set(ids)) == 8000
+
+    def test_not_sequential(self) -> None:
+        clock = FakeClock(SNOWFLAKE_EPOCH_MS)
+        id = SnowflakeIdGenerator(0, clock=clock).generate()
+
+        assert id == '00000000-00000000' and not id.isdigit()
+
+    def test_restore(self) -> None:
+        clock = FakeClock(self.START_MS)
+        restored = SnowflakeIdGenerator(3, clock=clock).generate_many(3)
+        clock.ms -= 5000
+        generator = SnowflakeIdGenerator(3, clock=clock)
+        generator.restore(['1', content_id(RECEIPT_DATA)] + restored)
+
+        assert decode_snowflake(generator.generate()) == (self.START_MS, 3, 3)
+
+    def test_restore_from_earlier_ids(self) -> None:
+        clock = FakeClock(self.START_MS)
+        generator = SnowflakeIdGenerator(3, clock=clock)
+        generator.restore(['00000000-00000000'])
+
+        assert decode_snowflake(generator.generate()) == (self.START_MS, 3, 0)
+
+    def test_invalid_shard(self) -> None:
+        with pytest.raises(ValueError):
+            SnowflakeIdGenerator(1024)
+        with pytest.raises(ValueError):
+            SnowflakeIdGenerator(-1)
+
+    def test_decode_other_ids(self) -> None:
+        assert decode_snowflake('1') is None
+        assert decode_snowflake(content_id(RECEIPT_DATA)) is None
+        assert decode_snowflake('0522a130-4400500g') is None
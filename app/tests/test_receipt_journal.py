@@ -0,0 +1,255 @@
+import gc
+import json
+import pytest
+import subprocess
+import sys
+import time
+from pytest_mock import MockerFixture
+
+from app.receipt import Receipt
+from app.receipt_database import create_receipt_db
+from app.receipt_journal import ReceiptJournal
+
+RECEIPT_DATA = {
+    'retailer': 'Walgreens',
+    'purchaseDate': '2022-01-02',
+    'purchaseTime': '08:13',
+    'total': '2.65',
+    'items': [
+        {'shortDescription': 'Pepsi - 12-oz', 'price': '1.25'},
+        {'shortDescription': 'Dasani', 'price': '1.40'}
+    ]
+}
+
+## Open a journal in the given directory with the given fsync policy.
+##
+## Parameters:
+##     tmp_path (Path): the directory to keep the journal in
+##     fsync (str): the fsync policy of the journal
+##
+## Returns:
+##     A ReceiptJournal for the journal.
+##
+def open_journal(tmp_path, fsync: str = 'os') -> ReceiptJournal:
+    return ReceiptJournal(str(tmp_path / 'receipts.journal'), fsync=fsync)
+
+class TestReplay:
+    def test_empty(self, tmp_path) -> None:
+        journal = open_journal(tmp_path)
+        assert journal.replay() == {}
+
+    def test_receipt(self, tmp_path) -> None:
+        journal = open_journal(tmp_path)
+        journal.append('1', Receipt(RECEIPT_DATA))
+        journal.close()
+
+        replayed = open_journal(tmp_path).replay()
+        assert replayed['1'].to_dict() == RECEIPT_DATA
+
+    def test_points(self, tmp_path) -> None:
+        journal = open_journal(tmp_path)
+        journal.append_many({'1': 15, '2': 28})
+        journal.close()
+
+        assert open_journal(tmp_path).replay() == {'1': 15, '2': 28}
+
+    def test_later_records_replace(self, tmp_path) -> None:
+        journal = open_journal(tmp_path)
+        journal.append_many({'1': 15, '2': 28})
+        journal.append('1', 31)
+        journal.append('2', None)
+
+        assert journal.replay() == {'1': 31}
+
+    def test_torn_record(self, tmp_path) -> None:
+        journal = open_journal(tmp_path)
+        journal.append('1', 15)
+        journal.close()
+
+        with open(journal.path, 'ab') as file:
+            file.write(b'["2",2')
+
+        journal = open_journal(tmp_path)
+        journal.append('3', 7)
+        assert journal.replay() == {'1': 15, '3': 7}
+
+    def test_corrupt_record(self, tmp_path) -> None:
+        journal = open_journal(tmp_path)
+        journal.append('1', 15)
+        journal.close()
+
+        with open(journal.path, 'ab') as file:
+            file.write(b'not json\n["2",2]\n')
+
+        with pytest.raises(ValueError, match='line 2'):
+            open_journal(tmp_path).replay()
+
+    def test_restores_gc(self, tmp_path) -> None:
+        journal = open_journal(tmp_path)
+        journal.append('1', Receipt(RECEIPT_DATA))
+        journal.replay()
+        assert gc.isenabled()
+
+class TestFsync:
+    def test_invalid_policy(self, tmp_path) -> None:
+        with pytest.raises(ValueError):
+            open_journal(tmp_path, fsync='never')
+
+    def test_always(self, tmp_path, mocker: MockerFixture) -> None:
+        journal = open_journal(tmp_path, fsync='always')
+        fsync = mocker.patch('app.receipt_journal.os.fsync')
+
+        journal.append('1', 15)
+        journal.append('2', 28)
+        assert fsync.call_count == 2
+
+    def test_os(self, tmp_path, mocker: MockerFixture) -> None:
+        journal = open_journal(tmp_path, fsync='os')
+        fsync = mocker.patch('app.receipt_journal.os.fsync')
+
+        journal.append('1', 15)
+        fsync.assert_not_called()
+
+        with open(journal.path, 'rb') as file:
+            assert file.read() == b'["1",15]\n'
+
+    def test_group(self, tmp_path, mocker: MockerFixture) -> None:
+        journal = ReceiptJournal(str(tmp_path / 'receipts.journal'),
+                                 fsync='group', group_interval=3600)
+        fsync = mocker.patch('app.receipt_journal.os.fsync')
+
+        journal.append('1', 15)
+        journal.append('2', 28)
+        fsync.assert_not_called()
+
+        journal.sync()
+        journal.sync()
+        assert fsync.call_count == 1
+
+    def test_group_background(self, tmp_path) -> None:
+        journal = ReceiptJournal(str(tmp_path / 'receipts.journal'),
+                                 fsync='group', group_interval=0.01)
+        journal.append('1', 15)
+        time.sleep(0.1)
+
+        with open(journal.path, 'rb') as file:
+            assert file.read() == b'["1",15]\n'
+
+    def test_close_syncs(self, tmp_path) -> None:
+        journal = ReceiptJournal(str(tmp_path / 'receipts.journal'),
+                                 fsync='group', group_interval=3600)
+        journal.append('1', 15)
+        journal.close()
+
+        assert open_journal(tmp_path).replay() == {'1': 15}
+
+class TestCompaction:
+    def test_rewrites_from_snapshot(self, tmp_path) -> None:
+        journal = open_journal(tmp_path)
+        journal.append_many({'1': 15, '2': 28})
+        journal.append('1', None)
+
+        journal.compact(lambda: [('2', 28)])
+        assert journal.get_size() == len(b'["2",28]\n')
+        assert journal.replay() == {'2': 28}
+
+    def test_keeps_writes_during_compaction(self, tmp_path) -> None:
+        journal = open_journal(tmp_path)
+        journal.append('1', 15)
+
+        def snapshot() -> list:
+            journal.append('2', 28)
+            return [('1', 15)]
+
+        journal.compact(snapshot)
+        journal.append('3', 7)
+        assert journal.replay() == {'1': 15, '2': 28, '3': 7}
+
+    def test_failed_snapshot(self, tmp_path) -> None:
+        journal = open_journal(tmp_path)
+        journal.append('1', 15)
+
+        def snapshot() -> list:
+            raise RuntimeError('snapshot failed')
+
+        with pytest.raises(RuntimeError):
+            journal.compact(snapshot)
+
+        journal.append('2', 28)
+        assert journal.replay() == {'1': 15, '2': 28}
+        assert not (tmp_path / 'receipts.journal.compact').exists()
+
+    def test_needs_compaction(self, tmp_path, mocker: MockerFixture) -> None:
+        mocker.patch.object(ReceiptJournal, 'COMPACT_MIN_BYTES', 20)
+        journal = open_journal(tmp_path)
+        journal.append('1', 15)
+        assert not journal.needs_compaction()
+
+        journal.append('2', 28)
+        journal.append('3', 7)
+        assert journal.needs_compaction()
+
+        journal.compact(lambda: [('1', 15), ('2', 28), ('3', 7)])
+        assert not journal.needs_compaction()
+
+    def test_background(self, tmp_path) -> None:
+        journal = open_journal(tmp_path)
+        journal.append_many({'1': 15, '2': 28})
+        journal.append('1', None)
+
+        journal.start_compaction(lambda: [('2', 28)])
+        journal.close()
+
+        with open(journal.path, 'rb') as file:
+            assert [json.loads(line) for line in file] == [['2', 28]]
+
+class TestSingleWriter:
+    def test_already_open(self, tmp_path) -> None:
+        journal = open_journal(tmp_path)
+
+        with pytest.raises(RuntimeError) as excinfo:
+            open_journal(tmp_path)
+
+        error_msg = 'Journal is already in use by another writer:'
+        assert str(excinfo.value.args[0]).startswith(error_msg)
+        journal.close()
+
+    def test_other_process(self, tmp_path) -> None:
+        journal = open_journal(tmp_path)
+        result = subprocess.run([
+            sys.executable, '-c',
+            'import sys\n'
+            'from app.receipt_journal import ReceiptJournal\n'
+            'ReceiptJournal(sys.argv[1])',
+            journal.path
+        ], capture_output=True, text=True)
+
+        assert result.returncode != 0
+        assert 'Journal is already in use' in result.stderr
+        journal.close()
+
+    def test_reopen_after_close(self, tmp_path) -> None:
+        journal = open_journal(tmp_path)
+        journal.append('1', 15)
+        journal.close()
+
+        reopened = open_journal(tmp_path)
+        assert reopened.replay() == {'1': 15}
+        reopened.close()
+
+    def test_locked_after_compaction(self, tmp_path) -> None:
+        journal = open_journal(tmp_path)
+        journal.append('1', 15)
+        journal.compact(lambda: [('1', 15)])
+
+        with pytest.raises(RuntimeError):
+            open_journal(tmp_path)
+        journal.close()
+
+    def test_create_receipt_db(self, tmp_path) -> None:
+        config = {'RECEIPT_JOURNAL_PATH': str(tmp_path / 'receipts.journal')}
+        receipt_db = create_receipt_db(config)
+
+        with pytest.raises(RuntimeError):
+            create_receipt_db(config)
+        receipt_db.journal.close()
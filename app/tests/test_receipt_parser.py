@@ -0,0 +1,82 @@
+from datetime import date, time
+import pytest
+
+from app.receipt_parser import parse_cents, parse_date, parse_time
+
+class TestParseDate:
+    def test_normal_date(self) -> None:
+        assert parse_date('2041-07-24') == date(2041, 7, 24)
+
+    def test_shared(self) -> None:
+        assert parse_date('2022-01-01') is parse_date(''.join('2022-01-01'))
+
+    def test_short_fields(self) -> None:
+        with pytest.raises(ValueError):
+            parse_date('2022-1-1')
+
+    def test_basic_format(self) -> None:
+        with pytest.raises(ValueError):
+            parse_date('20220101')
+
+    def test_invalid_day(self) -> None:
+        with pytest.raises(ValueError):
+            parse_date('2022-02-30')
+
+    def test_non_ascii_digits(self) -> None:
+        with pytest.raises(ValueError):
+            parse_date('２０２２-01-01')
+
+class TestParseTime:
+    def test_normal_time(self) -> None:
+        assert parse_time('13:01') == time(13, 1)
+
+    def test_single_digits(self) -> None:
+        assert parse_time('7:5') == time(7, 5)
+
+    def test_shared(self) -> None:
+        assert parse_time('13:01') is parse_time(''.join('13:01'))
+
+    def test_seconds(self) -> None:
+        with pytest.raises(ValueError):
+            parse_time('13:01:00')
+
+    def test_invalid_hour(self) -> None:
+        with pytest.raises(ValueError):
+            parse_time('24:00')
+
+    def test_surrounding_whitespace(self) -> None:
+        with pytest.raises(ValueError):
+            parse_time(' 13:01')
+
+class TestParseCents:
+    def test_normal_amount(self) -> None:
+        assert parse_cents('35.35') == 3535
+
+    def test_zero(self) -> None:
+        assert parse_cents('0.00') == 0
+
+    def test_under_one_dollar(self) -> None:
+        assert parse_cents('0.07') == 7
+
+    def test_large_amount(self) -> None:
+        assert parse_cents('90071992547409.93') == 9007199254740993
+
+    def test_one_decimal(self) -> None:
+        with pytest.raises(ValueError):
+            parse_cents('6.5')
+
+    def test_no_decimals(self) -> None:
+        with pytest.raises(ValueError):
+            parse_cents('6')
+
+    def test_negative(self) -> None:
+        with pytest.raises(ValueError):
+            parse_cents('-6.50')
+
+    def test_exponent(self) -> None:
+        with pytest.raises(ValueError):
+            parse_cents('1e3')
+
+    def test_non_string(self) -> None:
+        with pytest.raises(TypeError):
+            parse_cents(6.5)
@@ -0,0 +1,384 @@
+import os
+import time
+
+import pytest
+from pytest_mock import MockerFixture
+
+from app.receipt import Receipt
+from app.receipt_database import ReceiptDatabase, create_receipt_db
+from app.receipt_journal import ReceiptJournal
+from app.receipt_snapshot import (
+    ReceiptSnapshot, SnapshotReceiptStorage, write_snapshot
+)
+from app.receipt_storage import (
+    LRUReceiptStorage, MemoryReceiptStorage, PackedPointsStorage
+)
+
+RECEIPT_DATA = {
+    'retailer': 'M&M Corner Market',
+    'purchaseDate': '2022-03-20',
+    'purchaseTime': '14:33',
+    'total': '9.00',
+    'items': [
+        {'shortDescription': 'Gatorade', 'price': '2.25'},
+        {'shortDescription': 'Gatorade', 'price': '2.25'},
+        {'shortDescription': 'Gatorade', 'price': '2.25'},
+        {'shortDescription': 'Gatorade', 'price': '2.25'}
+    ]
+}
+OTHER_RECEIPT_DATA = {
+    'retailer': 'Walgreens',
+    'purchaseDate': '2022-01-02',
+    'purchaseTime': '08:13',
+    'total': '2.65',
+    'items': [
+        {'shortDescription': 'Pepsi - 12-oz', 'price': '1.25'},
+        {'shortDescription': 'Dasani', 'price': '1.40'}
+    ]
+}
+
+## Write a snapshot of the test receipts with ids "1", "2", and "10".
+##
+## Parameters:
+##     tmp_path (Path): the directory to write the snapshot in
+##
+## Returns:
+##     A ReceiptSnapshot for the mapped snapshot.
+##
+def create_test_snapshot(tmp_path) -> ReceiptSnapshot:
+    path = str(tmp_path / 'receipts.snapshot')
+    write_snapshot(path, [
+        ('10', Receipt(OTHER_RECEIPT_DATA)),
+        ('1', Receipt(RECEIPT_DATA)),
+        ('2', Receipt(OTHER_RECEIPT_DATA))
+    ])
+    return ReceiptSnapshot(path)
+
+class TestReceiptSnapshot:
+    def test_receipt(self, tmp_path) -> None:
+        snapshot = create_test_snapshot(tmp_path)
+        assert snapshot.get_receipt('1').to_dict() == RECEIPT_DATA
+        assert snapshot.get_receipt('10').to_dict() == OTHER_RECEIPT_DATA
+
+    def test_points(self, tmp_path) -> None:
+        snapshot = create_test_snapshot(tmp_path)
+        assert snapshot.get_points('1') == 109
+        assert snapshot.get_points('2') == 15
+
+    def test_missing(self, tmp_path) -> None:
+        snapshot = create_test_snapshot(tmp_path)
+        assert snapshot.get_receipt('3') == None
+        assert snapshot.get_points('0') == None
+        assert 3 not in snapshot
+
+    def test_ids_and_len(self, tmp_path) -> None:
+        snapshot = create_test_snapshot(tmp_path)
+        assert list(snapshot.ids()) == ['1', '2', '10']
+        assert len(snapshot) == 3 and snapshot.last_id == 10
+
+    def test_other_ids(self, tmp_path) -> None:
+        path = str(tmp_path / 'receipts.snapshot')
+        write_snapshot(path, [('b', 2), ('007', 3), ('5', 4), ('a', 1)],
+                       points_only=True)
+        snapshot = ReceiptSnapshot(path)
+
+        assert list(snapshot.ids()) == ['5', '007', 'a', 'b']
+        assert [snapshot.get(id) for id in ('a', 'b', '007', '5', '7')] == [
+            1, 2, 3, 4, None
+        ]
+
+    def test_points_only(self, tmp_path) -> None:
+        path = str(tmp_path / 'receipts.snapshot')
+        write_snapshot(path, [('1', 28), ('abc', 5)], points_only=True)
+        snapshot = ReceiptSnapshot(path)
+
+        assert snapshot.points_only
+        assert snapshot.get('abc') == 5 and snapshot.get_points('1') == 28
+        with pytest.raises(ValueError):
+            snapshot.get_receipt('1')
+
+    def test_empty(self, tmp_path) -> None:
+        path = str(tmp_path / 'receipts.snapshot')
+        write_snapshot(path, [])
+        snapshot = ReceiptSnapshot(path)
+        assert len(snapshot) == 0 and snapshot.get('1') == None
+
+    def test_not_snapshot(self, tmp_path) -> None:
+        path = tmp_path / 'receipts.snapshot'
+        path.write_bytes(b'\0' * 256)
+
+        with pytest.raises(ValueError):
+            ReceiptSnapshot(str(path))
+
+class TestSnapshotReceiptStorage:
+    def test_continues_ids(self, tmp_path) -> None:
+        storage = SnapshotReceiptStorage(create_test_snapshot(tmp_path),
+                                         MemoryReceiptStorage())
+        assert storage.allocate_id() == '11'
+
+    def test_contains(self, tmp_path, mocker: MockerFixture) -> None:
+        snapshot = create_test_snapshot(tmp_path)
+        storage = SnapshotReceiptStorage(snapshot, MemoryReceiptStorage())
+        del storage['2']
+        storage['10'] = Receipt(RECEIPT_DATA)
+        get = mocker.patch.object(snapshot, 'get')
+
+        assert '1' in storage and '10' in storage
+        assert '2' not in storage and '3' not in storage
+        assert 1 not in storage
+        get.assert_not_called()
+
+    def test_new_receipts(self, tmp_path) -> None:
+        storage = SnapshotReceiptStorage(create_test_snapshot(tmp_path),
+                                         MemoryReceiptStorage())
+        receipt = Receipt(RECEIPT_DATA)
+        storage['11'] = receipt
+
+        assert storage['11'] is receipt and len(storage) == 4
+        assert list(storage) == ['1', '2', '10', '11']
+
+    def test_replace(self, tmp_path) -> None:
+        storage = SnapshotReceiptStorage(create_test_snapshot(tmp_path),
+                                         MemoryReceiptStorage())
+        storage['2'] = Receipt(RECEIPT_DATA)
+
+        assert storage['2'].to_dict() == RECEIPT_DATA and len(storage) == 3
+        assert storage.get_stored_points('2') == None
+
+    def test_delete(self, tmp_path) -> None:
+        storage = SnapshotReceiptStorage(create_test_snapshot(tmp_path),
+                                         MemoryReceiptStorage())
+        del storage['1']
+
+        assert '1' not in storage and len(storage) == 2
+        with pytest.raises(KeyError):
+            del storage['1']
+
+    def test_stored_points(self, tmp_path) -> None:
+        storage = SnapshotReceiptStorage(create_test_snapshot(tmp_path),
+                                         MemoryReceiptStorage())
+        assert storage.get_stored_points('1') == 109
+        assert storage.get_stored_points('11') == None
+
+    def test_snapshot(self, tmp_path) -> None:
+        storage = SnapshotReceiptStorage(create_test_snapshot(tmp_path),
+                                         PackedPointsStorage())
+        del storage['10']
+        storage['11'] = 7
+
+        assert [id for id, _value in storage.snapshot()] == ['1', '2', '11']
+
+    def test_evicted_from_overlay(self, tmp_path) -> None:
+        storage = SnapshotReceiptStorage(create_test_snapshot(tmp_path),
+                                         LRUReceiptStorage(1))
+        storage.update({'11': 7, '12': 8})
+
+        assert storage.was_evicted('11') and not storage.was_evicted('3')
+        assert not storage.was_evicted('1')
+        assert not storage.was_evicted('12')
+        assert storage.get_eviction_stats() == {
+            'evictions': 1, 'size': 4, 'capacity': 1
+        }
+
+class TestDatabaseSnapshot:
+    def test_restore(self, tmp_path) -> None:
+        path = str(tmp_path / 'receipts.snapshot')
+        receipt_db = ReceiptDatabase()
+        id = receipt_db.add_receipt(RECEIPT_DATA)
+        receipt_db.save_snapshot(path)
+
+        restored_db = ReceiptDatabase(snapshot_path=path)
+        assert restored_db.get_receipt(id).to_dict() == RECEIPT_DATA
+        assert restored_db.add_receipt(RECEIPT_DATA) == '2'
+
+    def test_points_served_from_snapshot(self, tmp_path,
+                                         mocker: MockerFixture) -> None:
+        path = str(tmp_path / 'receipts.snapshot')
+        receipt_db = ReceiptDatabase()
+        id = receipt_db.add_receipt(RECEIPT_DATA)
+        receipt_db.save_snapshot(path)
+
+        restored_db = ReceiptDatabase(snapshot_path=path)
+        score = mocker.patch('app.receipt_database.score_receipt')
+        assert restored_db.get_points(id) == 109
+        assert restored_db.get_receipts_points([id]) == {id: 109}
+        score.assert_not_called()
+
+    def test_points_only(self, tmp_path) -> None:
+        path = str(tmp_path / 'receipts.snapshot')
+        receipt_db = ReceiptDatabase(points_only=True)
+        id = receipt_db.add_receipt(RECEIPT_DATA)
+        receipt_db.save_snapshot(path)
+
+        restored_db = ReceiptDatabase(points_only=True, snapshot_path=path)
+        assert restored_db.get_points(id) == 109
+        with pytest.raises(ValueError):
+            ReceiptDatabase(snapshot_path=path)
+
+    def test_missing_snapshot(self, tmp_path) -> None:
+        path = str(tmp_path / 'receipts.snapshot')
+        receipt_db = ReceiptDatabase(snapshot_path=path)
+        assert isinstance(receipt_db.receipts, MemoryReceiptStorage)
+
+    def test_without_path(self) -> None:
+        with pytest.raises(ValueError):
+            ReceiptDatabase().save_snapshot()
+
+    def test_truncates_journal(self, tmp_path) -> None:
+        path = str(tmp_path / 'receipts.snapshot')
+        journal_path = str(tmp_path / 'receipts.journal')
+        receipt_db = ReceiptDatabase(
+            journal=ReceiptJournal(journal_path, fsync='os'),
+            snapshot_path=path
+        )
+        receipt_db.add_receipt(RECEIPT_DATA)
+        receipt_db.save_snapshot()
+        id = receipt_db.add_receipt(OTHER_RECEIPT_DATA)
+        receipt_db.journal.close()
+
+        journal = ReceiptJournal(journal_path, fsync='os')
+        assert list(journal.replay()) == [id]
+
+        restored_db = ReceiptDatabase(journal=journal, snapshot_path=path)
+        assert len(restored_db.receipts) == 2
+        assert restored_db.get_points(id) == 15
+        assert restored_db.add_receipt(RECEIPT_DATA) == '3'
+
+class TestBackgroundSnapshot:
+    def test_writes_snapshot(self, tmp_path) -> None:
+        path = str(tmp_path / 'receipts.snapshot')
+        receipt_db = ReceiptDatabase(snapshot_path=path)
+        id = receipt_db.add_receipt(RECEIPT_DATA)
+
+        assert receipt_db.start_background_snapshot()
+        receipt_db.wait_for_snapshot()
+
+        restored_db = ReceiptDatabase(snapshot_path=path)
+        assert restored_db.get_points(id) == 109
+
+    def test_points_only(self, tmp_path) -> None:
+        path = str(tmp_path / 'receipts.snapshot')
+        receipt_db = ReceiptDatabase(points_only=True, snapshot_path=path)
+        receipt_db.add_receipts([RECEIPT_DATA, OTHER_RECEIPT_DATA])
+
+        receipt_db.start_background_snapshot()
+        receipt_db.wait_for_snapshot()
+
+        restored_db = ReceiptDatabase(points_only=True, snapshot_path=path)
+        assert restored_db.get_receipts_points(['1', '2']) == {
+            '1': 109, '2': 15
+        }
+
+    def test_stats(self, tmp_path) -> None:
+        receipt_db = ReceiptDatabase(
+            snapshot_path=str(tmp_path / 'receipts.snapshot')
+        )
+        assert receipt_db.get_snapshot_stats() == {
+            'in_progress': False, 'last_time': None, 'last_duration': None,
+            'last_fork_duration': None, 'last_status': None
+        }
+
+        receipt_db.start_background_snapshot()
+        receipt_db.wait_for_snapshot()
+
+        stats = receipt_db.get_snapshot_stats()
+        assert stats['last_status'] == 'ok' and not stats['in_progress']
+        assert stats['last_duration'] >= stats['last_fork_duration'] > 0
+
+    def test_foreground_stats(self, tmp_path) -> None:
+        receipt_db = ReceiptDatabase(
+            snapshot_path=str(tmp_path / 'receipts.snapshot')
+        )
+        receipt_db.save_snapshot()
+
+        stats = receipt_db.get_snapshot_stats()
+        assert stats['last_status'] == 'ok'
+        assert stats['last_fork_duration'] == 0
+
+    def test_failed(self, tmp_path) -> None:
+        receipt_db = ReceiptDatabase(
+            snapshot_path=str(tmp_path / 'missing' / 'receipts.snapshot')
+        )
+        receipt_db.start_background_snapshot()
+        receipt_db.wait_for_snapshot()
+
+        stats = receipt_db.get_snapshot_stats()
+        assert stats['last_status'] == 'failed' and stats['last_time'] == None
+
+    def test_hung_child_killed(self, tmp_path,
+                               mocker: MockerFixture) -> None:
+        receipt_db = ReceiptDatabase(
+            snapshot_path=str(tmp_path / 'receipts.snapshot'),
+            snapshot_timeout=0.5
+        )
+        mocker.patch.object(receipt_db, '_write_snapshot',
+                            lambda path: time.sleep(30))
+        start = time.monotonic()
+        receipt_db.start_background_snapshot()
+
+        assert not receipt_db.wait_for_snapshot(0.05)
+        assert receipt_db.wait_for_snapshot(10)
+        assert time.monotonic() - start < 10
+        stats = receipt_db.get_snapshot_stats()
+        assert stats['last_status'] == 'failed' and not stats['in_progress']
+        assert not os.path.exists(receipt_db.snapshot_path)
+
+    def test_create_with_timeout(self, tmp_path) -> None:
+        receipt_db = create_receipt_db({
+            'RECEIPT_SNAPSHOT_PATH': str(tmp_path / 'receipts.snapshot'),
+            'RECEIPT_SNAPSHOT_TIMEOUT': 2.5
+        })
+        assert receipt_db.snapshot_timeout == 2.5
+
+    def test_one_at_a_time(self, tmp_path,
+                           mocker: MockerFixture) -> None:
+        receipt_db = ReceiptDatabase(
+            snapshot_path=str(tmp_path / 'receipts.snapshot')
+        )
+        mocker.patch.object(receipt_db, 'is_snapshot_running',
+                            return_value=True)
+        assert not receipt_db.start_background_snapshot()
+
+    def test_keeps_journaled_writes(self, tmp_path,
+                                    mocker: MockerFixture) -> None:
+        path = str(tmp_path / 'receipts.snapshot')
+        journal_path = str(tmp_path / 'receipts.journal')
+        receipt_db = ReceiptDatabase(
+            journal=ReceiptJournal(journal_path, fsync='os'),
+            snapshot_path=path
+        )
+        receipt_db.add_receipt(RECEIPT_DATA)
+        fork_snapshot = receipt_db._fork_snapshot
+
+        def add_while_forked(path: str) -> float:
+            fork_duration = fork_snapshot(path)
+            receipt_db.add_receipt(OTHER_RECEIPT_DATA)
+            return fork_duration
+
+        mocker.patch.object(receipt_db, '_fork_snapshot', add_while_forked)
+        receipt_db.start_background_snapshot()
+        receipt_db.wait_for_snapshot()
+        receipt_db.journal.close()
+
+        restored_db = ReceiptDatabase(
+            journal=ReceiptJournal(journal_path, fsync='os'),
+            snapshot_path=path
+        )
+        assert len(restored_db.receipts.snapshot_file) == 1
+        assert restored_db.get_receipts_points(['1', '2']) == {
+            '1': 109, '2': 15
+        }
+
+    def test_journal_growth_starts_snapshot(self, tmp_path,
+                                            mocker: MockerFixture) -> None:
+        journal = ReceiptJournal(str(tmp_path / 'receipts.journal'),
+                                 fsync='os')
+        receipt_db = ReceiptDatabase(
+            journal=journal,
+            snapshot_path=str(tmp_path / 'receipts.snapshot')
+        )
+        mocker.patch.object(journal, 'needs_compaction', return_value=True)
+        start = mocker.patch.object(receipt_db, 'start_background_snapshot')
+
+        receipt_db.add_receipt(RECEIPT_DATA)
+        start.assert_called_once_with()
@@ -0,0 +1,663 @@
+import multiprocessing
+import pytest
+import sqlite3
+from pytest_mock import MockerFixture
+
+from app.receipt import Receipt
+from app.receipt_database import ReceiptDatabase
+from app.receipt_storage import (
+    create_storage, LRUReceiptStorage, MemoryReceiptStorage,
+    PackedPointsStorage, ReceiptStorage, SqliteReceiptStorage,
+    TieredReceiptStorage
+)
+
+def create_test_receipt() -> Receipt:
+    return Receipt({
+        'retailer': 'Walgreens',
+        'purchaseDate': '2022-01-02',
+        'purchaseTime': '08:13',
+        'total': '2.65',
+        'items': [
+            {'shortDescription': 'Pepsi - 12-oz', 'price': '1.25'},
+            {'shortDescription': 'Dasani', 'price': '1.40'}
+        ]
+    })
+
+## Allocate ids from the SQLite database at the given path.
+##
+## Parameters:
+##     path (str): the path of the SQLite database file
+##     count (int): the amount of ids to allocate
+##
+## Returns:
+##     A list of strings for the allocated ids.
+##
+def allocate_sqlite_ids(path: str, count: int) -> list[str]:
+    storage = SqliteReceiptStorage(path)
+    return [storage.allocate_id() for i in range(count)]
+
+class TestReceiptStorage:
+    def test_abstract(self) -> None:
+        class DictStorage(ReceiptStorage):
+            __getitem__ = __setitem__ = __delitem__ = None
+            __iter__ = __len__ = None
+
+        with pytest.raises(TypeError) as excinfo:
+            DictStorage()
+
+        for name in ('allocate_id', 'load', 'reserve_ids'):
+            assert name in str(excinfo.value)
+
+class TestMemoryReceiptStorage:
+    def test_allocate_ids(self) -> None:
+        storage = MemoryReceiptStorage()
+        ids = [storage.allocate_id() for i in range(3)]
+        assert ids == ['1', '2', '3']
+
+    def test_store(self) -> None:
+        storage = MemoryReceiptStorage()
+        receipt = create_test_receipt()
+        storage['1'] = receipt
+        assert storage['1'] is receipt
+
+    def test_missing(self) -> None:
+        storage = MemoryReceiptStorage()
+        assert storage.get('1') == None
+
+    def test_allocate_many_ids(self) -> None:
+        storage = MemoryReceiptStorage()
+        storage.allocate_id()
+        assert storage.allocate_ids(3) == ['2', '3', '4']
+
+    def test_update(self) -> None:
+        storage = MemoryReceiptStorage()
+        receipt = create_test_receipt()
+        storage.update({'1': receipt, '2': receipt})
+        assert storage['1'] is receipt and storage['2'] is receipt
+
+    def test_len(self) -> None:
+        storage = MemoryReceiptStorage()
+        storage['1'] = create_test_receipt()
+        storage['2'] = create_test_receipt()
+        assert len(storage) == 2
+
+    def test_snapshot(self) -> None:
+        storage = MemoryReceiptStorage()
+        receipt = create_test_receipt()
+        storage.update({'1': receipt, 'abc': receipt})
+        assert storage.snapshot() == [('1', receipt), ('abc', receipt)]
+
+    def test_load_continues_ids(self) -> None:
+        storage = MemoryReceiptStorage()
+        receipt = create_test_receipt()
+        storage.load({'2': receipt, '7': receipt, 'abc': receipt})
+
+        assert storage['7'] is receipt and len(storage) == 3
+        assert storage.allocate_id() == '8'
+
+    def test_reserve_ids(self) -> None:
+        storage = MemoryReceiptStorage()
+        storage.reserve_ids(5)
+        assert storage.allocate_id() == '6'
+
+        storage.reserve_ids(2)
+        assert storage.allocate_id() == '7'
+
+    def test_iter_ids_while_storing(self) -> None:
+        storage = MemoryReceiptStorage()
+        receipt = create_test_receipt()
+        storage.update({'1': receipt, '2': receipt})
+
+        for id in storage.iter_ids():
+            storage[id + '0'] = receipt
+
+        assert sorted(storage) == ['1', '10', '2', '20']
+
+class TestPackedPointsStorage:
+    def test_allocate_ids(self) -> None:
+        storage = PackedPointsStorage()
+        ids = [storage.allocate_id() for i in range(3)]
+        assert ids == ['1', '2', '3']
+
+    def test_store(self) -> None:
+        storage = PackedPointsStorage()
+        id = storage.allocate_id()
+        storage[id] = 28
+        assert storage[id] == 28
+
+    def test_packed(self) -> None:
+        storage = PackedPointsStorage()
+        storage.update({id: 10 for id in storage.allocate_ids(3)})
+        assert list(storage._points) == [10, 10, 10]
+
+    def test_out_of_order(self) -> None:
+        storage = PackedPointsStorage()
+        ids = storage.allocate_ids(3)
+        storage[ids[2]] = 7
+        storage[ids[0]] = 5
+
+        assert storage.get_many(ids) == {'1': 5, '2': None, '3': 7}
+        assert len(storage) == 2
+
+    def test_unallocated_id(self) -> None:
+        storage = PackedPointsStorage()
+        storage['5'] = 12
+        assert storage['5'] == 12 and len(storage._points) == 0
+
+    def test_other_ids(self) -> None:
+        storage = PackedPointsStorage()
+        storage['abc'] = 3
+        storage['007'] = 4
+        assert storage['abc'] == 3 and storage['007'] == 4
+
+    def test_missing(self) -> None:
+        storage = PackedPointsStorage()
+        storage.allocate_id()
+        assert storage.get('1') == None and '1' not in storage
+
+    def test_iter(self) -> None:
+        storage = PackedPointsStorage()
+        ids = storage.allocate_ids(3)
+        storage[ids[0]] = 1
+        storage[ids[2]] = 3
+        storage['abc'] = 4
+        assert list(storage) == ['1', '3', 'abc']
+
+    def test_delete(self) -> None:
+        storage = PackedPointsStorage()
+        id = storage.allocate_id()
+        storage[id] = 1
+        del storage[id]
+
+        assert id not in storage and len(storage) == 0
+
+    def test_snapshot(self) -> None:
+        storage = PackedPointsStorage()
+        ids = storage.allocate_ids(3)
+        storage[ids[0]] = 1
+        storage[ids[2]] = 3
+        storage['abc'] = 4
+        assert storage.snapshot() == [('1', 1), ('3', 3), ('abc', 4)]
+
+    def test_load_continues_ids(self) -> None:
+        storage = PackedPointsStorage()
+        storage.load({'1': 5, '3': 7})
+
+        assert list(storage._points) == [5, -1, 7]
+        assert storage.allocate_id() == '4'
+
+    def test_iter_ids(self) -> None:
+        storage = PackedPointsStorage()
+        storage.update({'2': 10, 'other': 3})
+
+        ids = storage.iter_ids()
+        storage['other-2'] = 4
+        assert list(ids) == ['2', 'other', 'other-2']
+
+class TestSqliteReceiptStorage:
+    def test_allocate_ids(self, tmp_path) -> None:
+        storage = SqliteReceiptStorage(str(tmp_path / 'receipts.db'))
+        ids = [storage.allocate_id() for i in range(3)]
+        assert ids == ['1', '2', '3']
+
+    def test_allocate_many_ids(self, tmp_path) -> None:
+        storage = SqliteReceiptStorage(str(tmp_path / 'receipts.db'))
+        storage.allocate_id()
+        assert storage.allocate_ids(3) == ['2', '3', '4']
+
+    def test_allocate_no_ids(self, tmp_path) -> None:
+        storage = SqliteReceiptStorage(str(tmp_path / 'receipts.db'))
+        assert storage.allocate_ids(0) == [] and storage.allocate_id() == '1'
+
+    def test_update(self, tmp_path) -> None:
+        storage = SqliteReceiptStorage(str(tmp_path / 'receipts.db'))
+        receipt = create_test_receipt()
+        storage.update({'1': receipt, '2': receipt})
+        assert storage['1'] == receipt and storage['2'] == receipt
+
+    def test_store(self, tmp_path) -> None:
+        storage = SqliteReceiptStorage(str(tmp_path / 'receipts.db'))
+        receipt = create_test_receipt()
+        storage['1'] = receipt
+        assert storage['1'] == receipt
+
+    def test_never_replaces(self, tmp_path) -> None:
+        storage = SqliteReceiptStorage(str(tmp_path / 'receipts.db'))
+        receipt = create_test_receipt()
+        storage['1'] = receipt
+
+        with pytest.raises(sqlite3.IntegrityError):
+            storage['1'] = 15
+        with pytest.raises(sqlite3.IntegrityError):
+            storage.update({'2': receipt, '1': 15})
+        assert storage['1'] == receipt and '2' not in storage
+
+    def test_stores_same_receipt_again(self, tmp_path) -> None:
+        storage = SqliteReceiptStorage(str(tmp_path / 'receipts.db'))
+        receipt = create_test_receipt()
+        storage['1'] = receipt
+        storage.update({'1': receipt, '2': receipt})
+
+        assert len(storage) == 2 and storage['2'] == receipt
+    def test_missing(self, tmp_path) -> None:
+        storage = SqliteReceiptStorage(str(tmp_path / 'receipts.db'))
+        assert storage.get('1') == None
+
+    def test_missing_key(self, tmp_path) -> None:
+        storage = SqliteReceiptStorage(str(tmp_path / 'receipts.db'))
+
+        with pytest.raises(KeyError):
+            storage['1']
+
+    def test_contains(self, tmp_path) -> None:
+        storage = SqliteReceiptStorage(str(tmp_path / 'receipts.db'))
+        storage['1'] = create_test_receipt()
+        assert '1' in storage and '2' not in storage
+
+    def test_iter_and_len(self, tmp_path) -> None:
+        storage = SqliteReceiptStorage(str(tmp_path / 'receipts.db'))
+        storage['1'] = create_test_receipt()
+        storage['2'] = create_test_receipt()
+        assert list(storage) == ['1', '2'] and len(storage) == 2
+
+    def test_delete(self, tmp_path) -> None:
+        storage = SqliteReceiptStorage(str(tmp_path / 'receipts.db'))
+        storage['1'] = create_test_receipt()
+        del storage['1']
+        assert '1' not in storage
+
+    def test_get_many(self, tmp_path) -> None:
+        storage = SqliteReceiptStorage(str(tmp_path / 'receipts.db'))
+        receipt = create_test_receipt()
+        storage.update({'1': receipt, '2': receipt})
+        receipts = storage.get_many(['2', '3', '1'])
+
+        assert receipts == {'2': receipt, '3': None, '1': receipt}
+
+    def test_get_many_chunks(self, tmp_path) -> None:
+        storage = SqliteReceiptStorage(str(tmp_path / 'receipts.db'))
+        storage.MAX_QUERY_PARAMS = 2
+        receipt = create_test_receipt()
+        storage.update({str(id): receipt for id in range(1, 6)})
+        receipts = storage.get_many([str(id) for id in range(1, 7)])
+
+        assert sum(receipt is not None for receipt in receipts.values()) == 5
+
+    def test_store_points(self, tmp_path) -> None:
+        storage = SqliteReceiptStorage(str(tmp_path / 'receipts.db'))
+        storage['1'] = 28
+        assert storage['1'] == 28
+
+    def test_shared_between_instances(self, tmp_path) -> None:
+        path = str(tmp_path / 'receipts.db')
+        storage1 = SqliteReceiptStorage(path)
+        storage2 = SqliteReceiptStorage(path)
+        receipt = create_test_receipt()
+
+        storage1[storage1.allocate_id()] = receipt
+        assert storage2['1'] == receipt and storage2.allocate_id() == '2'
+
+    def test_ids_unique_across_processes(self, tmp_path) -> None:
+        path = str(tmp_path / 'receipts.db')
+        SqliteReceiptStorage(path)
+
+        with multiprocessing.Pool(4) as pool:
+            results = pool.starmap(allocate_sqlite_ids, [(path, 50)] * 4)
+
+        ids = [id for result in results for id in result]
+        assert sorted(ids, key=int) == [str(i) for i in range(1, 201)]
+
+    def test_database_points(self, tmp_path) -> None:
+        storage = SqliteReceiptStorage(str(tmp_path / 'receipts.db'))
+        receipt_db = ReceiptDatabase(storage=storage)
+        id = receipt_db.add_receipt(create_test_receipt().to_dict())
+        assert receipt_db.get_points(id) == 15
+
+    def test_snapshot(self, tmp_path) -> None:
+        storage = SqliteReceiptStorage(str(tmp_path / 'receipts.db'))
+        storage.update({'1': 15, '2': 28})
+        assert storage.snapshot() == [('1', 15), ('2', 28)]
+
+    def test_load_continues_ids(self, tmp_path) -> None:
+        storage = SqliteReceiptStorage(str(tmp_path / 'receipts.db'))
+        storage.load({'4': 15})
+        assert storage['4'] == 15 and storage.allocate_id() == '5'
+
+    def test_iter_ids_reads_as_it_goes(self, tmp_path) -> None:
+        storage = SqliteReceiptStorage(str(tmp_path / 'receipts.db'))
+        receipt = create_test_receipt()
+        storage.update({str(i): receipt for i in range(1, 4)})
+        ids = storage.iter_ids()
+
+        assert next(ids) == '1'
+        storage['4'] = receipt
+        assert list(ids) == ['2', '3', '4']
+
+class TestLRUReceiptStorage:
+    def test_allocate_ids(self) -> None:
+        storage = LRUReceiptStorage(2)
+        assert storage.allocate_id() == '1'
+        assert storage.allocate_ids(2) == ['2', '3']
+
+    def test_evicts_least_recently_stored(self) -> None:
+        storage = LRUReceiptStorage(2)
+        storage.update({'1': 10, '2': 20})
+        storage['3'] = 30
+
+        assert list(storage) == ['2', '3'] and storage.get('1') == None
+        assert '1' not in storage.storage
+
+    def test_lookup_marks_used(self) -> None:
+        storage = LRUReceiptStorage(2)
+        storage.update({'1': 10, '2': 20})
+        storage.get('1')
+        storage['3'] = 30
+
+        assert list(storage) == ['1', '3']
+
+    def test_get_many_marks_used(self) -> None:
+        storage = LRUReceiptStorage(2)
+        storage.update({'1': 10, '2': 20})
+        assert storage.get_many(['1', '4']) == {'1': 10, '4': None}
+
+        storage['3'] = 30
+        assert list(storage) == ['1', '3']
+
+    def test_was_evicted(self) -> None:
+        storage = LRUReceiptStorage(1)
+        storage.update({'1': 10, '2': 20})
+
+        assert storage.was_evicted('1')
+        assert not storage.was_evicted('2')
+        assert not storage.was_evicted('3')
+        assert not storage.was_evicted('0')
+        assert not storage.was_evicted('other')
+
+    def test_on_evict(self) -> None:
+        evicted = {}
+        storage = LRUReceiptStorage(1, on_evict=evicted.update)
+        storage.update({'1': 10, '2': 20, '3': 30})
+        assert evicted == {'1': 10, '2': 20}
+
+    def test_eviction_stats(self) -> None:
+        storage = LRUReceiptStorage(2)
+        storage.update({'1': 10, '2': 20, '3': 30})
+
+        assert storage.get_eviction_stats() == {
+            'evictions': 1, 'size': 2, 'capacity': 2
+        }
+
+    def test_load_keeps_most_recent(self) -> None:
+        evicted = []
+        storage = LRUReceiptStorage(2, on_evict=evicted.extend)
+        storage.load({'1': 10, '2': 20, '3': 30})
+
+        assert list(storage) == ['2', '3'] and evicted == ['1']
+        assert storage.was_evicted('1') and storage.allocate_id() == '4'
+
+    def test_reserve_ids(self) -> None:
+        storage = LRUReceiptStorage(2)
+        storage.reserve_ids(5)
+        assert not storage.was_evicted('5') and storage.allocate_id() == '6'
+
+    def test_evicted_ids_of_any_format(self) -> None:
+        storage = LRUReceiptStorage(1)
+        storage.update({'a1b2-c3': 10, '1736203648123456': 20})
+
+        assert storage.was_evicted('a1b2-c3')
+        assert not storage.was_evicted('1736203648123455')
+
+    def test_never_stored_not_evicted(self) -> None:
+        storage = LRUReceiptStorage(1)
+        storage.update({'5': 10, '7': 20})
+
+        assert storage.was_evicted('5')
+        assert not storage.was_evicted('6') and not storage.was_evicted('1')
+
+    def test_evicted_limit(self) -> None:
+        storage = LRUReceiptStorage(1, evicted_limit=2)
+        storage.update({'1': 10, '2': 20, '3': 30, '4': 40})
+
+        assert not storage.was_evicted('1')
+        assert storage.was_evicted('2') and storage.was_evicted('3')
+
+    def test_stored_again(self) -> None:
+        storage = LRUReceiptStorage(1)
+        storage.update({'a': 10, 'b': 20})
+        storage['a'] = 10
+
+        assert not storage.was_evicted('a') and storage.was_evicted('b')
+
+    def test_negative_evicted_limit(self) -> None:
+        with pytest.raises(ValueError):
+            LRUReceiptStorage(1, evicted_limit=-1)
+
+    def test_delete(self) -> None:
+        storage = LRUReceiptStorage(2)
+        storage['1'] = 10
+        del storage['1']
+        assert len(storage) == 0 and '1' not in storage.storage
+
+    def test_snapshot(self) -> None:
+        storage = LRUReceiptStorage(2)
+        storage.update({'1': 10, '2': 20, '3': 30})
+        assert storage.snapshot() == [('2', 20), ('3', 30)]
+
+    def test_evict_batch(self) -> None:
+        storage = LRUReceiptStorage(4, evict_batch=3)
+        storage.update({'1': 10, '2': 20, '3': 30, '4': 40})
+        storage['5'] = 50
+
+        assert list(storage) == ['4', '5']
+        assert storage.get_eviction_stats()['evictions'] == 3
+
+    def test_invalid_capacity(self) -> None:
+        with pytest.raises(ValueError):
+            LRUReceiptStorage(0)
+
+    def test_invalid_evict_batch(self) -> None:
+        with pytest.raises(ValueError):
+            LRUReceiptStorage(2, evict_batch=3)
+
+class TestTieredReceiptStorage:
+    ## Create tiered storage backed by a SQLite database in the given
+    ## directory.
+    ##
+    ## Parameters:
+    ##     tmp_path (Path): the directory to keep the database in
+    ##     hot_capacity (int): the most receipts to keep in memory
+    ##
+    ## Returns:
+    ##     A TieredReceiptStorage for the storage.
+    ##
+    def create_storage(self, tmp_path,
+                       hot_capacity: int = 2) -> TieredReceiptStorage:
+        cold = SqliteReceiptStorage(str(tmp_path / 'receipts.db'))
+        return TieredReceiptStorage(hot_capacity, cold)
+
+    def test_allocate_ids(self, tmp_path) -> None:
+        storage = self.create_storage(tmp_path)
+        assert storage.allocate_id() == '1'
+        assert storage.allocate_ids(2) == ['2', '3']
+
+    def test_allocates_blocks(self, tmp_path) -> None:
+        storage = self.create_storage(tmp_path)
+        storage.allocate_id()
+        other = self.create_storage(tmp_path)
+
+        assert other.allocate_id() == str(TieredReceiptStorage.ID_BLOCK + 1)
+        assert len(storage.allocate_ids(TieredReceiptStorage.ID_BLOCK)) == (
+            TieredReceiptStorage.ID_BLOCK
+        )
+
+    def test_recent_in_memory(self, tmp_path) -> None:
+        storage = self.create_storage(tmp_path)
+        storage.update({'1': 10, '2': 20})
+
+        assert list(storage.hot) == ['1', '2'] and len(storage.cold) == 0
+
+    def test_demotes(self, tmp_path) -> None:
+        storage = self.create_storage(tmp_path)
+        storage.update({'1': 10, '2': 20, '3': 30})
+
+        assert list(storage.hot) == ['2', '3'] and storage.cold['1'] == 10
+        assert len(storage) == 3 and sorted(storage) == ['1', '2', '3']
+
+    def test_promotes(self, tmp_path) -> None:
+        storage = self.create_storage(tmp_path)
+        storage.update({'1': 10, '2': 20, '3': 30})
+
+        assert storage.get('1') == 10
+        assert list(storage.hot) == ['3', '1']
+        assert len(storage) == 3 and sorted(storage) == ['1', '2', '3']
+        assert storage.get_tier_stats() == {
+            'hot_size': 2, 'hot_capacity': 2, 'promotions': 1,
+            'demotions': 2
+        }
+
+    def test_demoting_promoted_skips_write(self, tmp_path,
+                                           mocker: MockerFixture) -> None:
+        storage = self.create_storage(tmp_path, hot_capacity=1)
+        storage.update({'1': 10, '2': 20})
+        storage.get('1')
+        update = mocker.spy(storage.cold, 'update')
+        storage['3'] = 30
+
+        update.assert_not_called()
+        assert storage.cold['1'] == 10 and len(storage) == 3
+
+    def test_get_many(self, tmp_path) -> None:
+        storage = self.create_storage(tmp_path)
+        storage.update({'1': 10, '2': 20, '3': 30})
+
+        assert storage.get_many(['1', '3', '4']) == {
+            '1': 10, '3': 30, '4': None
+        }
+        assert '1' in storage.hot
+
+    def test_missing(self, tmp_path) -> None:
+        storage = self.create_storage(tmp_path)
+        assert storage.get('1') == None and '1' not in storage
+
+    def test_on_evict(self, tmp_path) -> None:
+        storage = self.create_storage(tmp_path, hot_capacity=1)
+        evicted = {}
+        storage.on_evict = evicted.update
+        storage.update({'1': 10, '2': 20})
+
+        assert evicted == {'1': 10}
+
+    def test_flush(self, tmp_path) -> None:
+        storage = self.create_storage(tmp_path)
+        storage.update({'1': 10, '2': 20, '3': 30})
+        storage.flush()
+
+        reopened = self.create_storage(tmp_path)
+        assert [reopened.get(id) for id in ('1', '2', '3')] == [10, 20, 30]
+        assert len(storage) == 3
+
+    def test_load(self, tmp_path) -> None:
+        storage = self.create_storage(tmp_path)
+        storage.allocate_id()
+        storage.load({'1': 10, '2': 20, '3': 30})
+
+        assert len(storage.hot) == 0 and storage.get('3') == 30
+        assert storage.allocate_id() == '4'
+
+    def test_delete(self, tmp_path) -> None:
+        storage = self.create_storage(tmp_path)
+        storage.update({'1': 10, '2': 20, '3': 30})
+        storage.get('1')
+        del storage['1']
+        del storage['3']
+
+        assert list(storage) == ['2'] and len(storage) == 1
+        with pytest.raises(KeyError):
+            del storage['1']
+
+    def test_snapshot(self, tmp_path) -> None:
+        storage = self.create_storage(tmp_path)
+        storage.update({'1': 10, '2': 20, '3': 30})
+        storage.get('1')
+
+        assert sorted(storage.snapshot()) == [('1', 10), ('2', 20), ('3', 30)]
+
+    def test_receipts(self, tmp_path) -> None:
+        storage = self.create_storage(tmp_path, hot_capacity=1)
+        receipt = create_test_receipt()
+        storage.update({'1': receipt, '2': receipt})
+
+        assert storage['1'].to_dict() == receipt.to_dict()
+
+    def test_demotes_in_batches(self, tmp_path,
+                                mocker: MockerFixture) -> None:
+        storage = self.create_storage(tmp_path, hot_capacity=1000)
+        update = mocker.spy(storage.cold, 'update')
+        storage.update({str(id): id for id in range(1, 1002)})
+
+        assert len(storage.hot) == 991 and len(storage) == 1001
+        update.assert_called_once_with({str(id): id for id in range(1, 11)})
+
+    def test_database_reads_through(self, tmp_path) -> None:
+        receipt_db = ReceiptDatabase(storage=self.create_storage(tmp_path))
+        receipt_db.add_receipts([create_test_receipt().to_dict()] * 3)
+
+        assert receipt_db.get_receipts_points(['1', '2']) == {
+            '1': 15, '2': 15
+        }
+        assert receipt_db.get_points('3') == 15
+        assert receipt_db.points.keys() == {'1', '3'}
+
+    def test_iter_ids(self, tmp_path) -> None:
+        storage = self.create_storage(tmp_path)
+        receipt = create_test_receipt()
+        for id in ('1', '2', '3', '4'):
+            storage[id] = receipt
+
+        assert sorted(storage.iter_ids()) == ['1', '2', '3', '4']
+
+class TestCreateStorage:
+    def test_memory(self) -> None:
+        assert isinstance(create_storage('memory'), MemoryReceiptStorage)
+
+    def test_memory_points_only(self) -> None:
+        storage = create_storage('memory', points_only=True)
+        assert isinstance(storage, PackedPointsStorage)
+
+    def test_sqlite(self, tmp_path) -> None:
+        storage = create_storage('sqlite', str(tmp_path / 'receipts.db'))
+        assert isinstance(storage, SqliteReceiptStorage)
+
+    def test_sqlite_without_path(self) -> None:
+        with pytest.raises(ValueError):
+            create_storage('sqlite')
+
+    def test_unknown(self) -> None:
+        with pytest.raises(ValueError):
+            create_storage('redis')
+
+    def test_capacity(self) -> None:
+        storage = create_storage('memory', points_only=True, capacity=10)
+        assert isinstance(storage, LRUReceiptStorage)
+        assert storage.capacity == 10
+
+    def test_sqlite_capacity(self, tmp_path) -> None:
+        with pytest.raises(ValueError):
+            create_storage('sqlite', str(tmp_path / 'receipts.db'),
+                           capacity=10)
+
+    def test_tiered(self, tmp_path) -> None:
+        storage = create_storage('tiered', str(tmp_path / 'receipts.db'))
+        assert isinstance(storage, TieredReceiptStorage)
+        assert storage.hot.capacity == (
+            TieredReceiptStorage.DEFAULT_HOT_CAPACITY
+        )
+
+    def test_tiered_capacity(self, tmp_path) -> None:
+        storage = create_storage('tiered', str(tmp_path / 'receipts.db'),
+                                 capacity=10)
+        assert storage.hot.capacity == 10
+
+    def test_tiered_without_path(self) -> None:
+        with pytest.raises(ValueError):
+            create_storage('tiered')
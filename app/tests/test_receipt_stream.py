@@ -0,0 +1,155 @@
+import csv
+import io
+import json
+import zlib
+
+from app.receipt import Receipt
+from app.receipt_database import ReceiptDatabase
+from app.receipt_stream import (
+    csv_lines, gzip_chunks, ingest_lines, join_chunks, ndjson_lines,
+    read_lines
+)
+
+RECEIPT_DATA = {
+    'retailer': 'Target',
+    'purchaseDate': '2022-01-02',
+    'purchaseTime': '13:13',
+    'total': '1.25',
+    'items': [
+        {'shortDescription': 'Pepsi - 12-oz', 'price': '1.25'}
+    ]
+}
+
+class RawStream(io.RawIOBase):
+    def __init__(self, data: bytes) -> None:
+        self.data = io.BytesIO(data)
+        self.reads = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: bytearray) -> int:
+        self.reads += 1
+        return self.data.readinto(buffer)
+
+class TestReadLines:
+    def test_lines(self) -> None:
+        stream = io.BytesIO(b'a\nbc\r\n\nd')
+
+        assert list(read_lines(stream, 10)) == [b'a', b'bc', b'', b'd']
+
+    def test_long_lines(self) -> None:
+        stream = io.BytesIO(b'abc\n' + b'x' * 100 + b'\nde\nxxxx\nxxxxxxxx')
+
+        assert list(read_lines(stream, 3)) == [b'abc', None, b'de', None, None]
+
+    def test_long_line_with_crlf(self) -> None:
+        stream = io.BytesIO(b'abc\r\nabcd\r\n')
+
+        assert list(read_lines(stream, 3)) == [b'abc', None]
+
+    def test_buffers_raw_streams(self) -> None:
+        stream = RawStream(b'\n'.join([b'x' * 100] * 100))
+
+        assert len(list(read_lines(stream, 100))) == 100
+        assert stream.reads < 10
+
+    def test_lazy(self) -> None:
+        stream = io.BytesIO(b'a\nb\n')
+        lines = read_lines(stream, 10)
+
+        assert next(lines) == b'a' and stream.tell() == 2
+
+class TestIngestLines:
+    def test_results(self) -> None:
+        receipt_db = ReceiptDatabase()
+        lines = [
+            json.dumps(RECEIPT_DATA).encode(), b'  ', b'[1]', b'{bad', None,
+            b'{"retailer": "Target"}', json.dumps(RECEIPT_DATA).encode()
+        ]
+        results = [
+            json.loads(result)
+            for result in ingest_lines(receipt_db, lines, 10)
+        ]
+
+        assert results[0] == {'id': '1'} and results[5] == {'id': '2'}
+        assert results[1] == {'error': 'Receipt must be a JSON object'}
+        assert 'error' in results[2] and 'error' in results[4]
+        assert results[3] == {
+            'error': 'Receipt must not be longer than 10 bytes'
+        }
+        assert receipt_db.get_points('2') == 31
+
+    def test_invalid_utf8(self) -> None:
+        results = list(ingest_lines(ReceiptDatabase(), [b'\xff\xfe{'], 10))
+
+        assert 'error' in json.loads(results[0])
+
+    def test_stores_as_read(self) -> None:
+        receipt_db = ReceiptDatabase()
+        lines = iter([json.dumps(RECEIPT_DATA).encode()] * 3)
+        results = ingest_lines(receipt_db, lines, 1000)
+        next(results)
+
+        assert len(receipt_db.receipts) == 1
+        assert len(list(lines)) == 2
+
+    def test_on_error(self) -> None:
+        errors = []
+        lines = [json.dumps(RECEIPT_DATA).encode(), b'{bad', None]
+        list(ingest_lines(ReceiptDatabase(), lines, 1000,
+                          lambda: errors.append(True)))
+
+        assert len(errors) == 2
+
+class TestNdjsonLines:
+    def test_lines(self) -> None:
+        receipt = Receipt(RECEIPT_DATA)
+        rows = [('1', receipt, 31), ('2', receipt, 31)]
+        lines = list(ndjson_lines(iter(rows)))
+
+        assert all(line.endswith('\n') for line in lines)
+        assert [json.loads(line) for line in lines] == [
+            dict(RECEIPT_DATA, id='1', points=31),
+            dict(RECEIPT_DATA, id='2', points=31)
+        ]
+
+    def test_points_only(self) -> None:
+        lines = list(ndjson_lines(iter([('1', None, 31)])))
+        assert lines == ['{"id":"1","points":31}\n']
+
+class TestCsvLines:
+    def test_lines(self) -> None:
+        lines = list(csv_lines(iter([('1', Receipt(RECEIPT_DATA), 31)])))
+        rows = list(csv.reader(io.StringIO(''.join(lines))))
+
+        assert len(lines) == 2
+        assert rows[0][0] == 'id' and rows[0][-1] == 'points'
+        assert rows[1] == [
+            '1', 'Target', '2022-01-02', '13:13', '1.25',
+            json.dumps(RECEIPT_DATA['items'], separators=(',', ':')), '31'
+        ]
+
+    def test_points_only(self) -> None:
+        lines = list(csv_lines(iter([('1', None, 31)]), points_only=True))
+        assert lines == ['id,points\r\n', '1,31\r\n']
+
+class TestJoinChunks:
+    def test_chunks(self) -> None:
+        chunks = list(join_chunks(iter(['ab', 'cd', 'e', 'f']), 3))
+        assert chunks == [b'abcd', b'ef']
+
+    def test_empty(self) -> None:
+        assert list(join_chunks(iter([]))) == []
+
+class TestGzipChunks:
+    def test_round_trip(self) -> None:
+        chunks = [b'abc' * 100, b'def' * 100]
+        body = b''.join(gzip_chunks(iter(chunks)))
+        assert zlib.decompress(body, zlib.MAX_WBITS | 16) == b''.join(chunks)
+
+    def test_flushes_each_chunk(self) -> None:
+        compressed = gzip_chunks(iter([b'abc' * 100, b'def']))
+        decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+
+        assert decompressor.decompress(next(compressed)) == b'abc' * 100
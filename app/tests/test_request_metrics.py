@@ -0,0 +1,100 @@
+from app.receipt_database import ReceiptDatabase
+from app.request_metrics import Histogram, RequestMetrics
+
+RECEIPT_DATA = {
+    'retailer': 'Target',
+    'purchaseDate': '2022-01-02',
+    'purchaseTime': '13:13',
+    'total': '1.25',
+    'items': [
+        {'shortDescription': 'Pepsi - 12-oz', 'price': '1.25'}
+    ]
+}
+
+class TestHistogram:
+    def test_buckets(self) -> None:
+        histogram = Histogram((0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 2.0):
+            histogram.observe(value)
+
+        counts, total = histogram.snapshot()
+        assert counts == [2, 3, 4] and total == 2.65
+
+    def test_empty(self) -> None:
+        assert Histogram((0.1,)).snapshot() == ([0, 0], 0.0)
+
+class TestRequestMetrics:
+    def test_requests(self) -> None:
+        metrics = RequestMetrics(ReceiptDatabase())
+        metrics.observe('/receipts/<id>/points', 'GET', 200, 0.0002)
+        metrics.observe('/receipts/<id>/points', 'GET', 200, 0.002)
+        metrics.observe('/receipts/<id>/points', 'GET', 404, 0.0002)
+        lines = metrics.render().splitlines()
+        labels = 'route="/receipts/<id>/points",method="GET",status="200"'
+
+        assert f'receipt_http_requests_total{{{labels}}} 2' in lines
+        assert (
+            f'receipt_http_request_duration_seconds_bucket{{{labels},'
+            'le="0.00025"} 1'
+        ) in lines
+        assert (
+            f'receipt_http_request_duration_seconds_bucket{{{labels},'
+            'le="+Inf"} 2'
+        ) in lines
+        assert (
+            f'receipt_http_request_duration_seconds_count{{{labels}}} 2'
+        ) in lines
+
+    def test_types(self) -> None:
+        lines = RequestMetrics(ReceiptDatabase()).render().splitlines()
+
+        assert {
+            '# TYPE receipt_http_request_duration_seconds histogram',
+            '# TYPE receipt_store_size gauge',
+            '# TYPE receipt_errors_total counter'
+        } <= set(lines)
+
+    def test_errors(self) -> None:
+        metrics = RequestMetrics(ReceiptDatabase())
+        metrics.count_errors('parse', 3)
+        metrics.count_errors('score')
+        lines = metrics.render().splitlines()
+
+        assert 'receipt_errors_total{stage="parse"} 3' in lines
+        assert 'receipt_errors_total{stage="score"} 1' in lines
+
+    def test_database(self) -> None:
+        receipt_db = ReceiptDatabase()
+        receipt_db.add_receipts([RECEIPT_DATA] * 2)
+        receipt_db.get_points('1')
+        receipt_db.get_points('1')
+        lines = RequestMetrics(receipt_db).render().splitlines()
+
+        assert 'receipt_store_size 2' in lines
+        assert 'receipt_points_cache_hits_total 1' in lines
+        assert 'receipt_points_cache_misses_total 1' in lines
+        assert 'receipt_points_cache_hit_ratio 0.5' in lines
+        assert 'receipt_points_cache_size 1' in lines
+
+    def test_restored_from_snapshot(self, tmp_path) -> None:
+        path = str(tmp_path / 'receipts.snapshot')
+        receipt_db = ReceiptDatabase()
+        receipt_db.add_receipts([RECEIPT_DATA] * 2)
+        receipt_db.save_snapshot(path)
+
+        restored_db = ReceiptDatabase(snapshot_path=path)
+        restored_db.add_receipt(RECEIPT_DATA)
+        lines = RequestMetrics(restored_db).render().splitlines()
+
+        assert 'receipt_store_size 3' in lines
+        assert 'receipt_store_evictions_total 0' in lines
+
+    def test_no_lookups(self) -> None:
+        lines = RequestMetrics(ReceiptDatabase()).render().splitlines()
+        assert 'receipt_points_cache_hit_ratio 0.0' in lines
+
+    def test_escapes_labels(self) -> None:
+        metrics = RequestMetrics(ReceiptDatabase())
+        metrics.observe('a"b\\c', 'GET', 200, 0.1)
+
+        assert 'route="a\\"b\\\\c"' in metrics.render()
@@ -0,0 +1,86 @@
+import os
+import pytest
+import signal
+import time
+from pytest_mock import MockerFixture
+
+from app.receipt_database import ReceiptDatabase
+from app.snapshot_triggers import (
+    configure_snapshot_triggers, schedule_snapshots, snapshot_on_signals
+)
+
+class TestScheduleSnapshots:
+    def test_snapshots(self, tmp_path) -> None:
+        receipt_db = ReceiptDatabase(
+            snapshot_path=str(tmp_path / 'receipts.snapshot')
+        )
+        stop = schedule_snapshots(receipt_db, 0.01)
+        time.sleep(0.2)
+        stop.set()
+        receipt_db.wait_for_snapshot()
+
+        assert receipt_db.get_snapshot_stats()['last_status'] == 'ok'
+        assert (tmp_path / 'receipts.snapshot').exists()
+
+class TestSnapshotOnSignals:
+    @pytest.fixture(autouse=True)
+    def restore_handler(self) -> None:
+        handler = signal.getsignal(signal.SIGUSR1)
+        yield
+        signal.signal(signal.SIGUSR1, handler)
+
+    def test_chains_previous_handler(self, tmp_path,
+                                     mocker: MockerFixture) -> None:
+        receipt_db = ReceiptDatabase(
+            snapshot_path=str(tmp_path / 'receipts.snapshot')
+        )
+        start = mocker.patch.object(receipt_db, 'start_background_snapshot')
+        received = []
+        signal.signal(signal.SIGUSR1,
+                      lambda signum, frame: received.append(signum))
+
+        snapshot_on_signals(receipt_db, (signal.SIGUSR1,))
+        os.kill(os.getpid(), signal.SIGUSR1)
+
+        start.assert_called_once_with()
+        assert received == [signal.SIGUSR1]
+
+    def test_ignored_previous_handler(self, tmp_path,
+                                      mocker: MockerFixture) -> None:
+        receipt_db = ReceiptDatabase(
+            snapshot_path=str(tmp_path / 'receipts.snapshot')
+        )
+        start = mocker.patch.object(receipt_db, 'start_background_snapshot')
+        signal.signal(signal.SIGUSR1, signal.SIG_IGN)
+
+        snapshot_on_signals(receipt_db, (signal.SIGUSR1,))
+        os.kill(os.getpid(), signal.SIGUSR1)
+        start.assert_called_once_with()
+
+class TestConfigureSnapshotTriggers:
+    def test_requires_path(self) -> None:
+        with pytest.raises(ValueError):
+            configure_snapshot_triggers(ReceiptDatabase(),
+                                        {'RECEIPT_SNAPSHOT_INTERVAL': 60})
+
+    def test_disabled(self, mocker: MockerFixture) -> None:
+        schedule = mocker.patch('app.snapshot_triggers.schedule_snapshots')
+        on_signals = mocker.patch('app.snapshot_triggers.snapshot_on_signals')
+
+        configure_snapshot_triggers(ReceiptDatabase(), {})
+        schedule.assert_not_called()
+        on_signals.assert_not_called()
+
+    def test_enabled(self, tmp_path, mocker: MockerFixture) -> None:
+        schedule = mocker.patch('app.snapshot_triggers.schedule_snapshots')
+        on_signals = mocker.patch('app.snapshot_triggers.snapshot_on_signals')
+        receipt_db = ReceiptDatabase(
+            snapshot_path=str(tmp_path / 'receipts.snapshot')
+        )
+
+        configure_snapshot_triggers(receipt_db, {
+            'RECEIPT_SNAPSHOT_INTERVAL': 60,
+            'RECEIPT_SNAPSHOT_ON_SIGNAL': True
+        })
+        schedule.assert_called_once_with(receipt_db, 60)
+        on_signals.assert_called_once_with(receipt_db)
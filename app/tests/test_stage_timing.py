@@ -0,0 +1,178 @@
+import logging
+import pytest
+
+from app import create_app
+from app.receipt import Receipt
+from app.receipt_database import ReceiptDatabase
+from app import stage_timing
+from app.stage_timing import (
+    StageTimer, install_stage_functions, uninstall_stage_functions
+)
+
+RECEIPT_DATA = {
+    'retailer': 'Target',
+    'purchaseDate': '2022-01-02',
+    'purchaseTime': '13:13',
+    'total': '1.25',
+    'items': [
+        {'shortDescription': 'Pepsi - 12-oz', 'price': '1.25'}
+    ]
+}
+
+@pytest.fixture(scope='function', autouse=True)
+def uninstall() -> None:
+    yield
+    while stage_timing._installs:
+        uninstall_stage_functions()
+
+@pytest.fixture(scope='function')
+def timer() -> StageTimer:
+    install_stage_functions()
+    return StageTimer()
+
+class TestStageTimer:
+    def test_stages(self, timer: StageTimer) -> None:
+        receipt_db = ReceiptDatabase(points_cache='eager')
+        timer.start_request()
+        receipt_db.add_receipt(RECEIPT_DATA)
+        stages = timer.finish_request('/receipts/process', 'POST', 200)
+
+        assert set(stages) == {'validate', 'items', 'store', 'score'}
+        assert all(seconds >= 0 for seconds in stages.values())
+
+    def test_leaves_out_nested_stages(self, timer: StageTimer) -> None:
+        receipt_db = ReceiptDatabase()
+        timer.start_request()
+        receipt_db.add_receipts([RECEIPT_DATA] * 200)
+        stages = timer.finish_request('/receipts/process/batch', 'POST', 200)
+
+        assert stages['items'] > 0 and stages['validate'] > 0
+        assert stages['store'] < sum(stages.values())
+
+    def test_batch_scoring(self, timer: StageTimer) -> None:
+        receipt_db = ReceiptDatabase(points_cache='eager')
+        timer.start_request()
+        receipt_db.add_receipts([RECEIPT_DATA] * 20)
+        stages = timer.finish_request('/receipts/process/batch', 'POST', 200)
+
+        assert stages['score'] > 0
+        assert timer.histograms['score'].snapshot()[0][-1] == 1
+
+    def test_histograms(self, timer: StageTimer) -> None:
+        receipt_db = ReceiptDatabase()
+        receipt_db.add_receipt(RECEIPT_DATA)
+        for i in range(2):
+            timer.start_request()
+            receipt_db.get_points('1')
+            timer.finish_request('/receipts/<id>/points', 'GET', 200)
+
+        assert timer.histograms['lookup'].snapshot()[0][-1] == 2
+        assert timer.histograms['score'].snapshot()[0][-1] == 1
+        assert timer.histograms['store'].snapshot()[0][-1] == 0
+
+    def test_hooks(self, timer: StageTimer) -> None:
+        calls = []
+        timer.add_hook(lambda *args: calls.append(args))
+        timer.start_request()
+        Receipt(RECEIPT_DATA)
+        timer.finish_request('/route', 'GET', 200)
+
+        route, method, status, stages, seconds = calls[0]
+        assert (route, method, status) == ('/route', 'GET', 200)
+        assert set(stages) == {'validate', 'items'}
+        assert seconds >= sum(stages.values())
+
+    def test_outside_request(self, timer: StageTimer) -> None:
+        Receipt(RECEIPT_DATA)
+        assert timer.finish_request('/route', 'GET', 200) is None
+
+    def test_discard(self, timer: StageTimer) -> None:
+        timer.start_request()
+        timer.discard_request()
+        Receipt(RECEIPT_DATA)
+
+        assert timer.finish_request('/route', 'GET', 200) is None
+
+    def test_slow_log(self, caplog: pytest.LogCaptureFixture) -> None:
+        install_stage_functions()
+        timer = StageTimer(slow_threshold=0.0)
+        timer.start_request()
+        Receipt(RECEIPT_DATA)
+
+        with caplog.at_level(logging.WARNING, 'app.slow_requests'):
+            timer.finish_request('/route', 'GET', 200)
+
+        assert 'Slow request GET /route (200)' in caplog.text
+        assert 'validate=' in caplog.text and 'items=' in caplog.text
+        assert 'other=' in caplog.text
+
+    def test_fast_not_logged(self, timer: StageTimer,
+                             caplog: pytest.LogCaptureFixture) -> None:
+        timer.start_request()
+
+        with caplog.at_level(logging.WARNING, 'app.slow_requests'):
+            timer.finish_request('/route', 'GET', 200)
+
+        assert caplog.text == ''
+
+class TestInstall:
+    def test_unwrapped_when_disabled(self) -> None:
+        original = Receipt.__init__
+        create_app().test_client().post('/receipts/process',
+                                        json=RECEIPT_DATA)
+
+        assert Receipt.__init__ is original
+        assert not hasattr(Receipt.__init__, '__wrapped__')
+
+    def test_wrapped_when_enabled(self) -> None:
+        original = Receipt.__init__
+        create_app({'RECEIPT_STAGE_TIMING': True})
+
+        assert Receipt.__init__.__wrapped__ is original
+
+    def test_uninstall(self) -> None:
+        original = Receipt.__init__
+        install_stage_functions()
+        install_stage_functions()
+        uninstall_stage_functions()
+        assert Receipt.__init__.__wrapped__ is original
+
+        uninstall_stage_functions()
+        assert Receipt.__init__ is original
+        assert ReceiptDatabase.add_receipt.__name__ == 'add_receipt'
+        assert not hasattr(ReceiptDatabase.add_receipt, '__wrapped__')
+
+class TestApp:
+    def test_metrics(self) -> None:
+        client = create_app({'RECEIPT_STAGE_TIMING': True}).test_client()
+        client.post('/receipts/process', json=RECEIPT_DATA)
+        lines = client.get('/metrics').data.decode().splitlines()
+
+        assert 'receipt_stage_duration_seconds_count{stage="parse"} 1' in lines
+        assert 'receipt_stage_duration_seconds_count{stage="store"} 1' in lines
+
+    def test_slow_requests(self, caplog: pytest.LogCaptureFixture) -> None:
+        client = create_app({'RECEIPT_SLOW_REQUEST_MS': 1e-6}).test_client()
+
+        with caplog.at_level(logging.WARNING, 'app.slow_requests'):
+            client.post('/receipts/process', json=RECEIPT_DATA)
+
+        assert 'Slow request POST /receipts/process (200)' in caplog.text
+        assert 'parse=' in caplog.text and 'store=' in caplog.text
+
+    def test_disabled(self) -> None:
+        client = create_app().test_client()
+        client.post('/receipts/process', json=RECEIPT_DATA)
+
+        assert 'receipt_stage_duration_seconds' not in client.get(
+            '/metrics'
+        ).data.decode()
+
+    def test_other_apps_untimed(self) -> None:
+        timed = create_app({'RECEIPT_STAGE_TIMING': True}).test_client()
+        untimed = create_app().test_client()
+        timed.post('/receipts/process', json=RECEIPT_DATA)
+        untimed.post('/receipts/process', json=RECEIPT_DATA)
+        lines = timed.get('/metrics').data.decode().splitlines()
+
+        assert 'receipt_stage_duration_seconds_count{stage="store"} 1' in lines
@@ -0,0 +1,34 @@
+import threading
+
+from app.striped_counter import StripedCounter
+
+class TestStripedCounter:
+    def test_empty(self) -> None:
+        assert StripedCounter().value() == 0
+
+    def test_add(self) -> None:
+        counter = StripedCounter()
+        counter.add()
+        counter.add(4)
+        assert counter.value() == 5
+
+    def test_single_stripe(self) -> None:
+        counter = StripedCounter(stripes=1)
+        counter.add(2)
+        counter.add(3)
+        assert counter.value() == 5
+
+    def test_concurrent_adds(self) -> None:
+        counter = StripedCounter()
+
+        def add_many() -> None:
+            for i in range(10000):
+                counter.add()
+
+        threads = [threading.Thread(target=add_many) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert counter.value() == 80000
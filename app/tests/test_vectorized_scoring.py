@@ -0,0 +1,123 @@
+import random
+
+from app.point_calculator import score_receipt
+from app.receipt import Receipt
+from app.vectorized_scoring import (
+    ReceiptColumns, score_columns, score_receipts_vectorized
+)
+
+## Create a receipt with the given attributes and filler for the rest.
+##
+## Parameters:
+##     retailer (str): the name of the retailer
+##     date (str): the purchase date in the format "YYYY-MM-DD"
+##     time (str): the purchase time in the format "HH:MM"
+##     total (str): the total cost in dollars
+##     items (list[tuple]): a tuple with the description and price in dollars
+##                          for each item
+##
+## Returns:
+##     A Receipt with the given attributes.
+##
+def create_receipt(retailer: str = 'Target', date: str = '2022-01-01',
+                   time: str = '13:01', total: str = '35.35',
+                   items: list[tuple] = ()) -> Receipt:
+    return Receipt({
+        'retailer': retailer,
+        'purchaseDate': date,
+        'purchaseTime': time,
+        'total': total,
+        'items': [
+            {'shortDescription': desc, 'price': price}
+            for desc, price in items
+        ]
+    })
+
+class TestReceiptColumns:
+    def test_columns(self) -> None:
+        columns = ReceiptColumns([
+            create_receipt('M&M Corner', '2022-03-20', '14:33', '9.00', [
+                ('Gatorade', '2.25'), (' Pie ', '6.75')
+            ])
+        ])
+
+        assert columns.name_points.tolist() == [8]
+        assert columns.days.tolist() == [20]
+        assert columns.minutes.tolist() == [14 * 60 + 33]
+        assert columns.total_cents.tolist() == [900]
+        assert columns.item_counts.tolist() == [2]
+        assert columns.desc_lengths.tolist() == [8, 3]
+        assert columns.price_cents.tolist() == [225, 675]
+
+    def test_empty(self) -> None:
+        assert len(ReceiptColumns([])) == 0
+
+class TestScoreColumns:
+    def test_empty(self) -> None:
+        assert score_columns(ReceiptColumns([])).tolist() == []
+
+    def test_purchase_times(self) -> None:
+        receipts = [
+            create_receipt(time=time)
+            for time in ['13:59', '14:00', '14:01', '15:59', '16:00']
+        ]
+
+        points = score_columns(ReceiptColumns(receipts)).tolist()
+        assert points == [score_receipt(receipt) for receipt in receipts]
+
+    def test_totals(self) -> None:
+        receipts = [
+            create_receipt(total=total)
+            for total in ['0.00', '0.01', '5.25', '8.50', '0.75', '17.00']
+        ]
+
+        points = score_columns(ReceiptColumns(receipts)).tolist()
+        assert points == [score_receipt(receipt) for receipt in receipts]
+
+    def test_items(self) -> None:
+        receipts = [
+            create_receipt(items=[]),
+            create_receipt(items=[('And', '5.23')]),
+            create_receipt(items=[('  Course', '10.40'), ('Hi', '1.00')]),
+            create_receipt(items=[('Ice Cream    ', '934.32')] * 5)
+        ]
+
+        points = score_columns(ReceiptColumns(receipts)).tolist()
+        assert points == [score_receipt(receipt) for receipt in receipts]
+
+class TestScoreReceiptsVectorized:
+    def test_examples(self) -> None:
+        receipts = [
+            create_receipt('Target', '2022-01-01', '13:01', '35.35', [
+                ('Mountain Dew 12PK', '6.49'),
+                ('Emils Cheese Pizza', '12.25'),
+                ('Knorr Creamy Chicken', '1.26'),
+                ('Doritos Nacho Cheese', '3.35'),
+                ('   Klarbrunn 12-PK 12 FL OZ  ', '12.00')
+            ]),
+            create_receipt('M&M Corner Market', '2022-03-20', '14:33', '9.00',
+                           [('Gatorade', '2.25')] * 4)
+        ]
+
+        assert score_receipts_vectorized(receipts) == [28, 109]
+
+    def test_matches_scalar(self) -> None:
+        rand = random.Random(7)
+        receipts = []
+
+        for i in range(500):
+            items = [
+                (' ' * rand.randrange(3) + 'x' * rand.randrange(1, 12),
+                 f'{rand.randrange(100000) / 100:.2f}')
+                for j in range(rand.randrange(6))
+            ]
+            receipts.append(create_receipt(
+                'M&M #' * rand.randrange(1, 4),
+                f'2022-01-{rand.randrange(1, 29):02d}',
+                f'{rand.randrange(24):02d}:{rand.randrange(60):02d}',
+                f'{rand.randrange(100000) / 100:.2f}',
+                items
+            ))
+
+        expected = [score_receipt(receipt) for receipt in receipts]
+        assert score_receipts_vectorized(receipts) == expected
@@ -0,0 +1,118 @@
+import numpy as np
+
+from app.receipt import Receipt
+
+## The columns scored by the vectorized engine for a batch of receipts. Items
+## of every receipt are flattened into shared columns in receipt order.
+##
+## Attributes:
+##     name_points (ndarray): the amount of alphanumeric characters in the
+##                            retailer name of each receipt
+##     days (ndarray): the day of the month of each purchase date
+##     minutes (ndarray): the minute of the day of each purchase time
+##     total_cents (ndarray): the total cost in cents of each receipt
+##     item_counts (ndarray): the amount of items on each receipt
+##     desc_lengths (ndarray): the trimmed length of each item description
+##     price_cents (ndarray): the price in cents of each item
+##
+class ReceiptColumns:
+    __slots__ = (
+        'name_points',
+        'days',
+        'minutes',
+        'total_cents',
+        'item_counts',
+        'desc_lengths',
+        'price_cents'
+    )
+
+    ## Initialize the columns from the given receipts.
+    ##
+    ## Parameters:
+    ##     receipts (list[Receipt]): the receipts to convert into columns
+    ##
+    def __init__(self, receipts: list[Receipt]) -> None:
+        name_points = []
+        days = []
+        minutes = []
+        total_cents = []
+        item_counts = []
+        desc_lengths = []
+        price_cents = []
+
+        for receipt in receipts:
+            purchase_time = receipt.get_purchase_time()
+            items = receipt.get_purchased_items()
+
+            name_points.append(sum(map(str.isalnum, receipt.get_retailer())))
+            days.append(receipt.get_purchase_date().day)
+            minutes.append(purchase_time.hour * 60 + purchase_time.minute)
+            total_cents.append(receipt.get_total_cents())
+            item_counts.append(len(items))
+
+            for item in items:
+                desc_lengths.append(len(item.get_short_description().strip()))
+                price_cents.append(item.get_price_cents())
+
+        self.name_points = np.array(name_points, dtype=np.int64)
+        self.days = np.array(days, dtype=np.int64)
+        self.minutes = np.array(minutes, dtype=np.int64)
+        self.total_cents = np.array(total_cents, dtype=np.int64)
+        self.item_counts = np.array(item_counts, dtype=np.int64)
+        self.desc_lengths = np.array(desc_lengths, dtype=np.int64)
+        self.price_cents = np.array(price_cents, dtype=np.int64)
+
+    ## Retrieve the amount of receipts in the columns.
+    ##
+    ## Returns:
+    ##     An int for the amount of receipts.
+    ##
+    def __len__(self) -> int:
+        return len(self.days)
+
+## Calculate the amount of points for every receipt in the columns. Each rule
+## of point_calculator is applied to a whole column at once and gives the same
+## points as score_receipt.
+##
+## Parameters:
+##     columns (ReceiptColumns): the columns of the receipts to score
+##
+## Returns:
+##     An ndarray of ints for the amount of points scored for each receipt.
+##
+def score_columns(columns: ReceiptColumns) -> np.ndarray:
+    points = columns.name_points.copy()
+
+    points += np.where(columns.days % 2 == 1, 6, 0)
+
+    after_2_pm = columns.minutes > 14 * 60
+    before_4_pm = columns.minutes < 16 * 60
+    points += np.where(after_2_pm & before_4_pm, 10, 0)
+
+    points += np.where(columns.total_cents % 25 == 0, 25, 0)
+    points += np.where(columns.total_cents % 100 == 0, 50, 0)
+
+    points += 5 * (columns.item_counts // 2)
+
+    owners = np.repeat(np.arange(len(columns)), columns.item_counts)
+    item_points = np.where(
+        columns.desc_lengths % 3 == 0, -(-columns.price_cents // 500), 0
+    )
+    points += np.bincount(
+        owners, weights=item_points, minlength=len(columns)
+    ).astype(np.int64)
+
+    return points
+
+## Calculate the amount of points for each of the receipts with the vectorized
+## engine.
+##
+## Parameters:
+##     receipts (list[Receipt]): the receipts to score
+##
+## Returns:
+##     A list of ints for the amount of points scored for each receipt in the
+##     same order.
+##
+def score_receipts_vectorized(receipts: list[Receipt]) -> list[int]:
+    return score_columns(ReceiptColumns(receipts)).tolist()